@@ -122,6 +122,9 @@ class AnthropicModel(backends.Model):
                 encoded_messages.append(claude_message)
         return encoded_messages, system_message
 
+    def supports_concurrency(self) -> bool:
+        return True  # requests are served remotely, so they can be issued from several threads
+
     @retry(tries=3, delay=10, logger=logger)
     @augment_response_object
     @ensure_messages_format
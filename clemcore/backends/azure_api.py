@@ -105,6 +105,9 @@ class AzureOpenAIModel(backends.Model):
                 encoded_messages.append(this)
         return encoded_messages
 
+    def supports_concurrency(self) -> bool:
+        return True  # requests are served remotely, so they can be issued from several threads
+
     @retry(tries=3, delay=90, logger=logger)
     @augment_response_object
     @ensure_messages_format
@@ -181,6 +184,9 @@ class AzureClaudeModel(backends.Model):
                 encoded_messages.append(this)
         return encoded_messages
 
+    def supports_concurrency(self) -> bool:
+        return True  # requests are served remotely, so they can be issued from several threads
+
     @retry(tries=3, delay=90, logger=logger)
     @augment_response_object
     @ensure_messages_format
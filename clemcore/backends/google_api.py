@@ -147,6 +147,9 @@ class GoogleModel(backends.Model):
                 return message['content']
         return None
 
+    def supports_concurrency(self) -> bool:
+        return True  # requests are served remotely, so they can be issued from several threads
+
     @retry(tries=3, delay=10, logger=logger)
     @augment_response_object
     @ensure_messages_format
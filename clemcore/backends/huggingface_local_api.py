@@ -1,11 +1,14 @@
 """Backend using HuggingFace transformers models.
 Uses HF tokenizers instruct/chat templates for proper input format per model.
 """
+import copy
+import gc
 import logging
 from typing import List, Dict, Tuple, Any
 import torch
 import re
 from transformers import AutoTokenizer, AutoModelForCausalLM, AutoConfig, AutoProcessor, BitsAndBytesConfig, PreTrainedTokenizerBase, PreTrainedModel
+from transformers import DynamicCache
 from transformers.generation.utils import GenerateOutput
 from transformers.image_utils import load_image
 from peft import PeftModel
@@ -15,6 +18,7 @@ from jinja2 import meta as jinja2_meta
 
 import clemcore.backends as backends
 from clemcore.backends.key_registry import KeyRegistry
+from clemcore.backends.prompt_cache import PromptCache
 from clemcore.backends.utils import ensure_alternating_roles, ensure_messages_format, augment_response_object, \
     ContextExceededError
 
@@ -200,6 +204,13 @@ def load_config_and_tokenizer(model_spec: backends.ModelSpec) -> Tuple[PreTraine
     return tokenizer, auto_config
 
 
+def release_memory():
+    """Free the memory of unreferenced model weights, including the cached memory of the GPUs."""
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
 def load_model(model_spec: backends.ModelSpec) -> PreTrainedModel | PeftModel:
     """Load Huggingface model weights, into VRAM if available.
     Weights are distributed over all available GPUs for maximum speed - make sure to limit the available GPUs using
@@ -247,6 +258,25 @@ def load_model(model_spec: backends.ModelSpec) -> PreTrainedModel | PeftModel:
     return model
 
 
+def _to_layer_states(past_key_values) -> Tuple[Tuple[torch.Tensor, torch.Tensor], ...]:
+    """The (keys, values) of each layer, shaped [batch, heads, length, head_dim], of a cache returned by generate()."""
+    if hasattr(past_key_values, "layers"):  # transformers >= 4.56
+        return tuple((layer.keys, layer.values) for layer in past_key_values.layers)
+    if hasattr(past_key_values, "to_legacy_cache"):
+        return past_key_values.to_legacy_cache()
+    return tuple(past_key_values)
+
+
+def _num_bytes(layer_states) -> int:
+    return sum(tensor.numel() * tensor.element_size() for layer_state in layer_states for tensor in layer_state)
+
+
+def _crop_layer_states(layer_states, length: int) -> Tuple[Tuple[Tuple[torch.Tensor, torch.Tensor], ...], int]:
+    """A copy of the (keys, values) of each layer for the first length tokens and its size in bytes."""
+    cropped = tuple((keys[:, :, :length].clone(), values[:, :, :length].clone()) for keys, values in layer_states)
+    return cropped, _num_bytes(cropped)
+
+
 class HuggingfaceLocal(backends.Backend):
     """Model/backend handler class for locally-run Huggingface models."""
 
@@ -290,6 +320,16 @@ class HuggingfaceLocalModel(backends.BatchGenerativeModel):
 
         self.device = next(self.model.parameters()).device
 
+        # keep the KV states of the previous turns and of the shared prompt prefixes, so that only the new
+        # messages of a dialogue (or the instance-specific part of the first prompt) are prefilled
+        self.prompt_cache = None
+        kv_cache_budget = model_spec.model_config.get("kv_cache_budget")
+        if kv_cache_budget and self.tokenizer.padding_side != "left":
+            logger.warning("The KV states of %s are not reused: the prompts are not padded on the left",
+                           model_spec.model_name)
+        elif kv_cache_budget:
+            self.prompt_cache = PromptCache(kv_cache_budget, crop=_crop_layer_states)
+
     @property
     def chat_template_kwargs(self) -> dict:
         return dict(self._chat_template_kwargs)
@@ -302,6 +342,13 @@ class HuggingfaceLocalModel(backends.BatchGenerativeModel):
         if self._chat_template_kwargs:
             check_chat_template_kwargs(self.tokenizer.chat_template, self._chat_template_kwargs)
 
+    def unload(self):
+        """Release the model weights, e.g., to load another local model in a run matrix."""
+        self.model = None
+        if self.prompt_cache is not None:
+            self.prompt_cache.clear()
+        release_memory()
+
     @augment_response_object
     @ensure_messages_format
     def generate_response(self, messages: List[Dict]) -> Tuple[Any, Any, str]:
@@ -336,16 +383,39 @@ class HuggingfaceLocalModel(backends.BatchGenerativeModel):
         """
         return self._generate_batch_response(batch_messages)
 
-    def _generate_batch_response(self, batch_messages: List[List[Dict]]) -> List[Tuple[Any, Any, str]]:
+    @augment_response_object
+    @ensure_messages_format
+    def generate_samples(self, messages: List[Dict], n: int) -> List[Tuple[Any, Any, str]]:
+        """
+        Public method for generating several responses to the same messages.
+
+        The prompt is encoded (prefilled) only once and the n samples are drawn via num_return_sequences.
+
+        Args:
+            messages (List[Dict]): List of message dicts.
+            n (int): The number of responses to generate.
+
+        Returns:
+            List[Tuple[Any, Any, str]]: List of n response tuples.
+        """
+        return self._generate_batch_response([messages], num_return_sequences=n)
+
+    def supports_sampling(self) -> bool:
+        return True
+
+    def _generate_batch_response(self, batch_messages: List[List[Dict]],
+                                 num_return_sequences: int = 1) -> List[Tuple[Any, Any, str]]:
         """
         Core batch response implementation without decorators.
 
         Args:
             batch_messages (List[List[Dict]]): Batch of message lists,
                 assumed to be properly formatted.
+            num_return_sequences (int): The number of responses per message list. Default: 1.
 
         Returns:
-            List[Tuple[Any, Any, str]]: List of response tuples (prompt, response_object, response_text).
+            List[Tuple[Any, Any, str]]: List of response tuples (prompt, response_object, response_text),
+                num_return_sequences consecutive ones per message list.
 
         Note:
             Intended for internal use only. Use public decorated methods
@@ -433,11 +503,20 @@ class HuggingfaceLocalModel(backends.BatchGenerativeModel):
             gen_args["do_sample"] = True
             gen_args["top_p"] = getattr(self.model.generation_config, "top_p", None)  # look in config for default value
             gen_args["temperature"] = self.temperature
+            # the samples share the prefill of their prompt; greedy decoding would return identical sequences
+            gen_args["num_return_sequences"] = num_return_sequences
 
         # Let CoT-output models generate to their context limit to assure CoT+final answer completion
         if 'cot_output' in self.model_spec.model_config and self.model_spec.model_config['cot_output']:
             gen_args["max_new_tokens"] = self.context_size
 
+        # Prefill only the suffixes of the prompts that are not covered by the KV states of previous turns
+        reuse_kv_states = self.prompt_cache is not None and gen_args.get("num_return_sequences", 1) == 1
+        if reuse_kv_states:
+            past_key_values = self._reuse_kv_states(prompt_token_ids, attention_mask)
+            if past_key_values is not None:
+                gen_args["past_key_values"] = past_key_values
+
         # Put the model into evaluation mode e.g., disable dropout and configure batch norm etc.
         if self.model.training:
             stdout_logger.info("Model is in training mode; switching to eval mode for generation.")
@@ -445,15 +524,77 @@ class HuggingfaceLocalModel(backends.BatchGenerativeModel):
 
         # Generate outputs for the whole batch (Note: model.generate() is decorated with torch.no_grad() !)
         generation_output: GenerateOutput = self.model.generate(prompt_token_ids, **gen_args)
+        if reuse_kv_states:
+            self._store_kv_states(generation_output, attention_mask)
 
         # Decode all outputs and prompts
         model_outputs = self.tokenizer.batch_decode(generation_output.sequences)
         prompt_texts = self.tokenizer.batch_decode(prompt_token_ids)
+        num_sequences = gen_args.get("num_return_sequences", 1)  # the sequences of a prompt are consecutive
+        prompt_texts = [prompt_text for prompt_text in prompt_texts for _ in range(num_sequences)]
 
         prompts, response_texts, responses = split_and_clean_batch_outputs(self,
                                                                            model_outputs,
                                                                            prompt_texts)
-        return list(zip(prompts, responses, response_texts))
+        results = list(zip(prompts, responses, response_texts))
+        if num_sequences < num_return_sequences:  # greedy decoding: repeat the only response
+            results = [(prompt, copy.deepcopy(response), response_text)
+                       for prompt, response, response_text in results for _ in range(num_return_sequences)]
+        return results
+
+    def _reuse_kv_states(self, prompt_token_ids: torch.Tensor, attention_mask: torch.Tensor) -> DynamicCache | None:
+        """
+        Assemble the KV states of the longest cached prefixes of the (left-padded) prompts into a batch cache.
+
+        The batch cache covers the same number of positions for each row: the padding (zeros, which are masked)
+        followed by the cached prefix of the prompt. Hence, it is as long as the shortest of these, so that
+        a batch only benefits when the prefixes of all its prompts are cached.
+
+        Returns:
+            The cache to pass to generate() or None, if no position is covered.
+        """
+        num_pads = (attention_mask == 0).sum(dim=1).tolist()
+        matches = []
+        for row, num_pad in enumerate(num_pads):
+            prefix_length, entry = self.prompt_cache.lookup(prompt_token_ids[row, num_pad:].tolist())
+            matches.append((num_pad, prefix_length, entry))
+        cached_length = min(num_pad + prefix_length for num_pad, prefix_length, _ in matches)
+        if cached_length == 0:
+            return None
+        template = next(entry for _, _, entry in matches if entry is not None).kv_state
+        past_key_values = DynamicCache()
+        for layer_idx, layer_template in enumerate(template):
+            layer_states = []
+            for kv_idx, template_states in enumerate(layer_template):  # the keys and the values
+                rows = []
+                for num_pad, _, entry in matches:
+                    num_cached = max(cached_length - num_pad, 0)
+                    padding_shape = list(template_states.shape)
+                    padding_shape[2] = cached_length - num_cached
+                    row_states = [template_states.new_zeros(padding_shape)]
+                    if num_cached > 0:
+                        row_states.append(entry.kv_state[layer_idx][kv_idx][:, :, :num_cached])
+                    rows.append(torch.cat(row_states, dim=2))
+                layer_states.append(torch.cat(rows, dim=0))
+            past_key_values.update(*layer_states, layer_idx)
+        return past_key_values
+
+    def _store_kv_states(self, generation_output: GenerateOutput, attention_mask: torch.Tensor):
+        """Store the KV states of each prompt and its generated response (without the padding) in the cache."""
+        layer_states = _to_layer_states(generation_output.past_key_values)
+        cache_length = generation_output.sequences.shape[1] - 1  # the last token is not fed to the model
+        if any(keys.shape[2] != cache_length for keys, _ in layer_states):
+            logger.warning("The KV states of %s are not reused: the cache does not cover all positions "
+                           "(e.g. a sliding window cache)", self.model_spec.model_name)
+            self.prompt_cache = None
+            return
+        num_pads = (attention_mask == 0).sum(dim=1).tolist()
+        for row, num_pad in enumerate(num_pads):
+            kv_state = tuple((keys[row:row + 1, :, num_pad:].clone(), values[row:row + 1, :, num_pad:].clone())
+                             for keys, values in layer_states)
+            token_ids = generation_output.sequences[row, num_pad:cache_length].tolist()
+            self.prompt_cache.store(token_ids, kv_state, _num_bytes(kv_state),
+                                    num_prompt_tokens=attention_mask.shape[1] - num_pad)
 
 
 class HuggingfaceLocalMultimodalModel(backends.Model):
@@ -480,6 +621,11 @@ class HuggingfaceLocalMultimodalModel(backends.Model):
         )
         self.context_size = _context_size_from_config(auto_config, model_spec)
 
+    def unload(self):
+        """Release the model weights, e.g., to load another local model in a run matrix."""
+        self.model = None
+        release_memory()
+
     @augment_response_object
     @ensure_messages_format
     def generate_response(self, messages: List[Dict]) -> Tuple[Any, Any, str]:
@@ -673,6 +819,9 @@ def split_and_clean_cot_output(response_text: str, model: HuggingfaceLocalModel)
 
 
 def assert_context_limits(model: HuggingfaceLocalModel, prompt_token_ids):
+    """Check the context limit for all rows of the batch and raise for all the rows that exceed it at once
+    (see ContextExceededError.batch_indices), so that the other rows can be generated without them."""
+    exceeded = []
     for i in range(prompt_token_ids.size(0)):
         context_check = _check_context_limit(
             model.context_size,
@@ -682,12 +831,17 @@ def assert_context_limits(model: HuggingfaceLocalModel, prompt_token_ids):
         if not context_check[0]:
             logger.info(f"Context token limit for {model.model_spec.model_name} exceeded on batch index {i}: "
                         f"{context_check[1]}/{context_check[3]}")
-            raise ContextExceededError(
-                f"Context token limit for {model.model_spec.model_name} exceeded at batch index {i}",
-                tokens_used=context_check[1],
-                tokens_left=context_check[2],
-                context_size=context_check[3]
-            )
+            exceeded.append((i, context_check))
+    if exceeded:
+        first_index, context_check = exceeded[0]
+        raise ContextExceededError(
+            f"Context token limit for {model.model_spec.model_name} exceeded at batch indices "
+            f"{[i for i, _ in exceeded]}; first one:",
+            tokens_used=context_check[1],
+            tokens_left=context_check[2],
+            context_size=context_check[3],
+            batch_indices=[i for i, _ in exceeded]
+        )
 
 
 def _check_context_limit(context_size, prompt_tokens, max_new_tokens: int = 100) -> Tuple[bool, int, int, int]:
@@ -1,5 +1,6 @@
 """Backend using llama.cpp for GGUF/GGML models."""
 
+import copy
 import logging
 from typing import List, Dict, Tuple, Any
 import re
@@ -165,6 +166,12 @@ class LlamaCPPLocalModel(backends.Model):
         # get context size from model instance:
         self.context_size = self.model._n_ctx
 
+    def unload(self):
+        """Release the model weights, e.g., to load another local model in a run matrix."""
+        if self.model is not None and hasattr(self.model, "close"):
+            self.model.close()
+        self.model = None
+
     def generate_response(self, messages: List[Dict], return_full_text: bool = False) -> Tuple[Any, Any, str]:
         """Generate a response with the loaded llama-cpp model.
         Args:
@@ -179,6 +186,29 @@ class LlamaCPPLocalModel(backends.Model):
         Returns:
             The response message generated by the loaded llama-cpp model.
         """
+        prompt, prompt_text = self._encode_prompt(messages, return_full_text)
+        return self._sample(prompt, prompt_text, return_full_text)
+
+    def supports_sampling(self) -> bool:
+        return True
+
+    def generate_samples(self, messages: List[Dict], n: int) -> List[Tuple[Any, Any, str]]:
+        """Generate n responses to the same messages with the loaded llama-cpp model.
+        The prompt is checked and evaluated only once: llama.cpp keeps the evaluated prompt tokens in its context,
+        so that the later samples reuse them and only generate their continuations.
+        Args:
+            messages: A message history (see generate_response).
+            n: The number of responses to generate.
+        Returns:
+            The n responses generated by the loaded llama-cpp model.
+        """
+        prompt, prompt_text = self._encode_prompt(messages)
+        if not self.temperature > 0:  # greedy decoding: every sample would be the same
+            prompt, response, response_text = self._sample(prompt, prompt_text)
+            return [(prompt, copy.deepcopy(response), response_text) for _ in range(n)]
+        return [self._sample(prompt, prompt_text) for _ in range(n)]
+
+    def _encode_prompt(self, messages: List[Dict], return_full_text: bool = False) -> Tuple[Dict, str]:
         current_messages = ensure_alternating_roles(messages)
 
         # use llama.cpp jinja to apply chat template for prompt:
@@ -192,7 +222,9 @@ class LlamaCPPLocalModel(backends.Model):
         # check context limit:
         check_context_limit_generic(self.context_size, prompt_tokens, self.model_spec.model_name,
                                     max_new_tokens=self.max_tokens)
+        return prompt, prompt_text
 
+    def _sample(self, prompt: Dict, prompt_text: str, return_full_text: bool = False) -> Tuple[Any, Any, str]:
         # NOTE: HF transformers models come with their own generation configs, but llama.cpp doesn't seem to have a
         # feature like that. There are default sampling parameters, and clembench only handles two of them so far, which
         # are set accordingly. Other parameters use the llama-cpp-python default values for now.
@@ -46,6 +46,9 @@ class MistralModel(backends.Model):
         super().__init__(model_spec)
         self.client = client
 
+    def supports_concurrency(self) -> bool:
+        return True  # requests are served remotely, so they can be issued from several threads
+
     @retry(tries=3, delay=10, logger=logger)
     @augment_response_object
     @ensure_messages_format
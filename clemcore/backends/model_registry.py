@@ -531,10 +531,44 @@ class Model(abc.ABC):
         """
         pass
 
+    def generate_samples(self, messages: List[Dict], n: int) -> List[Tuple[Any, Any, str]]:
+        """
+        Generate n independent responses to the same messages, e.g., for the branches of a branching point.
+
+        By default, the messages are sent n times (as a batch, if the model supports batching).
+        Models that can draw several samples from a single evaluation of the prompt override this method
+        and return True for supports_sampling().
+
+        Args:
+            messages: The dialogue context (see generate_response).
+            n: The number of responses to generate.
+
+        Returns:
+            A list of n tuples (prompt, response_object, response_text) as returned by generate_response.
+        """
+        if self.supports_batching():
+            return self.generate_batch_response([list(messages) for _ in range(n)])
+        return [self.generate_response(messages) for _ in range(n)]
+
+    def supports_sampling(self) -> bool:
+        """
+        Check if the model draws the samples of `generate_samples` from a single evaluation of the prompt,
+        so that runners should request all responses to the same context in one call.
+
+        Returns:
+            bool: False by default. Local models and remote APIs with an `n` parameter return True.
+        """
+        return False
+
     def reset(self):
         """ Hook to perform cleanup operations after an interaction, if necessary."""
         pass
 
+    def unload(self):
+        """ Hook to release the resources held by the model, e.g., the weights of a local model.
+        The model cannot generate responses anymore afterwards."""
+        pass
+
     def supports_batching(self) -> bool:
         """
         Check if the given model supports batch generation of responses.
@@ -548,6 +582,26 @@ class Model(abc.ABC):
     def all_support_batching(player_models: List["Model"]) -> bool:
         return all(player_model.supports_batching() for player_model in player_models)
 
+    def supports_concurrency(self) -> bool:
+        """
+        Check if the model can serve calls to `generate_response` from several threads at the same time.
+
+        Returns:
+            bool: False by default, e.g. for local models that hold a single inference context.
+                  Models of remote APIs return True.
+        """
+        return False
+
+    def responds_instantly(self) -> bool:
+        """
+        Check if the model responds without any generation, so that runners may resolve its turns right away
+        instead of scheduling them with the turns of generative models.
+
+        Returns:
+            bool: False by default. Programmatic models return True.
+        """
+        return False
+
 
 class BatchGenerativeModel(Model):
 
@@ -576,6 +630,9 @@ class CustomResponseModel(BatchGenerativeModel):
             results.append(result)
         return results
 
+    def responds_instantly(self) -> bool:
+        return True
+
     def _call_player(self, player, messages):
         context = messages[-1]
         response_text = player._custom_response(context)
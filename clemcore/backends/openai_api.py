@@ -121,6 +121,12 @@ class OpenAIModel(backends.Model):
                 encoded_messages.append(this)
         return encoded_messages
 
+    def supports_concurrency(self) -> bool:
+        return True  # requests are served remotely, so they can be issued from several threads
+
+    def supports_sampling(self) -> bool:
+        return True  # the API returns several choices for a single request (n parameter)
+
     @retry(tries=3, delay=10, logger=logger)
     @augment_response_object
     @ensure_messages_format
@@ -137,9 +143,33 @@ class OpenAIModel(backends.Model):
         Returns:
             The generated response message returned by the OpenAI remote API.
         """
+        prompt, api_response = self._create_completion(messages)
+        response = api_response.model_dump(mode="json")
+        return prompt, response, self._get_response_text(api_response.choices[0])
+
+    @retry(tries=3, delay=10, logger=logger)
+    @augment_response_object
+    @ensure_messages_format
+    def generate_samples(self, messages: List[Dict], n: int) -> List[Tuple[str, Any, str]]:
+        """Request n generated responses to the same message history with a single OpenAI API call.
+        Args:
+            messages: A message history (see generate_response).
+            n: The number of responses (choices) to generate.
+        Returns:
+            The n generated responses, each with the API response reduced to its choice.
+        """
+        prompt, api_response = self._create_completion(messages, n=n)
+        response = api_response.model_dump(mode="json")
+        choices = response.pop("choices")
+        if len(api_response.choices) != n:
+            raise AttributeError(f"Requested {n} choices, but the OpenAI API returned {len(api_response.choices)}")
+        return [(prompt, {**response, "choices": [choice_json]}, self._get_response_text(choice))
+                for choice, choice_json in zip(api_response.choices, choices)]
+
+    def _create_completion(self, messages: List[Dict], **kwargs) -> Tuple[List[Dict], Any]:
         prompt = self.encode_messages(messages)
         gen_kwargs = dict(model=self.model_spec.model_id, messages=prompt)
-        gen_kwargs = {**gen_kwargs, **self.gen_args}
+        gen_kwargs = {**gen_kwargs, **self.gen_args, **kwargs}
         model_config = getattr(self.model_spec, "model_config", {})
         if 'reasoning_model' in model_config:
             if not self.temperature > 0:
@@ -160,14 +190,15 @@ class OpenAIModel(backends.Model):
         api_response = self.client.chat.completions.create(**gen_kwargs)
         if logger.isEnabledFor(logging.DEBUG):
             logger.debug(f"OpenAI API response: {api_response.model_dump_json(indent=2)}")
+        return prompt, api_response
 
-        message = api_response.choices[0].message
+    @staticmethod
+    def _get_response_text(choice) -> str:
+        message = choice.message
         if message.role != "assistant":  # safety check
             raise AttributeError("Response message role is " + message.role + " but should be 'assistant'")
 
         response_text = (message.content or "").strip()
         if not response_text:
             logger.warning("OpenAI API response message content is None or empty, returning empty string.")
-
-        response = api_response.model_dump(mode="json")
-        return prompt, response, response_text
+        return response_text
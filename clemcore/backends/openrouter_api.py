@@ -54,6 +54,12 @@ class OpenRouterModel(openai_api.OpenAIModel):
         super().__init__(client, model_spec)
         self.client = client
 
+    def supports_sampling(self) -> bool:
+        return False  # the n parameter is not supported by all providers
+
+    def generate_samples(self, messages: List[Dict], n: int) -> List[Tuple[str, Any, str]]:
+        return backends.Model.generate_samples(self, messages, n)
+
     @retry(tries=3, delay=10, logger=logger)
     @augment_response_object
     @ensure_messages_format
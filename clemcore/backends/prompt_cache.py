@@ -0,0 +1,235 @@
+"""
+Cross-turn and cross-instance reuse of the key-value (KV) states of local models.
+
+In a dialogue game, the prompt of a player's turn is the prompt of its previous turn, followed by the previous
+response and the new context. Without a cache, local models prefill the whole history again on every turn, so that
+the prefill cost grows quadratically with the length of the dialogue. The PromptCache keeps the KV state of each
+session's last prompt and generated response, so that only the new suffix of the next prompt has to be prefilled.
+
+The sessions (e.g. the dialogues of the players) are identified by their token ids: the next prompt of a session
+continues the tokens of its previous turn. A lookup returns the entry with the longest common prefix, which is found
+by walking a token-level trie of the cached sequences. The KV state of a token only depends on the tokens before it,
+hence, the state of the common prefix is valid for the new prompt, even when the history has been edited (the reuse
+stops at the first edited token) or the re-tokenized response differs from the generated tokens.
+
+Moreover, the instances of an experiment usually begin with the same long rules prompt and differ only in a few
+slots near its end. When a prompt diverges from the prompt of another cached sequence after at least
+min_shared_length tokens, the state of their common prefix is cropped once and kept as a shared entry, which is
+reused by every following session (and batch row) that begins with it.
+
+The entries are released (least recently used first) when the memory budget is exceeded. The shared entries are
+released only after all other entries, because the following sessions keep using them. The entries of finished
+sessions are kept until they are released, so that the prefixes that they share with the next sessions can be
+detected.
+The cache itself is agnostic of the KV state's format (see HuggingfaceLocalModel for the tensors).
+"""
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Sequence, Tuple, Optional, Dict, Callable, Set
+
+module_logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+MIN_SHARED_LENGTH = 64
+
+
+@dataclass
+class CacheEntry:
+    """The KV state of a token sequence (a prompt and, if generated, its response) and its size in bytes."""
+    token_ids: Tuple[int, ...]
+    kv_state: Any
+    num_bytes: int
+    num_prompt_tokens: int
+    shared: bool = False
+
+
+def common_prefix_length(token_ids: Sequence[int], other_token_ids: Sequence[int]) -> int:
+    """The number of leading tokens that the two sequences share."""
+    length = 0
+    for token_id, other_token_id in zip(token_ids, other_token_ids):
+        if token_id != other_token_id:
+            break
+        length += 1
+    return length
+
+
+class _TrieNode:
+    """A node of a radix trie: the edge from its parent is labeled with a sequence of tokens."""
+    __slots__ = ("token_ids", "children", "keys", "end_key")
+
+    def __init__(self, token_ids: Tuple[int, ...] = ()):
+        self.token_ids = token_ids
+        self.children: Dict[int, _TrieNode] = {}
+        self.keys: Set[Tuple[int, ...]] = set()  # the keys that pass through this node
+        self.end_key: Optional[Tuple[int, ...]] = None  # the key that ends at this node
+
+
+class TokenTrie:
+    """A radix trie of token sequences to find the sequence with the longest common prefix."""
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def insert(self, key: Tuple[int, ...]):
+        node, position = self.root, 0
+        node.keys.add(key)
+        while position < len(key):
+            child = node.children.get(key[position])
+            if child is None:
+                child = node.children[key[position]] = _TrieNode(key[position:])
+                child.keys.add(key)
+                child.end_key = key
+                return
+            length = common_prefix_length(child.token_ids, key[position:])
+            if length < len(child.token_ids):  # split the edge
+                split = node.children[key[position]] = _TrieNode(child.token_ids[:length])
+                split.keys = set(child.keys)
+                child.token_ids = child.token_ids[length:]
+                split.children[child.token_ids[0]] = child
+                child = split
+            child.keys.add(key)
+            node, position = child, position + length
+        node.end_key = key
+
+    def remove(self, key: Tuple[int, ...]):
+        node, position = self.root, 0
+        node.keys.discard(key)
+        while position < len(key):
+            child = node.children[key[position]]
+            child.keys.discard(key)
+            if not child.keys:
+                del node.children[key[position]]
+                return
+            node, position = child, position + len(child.token_ids)
+        node.end_key = None
+
+    def longest_prefix(self, token_ids: Sequence[int]) -> Tuple[int, Optional[Tuple[int, ...]]]:
+        """
+        Returns:
+            The length of the longest common prefix with the inserted sequences and one of the sequences that
+            share it (preferably the one that ends there), or (0, None) if no sequence shares a prefix.
+        """
+        node, position = self.root, 0
+        best_length, best_key = 0, None
+        while position < len(token_ids):
+            child = node.children.get(token_ids[position])
+            if child is None:
+                break
+            length = common_prefix_length(child.token_ids, token_ids[position:])
+            position += length
+            best_length = position
+            if length < len(child.token_ids):
+                best_key = next(iter(child.keys))
+                break
+            best_key = child.end_key or next(iter(child.keys))
+            node = child
+        return best_length, best_key
+
+
+class PromptCache:
+    """The KV states of the previous prompts (and their responses) by their token ids."""
+
+    def __init__(self, memory_budget: float, *,
+                 crop: Callable[[Any, int], Tuple[Any, int]] = None,
+                 min_shared_length: int = MIN_SHARED_LENGTH):
+        """
+        Args:
+            memory_budget: The memory (in GB) available for the KV states.
+            crop: Returns a copy of a KV state that is cropped to the given number of tokens and its size in bytes.
+                Default: None (no shared entries are created).
+            min_shared_length: The minimum number of tokens of a shared prompt prefix. Default: 64.
+        """
+        self.memory_budget = memory_budget
+        self.crop = crop
+        self.min_shared_length = min_shared_length
+        self.entries: Dict[Tuple[int, ...], CacheEntry] = OrderedDict()  # in order of last use
+        self.trie = TokenTrie()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.reused_tokens = 0
+        self.shared_prefixes = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, token_ids: Sequence[int], max_length: int = None) -> Tuple[int, Optional[CacheEntry]]:
+        """
+        Find the entry that shares the longest prefix with the token ids.
+
+        When the token ids diverge from the prompt of the found entry (and not from its response), the state of
+        their common prefix is stored as a shared entry (if it is long enough), which is returned instead.
+
+        Args:
+            token_ids: The token ids of the prompt.
+            max_length: The maximum number of tokens to reuse. Default: all but the last token (at least one
+                token has to be prefilled to compute the logits of the first generated token).
+        Returns:
+            The length of the common prefix and the entry (whose KV state must be cropped to that length),
+            or (0, None) if no entry shares a prefix with the token ids.
+        """
+        max_length = len(token_ids) - 1 if max_length is None else max_length
+        length, key = self.trie.longest_prefix(token_ids)
+        length = min(length, max_length)
+        if length <= 0:
+            self.misses += 1
+            return 0, None
+        entry = self.entries[key]
+        self.entries.move_to_end(key)
+        if length < entry.num_prompt_tokens and length >= self.min_shared_length and self.crop is not None:
+            entry = self._share(entry, length)
+        self.hits += 1
+        self.reused_tokens += length
+        return length, entry
+
+    def _share(self, entry: CacheEntry, length: int) -> CacheEntry:
+        kv_state, num_bytes = self.crop(entry.kv_state, length)
+        self.store(entry.token_ids[:length], kv_state, num_bytes, shared=True)
+        self.shared_prefixes += 1
+        module_logger.debug("Share the KV state of a prompt prefix of %s tokens", length)
+        return self.entries.get(entry.token_ids[:length], entry)  # the entry itself, if the budget is exceeded
+
+    def store(self, token_ids: Sequence[int], kv_state: Any, num_bytes: int, *,
+              num_prompt_tokens: int = None, shared: bool = False):
+        """
+        Store the KV state of the token ids and release the least recently used entries beyond the memory budget
+        (the shared entries last). A state that exceeds the whole budget is not stored.
+
+        Args:
+            token_ids: The token ids of the prompt and the generated response.
+            kv_state: The KV state of the token ids.
+            num_bytes: The size of the KV state.
+            num_prompt_tokens: The number of tokens of the prompt. Default: None (all tokens).
+            shared: Whether the tokens are a prefix that is shared by several prompts.
+        """
+        key = tuple(token_ids)
+        self.remove(key)
+        if num_bytes > self.memory_budget * GB:
+            module_logger.debug("The KV state of %s tokens exceeds the memory budget", len(key))
+            return
+        num_prompt_tokens = len(key) if num_prompt_tokens is None else num_prompt_tokens
+        self.entries[key] = CacheEntry(key, kv_state, num_bytes, num_prompt_tokens, shared)
+        self.trie.insert(key)
+        self.num_bytes += num_bytes
+        while self.num_bytes > self.memory_budget * GB:
+            self.remove(self._next_to_release(keep=key))
+
+    def _next_to_release(self, keep: Tuple[int, ...]) -> Tuple[int, ...]:
+        candidates = [key for key in self.entries if key != keep]
+        return next((key for key in candidates if not self.entries[key].shared), candidates[0])
+
+    def remove(self, token_ids: Tuple[int, ...]):
+        entry = self.entries.pop(token_ids, None)
+        if entry is not None:
+            self.trie.remove(token_ids)
+            self.num_bytes -= entry.num_bytes
+
+    def clear(self):
+        """Release all entries (e.g. when the model is unloaded)."""
+        if self.hits or self.misses:
+            module_logger.info("Prompt cache: %s hits, %s misses, %s reused tokens, %s shared prefixes",
+                               self.hits, self.misses, self.reused_tokens, self.shared_prefixes)
+        self.entries.clear()
+        self.trie = TokenTrie()
+        self.num_bytes = 0
@@ -210,7 +210,7 @@ class ContextExceededError(Exception):
     context_size: int = int()
 
     def __init__(self, info_str: str = "Context limit exceeded", tokens_used: int = 0,
-                 tokens_left: int = 0, context_size: int = 0):
+                 tokens_left: int = 0, context_size: int = 0, batch_indices: List[int] = None):
         """
         Args:
             info_str: String informing about context limit being exceeded. To optionally be modified with further
@@ -219,9 +219,12 @@ class ContextExceededError(Exception):
             tokens_left: The number of tokens left in the context limit. Will be negative if this error is raised,
                 absolute value being the number of tokens that exceed the context limit.
             context_size: The size of the context/the context limit.
+            batch_indices: For batched generation, the indices of all the rows that exceed the context limit
+                (the other rows can be generated without them). None, if unknown or not batched.
         """
         info = f"{info_str} {tokens_used}/{context_size}"
         super().__init__(info)
         self.tokens_used = tokens_used
         self.tokens_left = tokens_left
         self.context_size = context_size
+        self.batch_indices = batch_indices
@@ -1,13 +1,13 @@
 from clemcore.clemgame.callbacks import episode_results_folder_callbacks
 from clemcore.clemgame.callbacks.base import GameBenchmarkCallback, GameBenchmarkCallbackList, GameStep, GameSnapshot
 from clemcore.clemgame.callbacks.files import ResultsFolder, InstanceFileSaver, ExperimentFileSaver, \
-    InteractionsFileSaver, RunFileSaver, SignalFileSaver, EpochResultsFolder, EpisodeResultsFolder, \
+    InteractionsFileSaver, RunFileSaver, SignalFileSaver, SignalFileIndex, EpochResultsFolder, EpisodeResultsFolder, \
     EpochResultsFolderCallback, EpisodeResultsFolderCallback
 from clemcore.clemgame.envs.openenv.client import ClemGameEnv
 from clemcore.clemgame.envs.openenv.models import ClemGameObservation, ClemGameAction, ClemGameState
 from clemcore.clemgame.envs.pettingzoo import env, gym_env
 from clemcore.clemgame.errors import GameError, ParseError, RuleViolationError, ResponseError, ProtocolError, \
-    NotApplicableError
+    NotApplicableError, BatchResponseError, EpisodeCancelledError
 from clemcore.clemgame.instances import GameInstanceGenerator, GameInstances
 from clemcore.clemgame.resources import GameResourceLocator
 from clemcore.clemgame.master import GameMaster, DialogueGameMaster, Player, GameState
@@ -45,6 +45,7 @@ __all__ = [
     "ResultsFolder",
     "RunFileSaver",
     "SignalFileSaver",
+    "SignalFileIndex",
     "InstanceFileSaver",
     "ExperimentFileSaver",
     "InteractionsFileSaver",
@@ -55,5 +56,7 @@ __all__ = [
     "ParseError",
     "GameError",
     "RuleViolationError",
-    "NotApplicableError"
+    "NotApplicableError",
+    "BatchResponseError",
+    "EpisodeCancelledError"
 ]
@@ -2,10 +2,15 @@ import glob
 import importlib.util
 import inspect
 import logging
+import json
 import os
 import sys
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
+from types import ModuleType
+from typing import Dict, Tuple
 from tqdm import tqdm
 
 from clemcore import backends
@@ -30,6 +35,49 @@ def is_game_benchmark(obj):
     return False
 
 
+class _CachedGame:
+    """A loaded game module together with the additional modules it imported and the benchmarks created from it."""
+
+    def __init__(self, fingerprint: Tuple, game_module: ModuleType, extra_modules: Dict[str, ModuleType]):
+        self.fingerprint = fingerprint
+        self.game_module = game_module
+        self.extra_modules = extra_modules
+        self.game_benchmarks: Dict[str, "GameBenchmark"] = {}  # by game spec
+
+
+_game_cache: Dict[str, _CachedGame] = {}  # by the path of the game file
+_game_cache_lock = threading.RLock()
+
+
+def _fingerprint(game_spec: GameSpec, extra_modules: Dict[str, ModuleType]) -> Tuple:
+    """
+    The modification times of the game's master.py and of the additional modules that it imported from the game's
+    directory (or from the parent directory, if shared). Only these files are checked, so that the game directory
+    (which might contain many resource files) is not walked on every request.
+    """
+    game_path = Path(game_spec.game_path).absolute()
+    module_dir = game_path.parent if _uses_parent_dir(game_spec) else game_path
+    module_files = [Path(mod.__file__) for mod in extra_modules.values() if getattr(mod, "__file__", None)]
+    python_files = [Path(game_spec.get_game_file()).absolute()]
+    python_files.extend(file for file in module_files if file.is_relative_to(module_dir))
+    return tuple(sorted((str(file), _modification_time(file)) for file in python_files))
+
+
+def _modification_time(file: Path) -> int | None:
+    try:
+        return file.stat().st_mtime_ns
+    except OSError:  # e.g. removed
+        return None
+
+
+def _uses_parent_dir(game_spec: GameSpec) -> bool:
+    """Whether the game may import modules from its parent directory (by naming convention, e.g. games/game_v2)."""
+    parent_path = os.path.dirname(os.path.abspath(game_spec.game_path))
+    parent_dir_name = os.path.basename(os.path.normpath(parent_path))
+    game_dir_name = os.path.basename(os.path.normpath(game_spec.game_path))
+    return game_dir_name.startswith(parent_dir_name)
+
+
 class GameBenchmark(GameResourceLocator):
     """Organizes the run of a particular collection of game instances which compose a benchmark for the game.
     Supports different experiment conditions for games.
@@ -42,15 +90,45 @@ class GameBenchmark(GameResourceLocator):
         """
         super().__init__(game_spec.game_name, game_spec.game_path)
         self.game_spec = game_spec
-        self._extra_modules: list[str] = []  # additional modules loaded during load_from_spec
+        self._extra_modules: Dict[str, ModuleType] = {}  # additional modules loaded during load_from_spec
+        self._game_module: ModuleType | None = None  # the game's master.py (not registered in sys.modules)
 
-    def set_extra_modules(self, extra_modules: list[str]):
+    def set_extra_modules(self, extra_modules: Dict[str, ModuleType]):
         self._extra_modules = extra_modules
 
+    def set_game_module(self, game_module: ModuleType):
+        self._game_module = game_module
+
+    @property
+    def game_module(self) -> ModuleType | None:
+        """The module loaded from the game's master.py (None, if the benchmark was not loaded from a game spec)."""
+        return self._game_module
+
+    def activate_extra_modules(self):
+        """Register the game's additional modules (again), e.g. when another game has modules with the same names."""
+        sys.modules.update(self._extra_modules)
+
+    @contextmanager
+    def extra_modules_activated(self):
+        """Register the game's additional modules only within the context and restore the replaced modules after."""
+        replaced = {name: sys.modules.get(name) for name in self._extra_modules}
+        self.activate_extra_modules()
+        try:
+            yield self
+        finally:
+            for name, mod in replaced.items():
+                if sys.modules.get(name) is not self._extra_modules[name]:
+                    continue  # registered by someone else in the meantime
+                if mod is None:
+                    del sys.modules[name]
+                else:
+                    sys.modules[name] = mod
+
     def close(self):
-        for mod in self._extra_modules:
-            if mod in sys.modules:
-                del sys.modules[mod]
+        """Unregister the game's additional modules (but keep those of other games with the same names)."""
+        for name, mod in self._extra_modules.items():
+            if sys.modules.get(name) is mod:
+                del sys.modules[name]
 
     def __enter__(self):
         return self
@@ -108,18 +186,67 @@ class GameBenchmark(GameResourceLocator):
         raise NotImplementedError()
 
     @staticmethod
-    def load_from_spec(game_spec: GameSpec) -> "GameBenchmark":
+    def load_from_spec(game_spec: GameSpec, use_cache: bool = True) -> "GameBenchmark":
         """Load a clemgame using a GameSpec.
+
+        The loaded game modules and benchmarks are cached for the process, so that repeated requests (e.g. for
+        several envs or scoring runs) neither execute the game's master.py again nor re-import its modules.
+        The cache entry is renewed when the game's master.py or a module that it imported from the game's
+        directory has been modified. Games that have additional
+        modules with the same names (e.g. utils.py) are isolated: each game keeps its own module objects,
+        which are registered in sys.modules whenever its benchmark is requested.
+
         Args:
             game_spec: A GameSpec instance holding specific clemgame data.
+            use_cache: Whether to use the cache of loaded games. Default: True.
         """
+        if not use_cache:
+            return GameBenchmark._load_from_spec(game_spec)
+        game_file = os.path.abspath(game_spec.get_game_file())
+        spec_key = json.dumps(game_spec.__dict__, sort_keys=True, default=str)
+        with _game_cache_lock:
+            cached_game = _game_cache.get(game_file)
+            if cached_game is None or cached_game.fingerprint != _fingerprint(game_spec, cached_game.extra_modules):
+                # hide the modules of other games, so that modules with the same names are imported anew
+                other_modules = {name: mod for other_game in _game_cache.values()
+                                 for name, mod in other_game.extra_modules.items() if sys.modules.get(name) is mod}
+                for name in other_modules:
+                    del sys.modules[name]
+                try:
+                    game_module, extra_modules = GameBenchmark._load_game_module(game_spec)
+                finally:
+                    for name, mod in other_modules.items():
+                        sys.modules.setdefault(name, mod)
+                cached_game = _CachedGame(_fingerprint(game_spec, extra_modules), game_module, extra_modules)
+                _game_cache[game_file] = cached_game
+            if spec_key not in cached_game.game_benchmarks:
+                game_benchmark = GameBenchmark._create_from_module(game_spec, cached_game.game_module,
+                                                                   cached_game.extra_modules)
+                cached_game.game_benchmarks[spec_key] = game_benchmark
+            game_benchmark = cached_game.game_benchmarks[spec_key]
+            game_benchmark.activate_extra_modules()
+            return game_benchmark
+
+    @staticmethod
+    def clear_cache():
+        """Forget all loaded game modules and benchmarks (see load_from_spec)."""
+        with _game_cache_lock:
+            _game_cache.clear()
+
+    @staticmethod
+    def _load_from_spec(game_spec: GameSpec) -> "GameBenchmark":
+        game_module, extra_modules = GameBenchmark._load_game_module(game_spec)
+        return GameBenchmark._create_from_module(game_spec, game_module, extra_modules)
+
+    @staticmethod
+    def _load_game_module(game_spec: GameSpec) -> Tuple[ModuleType, Dict[str, ModuleType]]:
+        """Execute the game's master.py. Returns the game module and the additional modules it imported."""
         stdout_logger.info("Loading game benchmark for %s", game_spec.game_name)
         time_start = datetime.now()
         # add parent directory to python path if matching naming convention to load additional files if necessary
         parent_path = os.path.dirname(os.path.abspath(game_spec.game_path))
-        parent_dir_name = os.path.basename(os.path.normpath(parent_path))
-        game_dir_name = os.path.basename(os.path.normpath(game_spec.game_path))
-        if game_dir_name.startswith(parent_dir_name):
+        uses_parent_dir = _uses_parent_dir(game_spec)
+        if uses_parent_dir:
             module_logger.debug("Temporarily added game parent directory to python path: %s", parent_path)
             sys.path.insert(0, parent_path)
 
@@ -129,22 +256,29 @@ class GameBenchmark(GameResourceLocator):
         # keep track of potentially additional modules which must be unloaded after the run
         before_load = set(sys.modules.keys())
 
-        # load game module from this master file
-        spec = importlib.util.spec_from_file_location(game_spec.game_name, game_spec.get_game_file())
-        game_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(game_module)
-
-        # cleanup python path again
-        if game_dir_name.startswith(parent_dir_name):
-            sys.path.remove(parent_path)
-        sys.path.remove(game_spec.game_path)
-        module_logger.debug("Removed temporarily added python paths")
+        try:
+            # load game module from this master file
+            spec = importlib.util.spec_from_file_location(game_spec.game_name, game_spec.get_game_file())
+            game_module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(game_module)
+        finally:
+            # cleanup python path again
+            if uses_parent_dir:
+                sys.path.remove(parent_path)
+            sys.path.remove(game_spec.game_path)
+            module_logger.debug("Removed temporarily added python paths")
 
         after_load = set(sys.modules.keys())
-        extra_modules = after_load - before_load
+        extra_modules = {name: sys.modules[name] for name in after_load - before_load}
         if extra_modules:
-            module_logger.debug("Temporarily loaded additional game modules: %s", extra_modules)
+            module_logger.debug("Temporarily loaded additional game modules: %s", set(extra_modules))
+        stdout_logger.info(f'Loading game benchmark for {game_spec["game_name"]} took: %s',
+                           datetime.now() - time_start)
+        return game_module, extra_modules
 
+    @staticmethod
+    def _create_from_module(game_spec: GameSpec, game_module: ModuleType,
+                            extra_modules: Dict[str, ModuleType]) -> "GameBenchmark":
         try:
             # extract game class from master.py (is_game checks inheritance from GameBenchmark)
             game_subclasses = inspect.getmembers(game_module, predicate=is_game_benchmark)
@@ -155,14 +289,13 @@ class GameBenchmark(GameResourceLocator):
                 raise LookupError(f"There is more than one Game defined in {game_module}.")
             game_class_name, game_class = game_subclasses[0]
             game_cls: "GameBenchmark" = game_class(game_spec)  # instantiate the specific game class
-            stdout_logger.info(f'Loading game benchmark for {game_spec["game_name"]} took: %s',
-                               datetime.now() - time_start)
             game_cls.set_extra_modules(extra_modules)
+            game_cls.set_game_module(game_module)
             return game_cls
         except Exception as e:
             module_logger.exception(f"Failed to load game benchmark for {game_spec.game_name}: {e}")
-            for mod in extra_modules:
-                if mod in sys.modules:
-                    del sys.modules[mod]
+            for name, mod in extra_modules.items():
+                if sys.modules.get(name) is mod:
+                    del sys.modules[name]
             module_logger.debug("Immediately removed temporarily loaded additional game modules")
-            raise
\ No newline at end of file
+            raise
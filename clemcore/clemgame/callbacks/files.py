@@ -10,6 +10,7 @@ if TYPE_CHECKING:  # to satisfy pycharm
 
 from clemcore.clemgame.recorder import GameInteractionsRecorder, EventCallRecorder
 from clemcore.clemgame.callbacks.base import GameBenchmarkCallback
+from clemcore.clemgame.errors import EpisodeCancelledError
 from clemcore.clemgame.resources import store_json, load_json, module_logger
 
 
@@ -137,43 +138,69 @@ class EpochResultsFolderCallback(GameBenchmarkCallback):
 
 
 class RunFileSaver(GameBenchmarkCallback):
+    """Writes a run.json into the run directory with timing information for each played game.
 
-    def __init__(self, results_folder: ResultsFolder, *, player_model_infos: Any = None):
+    The bookkeeping is done per game name, so that the benchmarks of several games
+    can be active at the same time (e.g. when a worker process interleaves episodes of different games).
+    The file is (re-)written as a whole, hence, processes that share a run directory (e.g. the workers of a work
+    queue) must write their own run files (see file_name).
+    """
+
+    def __init__(self, results_folder: ResultsFolder, *, player_model_infos: Any = None,
+                 file_name: str = "run.json"):
         self.results_folder = results_folder
-        self.game_info = None
-        self.benchmark_start = None
-        self.num_instances = 0
+        self.file_name = file_name
+        self.game_infos: Dict[str, Dict] = {}
+        self.benchmark_starts: Dict[str, datetime] = {}
+        self.num_instances: Dict[str, int] = {}
         self.data = dict(clem_version=get_version(),
                          created=datetime.now().isoformat(),
                          player_models=player_model_infos,
                          games={})
 
         model_dir_path = self.results_folder.to_run_dir_path()
-        run_file_path = Path(model_dir_path / "run.json")
+        run_file_path = Path(model_dir_path / self.file_name)
         if run_file_path.exists():
             self.data = load_json(str(run_file_path))  # keep already stored values
         else:
-            store_json(self.data, "run.json", model_dir_path)  # create file
+            store_json(self.data, self.file_name, model_dir_path)  # create file
 
     def on_benchmark_start(self, game_benchmark: "GameBenchmark"):
-        self.benchmark_start = datetime.now()
-        self.game_info = dict(game_path=game_benchmark.game_path, benchmark_start=self.benchmark_start.isoformat())
-        self.data["games"][game_benchmark.game_name] = self.game_info
-        store_json(self.data, "run.json", self.results_folder.to_run_dir_path())  # overwrite
+        game_name = game_benchmark.game_name
+        benchmark_start = datetime.now()
+        self.benchmark_starts[game_name] = benchmark_start
+        self.num_instances[game_name] = 0
+        game_info = dict(game_path=game_benchmark.game_path, benchmark_start=benchmark_start.isoformat())
+        self.game_infos[game_name] = game_info
+        self.data["games"][game_name] = game_info
+        store_json(self.data, self.file_name, self.results_folder.to_run_dir_path())  # overwrite
 
     def on_game_start(self, game_master: "GameMaster", game_instance: Dict):
-        self.num_instances += 1  # the instance iterator is not necessarily yet initialized, so we count here
+        # the instance iterator is not necessarily yet initialized, so we count here
+        game_name = game_master.game_spec.game_name
+        self.num_instances[game_name] = self.num_instances.get(game_name, 0) + 1
+
+    def on_game_end(self, game_master: "GameMaster", game_instance: Dict,
+                    exception: Exception = None, rewards: dict[str, float] = None):
+        if isinstance(exception, EpisodeCancelledError):  # the episode is not counted
+            game_name = game_master.game_spec.game_name
+            self.num_instances[game_name] = self.num_instances.get(game_name, 1) - 1
 
     def on_benchmark_end(self, game_benchmark: "GameBenchmark"):
+        game_name = game_benchmark.game_name
         benchmark_end = datetime.now()
-        benchmark_duration = benchmark_end - self.benchmark_start
-        self.game_info["benchmark_end"] = benchmark_end.isoformat()
-        self.game_info["duration"] = str(benchmark_duration)
-        self.game_info["duration_seconds"] = benchmark_duration.total_seconds()
-        self.game_info["num_instances"] = self.num_instances
-        store_json(self.data, "run.json", self.results_folder.to_run_dir_path())  # overwrite
-        self.num_instances = 0
-        self.game_info = None
+        benchmark_duration = benchmark_end - self.benchmark_starts.pop(game_name)
+        game_info = self.game_infos.pop(game_name)
+        game_info["benchmark_end"] = benchmark_end.isoformat()
+        game_info["duration"] = str(benchmark_duration)
+        game_info["duration_seconds"] = benchmark_duration.total_seconds()
+        game_info["num_instances"] = self.num_instances.pop(game_name, 0)
+        store_json(self.data, self.file_name, self.results_folder.to_run_dir_path())  # overwrite
+
+    def store_game_info(self, game_name: str, key: str, value: Any):
+        """Add further information about the run of a game, e.g., the tuned batch sizes."""
+        self.data["games"].setdefault(game_name, {})[key] = value
+        store_json(self.data, self.file_name, self.results_folder.to_run_dir_path())  # overwrite
 
 
 class InstanceFileSaver(GameBenchmarkCallback):
@@ -215,6 +242,15 @@ class BranchCounter:
         # Always return the same instance - this must be shared across all branches
         return self
 
+    def __getstate__(self):
+        # A snapshot (see clemgame.snapshots) continues with a copy of the counts; pass the counter as a shared
+        # object to the snapshot, if the restored branches should be counted together with the others
+        return dict(_counters=dict(self._counters))
+
+    def __setstate__(self, state):
+        self._counters = state["_counters"]
+        self._lock = Lock()
+
     def next(self, key: str) -> int:
         with self._lock:
             count = self._counters.get(key, 0)
@@ -254,12 +290,13 @@ class InteractionsFileSaver(GameBenchmarkCallback):
 
     def on_game_end(self, game_master: "GameMaster", game_instance: Dict,
                     exception: Exception = None, rewards: dict[str, float] = None):
-        if exception is not None:
-            return
         game_name = game_master.game_spec.game_name
         experiment_name = game_master.experiment["name"]
         game_id = game_instance["game_id"]
         _key = InteractionsFileSaver.to_key(game_name, experiment_name, game_id)
+        if exception is not None:
+            self._recorders.pop(_key, None)  # release the recorder of the aborted episode
+            return
         assert _key in self._recorders, f"Recorder must be registered on_game_start, but wasn't for: {_key}"
         recorder = self._recorders.pop(_key)  # auto-remove recorder from registry
         instance_dir_path = self.results_folder.to_instance_dir_path(game_master, game_instance)
@@ -275,7 +312,7 @@ class SignalFileSaver(GameBenchmarkCallback):
     - ``error.json``     — written when an exception aborts the episode.
 
     These files make it easy to check the run status of any instance at a glance,
-    and support future ``--resume`` logic (see issue #231).
+    and support ``clem run --resume`` (see SignalFileIndex).
     """
 
     def __init__(self, results_folder: ResultsFolder):
@@ -290,6 +327,8 @@ class SignalFileSaver(GameBenchmarkCallback):
 
     def on_game_end(self, game_master: "GameMaster", game_instance: Dict,
                     exception: Exception = None, rewards: dict[str, float] = None):
+        if isinstance(exception, EpisodeCancelledError):
+            return  # the episode has no outcome (e.g. another worker plays it)
         instance_dir_path = self.results_folder.to_instance_dir_path(game_master, game_instance)
         if exception is None:
             store_json({"timestamp": datetime.now().isoformat()}, "completed.json", instance_dir_path)
@@ -301,6 +340,53 @@ class SignalFileSaver(GameBenchmarkCallback):
             }, "error.json", instance_dir_path)
 
 
+class SignalFileIndex:
+    """An index of the instances of a run directory that have a signal file written by the SignalFileSaver.
+
+    The index is built by globbing only the instance directories (without reading any file), so that it is
+    fast enough to resume even large runs, e.g., to skip the instances that have already been completed.
+    """
+
+    def __init__(self, results_folder: ResultsFolder, completed: set, errors: set):
+        self.results_folder = results_folder
+        self.completed = completed  # (game_dir, experiment_dir, instance_dir)
+        self.errors = errors  # (game_dir, experiment_dir, instance_dir)
+
+    @classmethod
+    def from_results_folder(cls, results_folder: ResultsFolder) -> "SignalFileIndex":
+        run_dir_path = results_folder.to_run_dir_path()
+
+        def collect(signal_file: str) -> set:
+            return {signal_path.parent.relative_to(run_dir_path).parts
+                    for signal_path in run_dir_path.glob(f"*/*/*/{signal_file}")}
+
+        return cls(results_folder, collect("completed.json"), collect("error.json"))
+
+    def to_key(self, row: Dict) -> tuple:
+        return (row["game_name"],
+                self.results_folder.to_experiment_dir(row["experiment"]),
+                self.results_folder.to_instance_dir(row["game_instance"]))
+
+    def is_completed(self, row: Dict) -> bool:
+        """Whether the episode of the game instance row has been played without error."""
+        return self.to_key(row) in self.completed
+
+    def has_error(self, row: Dict) -> bool:
+        """Whether the episode of the game instance row has been aborted by an error."""
+        return self.to_key(row) in self.errors
+
+    def to_instances_filter(self, errors_only: bool = False):
+        """A GameInstances filter that keeps the rows still to be played.
+
+        Args:
+            errors_only: If True, keep only the rows whose episode ended with an error.
+                Otherwise, keep all rows whose episode has not been completed (including the errors).
+        """
+        if errors_only:
+            return self.has_error
+        return lambda row: not self.is_completed(row)
+
+
 class PlayerFileSaver(GameBenchmarkCallback):
 
     def __init__(self, results_folder: ResultsFolder):
@@ -331,14 +417,14 @@ class PlayerFileSaver(GameBenchmarkCallback):
 
     def on_game_end(self, game_master: "GameMaster", game_instance: Dict,
                     exception: Exception = None, rewards: dict[str, float] = None):
-        if exception is not None:
-            return
         game_name = game_master.game_spec.game_name
         experiment_name = game_master.experiment["name"]
         game_id = game_instance["game_id"]
         for player in game_master.get_players():
             _key = PlayerFileSaver.to_key(game_name, experiment_name, game_id, player.name)
             recorder = self._recorders.pop(_key, None)  # discontinue recording with this recorder
+            if exception is not None:
+                continue  # only release the recorder of the aborted episode
             if recorder is None:
                 module_logger.error(f"Recorder must be registered on_game_start, but wasn't for: {_key}")
                 continue
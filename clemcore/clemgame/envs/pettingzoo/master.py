@@ -1,3 +1,4 @@
+from copy import deepcopy
 from functools import wraps
 from typing import Callable
 
@@ -9,6 +10,7 @@ from clemcore.clemgame.registry import GameRegistry
 from clemcore.clemgame.instances import GameInstances
 from clemcore.clemgame.benchmark import GameBenchmark
 from clemcore.clemgame.master import GameMaster, GameState, Outcome
+from clemcore.clemgame.snapshots import dump_snapshot, load_snapshot
 from clemcore.clemgame.envs.pettingzoo.wrappers import (
     GameInstanceIteratorWrapper,
     GameBenchmarkWrapper,
@@ -190,6 +192,53 @@ class GameMasterEnv(AECEnv):
         )
         self._action_space = spaces.Text(max_length=8192)
 
+    def __deepcopy__(self, memo):
+        """Deepcopy override method.
+        Deep copies the game master, the agent states and the callbacks (e.g. when branching), but shares what is
+        not changed during gameplay: the game benchmark, the game instance, the reset options (with the player models)
+        and the spaces.
+        Args:
+            memo: Dictionary of objects already copied during the current copying pass. (This is a deepcopy default.)
+        """
+        shared = [self.game_benchmark, self.experiment, self.game_instance, self.options, self.metadata,
+                  self._observation_space, self._action_space, *(self.options.get("player_models", None) or [])]
+        for value in shared:
+            memo.setdefault(id(value), value)
+        _copy = type(self).__new__(self.__class__)
+        memo[id(self)] = _copy
+        for key, value in self.__dict__.items():
+            setattr(_copy, key, deepcopy(value, memo))
+        return _copy
+
+    def to_snapshot(self, shared: dict | None = None) -> bytes:
+        """Serialize the env with its game master, players, recorders and callbacks (see snapshots.dump_snapshot).
+        The game benchmark and the models are only referenced and re-attached by from_snapshot().
+        Args:
+            shared: Objects that are not serialized, but referenced by a key, e.g., callbacks shared among branches.
+        Returns:
+            The snapshot as bytes, e.g., to continue the episode in another process or to checkpoint it.
+        """
+        return dump_snapshot(self, self.game_benchmark, shared=shared)
+
+    @staticmethod
+    def from_snapshot(data: bytes, game_benchmark: GameBenchmark, *, player_models: list | None = None,
+                      load_model: Callable | None = None, shared: dict | None = None) -> "GameMasterEnv":
+        """Restore an env from a snapshot taken with to_snapshot() (see snapshots.load_snapshot).
+        Args:
+            data: The snapshot.
+            game_benchmark: The game benchmark of the snapshot's game.
+            player_models: The models to re-attach by name (the missing ones are loaded via load_model).
+            load_model: A callable(model_spec) -> Model. Default: backends.load_model.
+            shared: The shared objects by the keys given to to_snapshot().
+        Returns:
+            The restored env, ready to continue with the next step.
+        """
+        game_env = load_snapshot(data, game_benchmark, player_models=player_models, load_model=load_model,
+                                 shared=shared)
+        if not isinstance(game_env, GameMasterEnv):
+            raise ValueError(f"The snapshot contains a {type(game_env).__name__} and not a GameMasterEnv")
+        return game_env
+
     @staticmethod
     def _default_reward(observation: dict, action: str, state: GameState, info: dict) -> float:
         """Default reward function mapping game outcome to scalar reward.
@@ -311,6 +360,20 @@ class GameMasterEnv(AECEnv):
         # Note: This already supports games where not all agents terminate together at the end of the game
         self._deads_step_first()
 
+    def abort(self, exception: Exception) -> None:
+        """Ends the current episode due to an error that occurred outside the env, e.g., during response generation.
+
+        All agents are flagged as truncated (so that no further observations are made) and the callbacks are
+        notified about the exception, just as for errors raised by reset() or step().
+
+        Args:
+            exception: the error that made it impossible to continue the episode
+        """
+        if self.game_master is not None and self.game_instance is not None:
+            self.callbacks.on_game_end(self.game_master, self.game_instance, exception)
+        for agent_id in self.agents:
+            self.truncations[agent_id] = True
+
     def observe(self, agent: AgentID) -> ObsType | None:
         """Returns the observation an agent currently can make.
 
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Dict, Tuple
 
 
 class ResponseError(Exception):
@@ -59,3 +59,31 @@ class RuleViolationError(GameError):
 class NotApplicableError(GameError):
     """Raised when a verbal action of a player cannot be applied to advance the game state."""
     pass
+
+
+class BatchResponseError(Exception):
+    """
+    Raised by Player.batch_response when the responses for some rows of a batch could not be generated.
+
+    The responses for the other rows have been generated (and perceived by their players) nevertheless,
+    so that the caller can continue with these and abort only the failed ones.
+    """
+
+    def __init__(self, context_response_by_row_id: Dict[int, Tuple[Dict, str]],
+                 exception_by_row_id: Dict[int, Exception]):
+        """
+        :param context_response_by_row_id: the (context, response) of the rows that succeeded
+        :param exception_by_row_id: the exception of the rows that failed
+        """
+        super().__init__(f"Response generation failed for {len(exception_by_row_id)} rows: "
+                         f"{sorted(exception_by_row_id)}")
+        self.context_response_by_row_id = context_response_by_row_id
+        self.exception_by_row_id = exception_by_row_id
+
+
+class EpisodeCancelledError(Exception):
+    """
+    Raised (or passed to GameMasterEnv.abort) when an episode is stopped without an outcome, e.g., because another
+    worker plays its work item. The callbacks release what they hold for the episode, but do not record a result.
+    """
+    pass
@@ -3,7 +3,7 @@ import collections
 import logging
 import os
 import random
-from typing import Dict, final, Callable, List
+from typing import Dict, final, Callable, List, Any
 
 try:
     import numpy as np
@@ -136,6 +136,18 @@ class GameInstances:
         rows = [row for row in self._rows if condition(row)]
         return GameInstances(self._game_name, rows)
 
+    def sort(self, key: Callable[[dict], Any], reverse: bool = False) -> "GameInstances":
+        """Returns a new GameInstances with the rows sorted by the given key.
+
+        The sort is stable, that is, rows with the same key keep their order (e.g. by experiment and game_id).
+
+        Args:
+            key: A callable that takes a row dict and returns a value to sort by.
+            reverse: Whether to sort in descending order.
+        """
+        rows = sorted(self._rows, key=key, reverse=reverse)
+        return GameInstances(self._game_name, rows)
+
     def find_by_game_id(self, game_id: int | str) -> dict:
         """Returns the row dict for the given game_id or raises ValueError if not found.
 
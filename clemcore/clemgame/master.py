@@ -86,6 +86,21 @@ class GameMaster(GameEventSource):
         self.game_resources = GameResourceLocator(game_spec.game_name, game_spec.game_path)
         self._current_player: Player | None = None
 
+    def __deepcopy__(self, memo):
+        """Deepcopy override method.
+        Deep copies the game state, players and loggers (e.g. when branching), but shares the configuration that is
+        not changed during gameplay: the game spec, the experiment, the resource locator and the player models.
+        Args:
+            memo: Dictionary of objects already copied during the current copying pass. (This is a deepcopy default.)
+        """
+        for shared in [self.game_spec, self.experiment, self.game_resources, *self.player_models]:
+            memo.setdefault(id(shared), shared)
+        _copy = type(self).__new__(self.__class__)
+        memo[id(self)] = _copy
+        for key, value in self.__dict__.items():
+            setattr(_copy, key, deepcopy(value, memo))
+        return _copy
+
     @property
     def state(self) -> GameState:
         return self._state
@@ -0,0 +1,245 @@
+"""
+Dry-run planner that estimates the calls, tokens, time and cost of a run before any model is called.
+
+The planner sets up the game master of each game instance (without calling a model) to render the first-turn
+prompts of the players. These are counted with the model's tokenizer (for local Hugging Face models) or estimated
+from their length. Together with the episode stats of previous runs (see EpisodeStats) the planner predicts:
+    - the number of calls per model (from the mean requests per instance; one per player, if unknown)
+    - the prompt tokens, assuming that each request adds the mean message length of previous episodes
+      (or the maximum completion length, if unknown) to the dialogue history of the players
+    - the completion tokens (from the mean response length; the maximum completion length, if unknown)
+    - the wall-clock time (from the mean response time; unknown without previous runs), where a batch is assumed
+      to take as long as a single call
+    - the API cost, if the model spec has a "pricing" entry with the USD per 1M "input" and "output" tokens
+    - the instances that are expected to exceed the model's context_size and the turn at which this happens
+
+Example:
+    clem run -g taboo -m gpt-4o --plan
+"""
+import logging
+import math
+import re
+from collections import defaultdict
+from typing import List, Dict, Optional, Any
+
+from clemcore.backends import Model, ModelSpec, CustomResponseModel, HumanModel
+from clemcore.clemgame.benchmark import GameBenchmark
+from clemcore.clemgame.instances import GameInstances
+from clemcore.clemgame.master import GameMaster
+from clemcore.clemgame.stats import EpisodeStats
+
+module_logger = logging.getLogger(__name__)
+stdout_logger = logging.getLogger("clemcore.run")
+
+CHARS_PER_TOKEN = 4
+"""The number of characters per token assumed when a model's tokenizer is not available."""
+TOKENS_PER_MESSAGE = 4
+"""The number of tokens assumed for the chat template of each message when a model's tokenizer is not available."""
+
+
+def parse_context_size(context_size: Any) -> Optional[int]:
+    """Parse a context size of the model registry, e.g. "128k" or "1M", into a number of tokens."""
+    if isinstance(context_size, (int, float)):
+        return int(context_size)
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kKmM]?)\s*", str(context_size or ""))
+    if match is None:
+        return None
+    factor = {"": 1, "k": 1_000, "m": 1_000_000}[match.group(2).lower()]
+    return int(float(match.group(1)) * factor)
+
+
+class PlanningModel(Model):
+    """A stand-in for a model during planning, so that game masters can be set up without loading the model."""
+
+    def generate_response(self, messages: List[Dict]):
+        raise RuntimeError(f"Model {self.name} must not be called while planning a run")
+
+
+def create_planning_model(model_spec: ModelSpec, gen_args: Dict) -> Model:
+    """Create a model for the (unified) model spec that can be passed to a game master, but is never called."""
+    if model_spec.is_programmatic():
+        model = CustomResponseModel(model_spec)
+    elif model_spec.is_human():
+        model = HumanModel(model_spec)
+    else:
+        model = PlanningModel(model_spec)
+    model.set_gen_args(**gen_args)
+    return model
+
+
+class TokenCounter:
+    """Counts the prompt tokens of messages with a model's tokenizer or estimates them from the message lengths."""
+
+    def __init__(self, tokenizer=None):
+        self.tokenizer = tokenizer
+
+    @classmethod
+    def from_model_spec(cls, model_spec: ModelSpec) -> "TokenCounter":
+        """Load the tokenizer of local Hugging Face models (if transformers is installed), otherwise estimate."""
+        if not model_spec.has_backend() or model_spec.backend != "huggingface_local" \
+                or not model_spec.has_attr("huggingface_id"):
+            return cls()
+        try:
+            from transformers import AutoTokenizer
+            return cls(AutoTokenizer.from_pretrained(model_spec.huggingface_id))
+        except Exception as e:  # the estimate is good enough for planning
+            module_logger.warning("Cannot load the tokenizer of %s (estimate the tokens instead): %s",
+                                  model_spec.model_name, e)
+            return cls()
+
+    def count(self, messages: List[Dict]) -> int:
+        if self.tokenizer is not None:
+            try:
+                return len(self.tokenizer.apply_chat_template(messages, add_generation_prompt=True))
+            except Exception:  # e.g. tokenizers without a chat template
+                return len(self.tokenizer.encode("\n".join(str(m.get("content", "")) for m in messages)))
+        return sum(len(str(message.get("content", ""))) // CHARS_PER_TOKEN + TOKENS_PER_MESSAGE
+                   for message in messages)
+
+    @staticmethod
+    def estimate(num_chars: float) -> float:
+        return num_chars / CHARS_PER_TOKEN
+
+
+def first_turn_prompts(game_master: GameMaster) -> Dict[str, List[Dict]]:
+    """The messages that each player of a set-up game master would be prompted with on its first turn."""
+    prompts = {}
+    initial_prompts = getattr(game_master, "initial_prompt_for_player", {})  # see DialogueGameMaster
+    for player in game_master.get_players():
+        context = game_master.get_context_for(player) or initial_prompts.get(player.name)
+        if context is not None:
+            prompts[player.name] = player.get_perspective() + [context]
+    return prompts
+
+
+def plan_game(game_benchmark: GameBenchmark,
+              game_instances: GameInstances,
+              player_models: List[Model],
+              *,
+              token_counters: Dict[str, TokenCounter] = None,
+              episode_stats: EpisodeStats = None) -> Dict:
+    """
+    Estimate the calls, tokens, time and cost to play the game instances with the player models.
+
+    Args:
+        game_benchmark: The game benchmark to plan for.
+        game_instances: The game instances that would be played.
+        player_models: The planning models (see create_planning_model) of the players.
+        token_counters: The token counters by model name. Default: estimate from the message lengths.
+        episode_stats: The statistics of previous runs. Default: None (no history).
+    Returns:
+        The plan of the game with the totals per model and the instances expected to exceed the context size.
+    """
+    token_counters = token_counters or {}
+    episode_stats = episode_stats or EpisodeStats()
+    models = {}
+    overflows = []
+    num_from_history = 0
+    for row in game_instances:
+        game_master = game_benchmark.create_game_master(row["experiment"], player_models)
+        game_master.setup(**row["game_instance"])
+        players = game_master.get_players()
+        prompts = first_turn_prompts(game_master)
+        experiment_stats = episode_stats.get_experiment_stats(row) or {}
+        num_requests = episode_stats.expected_requests(row)
+        if num_requests is None:
+            num_requests = len(players)
+        else:
+            num_from_history += 1
+        for player_idx, player in enumerate(players):
+            model = player.model
+            if model.model_spec.is_programmatic() or model.model_spec.is_human() or player.name not in prompts:
+                continue
+            max_tokens = model.max_tokens or 0
+            first_prompt_tokens = token_counters.get(model.name, TokenCounter()).count(prompts[player.name])
+            completion_tokens = max_tokens
+            if experiment_stats.get("mean_response_chars") is not None:
+                completion_tokens = min(TokenCounter.estimate(experiment_stats["mean_response_chars"]), max_tokens)
+            growth_per_request = completion_tokens
+            if experiment_stats.get("mean_chars") and experiment_stats.get("mean_requests"):
+                growth_per_request = TokenCounter.estimate(experiment_stats["mean_chars"]
+                                                           / experiment_stats["mean_requests"])
+            # the players take turns, hence, between two turns of a player every player's request adds to its history
+            num_calls = math.ceil(max(num_requests - player_idx, 0) / len(players))
+            growth_per_turn = growth_per_request * len(players)
+            prompt_tokens = num_calls * first_prompt_tokens + growth_per_turn * num_calls * (num_calls - 1) / 2
+            model_plan = models.setdefault(model.name, dict(calls=0, prompt_tokens=0, completion_tokens=0,
+                                                            seconds=None, cost=None))
+            model_plan["calls"] += num_calls
+            model_plan["prompt_tokens"] += prompt_tokens
+            model_plan["completion_tokens"] += num_calls * completion_tokens
+            if experiment_stats.get("mean_response_seconds") is not None:
+                model_plan["seconds"] = (model_plan["seconds"] or 0) \
+                                        + num_calls * experiment_stats["mean_response_seconds"]
+            context_size = parse_context_size(getattr(model.model_spec, "context_size", None))
+            if context_size is None:
+                continue
+            for turn in range(max(num_calls, 1)):
+                tokens = first_prompt_tokens + turn * growth_per_turn + max_tokens
+                if tokens > context_size:
+                    overflows.append(dict(experiment=row["experiment"]["name"],
+                                          game_id=row["game_instance"]["game_id"],
+                                          player=player.name, model=model.name, turn=turn + 1,
+                                          tokens=round(tokens), context_size=context_size))
+                    break
+    for model_name, model_plan in models.items():
+        model_plan["prompt_tokens"] = round(model_plan["prompt_tokens"])
+        model_plan["completion_tokens"] = round(model_plan["completion_tokens"])
+        model_plan["cost"] = estimate_cost(next(m.model_spec for m in player_models if m.name == model_name),
+                                           model_plan["prompt_tokens"], model_plan["completion_tokens"])
+    return dict(game_name=game_benchmark.game_name, instances=len(game_instances),
+                instances_with_history=num_from_history, models=models, context_overflows=overflows)
+
+
+def estimate_cost(model_spec: ModelSpec, prompt_tokens: float, completion_tokens: float) -> Optional[float]:
+    """The API cost in USD according to the "pricing" of the model spec, or None if the model spec has no pricing."""
+    pricing = getattr(model_spec, "pricing", None)
+    if not pricing:
+        return None
+    return (prompt_tokens * pricing.get("input", 0.) + completion_tokens * pricing.get("output", 0.)) / 1e6
+
+
+def summarize(game_plans: List[Dict], batch_size: int = 1) -> Dict:
+    """
+    Sum up the plans of the games. The expected wall-clock time assumes that the calls are made one after another
+    for batch_size=1 and otherwise in full batches that take as long as a single call.
+    """
+    totals = defaultdict(lambda: dict(calls=0, prompt_tokens=0, completion_tokens=0, seconds=None, cost=None))
+    for game_plan in game_plans:
+        for model_name, model_plan in game_plan["models"].items():
+            total = totals[model_name]
+            for key in ["calls", "prompt_tokens", "completion_tokens"]:
+                total[key] += model_plan[key]
+            for key in ["seconds", "cost"]:
+                if model_plan[key] is not None:
+                    total[key] = (total[key] or 0) + model_plan[key]
+    seconds = [total["seconds"] for total in totals.values() if total["seconds"] is not None]
+    costs = [total["cost"] for total in totals.values() if total["cost"] is not None]
+    return dict(models=dict(totals),
+                calls=sum(total["calls"] for total in totals.values()),
+                seconds=sum(seconds) / max(batch_size, 1) if seconds else None,
+                cost=sum(costs) if costs else None,
+                context_overflows=sum(len(game_plan["context_overflows"]) for game_plan in game_plans))
+
+
+def log_plan(game_plans: List[Dict], summary: Dict):
+    """Print the plan to the console."""
+    for game_plan in game_plans:
+        stdout_logger.info("%s: %s instances (%s with statistics of previous runs)", game_plan["game_name"],
+                           game_plan["instances"], game_plan["instances_with_history"])
+        for model_name, model_plan in game_plan["models"].items():
+            stdout_logger.info("  %s: %s calls, %s prompt tokens, %s completion tokens", model_name,
+                               model_plan["calls"], model_plan["prompt_tokens"], model_plan["completion_tokens"])
+        for overflow in game_plan["context_overflows"]:
+            stdout_logger.warning("  %s/%s exceeds the context of %s (%s tokens) on turn %s with ~%s tokens",
+                                  overflow["experiment"], overflow["game_id"], overflow["model"],
+                                  overflow["context_size"], overflow["turn"], overflow["tokens"])
+    for model_name, total in summary["models"].items():
+        cost = f"{total['cost']:.2f} USD" if total["cost"] is not None else "unknown cost (no pricing)"
+        stdout_logger.info("Total %s: %s calls, %s prompt tokens, %s completion tokens, %s", model_name,
+                           total["calls"], total["prompt_tokens"], total["completion_tokens"], cost)
+    seconds = summary["seconds"]
+    stdout_logger.info("Expected: %s calls, %s, %s, %s instances exceed the context", summary["calls"],
+                       f"{seconds / 3600:.2f} hours" if seconds is not None else "unknown time (no previous runs)",
+                       f"{summary['cost']:.2f} USD" if summary["cost"] is not None else "unknown cost",
+                       summary["context_overflows"])
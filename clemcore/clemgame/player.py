@@ -1,11 +1,16 @@
 import abc
+import logging
 from collections import defaultdict
 from copy import deepcopy
 from typing import List, Dict, Optional, Tuple
 
 from clemcore import backends
+from clemcore.backends.utils import ContextExceededError
+from clemcore.clemgame.errors import BatchResponseError
 from clemcore.clemgame.events import GameEventSource
 
+module_logger = logging.getLogger(__name__)
+
 
 class Player(GameEventSource):
     """A participant in a dialogue-based game, capable of generating responses
@@ -54,15 +59,18 @@ class Player(GameEventSource):
         """Deepcopy override method.
         Deep copies Player class object, but keeps backend model and game recorder references intact.
         We don't want to multiply the recorders on each deep copy, but have a single set for each game.
+        The message dicts are copied shallowly (their contents are shared), so that a game master that edits the
+        messages of a copy's history does not change the history of the original.
         Args:
             memo: Dictionary of objects already copied during the current copying pass. (This is a deepcopy default.)
         """
         _copy = type(self).__new__(self.__class__)
         memo[id(self)] = _copy
         for key, value in self.__dict__.items():
-            if key not in ["_model", "_loggers"]:
+            if key not in ["_model", "_loggers", "_messages"]:
                 setattr(_copy, key, deepcopy(value, memo))
         _copy._model = self._model
+        _copy._messages = [dict(message) for message in self._messages]
         _copy._loggers = []  # we don't want to copy loggers, but the list must be initialized
         return _copy
 
@@ -261,14 +269,17 @@ class Player(GameEventSource):
 
         Raises:
             AssertionError: If the lengths of `players`, `contexts`, and `row_ids` do not match.
-            AssertionError: If a model returns a number of responses that doesn't match the number of prompts
-                            it was given.
-            AttributeError: If a model does not implement the required `generate_batch_response` method.
+            AssertionError: If a model does not implement the required `generate_batch_response` method.
+            BatchResponseError: If the responses for some rows could not be generated. The responses of the
+                            other rows are generated nevertheless and are available via the error.
 
         Notes:
             - Models are grouped by name (not by instance) to avoid issues with unhashable model objects.
             - The order of inputs is preserved during batch generation to ensure correct mapping of responses
               to players and session IDs.
+            - Failures are isolated: rows that exceed the context limit (see ContextExceededError.batch_indices)
+              are removed from the batch, and for other errors the batch is bisected until the failing rows are
+              found. The other rows are generated as usual.
         """
         if row_ids is None:
             row_ids = list(range(len(players)))
@@ -293,33 +304,102 @@ class Player(GameEventSource):
             perspective = player.perceive_context(context)
             input_batch_by_model[player.model.name].append((row_id, player, perspective, context))
 
-        # Collect responses per row_id
+        # Collect responses (and errors) per row_id
         context_response_by_row_id = {}
+        exception_by_row_id = {}
         for model_name, batched_inputs in input_batch_by_model.items():
-            # Build input batch and track mapping back to session/player
-            row_mapping: Dict[int, Tuple[int, Player, Dict]] = {}
-            batched_perspectives: List[List[Dict]] = []
-            for prompt_idx, (row_id, player, perspective, context) in enumerate(batched_inputs):
-                row_mapping[prompt_idx] = (row_id, player, context)
-                batched_perspectives.append(perspective)
-
             # Run batched generation (assumes order-preserving)
             model = model_by_name[model_name]
-            if model.model_spec.is_programmatic():
-                model.players = [player for (_, player, _, _) in batched_inputs]  # inject game-specific players
-            results = model.generate_batch_response(batched_perspectives)
-            if model.model_spec.is_programmatic():
-                model.players = []  # clean up
-            assert len(results) == len(batched_perspectives), (
-                f"Model '{model_name}' returned {len(results)} responses, "
-                f"but {len(batched_perspectives)} prompts were sent."
-            )
+            results, exceptions = Player._generate_batch_isolated(model, batched_inputs,
+                                                                  list(range(len(batched_inputs))))
+            for prompt_idx, exception in exceptions.items():
+                exception_by_row_id[batched_inputs[prompt_idx][0]] = exception
 
             # Each result is assumed to be (prompt, response_object, response_text)
-            for prompt_idx, (perspective, response_object, response_text) in enumerate(results):
-                row_id, player, context = row_mapping[prompt_idx]
+            for prompt_idx, (perspective, response_object, response_text) in sorted(results.items()):
+                row_id, player, _, context = batched_inputs[prompt_idx]
                 context_response_by_row_id[row_id] = (context, response_text)
                 metadata = dict(prompt=perspective, response_object=response_object)
                 player.perceive_response(response_text, metadata=metadata)
 
+        if exception_by_row_id:
+            raise BatchResponseError(context_response_by_row_id, exception_by_row_id)
         return context_response_by_row_id
+
+    @staticmethod
+    def sample_response(players: List["Player"], context: Dict) -> List[str]:
+        """
+        Generates one response for each of several players that share a model and a dialogue history,
+        e.g., the copies of a player at a branching point, with a single call to `generate_samples()`.
+
+        Each player perceives the context; the responses are sampled for the perspective of the first player
+        and each player perceives its own response.
+
+        Args:
+            players (List[Player]): The players that respond to the same context with the same model.
+            context (Dict): The context to respond to.
+
+        Returns:
+            List[str]: The response text of each player (in the order of the players).
+
+        Raises:
+            AssertionError: If the players do not share the same model.
+        """
+        model = players[0].model
+        assert all(player.model.name == model.name for player in players), (
+            "The players of sample_response() must share the same model"
+        )
+        perspectives = [player.perceive_context(context) for player in players]
+        results = model.generate_samples(perspectives[0], len(players))
+        assert len(results) == len(players), (
+            f"Model '{model.name}' returned {len(results)} samples, but {len(players)} were requested."
+        )
+        response_texts = []
+        for player, (prompt, response_object, response_text) in zip(players, results):
+            player.perceive_response(response_text, metadata=dict(prompt=prompt, response_object=response_object))
+            response_texts.append(response_text)
+        return response_texts
+
+    @staticmethod
+    def _generate_batch_isolated(model: backends.Model,
+                                 batched_inputs: List[Tuple[int, "Player", List[Dict], Dict]],
+                                 indices: List[int]) -> Tuple[Dict[int, Tuple], Dict[int, Exception]]:
+        """
+        Generate the responses for the inputs at the given indices and isolate the rows that fail.
+
+        Returns:
+            The results (prompt, response_object, response_text) and the exceptions by input index.
+        """
+        try:
+            if model.model_spec.is_programmatic():
+                model.players = [batched_inputs[idx][1] for idx in indices]  # inject game-specific players
+            try:
+                results = model.generate_batch_response([batched_inputs[idx][2] for idx in indices])
+            finally:
+                if model.model_spec.is_programmatic():
+                    model.players = []  # clean up
+            assert len(results) == len(indices), (
+                f"Model '{model.name}' returned {len(results)} responses, but {len(indices)} prompts were sent."
+            )
+            return dict(zip(indices, results)), {}
+        except Exception as e:
+            if len(indices) == 1:
+                module_logger.warning("Response generation failed for a single row: %s", e)
+                return {}, {indices[0]: e}
+            batch_indices = e.batch_indices if isinstance(e, ContextExceededError) else None
+            if batch_indices:  # the rows that exceed the context are known, so generate the others without them
+                failed = {indices[batch_idx] for batch_idx in batch_indices}
+                remaining = [idx for idx in indices if idx not in failed]
+                results, exceptions = Player._generate_batch_isolated(model, batched_inputs, remaining) \
+                    if remaining else ({}, {})
+                exceptions.update({idx: e for idx in failed})
+                return results, exceptions
+            # bisect, because it is not known which rows caused the error
+            module_logger.warning("Batch response generation failed for %s rows (bisect to isolate): %s",
+                                  len(indices), e)
+            middle = len(indices) // 2
+            results, exceptions = Player._generate_batch_isolated(model, batched_inputs, indices[:middle])
+            more_results, more_exceptions = Player._generate_batch_isolated(model, batched_inputs, indices[middle:])
+            results.update(more_results)
+            exceptions.update(more_exceptions)
+            return results, exceptions
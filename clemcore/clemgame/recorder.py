@@ -38,6 +38,22 @@ class GameInteractionsRecorder(GameEventLogger):
         self.violated_requests_counts = [0]  # count per round (initially zero)
         self.successful_requests_counts = [0]  # count per round (initially zero)
 
+    def __deepcopy__(self, memo):
+        """Deepcopy override method.
+        The logged events are never modified (the actions are copied when logged), hence, the copy shares them
+        with the original and only the lists of events per round are copied.
+        Args:
+            memo: Dictionary of objects already copied during the current copying pass. (This is a deepcopy default.)
+        """
+        _copy = type(self).__new__(self.__class__)
+        memo[id(self)] = _copy
+        for key, value in self.__dict__.items():
+            if key != "interactions":
+                setattr(_copy, key, copy.deepcopy(value, memo))
+        _copy.interactions = {key: [list(events) for events in value] if key == "turns" else copy.deepcopy(value, memo)
+                              for key, value in self.interactions.items()}
+        return _copy
+
     def log_next_round(self):
         """Call this method to group interactions per turn."""
         self._current_round += 1
@@ -1,5 +1,10 @@
 __all__ = [
     "dispatch",
     "batchwise",
-    "sequential"
+    "hybrid",
+    "early_stopping",
+    "matrix",
+    "batch_tuning",
+    "sequential",
+    "distributed"
 ]
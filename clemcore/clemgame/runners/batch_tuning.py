@@ -0,0 +1,212 @@
+"""
+Automatic batch size tuning for the batchwise runner (clem run -b auto).
+
+Before a game is run, a short calibration generates the responses to the game's first-turn prompts at increasing
+batch sizes (1, 2, 4, ...) and measures the throughput in generated tokens per second. The first batch is a warm-up
+and not measured, because it includes one-time costs (e.g. compiling kernels or growing the allocator's pools) that
+would understate the throughput of batch size 1. The calibration stops
+when the throughput does not increase anymore, the memory usage exceeds the limit or the model runs out of memory.
+The batch size with the highest throughput (within the memory limit) is chosen.
+
+During the run, the prompts grow with the dialogue. Hence, the tuner keeps observing the memory usage of each batch:
+the batch size is reduced when the memory usage exceeds the limit (or the model runs out of memory) and is increased
+again (up to the calibrated size) when the memory usage stays low for a while.
+
+The calibration curve and the batch size changes are recorded in the run.json (see RunFileSaver.store_game_info).
+"""
+import logging
+import time
+from typing import List, Dict, Optional, Callable
+
+from clemcore.backends import Model
+from clemcore.clemgame import GameBenchmark, GameInstances, BatchResponseError
+from clemcore.clemgame.planner import first_turn_prompts, TokenCounter
+
+module_logger = logging.getLogger(__name__)
+stdout_logger = logging.getLogger("clemcore.run")
+
+AUTO_BATCH_SIZE = "auto"
+
+
+def cuda_memory_usage() -> Optional[float]:
+    """
+    The peak fraction of the memory of the fullest CUDA device since the last call (the peak stats are reset).
+
+    Returns:
+        None, if torch is not installed or no CUDA device is available.
+    """
+    try:
+        import torch
+    except ImportError:
+        return None
+    if not torch.cuda.is_available():
+        return None
+    usage = 0.
+    for device in range(torch.cuda.device_count()):
+        total_memory = torch.cuda.get_device_properties(device).total_memory
+        usage = max(usage, torch.cuda.max_memory_reserved(device) / total_memory)
+        torch.cuda.reset_peak_memory_stats(device)
+    return usage
+
+
+def is_out_of_memory(exception: Exception) -> bool:
+    """Check if the exception (or one of the rows of a BatchResponseError) signals that the memory is exhausted."""
+    if isinstance(exception, BatchResponseError):
+        return any(is_out_of_memory(e) for e in exception.exception_by_row_id.values())
+    return isinstance(exception, MemoryError) or "out of memory" in str(exception).lower()
+
+
+class BatchSizeTuner:
+    """Chooses the batch size with the highest throughput and adapts it to the memory usage during a run."""
+
+    def __init__(self, *,
+                 max_batch_size: int = 64,
+                 memory_limit: float = .9,
+                 patience: int = 8,
+                 memory_usage: Callable[[], Optional[float]] = cuda_memory_usage,
+                 clock: Callable[[], float] = time.perf_counter):
+        """
+        Args:
+            max_batch_size: The largest batch size to try. Default: 64.
+            memory_limit: The maximum fraction of the device memory to use. Default: 0.9.
+            patience: The number of batches with a low memory usage (less than 3/4 of the limit) after which
+                a reduced batch size is increased again. Default: 8.
+            memory_usage: A function that returns the peak memory usage since its last call (as a fraction)
+                or None if unknown. Default: the usage of the CUDA devices.
+            clock: The clock to measure the generation time with (in seconds).
+        """
+        self.max_batch_size = max_batch_size
+        self.memory_limit = memory_limit
+        self.patience = patience
+        self.memory_usage = memory_usage
+        self.clock = clock
+        self.batch_size = 1
+        self.calibrated_batch_size = 1
+        self.curve: List[Dict] = []
+        self.changes: List[Dict] = []
+        self.num_batches = 0
+        self._num_low_memory_batches = 0
+
+    def calibrate(self, model: Optional[Model], prompts: List[List[Dict]]) -> int:
+        """
+        Measure the throughput of the model for the prompts at increasing batch sizes and choose the best one
+        (after a warm-up batch of size 1).
+
+        Args:
+            model: The model to calibrate the batch size for.
+            prompts: The prompts to generate responses for (repeated to fill larger batches).
+        Returns:
+            The chosen batch size, or the maximum batch size, if there is no model or prompt to calibrate with.
+        """
+        if model is None or not prompts:
+            self.calibrated_batch_size = self.max_batch_size
+            self._change(self.max_batch_size, "nothing to calibrate with")
+            return self.batch_size
+        self.memory_usage()  # reset the peak stats
+        best = None
+        batch_size = 1
+        warmed_up = False
+        while batch_size <= self.max_batch_size:
+            batch = [prompts[idx % len(prompts)] for idx in range(batch_size)]
+            start = self.clock()
+            try:
+                results = model.generate_batch_response(batch)
+            except Exception as e:
+                if not is_out_of_memory(e):
+                    raise
+                self.curve.append(dict(batch_size=batch_size, tokens_per_second=None, memory=None,
+                                       error="out of memory"))
+                break
+            if not warmed_up:  # measure the first batch size again
+                warmed_up = True
+                continue
+            seconds = max(self.clock() - start, 1e-9)
+            num_tokens = sum(TokenCounter.estimate(len(response_text)) for _, _, response_text in results)
+            point = dict(batch_size=batch_size, tokens_per_second=num_tokens / seconds, memory=self.memory_usage())
+            self.curve.append(point)
+            stdout_logger.info("Calibrate batch size %s: %.1f tokens/s (memory=%s)", batch_size,
+                               point["tokens_per_second"], point["memory"])
+            if point["memory"] is not None and point["memory"] > self.memory_limit:
+                break
+            if best is not None and point["tokens_per_second"] <= best["tokens_per_second"]:
+                break  # no gain anymore
+            best = point
+            batch_size *= 2
+        self.calibrated_batch_size = best["batch_size"] if best is not None else 1
+        self._change(self.calibrated_batch_size, "calibration")
+        return self.batch_size
+
+    def observe(self, batch_size: int, exception: Exception = None):
+        """
+        Adapt the batch size after a batch of the given size has been generated.
+
+        Args:
+            batch_size: The size of the generated batch.
+            exception: The exception raised by the generation, if any.
+        """
+        self.num_batches += 1
+        if exception is not None and is_out_of_memory(exception):
+            self._num_low_memory_batches = 0
+            self._change(max(batch_size // 2, 1), "out of memory")
+            return
+        memory = self.memory_usage()
+        if memory is None:
+            return
+        if memory > self.memory_limit:
+            self._num_low_memory_batches = 0
+            self._change(max(batch_size * 3 // 4, 1), f"memory usage {memory:.2f}")
+            return
+        if memory < self.memory_limit * 3 / 4 and self.batch_size < self.calibrated_batch_size:
+            self._num_low_memory_batches += 1
+            if self._num_low_memory_batches >= self.patience:
+                self._num_low_memory_batches = 0
+                self._change(min(max(self.batch_size * 4 // 3, self.batch_size + 1), self.calibrated_batch_size),
+                             f"memory usage {memory:.2f}")
+
+    def _change(self, batch_size: int, reason: str):
+        if self.changes and batch_size == self.batch_size:
+            return
+        module_logger.info("Change batch size from %s to %s (%s)", self.batch_size, batch_size, reason)
+        self.batch_size = batch_size
+        self.changes.append(dict(batch=self.num_batches, batch_size=batch_size, reason=reason))
+
+    def to_report(self) -> Dict:
+        return dict(calibrated_batch_size=self.calibrated_batch_size,
+                    final_batch_size=self.batch_size,
+                    max_batch_size=self.max_batch_size,
+                    memory_limit=self.memory_limit,
+                    curve=self.curve,
+                    changes=self.changes)
+
+
+def select_model(player_models: List[Model]) -> Optional[Model]:
+    """The model to tune the batch size for: the first player model that generates its responses."""
+    return next((player_model for player_model in player_models if not player_model.responds_instantly()), None)
+
+
+def calibrate(game_benchmark: GameBenchmark,
+              game_instances: GameInstances,
+              player_models: List[Model],
+              tuner: BatchSizeTuner) -> int:
+    """
+    Calibrate the batch size for the first-turn prompts of the game's first instances (see BatchSizeTuner).
+
+    The game masters are only set up (and not played) to render the prompts of the tuned model (see select_model).
+
+    Returns:
+        The chosen batch size.
+    """
+    model = select_model(player_models)
+    prompts = []
+    for row in game_instances:
+        if model is None or len(prompts) >= tuner.max_batch_size:
+            break
+        game_master = game_benchmark.create_game_master(row["experiment"], player_models)
+        game_master.setup(**row["game_instance"])
+        prompt_by_player = first_turn_prompts(game_master)
+        prompts.extend(prompt_by_player[player.name] for player in game_master.get_players()
+                       if player.model is model and player.name in prompt_by_player)
+    if model is not None:
+        stdout_logger.info("Calibrate the batch size of %s for %s on %s prompts", model.name,
+                           game_benchmark.game_name, len(prompts))
+    return tuner.calibrate(model, prompts)
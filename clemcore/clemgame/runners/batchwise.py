@@ -1,5 +1,8 @@
 import logging
-from typing import List, Dict, Callable, Optional, Tuple, Any, Iterable
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import List, Dict, Callable, Optional, Tuple, Any, Iterable, Iterator
 
 from tqdm import tqdm
 
@@ -9,9 +12,11 @@ from clemcore.clemgame import (
     GameBenchmark,
     GameBenchmarkCallbackList,
     Player,
-    GameInstances
+    GameInstances,
+    BatchResponseError
 )
 from clemcore.clemgame.envs.pettingzoo import GameMasterEnv
+from clemcore.clemgame.runners.batch_tuning import BatchSizeTuner
 
 module_logger = logging.getLogger(__name__)
 stdout_logger = logging.getLogger("clemcore.run")
@@ -42,10 +47,50 @@ class GameSession(Iterable):
         self.game_env = game_env
         self.game_instance = game_instance
 
+    @classmethod
+    def create(cls,
+               session_id: int,
+               row: Dict,
+               game_benchmark: GameBenchmark,
+               player_models: List[Model],
+               callbacks: GameBenchmarkCallbackList) -> "GameSession":
+        """
+        Set up a GameMasterEnv for the given game instance row and wrap it into a GameSession.
+
+        Args:
+            session_id: The unique identifier of the session.
+            row: The game instance row with "experiment" and "game_instance" keys.
+            game_benchmark: The GameBenchmark providing the game master.
+            player_models: List of player models to pass to the GameMasterEnv.
+            callbacks: Callback list to notify on game start.
+
+        Returns:
+            The prepared game session.
+        """
+        game_instance = row["game_instance"]
+        game_env = GameMasterEnv(game_benchmark, callbacks=callbacks)
+        with game_benchmark.extra_modules_activated():  # e.g. when the modules of several games are interleaved
+            game_env.reset(options={
+                "player_models": player_models,
+                "experiment": row["experiment"],
+                "game_instance": game_instance
+            })
+        return cls(session_id, game_env, game_instance)
+
     @property
     def is_done(self) -> bool:
-        """Check if all agents have terminated."""
-        return all(self.game_env.terminations.values())
+        """Check if all agents have terminated (or have been truncated because the session was aborted)."""
+        return all(self.game_env.terminations[agent_id] or self.game_env.truncations.get(agent_id, False)
+                   for agent_id in self.game_env.terminations)
+
+    def step(self, response: Any):
+        """Step the game env with the response (while the game's additional modules are registered)."""
+        with self.game_env.game_benchmark.extra_modules_activated():
+            self.game_env.step(response)
+
+    def abort(self, exception: Exception):
+        """End the session due to an error outside the env, e.g., when the response generation failed."""
+        self.game_env.abort(exception)
 
     def __iter__(self):
         """
@@ -122,6 +167,153 @@ class SinglePassGameSessionPoller(Iterable):
                 self.exhausted[i] = True
 
 
+class GameSessionPool(Iterable):
+    """
+    A bounded window of live GameSessions that are lazily set up from game instance rows.
+
+    Instead of preparing a GameMasterEnv for every game instance upfront, the pool keeps at most
+    `max_sessions` sessions alive and sets up new ones (in instance order) whenever others finish.
+    Hence, peak memory is independent of the number of game instances, and the first batch can be
+    generated as soon as the first `max_sessions` sessions are ready.
+
+    Optionally, the setup of new sessions is done by background threads (setup_workers > 0), so that
+    it overlaps with the model's generation. Then the `lock` must be held while stepping sessions,
+    because setup and stepping may both notify the (shared) callbacks.
+    """
+
+    def __init__(self,
+                 create_session: Callable[[int, Dict], "GameSession"],
+                 rows: Iterable[Dict],
+                 *,
+                 max_sessions: int,
+                 setup_workers: int = 0):
+        """
+        Args:
+            create_session: A function that sets up a GameSession given a session id and a game instance row.
+                Exceptions are logged and counted, but do not stop the pool from continuing with the next rows.
+            rows: The game instance rows to create sessions for. The session id is the index of the row.
+            max_sessions: The maximum number of sessions alive at the same time (including those in setup).
+            setup_workers: The number of background threads for session setup. Default: 0 (setup in caller thread).
+        """
+        assert max_sessions > 0, "The pool must allow at least a single session"
+        self.create_session = create_session
+        self.max_sessions = max_sessions
+        self.lock = threading.RLock()
+        self.error_count = 0
+        self.num_created = 0
+        self._rows: Iterator[Tuple[int, Dict]] = enumerate(rows)
+        self._has_pending_rows = True
+        self._sessions: Dict[int, GameSession] = {}
+        self._setups: Dict[Future, int] = {}
+        self._executor = ThreadPoolExecutor(setup_workers, thread_name_prefix="session-setup") \
+            if setup_workers > 0 else None
+
+    @classmethod
+    def from_sessions(cls, game_sessions: List["GameSession"]) -> "GameSessionPool":
+        """Create a pool over already prepared game sessions (all of them are alive at once)."""
+        return cls(lambda _, game_session: game_session, game_sessions, max_sessions=max(len(game_sessions), 1))
+
+    def __iter__(self):
+        """Iterate over a snapshot of the currently alive sessions (in order of creation)."""
+        return iter(list(self._sessions.values()))
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __getitem__(self, session_id: int) -> "GameSession":
+        return self._sessions[session_id]
+
+    def __contains__(self, session_id: int) -> bool:
+        return session_id in self._sessions
+
+    @property
+    def is_exhausted(self) -> bool:
+        """True, when all sessions are done and no further sessions will be set up."""
+        return not self._sessions and not self._setups and not self._has_pending_rows
+
+    def remove(self, session_id: int):
+        """Remove a session from the pool, e.g., because it does not provide observations anymore."""
+        self._sessions.pop(session_id, None)
+
+    def _create(self, session_id: int, row: Dict) -> Optional["GameSession"]:
+        with self.lock:
+            try:
+                return self.create_session(session_id, row)
+            except Exception:  # continue with other instances if something goes wrong
+                if isinstance(row, dict) and "game_instance" in row:
+                    message = f"{row.get('game_name')}: Exception for instance {row['game_instance']['game_id']}"
+                else:
+                    message = f"Exception for game session {session_id}"
+                module_logger.exception(f"{message} (but continue)")
+                self.error_count += 1
+                return None
+
+    def _admit(self, session: Optional["GameSession"]):
+        if session is None:
+            return
+        self.num_created += 1
+        if not session.is_done:
+            self._sessions[session.session_id] = session
+
+    def refill(self, block: bool = False):
+        """
+        Remove finished sessions and set up new ones until the window is full again.
+
+        Args:
+            block: If True and no session is alive, wait for a background setup to complete.
+        """
+        for session_id in [sid for sid, session in self._sessions.items() if session.is_done]:
+            del self._sessions[session_id]
+        self._collect_setups()
+        while self._has_pending_rows and len(self._sessions) + len(self._setups) < self.max_sessions:
+            next_row = next(self._rows, None)
+            if next_row is None:
+                self._has_pending_rows = False
+                break
+            session_id, row = next_row
+            if self._executor is None:
+                self._admit(self._create(session_id, row))
+            else:
+                self._setups[self._executor.submit(self._create, session_id, row)] = session_id
+        if block and not self._sessions and self._setups:
+            wait(list(self._setups), return_when=FIRST_COMPLETED)
+            self.refill(block=True)  # setup might have failed, then try the next rows
+
+    def _collect_setups(self):
+        for future in [future for future in self._setups if future.done()]:
+            del self._setups[future]
+            self._admit(future.result())
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class SlidingWindowGameSessionPoller(Iterable):
+    """
+    Iterable that yields one observation from each alive session of a GameSessionPool in a single pass.
+
+    Before each pass, finished sessions are removed from the pool and new sessions are admitted.
+    Exposes an `exhausted` attribute to be compatible with the DynamicBatchDataLoader.
+    """
+
+    def __init__(self, session_pool: GameSessionPool):
+        self.session_pool = session_pool
+
+    @property
+    def exhausted(self) -> List[bool]:
+        return [self.session_pool.is_exhausted]
+
+    def __iter__(self):
+        self.session_pool.refill(block=True)
+        for session in self.session_pool:
+            observation = next(iter(session), None)
+            if observation is None:  # the session is exhausted
+                self.session_pool.remove(session.session_id)
+                continue
+            yield observation
+
+
 class DynamicBatchDataLoader(Iterable):
     """
     A custom DataLoader for stateful IterableDatasets that supports dynamically shrinking batch sizes.
@@ -140,6 +332,7 @@ class DynamicBatchDataLoader(Iterable):
         The final batch in a polling round may be smaller than the specified `batch_size`, especially
         when few data sources remain. Fixing this to always yield full batches would require additional
         buffering and coordination logic, which is intentionally avoided here to keep the implementation simple.
+        The RefillBatchDataLoader implements this buffering for a GameSessionPool.
 
     Unlike PyTorch's built-in DataLoader, this implementation:
         - Avoids resetting dataset iterators on each pass.
@@ -178,12 +371,129 @@ class DynamicBatchDataLoader(Iterable):
                 yield self.collate_fn(batch_items)
 
 
+class RefillBatchDataLoader(Iterable):
+    """
+    A DataLoader that fills every batch up to `batch_size` as long as enough sessions are ready.
+
+    In contrast to the DynamicBatchDataLoader, there are no polling passes: the observations of ready sessions
+    are buffered in FIFO queues across batches, one queue per model (of the player that has to respond).
+    Sessions that were part of the previous batch (and have been stepped since) as well as newly admitted sessions
+    are appended to the end of their model's queue, and each batch is taken from the front of a single queue.
+    Hence, each batch is generated by a single model at full width (instead of being split by model in
+    Player.batch_response), and batches only shrink when fewer sessions than `batch_size` are ready for a model,
+    e.g. at the very end of a run.
+
+    The queue for the next batch is chosen as follows: the queue whose first observation has waited for
+    `max_wait` batches or more; otherwise, the queue with the oldest first observation among those that fill
+    a whole batch; otherwise, the longest queue. Hence, no session starves. With a single model, this is plain FIFO.
+
+    The sessions of a yielded batch are "in flight" until they have been stepped. By default, they are released
+    when the next batch is requested, that is, they must be stepped before (otherwise their observations are not
+    renewed yet and would be yielded again). With auto_release=False, the sessions stay in flight until they are
+    explicitly released, so that further batches can be requested while the responses for a batch are still
+    being generated (double-buffering). Then, when no session is ready but some are in flight, None is yielded
+    to signal that in-flight sessions must be stepped and released before there can be a next batch.
+
+    Optionally, observations can be resolved inline by `step_inline` when polled, e.g., the turns of programmatic
+    players. Such a session is stepped right away and polled again until it needs a turn of a generative model,
+    instead of waiting for a batch of its own.
+    """
+
+    def __init__(self, session_pool: GameSessionPool, *, collate_fn: Callable, batch_size: int,
+                 auto_release: bool = True, max_wait: int = 2,
+                 step_inline: Callable[[Tuple[int, Player, Dict]], bool] = None):
+        """
+        Args:
+            session_pool: The pool that provides the alive game sessions (and admits new ones).
+            collate_fn: Function used to merge a list of items into a single batch.
+            batch_size: Maximum number of items to include in each batch.
+            auto_release: Whether the sessions of a batch are released when the next batch is requested.
+                Otherwise, release() must be called for them after they have been stepped. Default: True.
+            max_wait: The number of batches (of other models) after which a ready observation is served,
+                even if its model's queue does not fill a whole batch. Default: 2.
+            step_inline: A function that may step the session of an observation right away instead of batching it.
+                Returns whether it did so. Default: None (all observations are batched).
+        """
+        self.session_pool = session_pool
+        self.collate_fn = collate_fn
+        self.batch_size = batch_size
+        self.auto_release = auto_release
+        self.max_wait = max_wait
+        self.step_inline = step_inline
+        self.in_flight = set()  # the ids of the sessions of yielded batches that have not been released yet
+        self.num_batches = 0
+
+    def release(self, session_ids: Iterable[int]):
+        """Mark the sessions as stepped, so that they are polled for their next observation again."""
+        self.in_flight.difference_update(session_ids)
+
+    def __iter__(self):
+        # the ready queues per model name with the observations of ready sessions (in order of becoming ready)
+        # together with the number of batches that were yielded before the session became ready
+        ready: Dict[str, deque] = {}
+        queued = set()  # the ids of the sessions in the ready queues
+        while True:
+            self.session_pool.refill(block=not queued and not self.in_flight)
+            while self._poll(ready, queued):  # exhausted sessions were removed, so there might be room for more
+                self.session_pool.refill(block=not queued and not self.in_flight)
+            if not queued:
+                if self.in_flight:
+                    yield None  # nothing to batch until the in-flight sessions have been stepped
+                    continue
+                if self.session_pool.is_exhausted:
+                    break
+                continue  # wait for sessions that are still being set up
+            queue = self._select_queue(ready)
+            batch_items = [queue.popleft()[1] for _ in range(min(self.batch_size, len(queue)))]
+            for session_id, _, _ in batch_items:
+                queued.discard(session_id)
+                self.in_flight.add(session_id)
+            self.num_batches += 1
+            yield self.collate_fn(batch_items)
+            if self.auto_release:
+                self.in_flight.clear()
+
+    def _select_queue(self, ready: Dict[str, deque]) -> deque:
+        """Choose the model queue to take the next batch from (see class description)."""
+        queues = [queue for queue in ready.values() if queue]
+        oldest = min(queues, key=lambda queue: queue[0][0])
+        if self.num_batches - oldest[0][0] >= self.max_wait:
+            return oldest
+        full_queues = [queue for queue in queues if len(queue) >= self.batch_size]
+        if full_queues:
+            return min(full_queues, key=lambda queue: queue[0][0])
+        return max(queues, key=lambda queue: (len(queue), -queue[0][0]))
+
+    def _poll(self, ready: Dict[str, deque], queued: set) -> bool:
+        """Append the observations of the sessions that became ready to the queues. Returns whether any were removed."""
+        removed = False
+        for session in self.session_pool:
+            if session.session_id in queued or session.session_id in self.in_flight:
+                continue  # the session is still waiting in a queue or for its response
+            observation = next(iter(session), None)
+            while observation is not None and self.step_inline is not None and self.step_inline(observation):
+                # the session has been stepped (or removed due to an error), so observe it again
+                observation = next(iter(session), None) if session.session_id in self.session_pool else None
+            if observation is None:  # the session is exhausted
+                self.session_pool.remove(session.session_id)
+                removed = True
+                continue
+            _, player, _ = observation
+            ready.setdefault(player.model.name, deque()).append((self.num_batches, observation))
+            queued.add(session.session_id)
+        return removed
+
+
 def run(game_benchmark: GameBenchmark,
         game_instances: GameInstances,
         player_models: List[BatchGenerativeModel],
         *,
         callbacks: GameBenchmarkCallbackList,
-        batch_size: int):
+        batch_size: int,
+        max_sessions: int = None,
+        setup_workers: int = 0,
+        pipelined: bool = True,
+        batch_size_tuner: BatchSizeTuner = None):
     """
     Executes a batchwise evaluation of the given game benchmark using one or more player models.
 
@@ -191,8 +501,9 @@ def run(game_benchmark: GameBenchmark,
 
     This function handles:
     - Validating that all player models support batch inference.
-    - Preparing game sessions for evaluation.
-    - Runs the game sessions, stepping through their progress using a round-robin scheduler.
+    - Lazily setting up a bounded window of game sessions (new ones are admitted as others finish).
+    - Runs the game sessions, stepping through their progress using a (fair) refill scheduler.
+    - Optionally steps the sessions of a batch while the responses for the next batch are generated.
     - Invokes callbacks on benchmark start/end and on game start/end.
 
     Args:
@@ -201,99 +512,168 @@ def run(game_benchmark: GameBenchmark,
         player_models: List of player models participating in the benchmark.
         callbacks: Callback list to notify about benchmark and game events.
         batch_size: The batch size to use for all player models.
+        max_sessions: The maximum number of game sessions alive at the same time. This bounds the memory
+            used for game masters, players and recorders. Default: None (twice the batch size when pipelined,
+            so that the next batch can be filled with sessions that are not in flight, otherwise the batch size).
+        setup_workers: The number of background threads that set up new game sessions while the models
+            generate. Default: 0 (setup between batches).
+        pipelined: Whether the responses are generated in a background thread, so that the game masters step
+            the sessions of the previous batch (and the callbacks write their files) while the model generates.
+            Only the background thread calls the models' generate_batch_response (one batch at a time) and only
+            the calling thread steps the sessions and invokes the callbacks. A session is never in both at the same
+            time, but the player models are shared across sessions: models that are not safe to call while the
+            game masters run (e.g. those that keep state between a generation and the next step) require
+            pipelined=False. Default: True.
+        batch_size_tuner: If given, the batch size is adapted to the memory usage after each batch
+            (see batch_tuning.BatchSizeTuner). The batch_size is then the largest batch size to use.
 
     Raises:
         AssertionError: If any model does not support batching.
+        RuntimeError: If not even a single game session could be set up.
     """
     # If not all support batching, then this doesn't help, because the models have to wait for the slowest one
     assert Model.all_support_batching(player_models), \
         "Not all player models support batching. Use the sequential runner instead."
 
     callbacks.on_benchmark_start(game_benchmark)
-    game_sessions = __prepare_game_sessions(game_benchmark, game_instances, player_models, callbacks,
-                                            verbose=True)
-    num_sessions = len(game_sessions)
-    if batch_size > num_sessions:
-        stdout_logger.info("Reduce batch_size=%s to number of game sessions %s", batch_size, num_sessions)
-    __run_game_sessions(game_sessions, min(batch_size, num_sessions))
+    num_instances = len(game_instances)
+    if batch_size > num_instances:
+        stdout_logger.info("Reduce batch_size=%s to number of game instances %s", batch_size, num_instances)
+    batch_size = max(min(batch_size, num_instances), 1)
+    max_sessions = max(max_sessions or (2 * batch_size if pipelined else batch_size), batch_size)
+    session_pool = GameSessionPool(
+        lambda session_id, row: GameSession.create(session_id, row, game_benchmark, player_models, callbacks),
+        game_instances,
+        max_sessions=max_sessions,
+        setup_workers=setup_workers
+    )
+    try:
+        __run_game_sessions(session_pool, batch_size, num_instances, pipelined=pipelined,
+                            batch_size_tuner=batch_size_tuner)
+    finally:
+        session_pool.close()
+    if session_pool.error_count > 0:
+        message = (f"{game_benchmark.game_name}: '{session_pool.error_count}' exceptions occurred: "
+                   f"See clembench.log for details.")
+        stdout_logger.error(message)
+    if session_pool.num_created == 0 and num_instances > 0:
+        message = f"{game_benchmark.game_name}: Could not prepare any game sessions. See clembench.log for details."
+        raise RuntimeError(message)
     callbacks.on_benchmark_end(game_benchmark)
 
 
-def __prepare_game_sessions(game_benchmark: GameBenchmark,
-                            game_instances: GameInstances,
-                            player_models: List[BatchGenerativeModel],
-                            callbacks: Optional[GameBenchmarkCallbackList] = None,
-                            verbose: bool = False):
+def run_interleaved(game_benchmarks: List[GameBenchmark],
+                    game_instances: List[GameInstances],
+                    player_models: List[BatchGenerativeModel],
+                    *,
+                    callbacks: GameBenchmarkCallbackList,
+                    batch_size: int,
+                    max_sessions: int = None,
+                    pipelined: bool = True):
     """
-    Prepare GameSession instances for each game instance in the benchmark.
-
-    Iterates over the game instances, creating GameMasterEnv objects and
-    corresponding GameSession wrappers.
+    Executes a batchwise evaluation of several game benchmarks at once using one or more player models.
 
-    Logs and counts exceptions, continuing with remaining instances on failure.
+    The game sessions of all games share a single window and a single stream of batches. Hence, the batches only
+    drain at the very end of the run instead of at the end of each game. The callbacks are still notified per game:
+    on_benchmark_start for all games before the first batch and on_benchmark_end for each game as soon as all
+    of its game sessions are done (so that the results are written to the game's own folders as usual).
 
     Args:
-        game_benchmark: The GameBenchmark providing game instances.
-        game_instances: The collection of game instances to iterate over.
-        player_models: List of player models to pass to the GameMasterEnv.
-        callbacks: Callback list to notify on game start.
-        verbose: Whether to show progress bar.
-
-    Returns:
-        List[GameSession]: The list of prepared game sessions.
+        game_benchmarks: The GameBenchmarks to run (with unique game names).
+        game_instances: The collections of game instances to be played, aligned with the game benchmarks.
+        player_models: List of player models participating in the benchmarks.
+        callbacks: Callback list to notify about benchmark and game events.
+        batch_size: The batch size to use for all player models.
+        max_sessions: The maximum number of game sessions alive at the same time.
+            Default: None (twice the batch size when pipelined, otherwise the batch size).
+        pipelined: Whether the sessions of a batch are stepped while the next batch is generated (see run for the
+            threads that call the models and the game masters). Default: True.
 
     Raises:
-        RuntimeError: If not even a single game session could be prepared.
+        AssertionError: If any model does not support batching.
+        RuntimeError: If not even a single game session could be set up.
     """
-    callbacks = callbacks or GameBenchmarkCallbackList()
-    error_count = 0
-    game_sessions: List[GameSession] = []
-    if verbose:
-        pbar = tqdm(total=len(game_instances), desc="Setup game instances", dynamic_ncols=True)
-    for session_id, row in enumerate(game_instances):
-        try:
-            game_instance = row["game_instance"]
-            game_env = GameMasterEnv(game_benchmark, callbacks=callbacks)
-            game_env.reset(options={
-                "player_models": player_models,
-                "experiment": row["experiment"],
-                "game_instance": game_instance
-            })
-            game_sessions.append(GameSession(session_id, game_env, game_instance))
-        except Exception:  # continue with other instances if something goes wrong
-            message = f"{game_benchmark.game_name}: Exception for instance {game_instance['game_id']} (but continue)"
-            module_logger.exception(message)
-            error_count += 1
-        if verbose:
-            pbar.update(1)
-    if verbose:
-        pbar.close()
-    if error_count > 0:
-        message = f"{game_benchmark.game_name}: '{error_count}' exceptions occurred: See clembench.log for details."
-        stdout_logger.error(message)
-    if len(game_sessions) == 0:
-        message = f"{game_benchmark.game_name}: Could not prepare any game sessions. See clembench.log for details."
-        raise RuntimeError(message)
-    return game_sessions
-
-
-def __run_game_sessions(game_sessions: List[GameSession], batch_size: int):
+    assert Model.all_support_batching(player_models), \
+        "Not all player models support batching. Use the sequential runner instead."
+    assert len(game_benchmarks) == len(game_instances), \
+        "There must be exactly one collection of game instances for each game benchmark"
+    game_benchmark_by_name = {game_benchmark.game_name: game_benchmark for game_benchmark in game_benchmarks}
+    assert len(game_benchmark_by_name) == len(game_benchmarks), "The game benchmarks must have unique game names"
+
+    for game_benchmark in game_benchmarks:
+        callbacks.on_benchmark_start(game_benchmark)
+    num_instances_by_game = {game_benchmark.game_name: len(instances)
+                             for game_benchmark, instances in zip(game_benchmarks, game_instances)}
+    num_instances = sum(num_instances_by_game.values())
+    batch_size = max(min(batch_size, num_instances), 1)
+    max_sessions = max(max_sessions or (2 * batch_size if pipelined else batch_size), batch_size)
+
+    # the games whose rows have all been issued: either len(instances) rows or fewer, if the instances stopped
+    # early (e.g. after an interrupt)
+    exhausted_games = {game_name for game_name, num in num_instances_by_game.items() if num == 0}
+    unfinished_games = list(game_benchmark_by_name)
+
+    def rows():
+        for game_benchmark, instances in zip(game_benchmarks, game_instances):
+            game_name = game_benchmark.game_name
+            for num_issued, row in enumerate(instances, start=1):
+                if num_issued == num_instances_by_game[game_name]:
+                    exhausted_games.add(game_name)
+                yield row
+            exhausted_games.add(game_name)
+
+    def create_session(session_id: int, row: Dict) -> GameSession:
+        game_benchmark = game_benchmark_by_name[row["game_name"]]
+        return GameSession.create(session_id, row, game_benchmark, player_models, callbacks)
+
+    session_pool = GameSessionPool(create_session, rows(), max_sessions=max_sessions)
+
+    def end_finished_games(all_done: bool = False):
+        with session_pool.lock:
+            alive_games = {session.game_env.game_benchmark.game_name
+                           for session in session_pool if not session.is_done}
+        for game_name in list(unfinished_games):
+            if not all_done and (game_name not in exhausted_games or game_name in alive_games):
+                continue
+            unfinished_games.remove(game_name)
+            callbacks.on_benchmark_end(game_benchmark_by_name[game_name])
+
+    end_finished_games()  # games without instances
+    try:
+        __run_game_sessions(session_pool, batch_size, num_instances, on_batch_stepped=end_finished_games,
+                            pipelined=pipelined)
+    finally:
+        session_pool.close()
+    if session_pool.error_count > 0:
+        stdout_logger.error(f"'{session_pool.error_count}' exceptions occurred: See clembench.log for details.")
+    if session_pool.num_created == 0 and num_instances > 0:
+        raise RuntimeError("Could not prepare any game sessions. See clembench.log for details.")
+    end_finished_games(all_done=True)  # e.g. games whose last sessions failed during setup
+
+
+def __run_game_sessions(session_pool: GameSessionPool, batch_size: int, num_instances: int,
+                        on_batch_stepped: Callable[[], None] = None, pipelined: bool = False,
+                        batch_size_tuner: BatchSizeTuner = None):
     """
-    Run multiple game sessions concurrently using a round-robin scheduler.
+    Run multiple game sessions concurrently using a refill scheduler that keeps the batches full.
 
     Processes batches of game observations, invokes Player.batch_response to generate
     model responses, and steps the GameMasterEnv with responses. Callbacks are handled
     internally by GameMasterEnv.step().
 
     Args:
-        game_sessions: List of active GameSession instances.
+        session_pool: The pool that provides the active GameSession instances.
         batch_size: The batch size to use for batching responses.
+        num_instances: The number of game instances to be played (for the progress bar).
+        on_batch_stepped: An optional function to be called after the sessions of each batch have been stepped.
+        pipelined: Whether to step the sessions of a batch while the responses for the next batch are generated.
+        batch_size_tuner: An optional tuner that adapts the batch size (up to batch_size) after each batch.
     """
     # Progress bar for completed games (known total)
-    pbar_instances = tqdm(total=len(game_sessions), desc="Completed game instances", dynamic_ncols=True)
+    pbar_instances = tqdm(total=num_instances, desc="Completed game instances", dynamic_ncols=True)
     # Progress bar for total steps (unknown total, so no 'total' arg)
     pbar_responses = tqdm(desc="Total responses", unit="response", dynamic_ncols=True)
-    # Progress bar for batch size (approaching one)
+    # Progress bar for batch size (stays full until fewer sessions than batch_size remain)
     pbar_batches = tqdm(bar_format="{desc}", dynamic_ncols=True)
 
     start_batch_size = batch_size
@@ -306,37 +686,126 @@ def __run_game_sessions(game_sessions: List[GameSession], batch_size: int):
             for v in values
         )
 
-    round_robin_scheduler = SinglePassGameSessionPoller(game_sessions)
-    data_loader = DynamicBatchDataLoader(
-        round_robin_scheduler,
+    def step_game_sessions(generate_responses: Callable[[], Dict[int, Tuple[Dict, str]]], session_ids: List[int]):
+        try:
+            context_response_by_session_id = generate_responses()
+            exception_by_session_id = {}
+        except BatchResponseError as e:  # continue with the sessions whose responses were generated
+            context_response_by_session_id = e.context_response_by_row_id
+            exception_by_session_id = e.exception_by_row_id
+        except Exception as e:  # continue with other sessions if something goes wrong
+            module_logger.exception(f"Exception while generating responses for game sessions {session_ids} "
+                                    f"(but continue)")
+            context_response_by_session_id = {}
+            exception_by_session_id = {sid: e for sid in session_ids}
+        # Use session_ids to map outputs back to game sessions for stepping
+        with session_pool.lock:
+            for sid, exception in exception_by_session_id.items():
+                module_logger.error(f"Abort game session {sid}, because its response could not be generated: "
+                                    f"{exception}")
+                session_pool[sid].abort(exception)
+                session_pool.remove(sid)
+                session_pool.error_count += 1
+            for sid, (context, response) in context_response_by_session_id.items():
+                session = session_pool[sid]
+                try:
+                    # Step the environment (callbacks are handled internally by GameMasterEnv.step)
+                    session.step(response)
+                except Exception:  # the env already notified the callbacks about the error
+                    module_logger.exception(f"Exception for game session {sid} (but continue)")
+                    session_pool.remove(sid)
+                    session_pool.error_count += 1
+                    continue
+                pbar_responses.update(1)
+                if session.is_done:
+                    pbar_instances.update(1)
+            if on_batch_stepped is not None:
+                on_batch_stepped()
+
+    def step_inline(observation: Tuple[int, Player, Dict]) -> bool:
+        # resolve the turns of programmatic players right away, so that their sessions do not wait for a batch
+        session_id, player, context = observation
+        if not player.model.responds_instantly():
+            return False
+        step_game_sessions(lambda: Player.batch_response([player], [context], row_ids=[session_id]), [session_id])
+        return True
+
+    data_loader = RefillBatchDataLoader(
+        session_pool,
         collate_fn=GameSession.collate_fn,
-        batch_size=batch_size
+        batch_size=batch_size,
+        auto_release=not pipelined,
+        step_inline=step_inline
     )
-    for batch in data_loader:
-        session_ids, batch_players, batch_contexts = batch
-
-        # Display batch_size
-        current_batch_size = len(session_ids)
-        batch_sizes.append(current_batch_size)
-        trend = scaled_sparkline(batch_sizes[-40:], max_val=start_batch_size)
-        pbar_batches.set_description_str(
-            f"Batch sizes: {trend} [start={start_batch_size}, "
-            f"current={current_batch_size}, "
-            f"mean={sum(batch_sizes) / len(batch_sizes):.2f}]"
-        )
-        pbar_batches.refresh()
-
-        # Apply batch to receive responses
-        context_response_by_session_id = Player.batch_response(batch_players, batch_contexts, row_ids=session_ids)
-
-        # Use session_ids to map outputs back to game sessions for stepping
-        for sid, (context, response) in context_response_by_session_id.items():
-            session = game_sessions[sid]  # assuming session_id is an index (see __prepare_game_sessions)
-            # Step the environment (callbacks are handled internally by GameMasterEnv.step)
-            session.game_env.step(response)
-            pbar_responses.update(1)
-            if session.is_done:
-                pbar_instances.update(1)
+    # The tuner observes the batches in the thread that generates them (right after the generation, so that it
+    # reads the memory usage of the batch), but the data loader is only changed by the main thread (that collects
+    # the batches). With pipelining, a new batch size thus applies from the second batch after the observed one.
+    tuner_lock = threading.Lock()
+
+    def apply_tuned_batch_size():
+        if batch_size_tuner is not None:
+            with tuner_lock:
+                data_loader.batch_size = min(batch_size_tuner.batch_size, batch_size)
+
+    apply_tuned_batch_size()
+
+    def generate_responses(batch_players: List[Player], batch_contexts: List[Dict], session_ids: List[int]):
+        if batch_size_tuner is None:
+            return Player.batch_response(batch_players, batch_contexts, row_ids=session_ids)
+        exception = None
+        try:
+            return Player.batch_response(batch_players, batch_contexts, row_ids=session_ids)
+        except Exception as e:
+            exception = e
+            raise
+        finally:
+            with tuner_lock:
+                batch_size_tuner.observe(len(session_ids), exception)
+
+    # With pipelining, the responses are generated by a background thread. While it generates the responses for
+    # batch k, the sessions of batch k-1 are stepped and the batch k+1 is collected from the sessions not in flight.
+    generator = ThreadPoolExecutor(1, thread_name_prefix="batch-generation") if pipelined else None
+    previous: Optional[Tuple[Future, List[int]]] = None  # the batch in flight (only when pipelined)
+
+    def step_previous_batch():
+        future, previous_session_ids = previous
+        step_game_sessions(future.result, previous_session_ids)
+        data_loader.release(previous_session_ids)
+        apply_tuned_batch_size()
+
+    try:
+        for batch in data_loader:
+            if batch is None:  # all ready sessions are in flight
+                step_previous_batch()
+                previous = None
+                continue
+            session_ids, batch_players, batch_contexts = batch
+
+            # Display batch_size
+            current_batch_size = len(session_ids)
+            batch_sizes.append(current_batch_size)
+            trend = scaled_sparkline(batch_sizes[-40:], max_val=start_batch_size)
+            pbar_batches.set_description_str(
+                f"Batch sizes: {trend} [start={start_batch_size}, "
+                f"current={current_batch_size}, "
+                f"mean={sum(batch_sizes) / len(batch_sizes):.2f}]"
+            )
+            pbar_batches.refresh()
+
+            # Apply batch to receive responses
+            if generator is None:
+                step_game_sessions(lambda: generate_responses(batch_players, batch_contexts, session_ids), session_ids)
+                apply_tuned_batch_size()
+                continue
+            future = generator.submit(generate_responses, batch_players, batch_contexts, session_ids)
+            if previous is not None:
+                step_previous_batch()  # while the current batch is generating
+            previous = (future, session_ids)
+        if previous is not None:
+            step_previous_batch()
+    finally:
+        if generator is not None:
+            generator.shutdown(wait=True, cancel_futures=True)
     pbar_instances.close()
     pbar_responses.close()
     pbar_batches.close()
@@ -11,8 +11,33 @@ Key concepts:
 
 The runner maintains a flat pool of active environments. At each step:
 - Every active environment is checked against the branching condition
-- If the condition is met, the environment is copied branching_factor times
-- Each copy is then stepped forward independently
+- If the condition is met, the environment is copied branching_factor - 1 times (the original is the last branch)
+- Each branch is then stepped forward independently
+
+Environments are only copied on an actual branch. The copies share what does not change during gameplay (the game
+benchmark, the game instance and the models) and the histories that are only appended to (the players' messages
+and the recorded events), so that the cost of a copy is proportional to the length of the histories and not to
+the size of their contents (see the __deepcopy__ methods of GameMasterEnv, GameMaster, Player and
+GameInteractionsRecorder).
+
+The responses for the active branches (of one or several game instances) are generated together: in batches for
+models that support batching and concurrently for models that support concurrent calls. Afterwards, each branch
+is stepped with its response.
+
+With N branches at each of M branching points, playing all N^M branches at the same time (breadth-first) needs
+memory for all of them, and their results are only written at the very end. The traversal policy and the maximum
+number of live branches bound this: the branches that exceed the limit are deferred (only their branching point
+is kept, the copies are made when the branches are started), so that
+- breadth-first (with max_branches) plays the tree level by level with a bounded frontier,
+- depth-first plays the most recent branching points first, so that finished trajectories are written steadily
+  and a tree is explored with memory for max_branches branches (and one parent per open branching point),
+- beam keeps only the max_branches best branches (according to a score_func) of each game instance after each step.
+The branches that finished (or failed) are released right away.
+
+Branches often reach identical contexts, e.g., with greedy decoding (temperature 0) every branch of a branching
+point receives the same response. With memoize=True, the responses of deterministic models (temperature 0) are
+memoized per game instance by the model and the full message history: identical contexts are generated only once
+and the other branches reuse the response. The hit rate is logged at the end of the run.
 
 Use cases:
 - Collecting multiple model responses for the same context
@@ -20,27 +45,37 @@ Use cases:
 - Generating diverse training data
 - Stochastic evaluation with repeated sampling
 """
+import hashlib
+import itertools
+import json
 import logging
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Tuple
 from copy import deepcopy
 
 from tqdm import tqdm
 
-from clemcore.backends import Model
-from clemcore.clemgame import GameBenchmarkCallbackList, GameInstances, GameBenchmark, GameSnapshot
+from clemcore.backends import Model, HumanModel
+from clemcore.clemgame import GameBenchmarkCallbackList, GameInstances, GameBenchmark, GameSnapshot, Player, \
+    BatchResponseError
 from clemcore.clemgame.envs.pettingzoo.master import GameMasterEnv
-from typing import Callable, TYPE_CHECKING
+from typing import Callable
 
 from clemcore.clemgame.master import GameState
 
-if TYPE_CHECKING:
-    from clemcore.clemgame.player import Player
-
 module_logger = logging.getLogger(__name__)
 stdout_logger = logging.getLogger("clemcore.run")
 
 # Type alias for branching condition callable
 BranchingCondition = Callable[..., bool]
+# Type alias for the score of a branch in beam traversal (higher is better)
+BranchScore = Callable[[GameMasterEnv], float]
+
+BREADTH_FIRST = "breadth"
+DEPTH_FIRST = "depth"
+BEAM = "beam"
+TRAVERSALS = [BREADTH_FIRST, DEPTH_FIRST, BEAM]
 
 
 def is_player_role(game_role: str) -> BranchingCondition:
@@ -127,6 +162,35 @@ def combined_condition(*conditions: BranchingCondition) -> BranchingCondition:
     return condition
 
 
+def validate_traversal(traversal: str, max_branches: Optional[int], score_func: Optional[BranchScore]):
+    """
+    Check that the traversal policy can be applied with the given maximum number of branches and score function.
+
+    Raises:
+        ValueError: If the traversal is unknown, max_branches is not positive or beam traversal misses
+            its beam width (max_branches) or score function.
+    """
+    if traversal not in TRAVERSALS:
+        raise ValueError(f"Unknown traversal '{traversal}', choose one of {TRAVERSALS}")
+    if max_branches is not None and max_branches < 1:
+        raise ValueError(f"max_branches must be at least 1, but is {max_branches}")
+    if traversal == BEAM and (max_branches is None or score_func is None):
+        raise ValueError("Beam traversal requires max_branches (the beam width) and a score_func")
+
+
+@dataclass
+class BranchingPoint:
+    """A branching point whose branches have not all been started yet (see BranchingRunner)."""
+    parent_env: GameMasterEnv
+    snapshot: GameSnapshot
+    remaining: int
+
+    def next_branch(self) -> GameMasterEnv:
+        """Start the next branch: a copy of the parent, which itself continues as the last branch."""
+        self.remaining -= 1
+        return deepcopy(self.parent_env) if self.remaining > 0 else self.parent_env
+
+
 def run(
         game_benchmark: GameBenchmark,
         game_instances: GameInstances,
@@ -136,7 +200,14 @@ def run(
         branching_factor: int = 1,
         branching_condition: Optional[BranchingCondition] = lambda **_: True,
         reward_func: Callable[[dict, str, GameState, dict], float] | None = None,
-        feedback_func: Callable[[dict, str, GameState, dict], str | None] | None = None
+        feedback_func: Callable[[dict, str, GameState, dict], str | None] | None = None,
+        max_instances: int = 1,
+        batch_size: int = None,
+        max_concurrency: int = 8,
+        traversal: str = BREADTH_FIRST,
+        max_branches: int = None,
+        score_func: Optional[BranchScore] = None,
+        memoize: bool = False
 ):
     """
     Run game instances with optional branching to explore multiple trajectories.
@@ -165,6 +236,19 @@ def run(
         feedback_func: an optional callable (observation, action, state, info) -> str | None to provide
             qualitative language feedback. When provided, the result is stored in info["turn_feedback"]
             and can be used by the training loop (e.g. as a verbal reward signal).
+        max_instances: The number of game instances whose branches are played at the same time,
+            so that their responses are generated together. Default: 1.
+        batch_size: The maximum number of responses per batch for models that support batching.
+            Default: None (the responses of all active branches are generated in a single batch).
+        max_concurrency: The maximum number of simultaneous calls to a model that supports concurrent calls.
+            Default: 8.
+        traversal: The order in which the branches are played: "breadth", "depth" or "beam" (see BranchingRunner).
+            Default: "breadth".
+        max_branches: The maximum number of live branches (the beam width for "beam"). The branches beyond the
+            limit are deferred. Default: None (unbounded; 1 for "depth").
+        score_func: A callable(env) -> float that scores a branch for "beam" traversal (higher is better).
+        memoize: Whether to reuse the responses of deterministic models (temperature 0) for identical contexts
+            of the branches of a game instance. Default: False.
     Returns:
         None. Results are saved via callbacks.
 
@@ -187,38 +271,64 @@ def run(
         # Custom condition using lambda
         run(...,  branching_factor=2, branching_condition=lambda player, **_: player.game_role == "Guesser")
 
+        # Explore a large tree depth-first with at most 4 live branches
+        run(..., branching_factor=4, traversal="depth", max_branches=4)
+
     Notes:
-        - With branching_factor=N and M branching points, you get N^M leaf branches
+        - With branching_factor=N and M branching points, you get N^M leaf branches (fewer with "beam")
         - Each leaf branch is a complete, independent game trajectory
-        - Branching creates deep copies of the game state, so branches don't interfere
+        - Branching creates copies of the game state, so branches don't interfere
+        - An error in a branch aborts only this branch (and not the other branches of the game instance)
         - Use **_ in lambda conditions to ignore unused parameters
     """
+    validate_traversal(traversal, max_branches, score_func)
     callbacks.on_benchmark_start(game_benchmark)
     error_count = 0
-    progress_bar = tqdm(game_instances, desc="Playing game instances")
-    for row in progress_bar:
+    memo_hits, memo_misses = 0, 0
+    progress_bar = tqdm(total=len(game_instances), desc="Playing game instances")
+    rows_iterator = iter(game_instances)
+    while rows := list(itertools.islice(rows_iterator, max(max_instances, 1))):
+        game_envs = []
+        for row in rows:
+            try:
+                game_env = GameMasterEnv(
+                    game_benchmark,
+                    callbacks=callbacks,
+                    reward_func=reward_func,
+                    feedback_func=feedback_func
+                )
+                game_env.reset(options={
+                    "player_models": player_models,
+                    "experiment": row["experiment"],
+                    "game_instance": row["game_instance"]
+                })
+                game_envs.append(game_env)
+            except Exception:
+                module_logger.exception(f"{game_benchmark.game_name}: Exception for instance "
+                                        f"{row['game_instance']['game_id']} (but continue)")
+                error_count += 1
+        for model in player_models:
+            model.reset()
         try:
-            game_env = GameMasterEnv(
-                game_benchmark,
-                callbacks=callbacks,
-                reward_func=reward_func,
-                feedback_func=feedback_func
-            )
-            game_env.reset(options={
-                "player_models": player_models,
-                "experiment": row["experiment"],
-                "game_instance": row["game_instance"]
-            })
-            for model in player_models:
-                model.reset()
-            runner = BranchingRunner(game_env, branching_factor, branching_condition, progress_bar=progress_bar)
+            runner = BranchingRunner(game_envs, branching_factor, branching_condition, progress_bar=progress_bar,
+                                     batch_size=batch_size, max_concurrency=max_concurrency,
+                                     traversal=traversal, max_branches=max_branches, score_func=score_func,
+                                     memoize=memoize)
             runner.run()
+            error_count += runner.error_count
+            memo_hits, memo_misses = memo_hits + runner.memo_hits, memo_misses + runner.memo_misses
         except Exception:
-            message = f"{game_benchmark.game_name}: Exception for instance {row['game_instance']['game_id']} (but continue)"
-            module_logger.exception(message)
+            game_ids = [game_env.game_instance["game_id"] for game_env in game_envs]
+            module_logger.exception(f"{game_benchmark.game_name}: Exception for instances {game_ids} (but continue)")
             error_count += 1
             for model in player_models:
                 model.reset()
+        progress_bar.update(len(rows))
+    progress_bar.close()
+    if memoize:
+        num_lookups = memo_hits + memo_misses
+        stdout_logger.info(f"{game_benchmark.game_name}: Reused {memo_hits} of {num_lookups} memoized responses "
+                           f"(hit rate: {memo_hits / num_lookups if num_lookups else 0.:.2f})")
     if error_count > 0:
         stdout_logger.error(
             f"{game_benchmark.game_name}: '{error_count}' exceptions occurred: See clembench.log for details.")
@@ -231,19 +341,38 @@ class BranchingRunner:
 
     This runner maintains a flat list of active game environments and processes them
     in parallel, creating new branches when the branching condition is met.
+    The runner can play the branches of several game instances (root environments) at the same time.
 
     At each iteration:
     1. Every active environment is checked against the branching condition
-    2. If the condition is met, the environment is deep-copied branching_factor times
-    3. Each copy is stepped forward independently
-    4. The resulting active environments form the pool for the next iteration
-    5. Continue until all environments have completed
+    2. If the condition is met, a branching point is added to the frontier and branches are started from the
+       frontier (as copies of the parent; the parent itself is the last branch) up to max_branches live branches
+    3. The responses for all branches are generated together (batched or concurrently, if the models support it);
+       the responses of the new branches of a branching point are sampled with a single call, if the model supports it
+    4. Each branch is stepped forward with its response
+    5. The resulting active environments form the pool for the next iteration (for "beam": the best of them)
+    6. Continue until all environments have completed and the frontier is empty
+
+    The traversal decides which branching point of the frontier is continued first: the oldest one for "breadth"
+    and "beam" and the most recent one for "depth".
 
     Attributes:
-        _root: The initial game environment
+        _root: The initial game environment (the first one, if several are given)
         branching_factor: Number of branches to create when condition is met
         branching_condition: Callable that determines when to branch
+        batch_size: The maximum number of responses per batch (None for all active branches)
+        max_concurrency: The maximum number of simultaneous calls to a model that supports concurrent calls
+        traversal: The traversal policy ("breadth", "depth" or "beam")
+        max_branches: The maximum number of live branches (None for unbounded); the beam width for "beam"
+        score_func: Callable that scores a branch for "beam" traversal
+        memoize: Whether to reuse the responses of deterministic models for identical contexts
+        error_count: The number of branches that were aborted by an error
+        pruned_count: The number of branches that were dropped by the beam
+        memo_hits: The number of responses that were reused (including identical contexts of the same step)
+        memo_misses: The number of responses that were generated and memoized
         _current_envs: List of currently active game environments
+        _frontier: The branching points whose branches have not all been started yet
+        _memo: The memoized responses by game instance, model and message history
 
     Example:
         runner = BranchingRunner(game_env, branching_factor=3, branching_condition=is_round(0))
@@ -253,17 +382,37 @@ class BranchingRunner:
 
     def __init__(
             self,
-            game_env: GameMasterEnv,
+            game_env: GameMasterEnv | List[GameMasterEnv],
             branching_factor: int = 1,
             branching_condition: Optional[BranchingCondition] = lambda **_: True,
-            progress_bar=None
+            progress_bar=None,
+            batch_size: int = None,
+            max_concurrency: int = 8,
+            traversal: str = BREADTH_FIRST,
+            max_branches: int = None,
+            score_func: Optional[BranchScore] = None,
+            memoize: bool = False
     ):
-        self._root = game_env
+        validate_traversal(traversal, max_branches, score_func)
+        game_envs = game_env if isinstance(game_env, list) else [game_env]
+        self._root = game_envs[0] if game_envs else None
         self.branching_factor = branching_factor
         self.branching_condition = branching_condition
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.traversal = traversal
+        self.max_branches = 1 if max_branches is None and traversal == DEPTH_FIRST else max_branches
+        self.score_func = score_func
+        self.memoize = memoize
+        self.error_count = 0
+        self.pruned_count = 0
+        self.memo_hits = 0
+        self.memo_misses = 0
 
         self._progress_bar = progress_bar
-        self._current_envs: list[GameMasterEnv] = [self._root]
+        self._current_envs: list[GameMasterEnv] = list(game_envs)
+        self._frontier: list[BranchingPoint] = []
+        self._memo: Dict[Tuple, str] = {}
 
     def should_branch(self, game_env):
         """
@@ -293,49 +442,110 @@ class BranchingRunner:
         )
 
     def run(self):
-        while self._current_envs:  # As long as we have remaining game envs to be played ...
+        while self._current_envs or self._frontier:  # As long as we have remaining branches to be played ...
             if self._progress_bar is not None:
-                self._progress_bar.set_postfix(branches=len(self._current_envs))
-            remaining_envs: list[GameMasterEnv] = []
-            for parent_env in self._current_envs:  # ... we iterate over all of them
+                self._progress_bar.set_postfix(branches=len(self._current_envs), deferred=self.num_deferred())
+            branch_envs: list[GameMasterEnv] = []
+            for parent_env in self._current_envs:  # ... we iterate over the live ones
+                if not self.should_branch(parent_env):
+                    branch_envs.append(parent_env)  # copy only on an actual branch
+                    continue
                 snapshot = GameSnapshot.create_from(parent_env.game_master)
-                branch_envs = []
-                if self.should_branch(parent_env):
-                    num_branches = self.branching_factor
-                    for _ in range(num_branches):
-                        branch_env = deepcopy(parent_env)
-                        branch_env.callbacks.on_branching_point(
-                            branch_env.game_master,
-                            branch_env.game_instance,
-                            snapshot
-                        )
-                        branch_envs.append(branch_env)
-                else:
-                    branch_envs.append(deepcopy(parent_env))
-                continued_branches = self._single_step_all(branch_envs)
-                remaining_envs.extend(continued_branches)
-            self._current_envs = remaining_envs
+                self._frontier.append(BranchingPoint(parent_env, snapshot, self.branching_factor))
+            sibling_groups = self._start_branches(branch_envs)
+            # step all branches together, so that their responses are generated together
+            self._current_envs = self._single_step_all(branch_envs, sibling_groups)
+            if self.traversal == BEAM:
+                self._current_envs = self._prune(self._current_envs)
         if self._progress_bar is not None:
-            self._progress_bar.set_postfix(branches=0)
+            self._progress_bar.set_postfix(branches=0, deferred=0)
+
+    def num_deferred(self) -> int:
+        """The number of branches that have not been started yet."""
+        return sum(branching_point.remaining for branching_point in self._frontier)
+
+    def _start_branches(self, branch_envs: list[GameMasterEnv]) -> list[list[GameMasterEnv]]:
+        """
+        Start branches from the frontier (and add them to branch_envs) until there are max_branches live branches.
+
+        The branches are copied only when they are started. Beam traversal starts all branches and prunes them
+        after the step (see _prune).
+
+        Returns:
+            The branches started together from the same branching point (the sibling groups).
+        """
+        sibling_groups = []
+        while self._frontier:
+            capacity = self.branching_factor
+            if self.max_branches is not None and self.traversal != BEAM:
+                capacity = self.max_branches - len(branch_envs)
+                if capacity <= 0:
+                    break
+            branching_point = self._frontier[-1] if self.traversal == DEPTH_FIRST else self._frontier[0]
+            siblings = [branching_point.next_branch() for _ in range(min(capacity, branching_point.remaining))]
+            if branching_point.remaining == 0:
+                self._frontier.remove(branching_point)
+            for branch_env in siblings:
+                branch_env.callbacks.on_branching_point(
+                    branch_env.game_master,
+                    branch_env.game_instance,
+                    branching_point.snapshot
+                )
+            branch_envs.extend(siblings)
+            sibling_groups.append(siblings)
+        return sibling_groups
+
+    def _prune(self, branch_envs: list[GameMasterEnv]) -> list[GameMasterEnv]:
+        """
+        Keep the max_branches best live branches of each game instance according to the score_func.
 
-    def _single_step_all(self, branch_envs: list[GameMasterEnv]) -> list[GameMasterEnv]:
+        Branches that are done (and only await their final step) are always kept.
+        """
+        live_by_instance: Dict[int, list[GameMasterEnv]] = {}
+        kept = []
+        for branch_env in branch_envs:
+            if self._is_done(branch_env):
+                kept.append(branch_env)
+            else:  # the copies of a branch share the game instance
+                live_by_instance.setdefault(id(branch_env.game_instance), []).append(branch_env)
+        for live_envs in live_by_instance.values():
+            ranked = sorted(live_envs, key=self.score_func, reverse=True)
+            kept.extend(ranked[:self.max_branches])
+            for branch_env in ranked[self.max_branches:]:
+                self.pruned_count += 1
+                branch_env.close()
+        kept_ids = {id(branch_env) for branch_env in kept}
+        return [branch_env for branch_env in branch_envs if id(branch_env) in kept_ids]  # keep the order
+
+    @staticmethod
+    def _is_done(branch_env: GameMasterEnv) -> bool:
+        agent_id = branch_env.agent_selection
+        return agent_id is None or branch_env.terminations.get(agent_id) or branch_env.truncations.get(agent_id)
+
+    def _single_step_all(self, branch_envs: list[GameMasterEnv],
+                         sibling_groups: list[list[GameMasterEnv]] = None) -> list[GameMasterEnv]:
         """
         Execute a single step for each branch environment.
 
-        For each environment, observes the current context and computes
-        a response via the active player. Terminal or truncated agents
-        receive a ``None`` action to allow final reward observation before
-        the environment is closed.
+        For each environment, observes the current context. The responses of the active players are
+        generated together for all branches (see _generate_responses) and then each branch is stepped
+        with its response. With memoize, the responses to contexts that have been seen before (or that are
+        identical within the step) are reused instead of being generated (see _memo_key). Terminal or
+        truncated agents receive a ``None`` action to allow final reward observation before the environment
+        is closed. A branch whose response or step fails is aborted.
 
         Args:
             branch_envs: List of game environments to step through.
+            sibling_groups: The branches that have just been created from the same parent, i.e.,
+                that respond to the same context (see _generate_responses).
 
         Returns:
             List of branch environments that are still active after the step.
             Environments whose ``agent_selection`` is ``None`` (terminal) are
             closed and excluded from the returned list.
         """
-        continued_branches: list[GameMasterEnv] = []
+        pending: list[Tuple[GameMasterEnv, Player, Dict]] = []
+        actions: list[Tuple[GameMasterEnv, str | None]] = []
         for branch_env in branch_envs:
             agent_id = branch_env.agent_selection
             if agent_id is None:  # This was a terminal branch (we can safely ignore it)
@@ -345,11 +555,154 @@ class BranchingRunner:
             if termination or truncation:
                 # None actions remove the agent from the game during step(None)
                 # This is essential to observe the final reward, e.g., for the describer, when the guesser wins
-                response = None
+                actions.append((branch_env, None))
             else:
-                player = branch_env.player_by_agent_id[agent_id]
-                response = player(context)
-            branch_env.step(response)
+                pending.append((branch_env, branch_env.player_by_agent_id[agent_id], context))
+        memo_keys = [self._memo_key(branch_env, player, context) for branch_env, player, context in pending]
+        generated: list[int] = []  # the indices of the pending responses that are generated
+        first_idx_by_key: Dict[Tuple, int] = {}
+        for idx, memo_key in enumerate(memo_keys):
+            if memo_key is None or (memo_key not in self._memo and memo_key not in first_idx_by_key):
+                generated.append(idx)
+                if memo_key is not None:
+                    first_idx_by_key[memo_key] = idx
+        generated_idx_by_env = {id(pending[idx][0]): position for position, idx in enumerate(generated)}
+        groups = [[generated_idx_by_env[id(branch_env)] for branch_env in sibling_group]
+                  for sibling_group in sibling_groups or []
+                  if all(id(branch_env) in generated_idx_by_env for branch_env in sibling_group)]
+        generated_responses = self._generate_responses([pending[idx][1:] for idx in generated], groups)
+        responses: list[str | Exception | None] = [None] * len(pending)
+        for idx, response in zip(generated, generated_responses):
+            responses[idx] = response
+            if memo_keys[idx] is not None and not isinstance(response, Exception):
+                self._memo[memo_keys[idx]] = response
+                self.memo_misses += 1
+        for idx, memo_key in enumerate(memo_keys):
+            if responses[idx] is not None:
+                continue
+            # a memoized response or the response to an identical context of this step (or its exception)
+            response = self._memo[memo_key] if memo_key in self._memo else responses[first_idx_by_key[memo_key]]
+            if not isinstance(response, Exception):
+                self._reuse_response(pending[idx][1], pending[idx][2], response)
+                self.memo_hits += 1
+            responses[idx] = response
+        for (branch_env, _, _), response in zip(pending, responses):
+            if isinstance(response, Exception):  # the env has not been notified yet (as it would be on step errors)
+                branch_env.callbacks.on_game_end(branch_env.game_master, branch_env.game_instance, response)
+                self._abort(branch_env, response)
+                continue
+            actions.append((branch_env, response))
+        continued_branches: list[GameMasterEnv] = []
+        for branch_env, response in actions:
+            try:
+                branch_env.step(response)
+            except Exception as e:  # the callbacks are notified by the env
+                self._abort(branch_env, e)
+                continue
             # If we made it to here, then the branch is to be continued (agent_id was not None)
             continued_branches.append(branch_env)
         return continued_branches
+
+    def _memo_key(self, branch_env: GameMasterEnv, player: Player, context: Dict) -> Optional[Tuple]:
+        """
+        The key of the memoized response to the context: the game instance, the model and the full message history.
+
+        Returns:
+            None, if memoize is off or the response is not deterministic, i.e., the model is programmatic, human
+            or samples with a temperature above zero.
+        """
+        model = player.model
+        if not self.memoize or model.responds_instantly() or isinstance(model, HumanModel) \
+                or model.gen_args.get("temperature") != 0:
+            return None
+        messages = json.dumps(player.get_perspective() + [context], sort_keys=True, default=str)
+        return id(branch_env.game_instance), model.name, hashlib.sha1(messages.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _reuse_response(player: Player, context: Dict, response: str):
+        """Let the player perceive the context and the memoized response as if it had generated the response."""
+        perspective = player.perceive_context(context)
+        response_object = dict(clem_player={"response": response, "model_name": player.model.name, "memoized": True})
+        player.perceive_response(response, metadata=dict(prompt=perspective, response_object=response_object))
+
+    def _generate_responses(self, inputs: List[Tuple[Player, Dict]],
+                            groups: List[List[int]] = None) -> List[str | Exception]:
+        """
+        Generate the responses of the players to their contexts.
+
+        The inputs of a group (the indices of sibling branches that respond to the same context) are sampled
+        with a single call via Player.sample_response, if their model supports sampling (see Model.generate_samples).
+        The inputs of models that support batching are generated via Player.batch_response (in batches of
+        up to batch_size), those of models that support concurrent calls in a thread pool and all others
+        (e.g. programmatic or human players) one after another.
+
+        Returns:
+            The response (or the exception raised while generating it) for each input.
+        """
+        responses: List[str | Exception | None] = [None] * len(inputs)
+
+        def respond(idx: int) -> str | Exception:
+            player, context = inputs[idx]
+            try:
+                return player(context)
+            except Exception as e:
+                return e
+
+        sampled = []
+        for group in groups or []:
+            model = inputs[group[0]][0].model
+            if len(group) > 1 and model.supports_sampling() and not model.responds_instantly():
+                sampled.append(group)
+        sampled_indices = {idx for group in sampled for idx in group}
+        for group in sampled:
+            try:
+                group_responses = Player.sample_response([inputs[idx][0] for idx in group], inputs[group[0]][1])
+            except Exception as e:
+                group_responses = [e] * len(group)
+            for idx, response in zip(group, group_responses):
+                responses[idx] = response
+
+        batched, concurrent, sequential = [], [], []
+        for idx, (player, _) in enumerate(inputs):
+            if idx in sampled_indices:
+                continue
+            model = player.model
+            if model.supports_batching() and not model.responds_instantly():
+                batched.append(idx)
+            elif model.supports_concurrency():
+                concurrent.append(idx)
+            else:
+                sequential.append(idx)
+        batch_size = self.batch_size or max(len(batched), 1)
+        for start in range(0, len(batched), batch_size):
+            row_ids = batched[start:start + batch_size]
+            try:
+                context_responses = Player.batch_response([inputs[idx][0] for idx in row_ids],
+                                                          [inputs[idx][1] for idx in row_ids],
+                                                          row_ids=row_ids)
+                exceptions = {}
+            except BatchResponseError as e:  # only some rows failed
+                context_responses, exceptions = e.context_response_by_row_id, e.exception_by_row_id
+            except Exception as e:
+                context_responses, exceptions = {}, {idx: e for idx in row_ids}
+            for idx, (_, response) in context_responses.items():
+                responses[idx] = response
+            for idx, exception in exceptions.items():
+                responses[idx] = exception
+        if len(concurrent) > 1:
+            with ThreadPoolExecutor(min(len(concurrent), max(self.max_concurrency, 1)),
+                                    thread_name_prefix="branch-generation") as executor:
+                for idx, response in zip(concurrent, executor.map(respond, concurrent)):
+                    responses[idx] = response
+        else:
+            sequential.extend(concurrent)
+        for idx in sequential:
+            responses[idx] = respond(idx)
+        return responses
+
+    def _abort(self, branch_env: GameMasterEnv, exception: Exception):
+        game_id = branch_env.game_instance["game_id"] if branch_env.game_instance else None
+        module_logger.error("Exception in a branch of instance %s (but continue with the other branches)",
+                            game_id, exc_info=exception)
+        self.error_count += 1
+        branch_env.close()
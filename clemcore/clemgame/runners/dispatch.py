@@ -3,6 +3,7 @@ from typing import List
 
 from clemcore.backends import Model, BatchGenerativeModel
 from clemcore.clemgame import GameBenchmark, GameBenchmarkCallbackList, GameInstances
+from clemcore.clemgame.runners.batch_tuning import BatchSizeTuner
 
 stdout_logger = logging.getLogger("clemcore.run")
 
@@ -12,23 +13,28 @@ def run(game_benchmark: GameBenchmark,
         player_models: List[Model | BatchGenerativeModel],
         *,
         callbacks: GameBenchmarkCallbackList = None,
-        batch_size: int = 1
+        batch_size: int = 1,
+        batch_size_tuner: BatchSizeTuner = None
         ):
     """
         The dispatch run method checks if batchwise processing is possible:
 
         - If (a) all models support batching and (b) batch size is >1, then will delegate to the batchwise runner.
+        - If (a) some models support batching or concurrent calls and (b) batch size is >1, then will delegate
+          to the hybrid runner, which batches the calls to the batching models and runs the others concurrently.
         - Otherwise, will delegate to the sequential runner.
 
         If you want to have more control over the runner selection, then invoke them directly.
 
-        Note: Slurk backends do not support batching, hence will run always sequentially (for now).
+        Note: Slurk and human backends cannot play multiple episodes at once, hence will run always sequentially.
     Args:
         game_benchmark: The game benchmark to run, that is, a factory to create the proper game master.
         game_instances: The collection of game instances to be played.
         player_models: A list of backends.Model instances to run the game with.
         callbacks: Callbacks to be invoked during the benchmark run.
         batch_size: The batch size to use (default: 1).
+        batch_size_tuner: An optional BatchSizeTuner that adapts the batch size during the run
+            (only applies to the batchwise runner).
     """
     callbacks = callbacks or GameBenchmarkCallbackList()
     if batch_size > 1 and Model.all_support_batching(player_models):
@@ -37,7 +43,17 @@ def run(game_benchmark: GameBenchmark,
                            game_benchmark.game_name,
                            ",".join(player_model.name for player_model in player_models),
                            batch_size)
-        batchwise.run(game_benchmark, game_instances, player_models, callbacks=callbacks, batch_size=batch_size)
+        batchwise.run(game_benchmark, game_instances, player_models, callbacks=callbacks, batch_size=batch_size,
+                      batch_size_tuner=batch_size_tuner)
+    elif batch_size > 1 and __benefits_from_hybrid(player_models):
+        from clemcore.clemgame.runners import hybrid  # lazy import
+        stdout_logger.info("Start hybrid runner for %s with models=[%s] (batch_size=%s, batching=%s, concurrent=%s)",
+                           game_benchmark.game_name,
+                           ",".join(player_model.name for player_model in player_models),
+                           batch_size,
+                           [model.supports_batching() for model in player_models],
+                           [model.supports_concurrency() for model in player_models])
+        hybrid.run(game_benchmark, game_instances, player_models, callbacks=callbacks, batch_size=batch_size)
     else:
         from clemcore.clemgame.runners import sequential  # lazy import
         if not Model.all_support_batching(player_models):
@@ -49,3 +65,9 @@ def run(game_benchmark: GameBenchmark,
                            ",".join(player_model.name for player_model in player_models),
                            batch_size)
         sequential.run(game_benchmark, game_instances, player_models, callbacks=callbacks)
+
+
+def __benefits_from_hybrid(player_models: List[Model]) -> bool:
+    from clemcore.clemgame.runners import hybrid  # lazy import
+    return hybrid.supports(player_models) and any(
+        player_model.supports_batching() or player_model.supports_concurrency() for player_model in player_models)
@@ -0,0 +1,370 @@
+"""
+Work-queue based runner for distributing game episodes across several worker processes or machines.
+
+A WorkQueue is a single SQLite file, e.g. located on shared storage, that holds one work item per
+(game, experiment, instance, model-pair). Worker processes lease items from the queue, keep their lease
+alive with heartbeats while playing the episode, and record completion (or failure) afterwards.
+
+Key properties:
+- **Load balancing**: Workers pull the next item as soon as they are free, so faster nodes simply play more episodes.
+- **Crash safety**: Leases of crashed workers expire and are handed out again, but completed items are never re-played.
+- **Standard layout**: Workers write into the usual results folder structure (via the callbacks given to the runner).
+
+Example:
+    clem enqueue -g taboo wordle -m llama3-8b -q /shared/sweep.sqlite
+    clem worker -q /shared/sweep.sqlite -r /shared/results  # on as many nodes as you like
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import closing, ExitStack
+from dataclasses import dataclass, replace
+from typing import List, Dict, Callable, Optional, Tuple
+
+from clemcore import backends
+from clemcore.backends import Model
+from clemcore.clemgame import GameBenchmark, GameBenchmarkCallbackList, GameInstances, GameRegistry, \
+    EpisodeCancelledError
+from clemcore.clemgame.envs.pettingzoo.master import GameMasterEnv
+from clemcore.clemgame.runners import sequential
+
+module_logger = logging.getLogger(__name__)
+stdout_logger = logging.getLogger("clemcore.run")
+
+PENDING = "pending"
+LEASED = "leased"
+COMPLETED = "completed"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_items (
+    item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    game_name TEXT NOT NULL,
+    experiment_name TEXT NOT NULL,
+    game_id INTEGER NOT NULL,
+    models TEXT NOT NULL,
+    gen_args TEXT NOT NULL,
+    instances_name TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker_id TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    message TEXT,
+    updated REAL,
+    UNIQUE (game_name, experiment_name, game_id, models, instances_name)
+)
+"""
+
+
+@dataclass(frozen=True)
+class WorkItem:
+    """A single episode to be played: one game instance of an experiment with a specific model pairing."""
+    item_id: int
+    game_name: str
+    experiment_name: str
+    game_id: int
+    models: Tuple[str, ...]
+    gen_args: Dict
+    instances_name: str
+    attempts: int = 0
+
+    def __str__(self):
+        return (f"WorkItem({self.item_id}: {self.game_name}/{self.experiment_name}/{self.game_id} "
+                f"with models={list(self.models)})")
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    A SQLite-backed queue of work items with leases.
+
+    Every operation opens its own short-lived connection, so that a WorkQueue can be shared
+    between threads (e.g. the heartbeat thread) and many processes on different machines.
+
+    Note: SQLite relies on file locking; for network file systems make sure that locking is supported.
+    """
+
+    def __init__(self, db_path: str | os.PathLike, *, lease_seconds: float = 600., max_attempts: int = 3):
+        """
+        Args:
+            db_path: The path to the SQLite file. Created when not existing.
+            lease_seconds: The time after which a lease expires, when it is not renewed by a heartbeat.
+            max_attempts: The number of leases per item after which an expired item is considered failed,
+                e.g., because it repeatedly crashed the workers.
+        """
+        self.db_path = str(db_path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with closing(self._connect()) as conn:
+            conn.execute(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: we control transactions explicitly (BEGIN IMMEDIATE for leases)
+        conn = sqlite3.connect(self.db_path, timeout=60., isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _to_item(row: sqlite3.Row) -> WorkItem:
+        return WorkItem(item_id=row["item_id"],
+                        game_name=row["game_name"],
+                        experiment_name=row["experiment_name"],
+                        game_id=row["game_id"],
+                        models=tuple(json.loads(row["models"])),
+                        gen_args=json.loads(row["gen_args"]),
+                        instances_name=row["instances_name"],
+                        attempts=row["attempts"])
+
+    def enqueue(self, game_instances: GameInstances, models: List[str], *,
+                gen_args: Dict, instances_name: str = "instances") -> int:
+        """
+        Add a work item for each game instance row to be played with the given model pairing.
+
+        Items that are already known to the queue (regardless of their status) are ignored,
+        so that enqueuing the same sweep twice does not re-play finished episodes.
+
+        Args:
+            game_instances: The game instance rows to be played.
+            models: The model selector strings (as given on the command line) of the pairing.
+            gen_args: The generation arguments to be used by the workers.
+            instances_name: The name of the instances file the rows are taken from.
+        Returns:
+            The number of newly added work items.
+        """
+        now = time.time()
+        models_json = json.dumps(list(models))
+        gen_args_json = json.dumps(gen_args, sort_keys=True)
+        values = [(row["game_name"], row["experiment"]["name"], int(row["game_instance"]["game_id"]),
+                   models_json, gen_args_json, instances_name, now) for row in game_instances]
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO work_items "
+                             "(game_name, experiment_name, game_id, models, gen_args, instances_name, updated) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)", values)
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+        return added
+
+    def lease(self, worker_id: str, *, prefer_models: Tuple[str, ...] = None,
+              prefer_game: str = None) -> Optional[WorkItem]:
+        """
+        Lease the next pending (or expired) work item to the given worker.
+
+        Args:
+            worker_id: The identifier of the worker that leases the item.
+            prefer_models: Prefer items with these models, so that workers avoid re-loading models.
+            prefer_game: Prefer items of this game, so that workers avoid loading further games.
+        Returns:
+            The leased work item or None if there is currently no item to lease.
+        """
+        now = time.time()
+        prefer_models_json = json.dumps(list(prefer_models)) if prefer_models else ""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")  # acquire the write lock, so that no other worker leases the same item
+            conn.execute("UPDATE work_items SET status = ?, message = ?, updated = ? "
+                         "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                         (FAILED, "Lease expired too often", now, LEASED, now, self.max_attempts))
+            row = conn.execute("SELECT * FROM work_items "
+                               "WHERE status = ? OR (status = ? AND lease_expires < ?) "
+                               "ORDER BY models = ? DESC, game_name = ? DESC, item_id LIMIT 1",
+                               (PENDING, LEASED, now, prefer_models_json, prefer_game or "")).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            if row["status"] == LEASED:
+                module_logger.warning("Re-lease expired item %s of worker %s", row["item_id"], row["worker_id"])
+            conn.execute("UPDATE work_items SET status = ?, worker_id = ?, lease_expires = ?, "
+                         "attempts = attempts + 1, updated = ? WHERE item_id = ?",
+                         (LEASED, worker_id, now + self.lease_seconds, now, row["item_id"]))
+            conn.execute("COMMIT")
+        return replace(self._to_item(row), attempts=row["attempts"] + 1)
+
+    def _update_leased(self, item: WorkItem, worker_id: str, sql: str, values: Tuple) -> bool:
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(sql + " WHERE item_id = ? AND worker_id = ? AND status = ?",
+                                  values + (item.item_id, worker_id, LEASED))
+            return cursor.rowcount == 1
+
+    def heartbeat(self, item: WorkItem, worker_id: str) -> bool:
+        """Renew the lease. Returns False if the lease was lost (e.g. expired and re-leased to another worker)."""
+        now = time.time()
+        return self._update_leased(item, worker_id, "UPDATE work_items SET lease_expires = ?, updated = ?",
+                                   (now + self.lease_seconds, now))
+
+    def complete(self, item: WorkItem, worker_id: str) -> bool:
+        """Mark the item as completed. Returns False if the lease was lost in the meantime."""
+        return self._update_leased(item, worker_id, "UPDATE work_items SET status = ?, message = NULL, updated = ?",
+                                   (COMPLETED, time.time()))
+
+    def fail(self, item: WorkItem, worker_id: str, message: str) -> bool:
+        """Mark the item as failed. Returns False if the lease was lost in the meantime."""
+        return self._update_leased(item, worker_id, "UPDATE work_items SET status = ?, message = ?, updated = ?",
+                                   (FAILED, message, time.time()))
+
+    def reset_failed(self) -> int:
+        """Put all failed items back into the queue. Returns the number of affected items."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute("UPDATE work_items SET status = ?, attempts = 0, worker_id = NULL, "
+                                  "lease_expires = NULL, updated = ? WHERE status = ?",
+                                  (PENDING, time.time(), FAILED))
+            return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Returns the number of work items by status."""
+        counts = {PENDING: 0, LEASED: 0, COMPLETED: 0, FAILED: 0}
+        with closing(self._connect()) as conn:
+            for row in conn.execute("SELECT status, COUNT(*) AS num_items FROM work_items GROUP BY status"):
+                counts[row["status"]] = row["num_items"]
+        return counts
+
+    def has_open_items(self) -> bool:
+        """Whether there are still pending or leased items, i.e., items that might become available to lease."""
+        counts = self.counts()
+        return counts[PENDING] + counts[LEASED] > 0
+
+
+class LeaseHeartbeat:
+    """
+    Context manager that renews the lease of a work item in a background thread while the episode is played.
+
+    When the lease is lost, e.g., because it expired and the item has been re-leased to another worker,
+    lease_lost is set, so that the episode can be aborted before its results are written.
+    """
+
+    def __init__(self, work_queue: WorkQueue, item: WorkItem, worker_id: str, interval: float = None):
+        self.work_queue = work_queue
+        self.item = item
+        self.worker_id = worker_id
+        self.interval = interval or max(work_queue.lease_seconds / 3, 1.)
+        self.lease_lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"heartbeat-{item.item_id}", daemon=True)
+
+    def _beat(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.work_queue.heartbeat(self.item, self.worker_id):
+                    module_logger.warning("Lost lease for %s", self.item)
+                    self.lease_lost.set()
+                    return
+            except sqlite3.Error:  # e.g. the shared file is temporarily locked; retry with the next beat
+                module_logger.exception("Heartbeat failed for %s (but continue)", self.item)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def run(work_queue: WorkQueue,
+        *,
+        create_callbacks: Callable[[List[Model]], GameBenchmarkCallbackList],
+        worker_id: str = None,
+        load_models: Callable[[List[backends.ModelSpec], Dict], List[Model]] = backends.load_models,
+        max_items: int = None,
+        poll_seconds: float = None):
+    """
+    Run a worker that leases work items from the queue and plays them one after another.
+
+    The worker keeps the models of the current pairing and all game benchmarks it has seen loaded,
+    and prefers items that can be played with them. The benchmark callbacks are notified once per
+    game and model pairing: on_benchmark_start when the first item is played, on_benchmark_end when the worker stops.
+
+    Args:
+        work_queue: The queue to lease work items from.
+        create_callbacks: A factory for the callbacks (e.g. the results file savers) given the loaded player models.
+        worker_id: The identifier of this worker. Defaults to hostname and process id.
+        load_models: A function to load the models from the model specs and generation arguments.
+        max_items: The maximum number of items to play before stopping. Default: None (until the queue is drained).
+        poll_seconds: When given, keep polling in this interval while other workers hold leases,
+            so that expired leases of crashed workers are picked up. Otherwise, stop when no item is pending.
+    Returns:
+        The number of items completed by this worker.
+    """
+    worker_id = worker_id or default_worker_id()
+    game_registry = GameRegistry.from_directories_and_cwd_files()
+    models_key, player_models, callbacks, game_name = None, None, None, None
+    game_benchmarks: Dict[Tuple[str, str], GameBenchmark] = {}
+    game_instances: Dict[Tuple[str, str], GameInstances] = {}
+    started: List[Tuple[GameBenchmarkCallbackList, GameBenchmark]] = []
+    num_completed, num_played = 0, 0
+    stdout_logger.info("Start worker %s on %s (%s)", worker_id, work_queue.db_path, work_queue.counts())
+    with ExitStack() as stack:
+        while max_items is None or num_played < max_items:
+            item = work_queue.lease(worker_id, prefer_models=models_key, prefer_game=game_name)
+            if item is None:
+                if poll_seconds is not None and work_queue.has_open_items():
+                    time.sleep(poll_seconds)
+                    continue
+                break
+            num_played += 1
+            game_name = item.game_name
+            try:
+                if item.models != models_key:
+                    __end_benchmarks(started)
+                    for model in player_models or []:  # release the weights of local models
+                        model.unload()
+                    models_key, player_models = None, None
+                    player_models = load_models(backends.ModelSpec.from_strings(list(item.models)), item.gen_args)
+                    models_key, callbacks = item.models, create_callbacks(player_models)
+                game_key = (item.game_name, item.instances_name)
+                if game_key not in game_benchmarks:
+                    game_spec = game_registry.get_game_specs_that_unify_with(item.game_name)[0]
+                    game_spec.instances = item.instances_name
+                    game_benchmarks[game_key] = stack.enter_context(GameBenchmark.load_from_spec(game_spec))
+                    game_instances[game_key] = GameInstances.from_game_spec(game_spec)
+                game_benchmark = game_benchmarks[game_key]
+                if not any(c is callbacks and b is game_benchmark for c, b in started):
+                    callbacks.on_benchmark_start(game_benchmark)
+                    started.append((callbacks, game_benchmark))
+                row = __find_row(game_instances[game_key], item)
+                game_env = GameMasterEnv(game_benchmark, callbacks=callbacks)
+                try:
+                    with LeaseHeartbeat(work_queue, item, worker_id) as heartbeat:
+                        finished = sequential.run_episode(game_env, row, player_models,
+                                                          is_aborted=heartbeat.lease_lost.is_set)
+                    if not finished:  # release the callbacks' state of the episode (without writing results)
+                        game_env.abort(EpisodeCancelledError(f"The lease of {item} was lost"))
+                finally:
+                    game_env.close()
+                if heartbeat.lease_lost.is_set():  # another worker plays the item (and writes its results)
+                    module_logger.warning("Abort %s on worker %s: the lease was lost", item, worker_id)
+                    continue
+                if work_queue.complete(item, worker_id):
+                    num_completed += 1
+            except Exception as e:  # continue with other items if something goes wrong
+                module_logger.exception("%s failed on worker %s (but continue)", item, worker_id)
+                try:
+                    work_queue.fail(item, worker_id, f"{type(e).__name__}: {e}")
+                except sqlite3.Error:  # e.g. the shared file is locked; the lease expires and the item is re-leased
+                    module_logger.exception("Cannot mark %s as failed (but continue)", item)
+                for model in player_models or []:
+                    model.reset()
+        __end_benchmarks(started)
+    stdout_logger.info("Stop worker %s after %s completed items (%s)", worker_id, num_completed, work_queue.counts())
+    return num_completed
+
+
+def __find_row(game_instances: GameInstances, item: WorkItem) -> Dict:
+    for row in game_instances:
+        if row["experiment"]["name"] == item.experiment_name and int(row["game_instance"]["game_id"]) == item.game_id:
+            return row
+    raise ValueError(f"Instance not found for {item}")
+
+
+def __end_benchmarks(started: List[Tuple[GameBenchmarkCallbackList, GameBenchmark]]):
+    for callbacks, game_benchmark in started:
+        callbacks.on_benchmark_end(game_benchmark)
+    started.clear()
@@ -0,0 +1,225 @@
+import logging
+import math
+import random
+import statistics
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Dict, Optional, Iterator, Callable, Iterable
+
+from clemcore.backends import Model
+from clemcore.clemgame import (
+    GameBenchmark,
+    GameBenchmarkCallback,
+    GameBenchmarkCallbackList,
+    GameInstances,
+    GameInteractionsRecorder
+)
+from clemcore.clemgame.metrics import BENCH_SCORE, METRIC_ABORTED, KEY_EPISODE_SCORES
+from clemcore.clemgame.resources import store_json
+from clemcore.clemgame.runners import dispatch
+from clemcore.clemgame.runners.batch_tuning import BatchSizeTuner
+
+module_logger = logging.getLogger(__name__)
+stdout_logger = logging.getLogger("clemcore.run")
+
+EARLY_STOPPING_FILE_NAME = "early_stopping.json"
+
+
+def confidence_interval(values: List[float], confidence: float) -> Optional[float]:
+    """
+    The half-width of the (normal approximation) confidence interval of the mean of the given values.
+
+    Returns:
+        None, if there are less than two values. Otherwise, the half-width, e.g., 4.2 for mean ± 4.2.
+    """
+    if len(values) < 2:
+        return None
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    return z * statistics.stdev(values) / math.sqrt(len(values))
+
+
+class RunningScores(GameBenchmarkCallback):
+    """
+    Scores each episode as soon as it ends (with the game's GameScorer) and keeps the scores per experiment.
+
+    The callback registers its own interactions recorder at game start, so that it does not depend on
+    other callbacks (or files) to obtain the interactions to score.
+    """
+
+    def __init__(self, game_benchmark: GameBenchmark):
+        self.game_benchmark = game_benchmark
+        self.main_scores: Dict[str, List[float]] = defaultdict(list)  # without aborted episodes (nan)
+        self.played: Dict[str, List[float]] = defaultdict(list)  # 100 for played, 0 for aborted episodes
+        self._recorders: Dict[tuple, GameInteractionsRecorder] = {}
+
+    def on_game_start(self, game_master, game_instance: Dict):
+        key = (game_master.experiment["name"], game_instance["game_id"])
+        game_recorder = GameInteractionsRecorder(self.game_benchmark.game_name, key[0], key[1], "", {})
+        for player in game_master.get_players():  # some scorers look up the players
+            game_recorder.log_player(player.name, player.game_role, player.model.name)
+        game_master.register(game_recorder)
+        self._recorders[key] = game_recorder
+
+    def on_game_end(self, game_master, game_instance: Dict, exception: Exception = None, rewards=None):
+        key = (game_master.experiment["name"], game_instance["game_id"])
+        game_recorder = self._recorders.pop(key, None)
+        if exception is not None or game_recorder is None:
+            return
+        try:
+            game_scorer = self.game_benchmark.create_game_scorer(game_master.experiment, game_instance)
+            game_scorer.compute_scores(game_recorder.interactions)
+            episode_scores = game_scorer.scores[KEY_EPISODE_SCORES]
+        except Exception:  # continue without this episode's scores
+            module_logger.exception(f"{self.game_benchmark.game_name}: Cannot score episode {key} (but continue)")
+            return
+        experiment_name = key[0]
+        self.played[experiment_name].append(0. if episode_scores[METRIC_ABORTED] else 100.)
+        main_score = episode_scores.get(BENCH_SCORE)
+        if main_score is not None and not math.isnan(main_score):
+            self.main_scores[experiment_name].append(float(main_score))
+
+    def precision(self, experiment_name: str, confidence: float) -> Dict:
+        main_scores, played = self.main_scores[experiment_name], self.played[experiment_name]
+        return {
+            "episodes": len(played),
+            "main_score": statistics.mean(main_scores) if main_scores else None,
+            "main_score_ci": confidence_interval(main_scores, confidence),
+            "played": statistics.mean(played) if played else None,
+            "played_ci": confidence_interval(played, confidence)
+        }
+
+
+class EarlyStoppingInstances:
+    """
+    Game instances in randomized order per experiment that stop to provide an experiment's rows once its
+    scores converged, that is, the confidence intervals of the main score and of % played are within a tolerance.
+
+    The experiments are visited in turns (one row at a time), so that all experiments progress at the same pace.
+    The runners pull the rows lazily, hence, an experiment is stopped as soon as the scores of the episodes
+    played so far converged (episodes already in progress are still played to the end).
+    """
+
+    def __init__(self,
+                 game_instances: GameInstances,
+                 running_scores: RunningScores,
+                 *,
+                 tolerance: float,
+                 confidence: float = .95,
+                 min_episodes: int = 5,
+                 seed: int = None):
+        """
+        Args:
+            game_instances: The game instances to sample from.
+            running_scores: The scores of the episodes played so far.
+            tolerance: The maximum half-width of the confidence intervals (in score points, e.g., 5 for ± 5).
+            confidence: The confidence level of the intervals. Default: 0.95.
+            min_episodes: The minimum number of scored episodes per experiment before stopping it. Default: 5.
+            seed: The seed for the randomized order of the instances (per experiment). Default: None.
+        """
+        self.game_instances = game_instances
+        self.running_scores = running_scores
+        self.tolerance = tolerance
+        self.confidence = confidence
+        self.min_episodes = max(min_episodes, 2)
+        self.rows_by_experiment: Dict[str, List[Dict]] = defaultdict(list)
+        for row in game_instances:
+            self.rows_by_experiment[row["experiment"]["name"]].append(row)
+        rng = random.Random(seed)
+        for rows in self.rows_by_experiment.values():
+            rng.shuffle(rows)
+        self.num_started: Dict[str, int] = defaultdict(int)
+
+    def __len__(self):
+        return len(self.game_instances)
+
+    def is_converged(self, experiment_name: str) -> bool:
+        precision = self.running_scores.precision(experiment_name, self.confidence)
+        if precision["episodes"] < self.min_episodes or precision["played_ci"] > self.tolerance:
+            return False
+        if len(self.running_scores.main_scores[experiment_name]) < self.min_episodes:
+            return precision["played"] == 0.  # there might be no main scores, because all episodes are aborted
+        return precision["main_score_ci"] <= self.tolerance
+
+    def __iter__(self) -> Iterator[Dict]:
+        row_iters = {name: iter(rows) for name, rows in self.rows_by_experiment.items()}
+        while row_iters:
+            for experiment_name in list(row_iters):
+                if self.is_converged(experiment_name):
+                    stdout_logger.info("Stop experiment %s after %s episodes: scores converged",
+                                       experiment_name, self.num_started[experiment_name])
+                    del row_iters[experiment_name]
+                    continue
+                row = next(row_iters[experiment_name], None)
+                if row is None:
+                    del row_iters[experiment_name]
+                    continue
+                self.num_started[experiment_name] += 1
+                yield row
+
+    def to_report(self) -> Dict:
+        """The achieved precision and the number of played and available episodes per experiment."""
+        report = {}
+        for experiment_name, rows in self.rows_by_experiment.items():
+            precision = self.running_scores.precision(experiment_name, self.confidence)
+            report[experiment_name] = dict(precision,
+                                           instances=len(rows),
+                                           started=self.num_started[experiment_name],
+                                           converged=self.is_converged(experiment_name))
+        return {"tolerance": self.tolerance, "confidence": self.confidence, "min_episodes": self.min_episodes,
+                "experiments": report}
+
+
+def run(game_benchmark: GameBenchmark,
+        game_instances: GameInstances,
+        player_models: List[Model],
+        *,
+        callbacks: GameBenchmarkCallbackList = None,
+        batch_size: int = 1,
+        batch_size_tuner: BatchSizeTuner = None,
+        tolerance: float,
+        confidence: float = .95,
+        min_episodes: int = 5,
+        seed: int = None,
+        report_dir_path: Path = None,
+        wrap_instances: Callable[[Iterable[Dict]], Iterable[Dict]] = None) -> Dict:
+    """
+    Plays the game instances of each experiment in randomized order until the scores of the experiment converged.
+
+    An experiment is stopped once the confidence intervals of its main score and of % played (computed from the
+    GameScorer's episode scores of the episodes played so far) are narrower than the tolerance. The episodes are
+    played by the runner selected by dispatch.run (with a batch size > 1, the sessions in progress are finished
+    after convergence, so that slightly more episodes than necessary might be played).
+
+    Args:
+        game_benchmark: The game benchmark to run.
+        game_instances: The collection of game instances to sample from.
+        player_models: A list of backends.Model instances to run the game with.
+        callbacks: Callbacks to be invoked during the benchmark run.
+        batch_size: The batch size to use (default: 1).
+        batch_size_tuner: If given, adapts the batch size to the memory usage (see dispatch.run).
+        tolerance: The maximum half-width of the confidence intervals (in score points, e.g., 5 for ± 5).
+        confidence: The confidence level of the intervals. Default: 0.95.
+        min_episodes: The minimum number of scored episodes per experiment before stopping it. Default: 5.
+        seed: The seed for the randomized order of the instances. Default: None.
+        report_dir_path: If given, the achieved precision is stored as early_stopping.json in this directory.
+        wrap_instances: If given, applied to the randomized instances before they are passed to the runner,
+            e.g., to stop providing rows on an interrupt.
+
+    Returns:
+        The report of the achieved precision per experiment.
+    """
+    running_scores = RunningScores(game_benchmark)
+    callbacks = GameBenchmarkCallbackList(list(callbacks.callbacks) if callbacks else [])
+    callbacks.append(running_scores)
+    sampled_instances = EarlyStoppingInstances(game_instances, running_scores, tolerance=tolerance,
+                                               confidence=confidence, min_episodes=min_episodes, seed=seed)
+    runner_instances = wrap_instances(sampled_instances) if wrap_instances else sampled_instances
+    dispatch.run(game_benchmark, runner_instances, player_models, callbacks=callbacks, batch_size=batch_size,
+                 batch_size_tuner=batch_size_tuner)
+    report = sampled_instances.to_report()
+    num_started = sum(experiment["started"] for experiment in report["experiments"].values())
+    stdout_logger.info("%s: Played %s of %s instances with early stopping (tolerance=%s)",
+                       game_benchmark.game_name, num_started, len(game_instances), tolerance)
+    if report_dir_path is not None:
+        store_json(report, EARLY_STOPPING_FILE_NAME, report_dir_path)
+    return report
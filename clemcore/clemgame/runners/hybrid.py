@@ -0,0 +1,232 @@
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import List, Dict, Tuple
+
+from tqdm import tqdm
+
+from clemcore.backends import Model
+from clemcore.clemgame import (
+    GameBenchmark,
+    GameBenchmarkCallbackList,
+    Player,
+    GameInstances,
+    BatchResponseError
+)
+from clemcore.clemgame.runners.batchwise import GameSession, GameSessionPool
+
+module_logger = logging.getLogger(__name__)
+stdout_logger = logging.getLogger("clemcore.run")
+
+
+class ModelLane:
+    """
+    Executes the response generation for all players that share a model (identified by its name).
+
+    A lane of a batching model runs one batch at a time (via Player.batch_response) with up to `batch_size`
+    observations. All other lanes run single calls (via Player.__call__) with up to `max_concurrency` calls
+    at the same time, if the model supports concurrent calls, and otherwise one call at a time.
+
+    Each lane has its own worker threads, so that a slow lane (e.g. a remote API) does not hold back the others.
+    """
+
+    def __init__(self, model: Model, *, batch_size: int, max_concurrency: int):
+        """
+        Args:
+            model: The model that generates the responses for the observations routed to this lane.
+            batch_size: The maximum number of observations per batch (only used for batching models).
+            max_concurrency: The maximum number of simultaneous single calls (only used for concurrent models).
+        """
+        self.model = model
+        self.is_batched = model.supports_batching()
+        self.batch_size = batch_size if self.is_batched else 1
+        self.capacity = max_concurrency if not self.is_batched and model.supports_concurrency() else 1
+        self.pending: deque = deque()  # observations waiting for a free slot (in order of arrival)
+        self.num_running = 0
+        self._executor = ThreadPoolExecutor(self.capacity, thread_name_prefix=f"lane-{model.name}")
+
+    def __repr__(self):
+        kind = f"batched({self.batch_size})" if self.is_batched else f"concurrent({self.capacity})"
+        return f"ModelLane({self.model.name}, {kind})"
+
+    def submit_pending(self) -> List[Tuple[Future, List[int]]]:
+        """
+        Start as many calls for pending observations as there are free slots.
+
+        Returns:
+            The futures of the started calls together with the session ids they respond to. Each future results
+            in a mapping from session ids to the context and response (like Player.batch_response).
+        """
+        submitted = []
+        while self.pending and self.num_running < self.capacity:
+            items = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+            session_ids, players, contexts = GameSession.collate_fn(items)
+            if self.is_batched:
+                future = self._executor.submit(Player.batch_response, players, contexts, row_ids=session_ids)
+            else:
+                future = self._executor.submit(ModelLane._respond, session_ids[0], players[0], contexts[0])
+            self.num_running += 1
+            submitted.append((future, session_ids))
+        return submitted
+
+    @staticmethod
+    def _respond(session_id: int, player: Player, context: Dict) -> Dict[int, Tuple[Dict, str]]:
+        return {session_id: (context, player(context))}
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def supports(player_models: List[Model]) -> bool:
+    """
+    Check if the hybrid runner can play with the given models.
+
+    The runner cannot handle models that must be reset in between episodes (slurk) or
+    that wait for console input (human), because it plays many episodes at the same time.
+    """
+    for player_model in player_models:
+        model_spec = player_model.model_spec
+        if model_spec.is_human() or (model_spec.has_backend() and model_spec.backend == "slurk"):
+            return False
+    return True
+
+
+def run(game_benchmark: GameBenchmark,
+        game_instances: GameInstances,
+        player_models: List[Model],
+        *,
+        callbacks: GameBenchmarkCallbackList,
+        batch_size: int,
+        max_sessions: int = None,
+        max_concurrency: int = None):
+    """
+    Executes an evaluation of the given game benchmark with a mix of batching and non-batching player models.
+
+    Each pending observation is routed to the execution lane of the model that has to respond to it:
+    batching models respond to batches of observations, while all other models respond to single observations
+    (concurrently, if they support it). A game session is stepped as soon as its own call returns, so that the
+    sessions waiting for a fast lane do not wait for the slow lanes.
+
+    Args:
+        game_benchmark: The GameBenchmark to run.
+        game_instances: The collection of game instances to be played.
+        player_models: List of player models participating in the benchmark.
+        callbacks: Callback list to notify about benchmark and game events.
+        batch_size: The maximum batch size for batching models.
+        max_sessions: The maximum number of game sessions alive at the same time.
+            Default: None (the batch size times the number of player models).
+        max_concurrency: The maximum number of simultaneous calls to a model that supports concurrent calls.
+            Default: None (the batch size).
+
+    Raises:
+        AssertionError: If any model cannot be used by this runner (see `supports`).
+        RuntimeError: If not even a single game session could be set up.
+    """
+    assert supports(player_models), \
+        "Human and slurk models cannot play multiple episodes at once. Use the sequential runner instead."
+
+    callbacks.on_benchmark_start(game_benchmark)
+    num_instances = len(game_instances)
+    batch_size = max(min(batch_size, num_instances), 1)
+    num_models = len({player_model.name for player_model in player_models})
+    max_sessions = max(max_sessions or batch_size * num_models, 1)
+    session_pool = GameSessionPool(
+        lambda session_id, row: GameSession.create(session_id, row, game_benchmark, player_models, callbacks),
+        game_instances,
+        max_sessions=max_sessions
+    )
+    try:
+        __run_game_sessions(session_pool, batch_size, max_concurrency or batch_size, num_instances)
+    finally:
+        session_pool.close()
+    if session_pool.error_count > 0:
+        message = (f"{game_benchmark.game_name}: '{session_pool.error_count}' exceptions occurred: "
+                   f"See clembench.log for details.")
+        stdout_logger.error(message)
+    if session_pool.num_created == 0 and num_instances > 0:
+        message = f"{game_benchmark.game_name}: Could not prepare any game sessions. See clembench.log for details."
+        raise RuntimeError(message)
+    callbacks.on_benchmark_end(game_benchmark)
+
+
+def __run_game_sessions(session_pool: GameSessionPool, batch_size: int, max_concurrency: int, num_instances: int):
+    """
+    Route the observations of the alive sessions to the model lanes and step each session when its response arrives.
+
+    Only the calling thread steps the game sessions, so that the callbacks are never notified concurrently.
+    An error during response generation aborts the affected sessions, while the others continue.
+    """
+    pbar_instances = tqdm(total=num_instances, desc="Completed game instances", dynamic_ncols=True)
+    pbar_responses = tqdm(desc="Total responses", unit="response", dynamic_ncols=True)
+
+    lanes: Dict[str, ModelLane] = {}  # created on demand, e.g. for programmatic players added by the game master
+    in_flight: Dict[Future, Tuple[ModelLane, List[int]]] = {}
+    routed = set()  # the ids of the sessions with a pending or running call
+    try:
+        while True:
+            session_pool.refill()
+            for session in session_pool:
+                if session.session_id in routed:
+                    continue
+                observation = next(iter(session), None)
+                if observation is None:  # the session is exhausted
+                    session_pool.remove(session.session_id)
+                    continue
+                model = observation[1].model
+                if model.name not in lanes:
+                    lanes[model.name] = ModelLane(model, batch_size=batch_size, max_concurrency=max_concurrency)
+                lanes[model.name].pending.append(observation)
+                routed.add(session.session_id)
+            for lane in lanes.values():
+                for future, session_ids in lane.submit_pending():
+                    in_flight[future] = (lane, session_ids)
+            if not in_flight:
+                if session_pool.is_exhausted:
+                    break
+                continue  # sessions were removed, so there might be room for more
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in done:
+                lane, session_ids = in_flight.pop(future)
+                lane.num_running -= 1
+                routed.difference_update(session_ids)
+                with session_pool.lock:
+                    __step_game_sessions(session_pool, future, session_ids, pbar_instances, pbar_responses)
+    finally:
+        for lane in lanes.values():
+            lane.close()
+        pbar_instances.close()
+        pbar_responses.close()
+
+
+def __step_game_sessions(session_pool: GameSessionPool, future: Future, session_ids: List[int],
+                         pbar_instances: tqdm, pbar_responses: tqdm):
+    try:
+        context_response_by_session_id = future.result()
+    except BatchResponseError as e:  # continue with the sessions whose responses were generated
+        context_response_by_session_id = e.context_response_by_row_id
+        for session_id, exception in e.exception_by_row_id.items():
+            module_logger.error(f"Abort game session {session_id}, because its response could not be generated: "
+                                f"{exception}")
+            session_pool[session_id].abort(exception)
+            session_pool.remove(session_id)
+            session_pool.error_count += 1
+    except Exception as e:  # continue with other sessions if something goes wrong
+        module_logger.exception(f"Exception while generating responses for game sessions {session_ids} (but continue)")
+        for session_id in session_ids:
+            session_pool[session_id].abort(e)
+            session_pool.remove(session_id)
+            session_pool.error_count += 1
+        return
+    for session_id, (context, response) in context_response_by_session_id.items():
+        session = session_pool[session_id]
+        try:
+            # Step the environment (callbacks are handled internally by GameMasterEnv.step)
+            session.step(response)
+        except Exception:  # the env already notified the callbacks about the error
+            module_logger.exception(f"Exception for game session {session_id} (but continue)")
+            session_pool.remove(session_id)
+            session_pool.error_count += 1
+            continue
+        pbar_responses.update(1)
+        if session.is_done:
+            pbar_instances.update(1)
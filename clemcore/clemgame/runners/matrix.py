@@ -0,0 +1,217 @@
+"""
+Run-matrix runner for playing many model pairings on many games in a single process.
+
+The pairings are split into two groups:
+- **Local pairings** (with at least one model whose weights are loaded into this process) are played one after
+  another in the calling thread. They are ordered so that consecutive pairings share their local models, which are
+  loaded only once and released when the memory budget requires room for the next one.
+- **Remote pairings** (whose models are all served remotely and support concurrent calls) are played concurrently
+  in worker threads while the local pairings run.
+
+Each model is loaded only once for the whole matrix. The game benchmarks are loaded once by the caller and shared.
+
+Example:
+    clem run -g taboo wordle -m llama3-8b qwen2-7b gpt-4o --matrix --memory_budget 40
+"""
+import logging
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Callable, Tuple, Optional, Iterable
+
+from clemcore.backends import Model, ModelSpec
+from clemcore.clemgame import GameBenchmark, GameBenchmarkCallbackList, GameInstances
+from clemcore.clemgame.runners import dispatch
+
+module_logger = logging.getLogger(__name__)
+stdout_logger = logging.getLogger("clemcore.run")
+
+LOCAL_BACKENDS = ["huggingface_local", "llamacpp"]
+
+
+def is_local(model_spec: ModelSpec) -> bool:
+    """Check if the model's weights are loaded into this process (as opposed to models served remotely)."""
+    return model_spec.has_backend() and model_spec.backend in LOCAL_BACKENDS
+
+
+def estimate_memory(model_spec: ModelSpec) -> Optional[float]:
+    """
+    Estimate the memory (in GB) required by a local model from the number of parameters in its model spec.
+
+    Assumes 16-bit weights unless the model config requests 8-bit or 4-bit quantization.
+
+    Returns:
+        None, if the model spec does not state the number of parameters (e.g. "8B" or "350M").
+    """
+    parameters = str(getattr(model_spec, "parameters", ""))
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([BM])\s*", parameters, flags=re.IGNORECASE)
+    if match is None:
+        return None
+    num_params = float(match.group(1)) * (1e9 if match.group(2).upper() == "B" else 1e6)
+    model_config = getattr(model_spec, "model_config", {}) or {}
+    bytes_per_param = .5 if model_config.get("load_in_4bit") else 1 if model_config.get("load_in_8bit") else 2
+    return num_params * bytes_per_param / 1e9
+
+
+class ModelCache:
+    """
+    Keeps each model loaded for as long as possible, so that it is loaded only once for all pairings.
+
+    Local models are released (least recently used first) when loading another local model would exceed the
+    memory budget. The models of the requested pairing itself are never released. Local models with an unknown
+    memory requirement are assumed to need the whole budget. Remote models are never released.
+    """
+
+    def __init__(self, load_model: Callable[[ModelSpec], Model], memory_budget: float = None):
+        """
+        Args:
+            load_model: A function that loads a model given its (unified) model spec.
+            memory_budget: The memory (in GB) available for local models. Default: None (unlimited).
+        """
+        self.load_model = load_model
+        self.memory_budget = memory_budget
+        self.models: Dict[str, Model] = OrderedDict()  # in order of last use
+        self.num_loads = 0
+
+    def _memory_of(self, model_spec: ModelSpec) -> float:
+        if not is_local(model_spec) or self.memory_budget is None:
+            return 0.
+        memory = estimate_memory(model_spec)
+        return memory if memory is not None else self.memory_budget
+
+    def memory_in_use(self) -> float:
+        return sum(self._memory_of(model.model_spec) for model in self.models.values())
+
+    def acquire(self, model_specs: List[ModelSpec]) -> List[Model]:
+        """Return the loaded models for the given model specs, loading the missing ones (and releasing others)."""
+        required = {model_spec.model_name for model_spec in model_specs}
+        player_models = []
+        for model_spec in model_specs:
+            if model_spec.model_name not in self.models:
+                self._make_room_for(model_spec, keep=required)
+                stdout_logger.info("Load model %s", model_spec.model_name)
+                self.models[model_spec.model_name] = self.load_model(model_spec)
+                self.num_loads += 1
+            self.models.move_to_end(model_spec.model_name)
+            player_models.append(self.models[model_spec.model_name])
+        return player_models
+
+    def _make_room_for(self, model_spec: ModelSpec, keep: set):
+        memory = self._memory_of(model_spec)
+        if memory == 0.:
+            return
+        for model_name in list(self.models):
+            if self.memory_in_use() + memory <= self.memory_budget:
+                return
+            model = self.models[model_name]
+            if model_name in keep or not is_local(model.model_spec):
+                continue
+            self.release(model_name)
+        if self.memory_in_use() + memory > self.memory_budget:
+            module_logger.warning("Loading %s exceeds the memory budget of %s GB", model_spec.model_name,
+                                  self.memory_budget)
+
+    def release(self, model_name: str):
+        stdout_logger.info("Release model %s", model_name)
+        self.models.pop(model_name).unload()
+
+    def release_all(self):
+        for model_name in list(self.models):
+            self.release(model_name)
+
+
+def plan(model_pairings: List[List[ModelSpec]]) -> Tuple[List[List[ModelSpec]], List[List[ModelSpec]]]:
+    """
+    Split the pairings into local and remote ones and order the local pairings to minimize model loads.
+
+    The local pairings are ordered greedily: the next pairing is the one that shares the most local models with
+    the previous one, so that the pairings of a local model are played while it is loaded.
+
+    Returns:
+        The ordered local pairings and the remote pairings (with no local model).
+    """
+    remote_pairings = [pairing for pairing in model_pairings if not any(is_local(spec) for spec in pairing)]
+    remaining = [pairing for pairing in model_pairings if any(is_local(spec) for spec in pairing)]
+    local_pairings = []
+    loaded = set()
+    while remaining:
+        def shared_models(pairing):
+            return len(loaded & {spec.model_name for spec in pairing if is_local(spec)})
+
+        # first of the best (keeps the given order on ties); pop by index, because model specs always compare equal
+        next_pairing = remaining.pop(max(range(len(remaining)), key=lambda idx: shared_models(remaining[idx])))
+        local_pairings.append(next_pairing)
+        loaded = {spec.model_name for spec in next_pairing if is_local(spec)}
+    return local_pairings, remote_pairings
+
+
+def run(game_benchmarks: List[GameBenchmark],
+        game_instances: List[GameInstances],
+        model_pairings: List[List[ModelSpec]],
+        *,
+        load_model: Callable[[ModelSpec], Model],
+        create_callbacks: Callable[[List[Model]], GameBenchmarkCallbackList],
+        batch_size: int = 1,
+        memory_budget: float = None,
+        max_remote_pairings: int = 4,
+        wrap_instances: Callable[[GameInstances], Iterable[Dict]] = None) -> List[Exception]:
+    """
+    Play all games with all model pairings, loading each model only once.
+
+    The remote pairings are played in up to `max_remote_pairings` worker threads, while the local pairings are
+    played one after another in the calling thread. The games of a pairing are played one after another
+    (via dispatch.run). Errors of a game are logged and do not stop the other games or pairings.
+
+    Args:
+        game_benchmarks: The loaded game benchmarks to play.
+        game_instances: The game instances to play for each game benchmark (in the same order).
+        model_pairings: The model pairings given as lists of unified model specs (see ModelRegistry).
+        load_model: A function that loads a model given its model spec.
+        create_callbacks: A factory for the callbacks (e.g. the results file savers) given the player models.
+        batch_size: The batch size to use (default: 1).
+        memory_budget: The memory (in GB) available for local models. Default: None (unlimited).
+        max_remote_pairings: The maximum number of remote pairings to play at the same time. Default: 4.
+        wrap_instances: If given, applied to the game instances before they are passed to the runner,
+            e.g., to stop providing rows on an interrupt.
+    Returns:
+        The exceptions that occurred while playing the games.
+    """
+    local_pairings, remote_pairings = plan(model_pairings)
+    stdout_logger.info("Run matrix of %s games x %s pairings (%s local, %s remote)", len(game_benchmarks),
+                       len(model_pairings), len(local_pairings), len(remote_pairings))
+    model_cache = ModelCache(load_model, memory_budget)
+    errors = []
+
+    def play_games(player_models: List[Model]):
+        callbacks = create_callbacks(player_models)
+        for game_benchmark, instances in zip(game_benchmarks, game_instances):
+            try:
+                stdout_logger.info("Running %s (models=%s)", game_benchmark.game_name, player_models)
+                with game_benchmark.extra_modules_activated():
+                    dispatch.run(game_benchmark,
+                                 wrap_instances(instances) if wrap_instances else instances,
+                                 player_models,
+                                 callbacks=callbacks,
+                                 batch_size=batch_size)
+            except Exception as e:  # continue with other games
+                module_logger.exception("%s failed for %s (but continue)", game_benchmark.game_name, player_models)
+                errors.append(e)
+
+    try:
+        with ThreadPoolExecutor(max(max_remote_pairings, 1), thread_name_prefix="remote-pairing") as executor:
+            futures = []
+            # remote models are loaded upfront (this is quick), so that only the calling thread uses the cache
+            for pairing in remote_pairings:
+                player_models = model_cache.acquire(pairing)
+                if all(player_model.supports_concurrency() for player_model in player_models):
+                    futures.append(executor.submit(play_games, player_models))
+                else:  # e.g. programmatic or human players
+                    local_pairings.append(pairing)
+            for pairing in local_pairings:
+                play_games(model_cache.acquire(pairing))
+            for future in futures:
+                future.result()
+    finally:
+        model_cache.release_all()
+    stdout_logger.info("Run matrix finished with %s model loads", model_cache.num_loads)
+    return errors
@@ -1,5 +1,5 @@
 import logging
-from typing import List
+from typing import List, Dict, Callable
 
 from tqdm import tqdm
 
@@ -22,23 +22,7 @@ def run(game_benchmark: GameBenchmark,
     error_count = 0
     for row in tqdm(game_instances, desc="Playing game instances"):
         try:
-            game_env.reset(options={
-                "player_models": player_models,
-                "experiment": row["experiment"],
-                "game_instance": row["game_instance"]
-            })
-            for model in player_models:
-                model.reset()  # this is mainly to notify slurk backends; other models are state-less anyway
-            for agent_id in game_env.agent_iter():  # when there is no agent left, the episode is done
-                context, reward, termination, truncation, info = game_env.last(observe=True)
-                if termination or truncation:
-                    # None actions remove the agent from the game during step(None)
-                    # This is essential to observe the final reward, e.g., for the describer, when the guesser wins
-                    response = None
-                else:
-                    player = game_env.player_by_agent_id[agent_id]
-                    response = player(context)
-                game_env.step(response)
+            run_episode(game_env, row, player_models)
         except Exception:  # continue with other instances if something goes wrong
             message = f"{game_benchmark.game_name}: Exception for instance {row['game_instance']['game_id']} (but continue)"
             module_logger.exception(message)
@@ -50,3 +34,42 @@ def run(game_benchmark: GameBenchmark,
         stdout_logger.error(
             f"{game_benchmark.game_name}: '{error_count}' exceptions occurred: See clembench.log for details.")
     callbacks.on_benchmark_end(game_benchmark)
+
+
+def run_episode(game_env: GameMasterEnv, row: Dict, player_models: List[Model],
+                is_aborted: Callable[[], bool] = None) -> bool:
+    """
+    Play a single game instance row from start to end with the given (already initialized) game env.
+
+    Exceptions are not handled here, but propagated to the caller (the env notifies the callbacks).
+
+    Args:
+        game_env: The GameMasterEnv to be reset with the row's experiment and game instance.
+        row: A dict with "experiment" and "game_instance" keys.
+        player_models: The player models to play the game with.
+        is_aborted: Checked before each step. When it returns True, the episode is stopped without ending it,
+            i.e., the callbacks are not notified of the game end (and no results are written). The caller should
+            then abort the env with an EpisodeCancelledError, so that the callbacks release the episode's state.
+    Returns:
+        False, if the episode has been aborted, otherwise True.
+    """
+    game_env.reset(options={
+        "player_models": player_models,
+        "experiment": row["experiment"],
+        "game_instance": row["game_instance"]
+    })
+    for model in player_models:
+        model.reset()  # this is mainly to notify slurk backends; other models are state-less anyway
+    for agent_id in game_env.agent_iter():  # when there is no agent left, the episode is done
+        if is_aborted is not None and is_aborted():
+            return False
+        context, reward, termination, truncation, info = game_env.last(observe=True)
+        if termination or truncation:
+            # None actions remove the agent from the game during step(None)
+            # This is essential to observe the final reward, e.g., for the describer, when the guesser wins
+            response = None
+        else:
+            player = game_env.player_by_agent_id[agent_id]
+            response = player(context)
+        game_env.step(response)
+    return True
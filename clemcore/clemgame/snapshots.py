@@ -0,0 +1,212 @@
+"""
+Serializable snapshots of game environments, e.g., to distribute branches across processes or to checkpoint episodes.
+
+A snapshot captures the complete state of an episode: the GameMasterEnv (or any part of it, e.g., a GameMaster,
+a Player or a GameInteractionsRecorder) with the game state, the players' histories, the recorders and the
+callbacks. It is a compact bytes object: a JSON header line, followed by the zlib-compressed pickle of the state.
+
+What does not belong to the episode is not serialized, but stored as a reference and re-attached on restore:
+    - the models, by their (unified) model spec and generation arguments: the given player models with the same
+      name are re-attached, otherwise the models are loaded (see load_snapshot)
+    - the game benchmark (and its game spec), by its game name: the game benchmark of the restoring process
+      is re-attached
+    - the classes and functions of the game's master.py, which are not importable by their module name
+      (see GameBenchmark.load_from_spec): they are looked up in the game module of the restoring benchmark
+    - shared objects, by a key: objects that cannot or should not be serialized, e.g., a callback that is shared
+      among the branches, are passed to both dump_snapshot and load_snapshot under the same key
+
+The format is versioned (see SNAPSHOT_VERSION): a snapshot of another version is rejected on restore.
+
+Security: the state is a pickle, and restoring a pickle can execute arbitrary code. Only restore snapshots from
+trusted sources, e.g. the snapshots that the processes of the same run have taken themselves.
+
+Example:
+    data = game_env.to_snapshot()  # e.g. sent to a worker process or written to disk
+    branch_env = GameMasterEnv.from_snapshot(data, game_benchmark, player_models=player_models)
+"""
+import io
+import json
+import logging
+import pickle
+import sys
+import types
+import zlib
+from typing import Any, Dict, List, Optional, Callable
+
+from clemcore import backends
+from clemcore.backends import Model, ModelSpec, CustomResponseModel, HumanModel
+from clemcore.clemgame.benchmark import GameBenchmark
+
+module_logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+"""The version of the snapshot format. Increase it when the format or the serialized classes change incompatibly."""
+
+
+class _SnapshotPickler(pickle.Pickler):
+
+    def __init__(self, file, game_benchmark: GameBenchmark, shared: Dict[str, Any]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.game_benchmark = game_benchmark
+        self.shared_keys = {id(value): key for key, value in shared.items()}
+        self.model_specs: Dict[str, Dict] = {}
+
+    def persistent_id(self, obj):
+        if id(obj) in self.shared_keys:
+            return "shared", self.shared_keys[id(obj)]
+        if isinstance(obj, Model):
+            model_spec = obj.model_spec.to_dict()
+            self.model_specs[obj.name] = model_spec
+            return "model", model_spec, dict(obj.gen_args)
+        if isinstance(obj, GameBenchmark):
+            return "game_benchmark", obj.game_name
+        if obj is self.game_benchmark.game_spec:
+            return "game_spec", obj.game_name
+        if isinstance(obj, (type, types.FunctionType)) and "<" not in obj.__qualname__ \
+                and not _is_importable(obj):  # lambdas and local definitions cannot be restored anyway
+            return "global", obj.__module__, obj.__qualname__
+        return None
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+
+    def __init__(self, file, game_benchmark: GameBenchmark, shared: Dict[str, Any],
+                 player_models: List[Model], load_model: Callable[[ModelSpec], Model]):
+        super().__init__(file)
+        self.game_benchmark = game_benchmark
+        self.shared = shared
+        self.models_by_name = {player_model.name: player_model for player_model in player_models}
+        self.given_models = set(self.models_by_name)  # whose gen_args are kept (but checked once)
+        self.load_model = load_model
+
+    def persistent_load(self, pid):
+        kind = pid[0]
+        if kind == "shared":
+            if pid[1] not in self.shared:
+                raise pickle.UnpicklingError(f"The snapshot references the shared object '{pid[1]}', "
+                                             f"but it is not given")
+            return self.shared[pid[1]]
+        if kind == "model":
+            return self._attach_model(ModelSpec.from_dict(pid[1]), pid[2])
+        if kind == "game_benchmark":
+            if pid[1] != self.game_benchmark.game_name:
+                raise pickle.UnpicklingError(f"The snapshot references the game '{pid[1]}', "
+                                             f"but the game benchmark is for '{self.game_benchmark.game_name}'")
+            return self.game_benchmark
+        if kind == "game_spec":
+            return self.game_benchmark.game_spec
+        if kind == "global":
+            return self._find_game_global(pid[1], pid[2])
+        raise pickle.UnpicklingError(f"Unknown reference in snapshot: {pid}")
+
+    def _attach_model(self, model_spec: ModelSpec, gen_args: Dict) -> Model:
+        if model_spec.model_name not in self.models_by_name:
+            if model_spec.is_programmatic():
+                model = CustomResponseModel(model_spec)
+            elif model_spec.is_human():
+                model = HumanModel(model_spec)
+            else:
+                module_logger.info("Load model %s to restore a snapshot", model_spec.model_name)
+                model = self.load_model(model_spec)
+            model.set_gen_args(**gen_args)
+            self.models_by_name[model_spec.model_name] = model
+        elif model_spec.model_name in self.given_models:
+            model = self.models_by_name[model_spec.model_name]
+            if model.gen_args != gen_args:  # the given model is in use elsewhere, hence, keep its gen_args
+                module_logger.warning("The gen_args of model %s differ from the snapshot's: %s (snapshot: %s)",
+                                      model.name, model.gen_args, gen_args)
+            self.given_models.discard(model_spec.model_name)
+        return self.models_by_name[model_spec.model_name]
+
+    def _find_game_global(self, module_name: str, qualname: str):
+        game_module = self.game_benchmark.game_module
+        if game_module is None or game_module.__name__ != module_name:
+            raise pickle.UnpicklingError(f"Cannot find {module_name}.{qualname}: the snapshot was taken from "
+                                         f"another game than {self.game_benchmark.game_name}")
+        obj = game_module
+        for name in qualname.split("."):
+            obj = getattr(obj, name)
+        return obj
+
+
+def _is_importable(obj) -> bool:
+    """Whether pickle can find the class or function by its module and qualified name."""
+    found = sys.modules.get(obj.__module__)
+    for name in obj.__qualname__.split("."):
+        found = getattr(found, name, None)
+    return found is obj
+
+
+def dump_snapshot(obj: Any, game_benchmark: GameBenchmark, *, shared: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    Serialize a game environment (or a game master, player, game state or recorder) into a snapshot.
+
+    Args:
+        obj: The object to serialize.
+        game_benchmark: The game benchmark that the object belongs to.
+        shared: Objects that are stored as references by their key (and must be given again on restore).
+    Returns:
+        The snapshot: a JSON header line with the version, the game name and the model specs, followed by
+        the compressed state.
+    """
+    buffer = io.BytesIO()
+    pickler = _SnapshotPickler(buffer, game_benchmark, shared or {})
+    try:
+        pickler.dump(obj)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        raise ValueError(f"Cannot serialize the {type(obj).__name__}: {e} "
+                         f"(pass the object that cannot be serialized as a shared object)") from e
+    header = dict(version=SNAPSHOT_VERSION, game_name=game_benchmark.game_name, type=type(obj).__name__,
+                  models=list(pickler.model_specs.values()))
+    return json.dumps(header).encode("utf-8") + b"\n" + zlib.compress(buffer.getvalue())
+
+
+def read_snapshot_header(data: bytes) -> Dict:
+    """The header of a snapshot: its version, the game name, the type of the state and the model specs."""
+    header, _, _ = data.partition(b"\n")
+    try:
+        return json.loads(header)
+    except ValueError:
+        raise ValueError("The data is not a snapshot (see dump_snapshot)") from None
+
+
+def load_snapshot(data: bytes,
+                  game_benchmark: GameBenchmark,
+                  *,
+                  player_models: Optional[List[Model]] = None,
+                  load_model: Optional[Callable[[ModelSpec], Model]] = None,
+                  shared: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Restore the object of a snapshot and re-attach the models, the game benchmark and the shared objects.
+
+    Note: Restoring a snapshot unpickles its state, which can execute arbitrary code. Never restore snapshots from
+    untrusted sources.
+
+    Args:
+        data: The snapshot (see dump_snapshot).
+        game_benchmark: The (loaded) game benchmark of the game that the snapshot was taken from.
+        player_models: The models to re-attach by name. Their gen_args are kept (a warning is logged when they
+            differ from the snapshot's). Default: None (load all generative models).
+        load_model: Loads the models that are not given by the player models (with the snapshot's gen_args).
+            Default: backends.load_model.
+        shared: The shared objects by the keys given to dump_snapshot.
+    Returns:
+        The restored object.
+    Raises:
+        ValueError: If the data is not a snapshot, has another version or was taken from another game.
+    """
+    header = read_snapshot_header(data)
+    if header.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Cannot restore a snapshot of version {header.get('version')} "
+                         f"(supported version: {SNAPSHOT_VERSION})")
+    if header.get("game_name") != game_benchmark.game_name:
+        raise ValueError(f"The snapshot was taken from the game '{header.get('game_name')}', "
+                         f"but the game benchmark is for '{game_benchmark.game_name}'")
+    payload = zlib.decompress(data.partition(b"\n")[2])
+    unpickler = _SnapshotUnpickler(io.BytesIO(payload), game_benchmark, shared or {}, player_models or [],
+                                   load_model or (lambda model_spec: backends.load_model(model_spec, {})))
+    try:
+        with game_benchmark.extra_modules_activated():  # the game's helper modules are imported by their names
+            return unpickler.load()
+    except pickle.UnpicklingError as e:
+        raise ValueError(str(e)) from e
@@ -0,0 +1,157 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Union, List, Tuple
+
+from clemcore.clemgame.instances import GameInstances
+from clemcore.clemgame.metrics import METRIC_REQUEST_COUNT
+from clemcore.clemgame.resources import store_json, load_json
+
+module_logger = logging.getLogger(__name__)
+
+EPISODE_STATS_FILE_NAME = "episode_stats.json"
+
+
+def _mean(values: List[float]) -> Optional[float]:
+    return sum(values) / len(values) if values else None
+
+
+class EpisodeStats:
+    """
+    Turn-count and length statistics of previously played episodes, e.g., to schedule long episodes first.
+
+    The statistics are collected from the interactions.json files of a results directory and aggregated
+    per game and experiment (averaged over all model pairings that played them). Each experiment entry holds:
+        - "episodes": the number of episodes the statistics are based on
+        - "mean_requests": the mean number of requests to the players per episode
+        - "mean_chars": the mean number of characters of all messages per episode (a proxy for the token count)
+        - "instances": the mean number of requests per game_id
+        - "mean_response_chars": the mean number of characters of a player response
+        - "mean_response_seconds": the mean time (in seconds) between a context and the player's response,
+          or None if the interactions have no timestamps
+
+    Structure of the stats file:
+        {
+            <game_name>: {
+                <experiment_name>: {"episodes": 10, "mean_requests": 7.5, "mean_chars": 5321.0,
+                                    "instances": {"0": 6.0, "1": 9.0, ...},
+                                    "mean_response_chars": 120.5, "mean_response_seconds": 1.8}
+            }
+        }
+    """
+
+    def __init__(self, stats: Dict = None):
+        self.stats: Dict[str, Dict[str, Dict]] = stats or {}
+
+    def __len__(self):
+        """The number of experiments with statistics."""
+        return sum(len(experiments) for experiments in self.stats.values())
+
+    @classmethod
+    def from_results_dir(cls, results_dir_path: Union[str, Path]) -> "EpisodeStats":
+        """Collect the statistics of all episodes that have an interactions.json in the given results directory."""
+        requests = defaultdict(lambda: defaultdict(list))  # (game, experiment) -> game_id -> request counts
+        chars = defaultdict(list)  # (game, experiment) -> message lengths
+        response_chars = defaultdict(list)  # (game, experiment) -> response lengths
+        response_seconds = defaultdict(list)  # (game, experiment) -> response times
+        for interactions_file in Path(results_dir_path).rglob("interactions.json"):
+            try:
+                interactions = load_json(str(interactions_file))
+                meta = interactions["meta"]
+                key = (meta["game_name"], meta["experiment_name"])
+                requests[key][str(meta["game_id"])].append(EpisodeStats.count_requests(interactions))
+                chars[key].append(EpisodeStats.count_chars(interactions))
+                for num_chars, seconds in EpisodeStats.collect_responses(interactions):
+                    response_chars[key].append(num_chars)
+                    if seconds is not None:
+                        response_seconds[key].append(seconds)
+            except Exception as e:  # skip broken or legacy files
+                module_logger.warning("Skip %s for episode stats: %s", interactions_file, e)
+        stats = defaultdict(dict)
+        for (game_name, experiment_name), requests_by_game_id in requests.items():
+            key = (game_name, experiment_name)
+            all_requests = [count for counts in requests_by_game_id.values() for count in counts]
+            stats[game_name][experiment_name] = {
+                "episodes": len(all_requests),
+                "mean_requests": sum(all_requests) / len(all_requests),
+                "mean_chars": sum(chars[key]) / len(all_requests),
+                "instances": {game_id: sum(counts) / len(counts) for game_id, counts in requests_by_game_id.items()},
+                "mean_response_chars": _mean(response_chars[key]),
+                "mean_response_seconds": _mean(response_seconds[key])
+            }
+        return cls(dict(stats))
+
+    @staticmethod
+    def count_requests(interactions: Dict) -> int:
+        """The number of requests to the players of an episode (counting player messages for older files)."""
+        if METRIC_REQUEST_COUNT in interactions:
+            return sum(interactions[METRIC_REQUEST_COUNT])
+        return sum(1 for turn in interactions["turns"] for event in turn if event["from"] != "GM")
+
+    @staticmethod
+    def count_chars(interactions: Dict) -> int:
+        return sum(len(str(event["action"].get("content", "")))
+                   for turn in interactions["turns"] for event in turn)
+
+    @staticmethod
+    def collect_responses(interactions: Dict) -> List[Tuple[int, Optional[float]]]:
+        """The length (in characters) of each player response and the seconds since the event before it
+        (None, if the events have no timestamps)."""
+        responses = []
+        previous_timestamp = None
+        for turn in interactions["turns"]:
+            for event in turn:
+                timestamp = event.get("timestamp")
+                if event["from"] != "GM" and event["action"].get("type") == "get message":
+                    seconds = None
+                    if timestamp is not None and previous_timestamp is not None:
+                        seconds = (datetime.fromisoformat(timestamp)
+                                   - datetime.fromisoformat(previous_timestamp)).total_seconds()
+                    responses.append((len(str(event["action"].get("content", ""))), seconds))
+                previous_timestamp = timestamp
+        return responses
+
+    @classmethod
+    def from_file(cls, file_path: Union[str, Path]) -> "EpisodeStats":
+        """Load the statistics from a stats file. Returns empty statistics if the file does not exist."""
+        if not Path(file_path).exists():
+            return cls()
+        return cls(load_json(str(file_path)))
+
+    def store(self, file_path: Union[str, Path]) -> str:
+        file_path = Path(file_path)
+        return store_json(self.stats, file_path.name, file_path.parent)
+
+    def get_experiment_stats(self, row: Dict) -> Optional[Dict]:
+        """The statistics of the experiment of the given game instance row, or None if there are none."""
+        return self.stats.get(row["game_name"], {}).get(row["experiment"]["name"])
+
+    def expected_requests(self, row: Dict) -> Optional[float]:
+        """
+        The expected number of requests to play the episode of the given game instance row.
+
+        Returns:
+            The mean of previous episodes of the same instance, or (if the instance has not been played before)
+            of the same experiment. None, if there are no statistics for the experiment.
+        """
+        experiment_stats = self.get_experiment_stats(row)
+        if experiment_stats is None:
+            return None
+        game_id = str(row["game_instance"]["game_id"])
+        return experiment_stats["instances"].get(game_id, experiment_stats["mean_requests"])
+
+    def longest_first(self, game_instances: GameInstances) -> GameInstances:
+        """
+        Order the game instances by their expected number of requests (longest first).
+
+        Starting the longest episodes first reduces the tail of a run, in which only a few long episodes are
+        still running. Instances without statistics are put first, because their length is unknown.
+        Instances with the same expected length keep their original order.
+        """
+
+        def longest_first_key(row):
+            expected_requests = self.expected_requests(row)
+            return -expected_requests if expected_requests is not None else float("-inf")
+
+        return game_instances.sort(longest_first_key)
@@ -1,8 +1,11 @@
 import argparse
+import signal
 import sys
+import threading
 import textwrap
 import logging
 import uvicorn
+from contextlib import ExitStack
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Union, Callable, Optional, Any
@@ -13,10 +16,12 @@ import clemcore.backends as backends
 from clemcore.backends import ModelRegistry, BackendRegistry, Model, KeyRegistry
 from clemcore.clemgame import GameRegistry, GameSpec, InstanceFileSaver, ExperimentFileSaver, \
     InteractionsFileSaver, GameBenchmarkCallbackList, RunFileSaver, GameInstances, ResultsFolder, \
-    GameBenchmark
-from clemcore import clemeval, get_version, load_logging_config
+    GameBenchmark, SignalFileIndex
+from clemcore import clemeval, daemon, get_version, load_logging_config
 from clemcore.clemgame.callbacks.files import PlayerFileSaver, SignalFileSaver
-from clemcore.clemgame.runners import dispatch
+from clemcore.clemgame.runners import dispatch, distributed, batchwise, early_stopping, matrix, batch_tuning
+from clemcore.clemgame.stats import EpisodeStats, EPISODE_STATS_FILE_NAME
+from clemcore.clemgame import planner
 from clemcore.clemgame.transcripts.builder import build_transcripts
 from clemcore.utils.string_utils import read_query_string
 from clemcore.clemgame.envs.openenv.server.app import create_clemv_app
@@ -134,6 +139,43 @@ def list_games(game_selector: str, verbose: bool = False):
             print(game_name, wrapper.fill(game_spec["description"]))
 
 
+def create_results_callbacks(results_dir_path: Path, player_models: List[Model],
+                             run_file_name: str = "run.json") -> GameBenchmarkCallbackList:
+    """Create the callbacks that store the episode records in the standard results layout.
+    Args:
+        results_dir_path: Path to the results directory in which to store the episode records.
+        player_models: The models that play the games; the run directory is named after them.
+        run_file_name: The name of the run file with the timing information of the games (see RunFileSaver).
+    """
+    # we name the run directory after the participating models
+    results_folder = ResultsFolder(results_dir_path, run_dir=Model.to_identifier(player_models))
+    model_infos = Model.to_infos(player_models)
+    return GameBenchmarkCallbackList([
+        InstanceFileSaver(results_folder),
+        ExperimentFileSaver(results_folder, player_model_infos=model_infos),
+        InteractionsFileSaver(results_folder, player_model_infos=model_infos),
+        RunFileSaver(results_folder, player_model_infos=model_infos, file_name=run_file_name),
+        PlayerFileSaver(results_folder),
+        SignalFileSaver(results_folder)
+    ])
+
+
+def _resolve_game_specs(game_selectors: Union[str, Dict, GameSpec, List[Union[str, Dict, GameSpec]]]) \
+        -> List[GameSpec]:
+    """The game specs that unify with any of the game selectors (once per game, in the order of the selectors).
+    Raises:
+        ValueError: If no game spec unifies with a game selector.
+    """
+    if not isinstance(game_selectors, list):
+        game_selectors = [game_selectors]
+    game_registry = GameRegistry.from_directories_and_cwd_files()
+    game_specs = {}
+    for game_selector in game_selectors:
+        for game_spec in game_registry.get_game_specs_that_unify_with(game_selector):  # throws when nothing unifies
+            game_specs.setdefault(game_spec.game_name, game_spec)
+    return list(game_specs.values())
+
+
 def run(game_selectors: Union[str, Dict, GameSpec, List[Union[str, Dict, GameSpec]]],
         model_selectors: List[backends.ModelSpec],
         *,
@@ -142,7 +184,17 @@ def run(game_selectors: Union[str, Dict, GameSpec, List[Union[str, Dict, GameSpe
         instances_filename: str = None,
         results_dir_path: Path = None,
         instances_filter: Callable[[dict], bool] | None = None,
-        batch_size: int = 1
+        batch_size: Union[int, str] = 1,
+        max_batch_size: int = 64,
+        interleave: bool = False,
+        order: str = "instances",
+        resume: bool = False,
+        retry_errors: bool = False,
+        tolerance: float = None,
+        confidence: float = .95,
+        min_episodes: int = 5,
+        seed: int = None,
+        load_models: daemon.LoadModels = None
         ):
     """Run specific model/models with a specified clemgame.
     Args:
@@ -156,70 +208,447 @@ def run(game_selectors: Union[str, Dict, GameSpec, List[Union[str, Dict, GameSpe
         results_dir_path: Path to the results directory in which to store the episode records.
         instances_filter: A condition to filter the list of dicts with "experiment" and "game_instance" keys.
             If the filter is None, then all game instances will be used.
-        batch_size: A batch size to use for the run.
+        batch_size: A batch size to use for the run. With "auto", the batch size is calibrated for each game
+            (if all models support batching) and adapted to the memory usage during the run (see
+            runners.batch_tuning). The tuned batch sizes are recorded in the run.json.
+        max_batch_size: The largest batch size to try with batch_size="auto". Default: 64.
+        interleave: Whether to play the sessions of all games in a single batched run (instead of game by game).
+            Only applies when batch_size > 1 and all models support batching.
+        order: The order in which the game instances are started: "instances" (as in the instances file) or
+            "longest-first" (by the expected number of requests according to the episode stats of previous runs).
+        resume: Whether to skip the game instances that have already been completed (according to the
+            completed.json signal files in the run directory of the models).
+        retry_errors: Whether to play only the game instances whose episodes ended with an error
+            (according to the error.json signal files in the run directory of the models).
+        tolerance: If given, the game instances of each experiment are played in randomized order and an experiment
+            is stopped once the confidence intervals of its main score and % played are within ± tolerance.
+            The achieved precision is stored as early_stopping.json in the game's results directory.
+            Not combined with interleave.
+        confidence: The confidence level of the intervals for early stopping. Default: 0.95.
+        min_episodes: The minimum number of scored episodes per experiment before early stopping. Default: 5.
+        seed: The seed for the randomized order of the game instances for early stopping. Default: None.
+        load_models: A function that loads the player models given the model selectors and gen_args, e.g., to use
+            the models kept loaded by a daemon. Default: backends.load_models.
+
+    Note: On the first SIGINT (Ctrl+C), no further episodes are started, but the episodes in progress are
+    played to the end (and recorded), so that the run can be continued with resume. A second SIGINT stops at once.
     """
     # check games
-    if not isinstance(game_selectors, list):
-        game_selectors = [game_selectors]
-    game_registry = GameRegistry.from_directories_and_cwd_files()
-    game_specs = set()
-    for game_selector in game_selectors:
-        game_specs.update(
-            game_registry.get_game_specs_that_unify_with(game_selector))  # throws error when nothing unifies
-    game_specs = list(game_specs)
+    game_specs = _resolve_game_specs(game_selectors)
 
     # load models (can take some time for large local models)
-    player_models = backends.load_models(model_selectors, gen_args)
+    player_models = (load_models or backends.load_models)(model_selectors, gen_args)
 
     # setup reusable callbacks here once
-    # we name the run directory after the participating models
-    results_folder = ResultsFolder(results_dir_path, run_dir=Model.to_identifier(player_models))
-    model_infos = Model.to_infos(player_models)
-    callbacks = GameBenchmarkCallbackList([
-        InstanceFileSaver(results_folder),
-        ExperimentFileSaver(results_folder, player_model_infos=model_infos),
-        InteractionsFileSaver(results_folder, player_model_infos=model_infos),
-        RunFileSaver(results_folder, player_model_infos=model_infos),
-        PlayerFileSaver(results_folder),
-        SignalFileSaver(results_folder)
-    ])
+    callbacks = create_results_callbacks(results_dir_path, player_models)
+
+    if resume or retry_errors:
+        results_folder = ResultsFolder(results_dir_path, run_dir=Model.to_identifier(player_models))
+        signal_index = SignalFileIndex.from_results_folder(results_folder)
+        logger.info("Resume %s: found %s completed and %s failed episodes", results_folder.to_run_dir_path(),
+                    len(signal_index.completed), len(signal_index.errors))
+        resume_filter = signal_index.to_instances_filter(errors_only=retry_errors)
+        given_filter = instances_filter
+        instances_filter = lambda row: (given_filter is None or given_filter(row)) and resume_filter(row)
 
+    episode_stats = None
+    if order == "longest-first":
+        episode_stats = load_episode_stats(results_dir_path)
+        if not episode_stats:
+            logger.info("No episode stats found in %s: Keep the instances order", results_dir_path)
+            episode_stats = None
+
+    auto_batch_size = batch_size == batch_tuning.AUTO_BATCH_SIZE
     all_start = datetime.now()
     errors = []
-    for game_spec in game_specs:
-        try:
-            # configure instance file to be used
-            if instances_filename:
-                game_spec.instances = instances_filename  # force the use of cli argument, when given
+    interrupt = GracefulInterrupt()
+    with interrupt:
+        if interleave and tolerance is None and not auto_batch_size and batch_size > 1 \
+                and Model.all_support_batching(player_models):
+            try:
+                with ExitStack() as stack:
+                    game_benchmarks, game_instances = [], []
+                    for game_spec in game_specs:
+                        game_benchmark = stack.enter_context(GameBenchmark.load_from_spec(game_spec))
+                        # unload the game's additional modules already, so that they do not shadow the next game's ones
+                        # (the runner registers them again while the game's sessions are set up and stepped)
+                        game_benchmark.close()
+                        game_benchmarks.append(game_benchmark)
+                        game_instances.append(interrupt.wrap(
+                            _select_game_instances(game_spec, experiment_name, instances_filename,
+                                                   instances_filter, episode_stats)))
+                    logger.info("Running %s games interleaved (models=%s)", len(game_benchmarks), player_models)
+                    batchwise.run_interleaved(
+                        game_benchmarks,
+                        game_instances,
+                        player_models,
+                        callbacks=callbacks,
+                        batch_size=batch_size
+                    )
+            except Exception as e:
+                logger.exception(e)
+                errors.append(e)
+        else:
+            if interleave:
+                logger.info("Fallback to running the games one after another, because interleaving requires "
+                            "batch_size > 1 (not auto), that all models support batching and no early stopping")
+            for game_spec in game_specs:
+                if interrupt.requested:
+                    break
+                try:
+                    with GameBenchmark.load_from_spec(game_spec) as game_benchmark:
+                        time_start = datetime.now()
+                        logger.info(f'Running {game_spec["game_name"]} (models={player_models})')
+                        game_instances = _select_game_instances(game_spec, experiment_name, instances_filename,
+                                                                instances_filter, episode_stats)
+                        batch_size_tuner = None
+                        game_batch_size = batch_size
+                        if auto_batch_size:
+                            batch_size_tuner = _calibrate_batch_size(game_benchmark, game_instances, player_models,
+                                                                     max_batch_size)
+                            game_batch_size = max_batch_size if batch_size_tuner is not None else 1
+                        try:
+                            if tolerance is not None:
+                                results_folder = ResultsFolder(results_dir_path,
+                                                               run_dir=Model.to_identifier(player_models))
+                                early_stopping.run(
+                                    game_benchmark,
+                                    game_instances,
+                                    player_models,
+                                    callbacks=callbacks,
+                                    batch_size=game_batch_size,
+                                    batch_size_tuner=batch_size_tuner,
+                                    tolerance=tolerance,
+                                    confidence=confidence,
+                                    min_episodes=min_episodes,
+                                    seed=seed,
+                                    report_dir_path=results_folder.to_run_dir_path() / game_spec["game_name"],
+                                    wrap_instances=interrupt.wrap
+                                )
+                            else:
+                                dispatch.run(
+                                    game_benchmark,
+                                    interrupt.wrap(game_instances),
+                                    player_models,
+                                    callbacks=callbacks,
+                                    batch_size=game_batch_size,
+                                    batch_size_tuner=batch_size_tuner
+                                )
+                        finally:  # record the tuned batch sizes also when the run fails
+                            if batch_size_tuner is not None:
+                                _store_game_info(callbacks, game_spec["game_name"], "batch_size_tuning",
+                                                 batch_size_tuner.to_report())
+                        logger.info(f"Running {game_spec['game_name']} took: %s", datetime.now() - time_start)
+                except Exception as e:
+                    logger.exception(e)
+                    logger.error(e, exc_info=True)
+                    errors.append(e)
+    logger.info("Running all benchmarks took: %s", datetime.now() - all_start)
+    if interrupt.requested:
+        logger.warning("The run has been interrupted: Use --resume to play the remaining game instances.")
+    if errors:
+        sys.exit(1)
+    if interrupt.requested:
+        sys.exit(130)  # conventional exit code for SIGINT
 
-            experiment_filter = None
-            if experiment_name:
-                logger.info("Only running experiment: %s", experiment_name)
-                experiment_filter = lambda row: row["experiment"]["name"] == experiment_name
 
-            with GameBenchmark.load_from_spec(game_spec) as game_benchmark:
-                time_start = datetime.now()
-                logger.info(f'Running {game_spec["game_name"]} (models={player_models})')
-                game_instances = GameInstances.from_game_spec(game_spec)
-                logger.info("Loaded %s (initially)", game_instances.describe())
-                game_instances = game_instances.filter(experiment_filter)
-                game_instances = game_instances.filter(instances_filter)
-                logger.info("Proceed with %s (after applying filters)", game_instances.describe())
-                dispatch.run(
-                    game_benchmark,
-                    game_instances,
-                    player_models,
-                    callbacks=callbacks,
-                    batch_size=batch_size
-                )
-                logger.info(f"Running {game_spec['game_name']} took: %s", datetime.now() - time_start)
-        except Exception as e:
-            logger.exception(e)
-            logger.error(e, exc_info=True)
-            errors.append(e)
-    logger.info("Running all benchmarks took: %s", datetime.now() - all_start)
+def _calibrate_batch_size(game_benchmark: GameBenchmark,
+                          game_instances: GameInstances,
+                          player_models: List[Model],
+                          max_batch_size: int) -> Optional[batch_tuning.BatchSizeTuner]:
+    """Calibrate the batch size for the game. Returns None, if not all models support batching."""
+    if not Model.all_support_batching(player_models):
+        logger.info("Use batch_size=1 for %s, because not all models support batching", game_benchmark.game_name)
+        return None
+    batch_size_tuner = batch_tuning.BatchSizeTuner(max_batch_size=max_batch_size)
+    batch_size = batch_tuning.calibrate(game_benchmark, game_instances, player_models, batch_size_tuner)
+    logger.info("Calibrated batch_size=%s for %s", batch_size, game_benchmark.game_name)
+    return batch_size_tuner
+
+
+def _store_game_info(callbacks: GameBenchmarkCallbackList, game_name: str, key: str, value: Any):
+    for callback in callbacks.callbacks:
+        if isinstance(callback, RunFileSaver):
+            callback.store_game_info(game_name, key, value)
+
+
+class GracefulInterrupt:
+    """Context manager that turns the first SIGINT (Ctrl+C) into a request to stop starting new episodes.
+
+    The runners pull the game instance rows lazily, hence, game instances wrapped with wrap() stop to provide rows
+    once a stop has been requested, while the episodes in progress are played to the end (and their records are
+    written). A second SIGINT raises a KeyboardInterrupt as usual.
+    """
+
+    def __init__(self):
+        self.requested = False
+        self._previous_handler = None
+
+    def __enter__(self):
+        if threading.current_thread() is threading.main_thread():  # signal handlers only work in the main thread
+            self._previous_handler = signal.signal(signal.SIGINT, self._handle)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._previous_handler is not None:
+            signal.signal(signal.SIGINT, self._previous_handler)
+            self._previous_handler = None
+        return False
+
+    def _handle(self, signum, frame):
+        if self.requested:
+            raise KeyboardInterrupt
+        self.requested = True
+        logger.warning("Interrupted: No further episodes are started, but the ones in progress are finished. "
+                       "Press Ctrl+C again to stop immediately.")
+
+    def wrap(self, game_instances: GameInstances) -> "GracefulInterrupt.Instances":
+        return GracefulInterrupt.Instances(game_instances, self)
+
+    class Instances:
+        """Game instances that stop to provide rows when a stop has been requested."""
+
+        def __init__(self, game_instances: GameInstances, interrupt: "GracefulInterrupt"):
+            self.game_instances = game_instances
+            self.interrupt = interrupt
+
+        def __len__(self):
+            return len(self.game_instances)
+
+        def __iter__(self):
+            for row in self.game_instances:
+                if self.interrupt.requested:
+                    return
+                yield row
+
+
+def _select_game_instances(game_spec: GameSpec,
+                           experiment_name: str = None,
+                           instances_filename: str = None,
+                           instances_filter: Callable[[dict], bool] | None = None,
+                           episode_stats: EpisodeStats = None) -> GameInstances:
+    """Load the game instances for the given game spec and apply the experiment and instances filters.
+    If episode stats are given, then the game instances are ordered longest-first."""
+    # configure instance file to be used
+    if instances_filename:
+        game_spec.instances = instances_filename  # force the use of cli argument, when given
+
+    experiment_filter = None
+    if experiment_name:
+        logger.info("Only running experiment: %s", experiment_name)
+        experiment_filter = lambda row: row["experiment"]["name"] == experiment_name
+
+    game_instances = GameInstances.from_game_spec(game_spec)
+    logger.info("Loaded %s (initially)", game_instances.describe())
+    game_instances = game_instances.filter(experiment_filter)
+    game_instances = game_instances.filter(instances_filter)
+    logger.info("Proceed with %s (after applying filters)", game_instances.describe())
+    if episode_stats is not None:
+        game_instances = episode_stats.longest_first(game_instances)
+        logger.info("Ordered the game instances longest-first (by expected number of requests)")
+    return game_instances
+
+
+def run_matrix(game_selectors: Union[str, Dict, GameSpec, List[Union[str, Dict, GameSpec]]],
+               model_pairings: List[List[backends.ModelSpec]],
+               *,
+               gen_args: Dict,
+               experiment_name: str = None,
+               instances_filename: str = None,
+               results_dir_path: Path = None,
+               instances_filter: Callable[[dict], bool] | None = None,
+               batch_size: int = 1,
+               memory_budget: float = None,
+               max_remote_pairings: int = 4):
+    """Run all the given games with all the given model pairings in a single process.
+    Each model is loaded only once. Local models are loaded and released one after another within the memory budget,
+    while the pairings of remote models are played concurrently (see runners.matrix).
+    Args:
+        game_selectors: One or more game selectors. Each can be a game name, a GameSpec-like dict, or a GameSpec.
+        model_pairings: The model pairings, each given as a list of one or two model selectors.
+        gen_args: Text generation parameters for the backend.
+        experiment_name: Name of the experiment to run. Acts as an instance filter.
+        instances_filename: Name of the instances JSON file to use for this benchmark run.
+        results_dir_path: Path to the results directory in which to store the episode records.
+        instances_filter: A condition to filter the list of dicts with "experiment" and "game_instance" keys.
+        batch_size: A batch size to use for the run.
+        memory_budget: The memory (in GB) available for local models. Default: None (unlimited).
+        max_remote_pairings: The maximum number of remote pairings to play at the same time. Default: 4.
+    """
+    game_specs = _resolve_game_specs(game_selectors)
+
+    # unify the model specs once upfront (throws error when nothing unifies), so that the plan knows the backends
+    model_registry = ModelRegistry.from_packaged_and_cwd_files()
+    model_pairings = [[model_registry.get_first_model_spec_that_unify_with(model_selector)
+                       for model_selector in model_pairing] for model_pairing in model_pairings]
+
+    all_start = datetime.now()
+    interrupt = GracefulInterrupt()
+    with interrupt, ExitStack() as stack:
+        game_benchmarks, game_instances = [], []
+        for game_spec in game_specs:
+            game_benchmark = stack.enter_context(GameBenchmark.load_from_spec(game_spec))
+            # unload the game's additional modules already, so that they do not shadow the next game's ones
+            # (matrix.run registers them again while the game is played)
+            game_benchmark.close()
+            game_benchmarks.append(game_benchmark)
+            game_instances.append(_select_game_instances(game_spec, experiment_name, instances_filename,
+                                                         instances_filter))
+        errors = matrix.run(
+            game_benchmarks,
+            game_instances,
+            model_pairings,
+            load_model=lambda model_spec: backends.load_model(model_spec, gen_args),
+            create_callbacks=lambda player_models: create_results_callbacks(results_dir_path, player_models),
+            batch_size=batch_size,
+            memory_budget=memory_budget,
+            max_remote_pairings=max_remote_pairings,
+            wrap_instances=interrupt.wrap
+        )
+    logger.info("Running the matrix took: %s", datetime.now() - all_start)
+    if interrupt.requested:
+        logger.warning("The run has been interrupted: The remaining game instances have not been played.")
     if errors:
         sys.exit(1)
+    if interrupt.requested:
+        sys.exit(130)  # conventional exit code for SIGINT
+
+
+def plan(game_selectors: Union[str, Dict, GameSpec, List[Union[str, Dict, GameSpec]]],
+         model_pairings: List[List[backends.ModelSpec]],
+         *,
+         gen_args: Dict,
+         experiment_name: str = None,
+         instances_filename: str = None,
+         results_dir_path: Path = None,
+         batch_size: int = 1) -> List[Dict]:
+    """Estimate the calls, tokens, time and cost of a run without calling any model (see clemgame.planner).
+    The estimates use the episode stats of previous runs in the results directory.
+    Args:
+        game_selectors: One or more game selectors. Each can be a game name, a GameSpec-like dict, or a GameSpec.
+        model_pairings: The model pairings to plan for, each given as a list of one or two model selectors.
+        gen_args: Text generation parameters for the backend; max_tokens limits the completion tokens.
+        experiment_name: Name of the experiment to plan for. Acts as an instance filter.
+        instances_filename: Name of the instances JSON file to use for this benchmark run.
+        results_dir_path: Path to the results directory with the records of previous runs.
+        batch_size: The batch size of the planned run.
+    Returns:
+        The plans of the games for each model pairing.
+    """
+    game_specs = _resolve_game_specs(game_selectors)
+    model_registry = ModelRegistry.from_packaged_and_cwd_files()
+    episode_stats = load_episode_stats(results_dir_path) if results_dir_path is not None else None
+    token_counters = {}
+    game_plans = []
+    for model_pairing in model_pairings:
+        model_specs = [model_registry.get_first_model_spec_that_unify_with(model_selector)
+                       for model_selector in model_pairing]
+        player_models = [planner.create_planning_model(model_spec, gen_args) for model_spec in model_specs]
+        for model_spec in model_specs:
+            if model_spec.model_name not in token_counters:
+                token_counters[model_spec.model_name] = planner.TokenCounter.from_model_spec(model_spec)
+        logger.info("Plan for models=%s", player_models)
+        pairing_plans = []
+        for game_spec in game_specs:
+            with GameBenchmark.load_from_spec(game_spec) as game_benchmark:
+                game_instances = _select_game_instances(game_spec, experiment_name, instances_filename)
+                pairing_plans.append(planner.plan_game(game_benchmark, game_instances, player_models,
+                                                       token_counters=token_counters, episode_stats=episode_stats))
+        planner.log_plan(pairing_plans, planner.summarize(pairing_plans, batch_size))
+        game_plans.extend(pairing_plans)
+    return game_plans
+
+
+def to_model_pairings(model_strings: List[str]) -> List[List[backends.ModelSpec]]:
+    """Parse the model selectors for a run matrix: each selector is a pairing on its own, unless two selectors
+    are joined with '+' (e.g. 'llama3-8b+gpt-4o'). JSON selectors cannot be joined."""
+    model_pairings = []
+    for model_string in model_strings:
+        if model_string.strip().startswith("{"):
+            model_pairings.append(backends.ModelSpec.from_strings([model_string]))
+        else:
+            model_pairings.append(backends.ModelSpec.from_strings(model_string.split("+")))
+    return model_pairings
+
+
+def load_episode_stats(results_dir_path: Path) -> EpisodeStats:
+    """Load the episode stats file of the results directory, or collect them from its interactions, if missing."""
+    stats_file_path = Path(results_dir_path) / EPISODE_STATS_FILE_NAME
+    if stats_file_path.exists():
+        return EpisodeStats.from_file(stats_file_path)
+    logger.info("No %s found, collect episode stats from %s", EPISODE_STATS_FILE_NAME, results_dir_path)
+    return EpisodeStats.from_results_dir(results_dir_path)
+
+
+def stats(results_dir: str):
+    """Collect turn-count and length statistics from the interactions of previous runs and store them
+    in the results directory (to be used by 'clem run --order longest-first').
+    Args:
+        results_dir: Path to the results directory in which the benchmark records are stored.
+    """
+    logger.info("Scanning for interaction files in %s", results_dir)
+    episode_stats = EpisodeStats.from_results_dir(results_dir)
+    stats_file_path = episode_stats.store(Path(results_dir) / EPISODE_STATS_FILE_NAME)
+    logger.info("Stored episode stats for %s experiments at %s", len(episode_stats), stats_file_path)
+
+
+def enqueue(game_selectors: Union[str, Dict, GameSpec, List[Union[str, Dict, GameSpec]]],
+            model_strings: List[str],
+            *,
+            queue_path: Path,
+            gen_args: Dict,
+            experiment_name: str = None,
+            instances_filename: str = None):
+    """Add work items for the given games and model pairing to a work queue to be played by 'clem worker' processes.
+    Args:
+        game_selectors: One or more game selectors. Each can be a game name, a GameSpec-like dict, or a GameSpec.
+        model_strings: The model selectors (as given on the command line) for the models that play the games.
+        queue_path: Path to the SQLite work queue file (created when not existing).
+        gen_args: Text generation parameters for the backend to be used by the workers.
+        experiment_name: Name of the experiment to enqueue. Acts as an instance filter.
+        instances_filename: Name of the instances JSON file to use.
+    """
+    game_specs = _resolve_game_specs(game_selectors)
+    work_queue = distributed.WorkQueue(queue_path)
+    for game_spec in game_specs:
+        if instances_filename:
+            game_spec.instances = instances_filename
+        game_instances = GameInstances.from_game_spec(game_spec)
+        if experiment_name:
+            game_instances = game_instances.filter(lambda row: row["experiment"]["name"] == experiment_name)
+        num_added = work_queue.enqueue(game_instances, model_strings, gen_args=gen_args,
+                                       instances_name=game_spec.instances)
+        logger.info("Enqueued %s new work items for %s (models=%s)", num_added, game_spec.game_name, model_strings)
+    print(f"Work queue {queue_path}: {work_queue.counts()}")
+
+
+def worker(queue_path: Path,
+           *,
+           results_dir_path: Path,
+           worker_id: str = None,
+           lease_seconds: float = 600.,
+           max_items: int = None,
+           poll_seconds: float = None):
+    """Lease and play work items from a work queue until it is drained.
+    Args:
+        queue_path: Path to the SQLite work queue file (as created by 'clem enqueue').
+        results_dir_path: Path to the results directory in which to store the episode records.
+        worker_id: Identifier of this worker. Defaults to hostname and process id.
+        lease_seconds: The time after which a lease expires, when it is not renewed by a heartbeat.
+        max_items: Stop after this number of items. Default: None (until the queue is drained).
+        poll_seconds: Keep polling in this interval while other workers hold leases (to take over expired ones).
+    """
+    if not Path(queue_path).is_file():
+        raise FileNotFoundError(f"No work queue found at {queue_path}. Use 'clem enqueue' to create one.")
+    work_queue = distributed.WorkQueue(queue_path, lease_seconds=lease_seconds)
+    worker_id = worker_id or distributed.default_worker_id()
+    # the workers share the run directories, hence, each one writes its own run file
+    distributed.run(work_queue,
+                    create_callbacks=lambda player_models: create_results_callbacks(
+                        results_dir_path, player_models, run_file_name=f"run.{worker_id}.json"),
+                    worker_id=worker_id,
+                    max_items=max_items,
+                    poll_seconds=poll_seconds)
 
 
 def score(game_selector: Union[str, Dict, GameSpec], results_dir: str = None, model_selector: str = None):
@@ -310,12 +739,53 @@ def serve(game: str,
     uvicorn.run(app, host=host, port=port, log_config=load_logging_config())
 
 
+def run_daemon(*, host: str = daemon.DEFAULT_HOST, port: int = daemon.DEFAULT_PORT, memory_budget: float = None):
+    """Serve a daemon that executes the submitted run, score and eval jobs with models that stay loaded.
+    Args:
+        host: The host to bind the daemon to. Default: 127.0.0.1 (only local clients).
+        port: The port to bind the daemon to.
+        memory_budget: The memory (in GB) for local models. The least recently used local models are released,
+            when the next one would exceed the budget. Default: None (keep all models loaded).
+    """
+    parser = create_parser()
+    service = daemon.RunDaemon(parse_args=parser.parse_args, execute=cli, memory_budget=memory_budget)
+    service.serve(host, port)
+
+
+def submit(job_argv: List[str], *, url: str, wait: bool = True, poll_seconds: float = 1.):
+    """Submit a clem command line (run, score or eval) to a daemon to be executed in the current working directory.
+    Args:
+        job_argv: The clem command line, e.g., ["run", "-g", "taboo", "-m", "llama3-8b"].
+        url: The URL of the daemon.
+        wait: Whether to wait until the job is finished. Default: True.
+        poll_seconds: The interval in which the job's status is queried while waiting.
+    """
+    client = daemon.DaemonClient(url)
+    job = client.submit(job_argv)
+    logger.info("Submitted job %s to %s: clem %s", job["job_id"], url, " ".join(job["argv"]))
+    if not wait:
+        print(f"Job {job['job_id']}: {job['status']}")
+        return
+    job = client.wait(job["job_id"], poll_seconds=poll_seconds)
+    print(f"Job {job['job_id']}: {job['status']} after {job['ended'] - job['started']:.1f}s"
+          + (f" ({job['message']})" if job["message"] else ""))
+    if job["status"] == daemon.FAILED:
+        sys.exit(1)
+
+
 def parse_kv(arg: str):
     if '=' not in arg:
         raise argparse.ArgumentTypeError(f"Invalid agent format: '{arg}'. Use key=value")
     return arg.split('=', 1)
 
 
+def batch_size_type(value: str) -> Union[int, str]:
+    """Parse the batch size argument: either a positive number or 'auto'."""
+    if value == batch_tuning.AUTO_BATCH_SIZE:
+        return value
+    return int(value)
+
+
 def read_gen_args(args: argparse.Namespace):
     """Get text generation inference parameters from CLI arguments.
     Handles sampling temperature and maximum number of tokens to generate.
@@ -327,7 +797,7 @@ def read_gen_args(args: argparse.Namespace):
     return dict(temperature=args.temperature, max_tokens=args.max_tokens)
 
 
-def cli(args: argparse.Namespace):
+def cli(args: argparse.Namespace, load_models: daemon.LoadModels = None):
     if args.command_name == "list":
         if args.mode == "games":
             list_games(args.selector, verbose=args.verbose)
@@ -348,7 +818,30 @@ def cli(args: argparse.Namespace):
             registry = KeyRegistry.register(args.name, reset=args.reset, force_cwd=args.cwd, **args.values)
             key = registry.get_key_for(args.name)
             print(f"Updated key registry at {registry.key_file_path} successfully: {key.to_json()}")
-    if args.command_name == "run":
+    if args.command_name == "run" and args.plan:
+        plan(args.game,
+             model_pairings=to_model_pairings(args.models) if args.matrix
+             else [backends.ModelSpec.from_strings(args.models)],
+             gen_args=read_gen_args(args),
+             experiment_name=args.experiment_name,
+             instances_filename=args.instances_filename,
+             results_dir_path=args.results_dir,
+             batch_size=args.max_batch_size if args.batch_size == batch_tuning.AUTO_BATCH_SIZE else args.batch_size)
+    elif args.command_name == "run" and args.matrix:
+        start = datetime.now()
+        try:
+            run_matrix(args.game,
+                       model_pairings=to_model_pairings(args.models),
+                       gen_args=read_gen_args(args),
+                       experiment_name=args.experiment_name,
+                       instances_filename=args.instances_filename,
+                       results_dir_path=args.results_dir,
+                       batch_size=args.batch_size,
+                       memory_budget=args.memory_budget,
+                       max_remote_pairings=args.max_remote_pairings)
+        finally:
+            logger.info("clem run took: %s", datetime.now() - start)
+    elif args.command_name == "run":
         start = datetime.now()
         try:
             run(args.game,
@@ -357,10 +850,35 @@ def cli(args: argparse.Namespace):
                 experiment_name=args.experiment_name,
                 instances_filename=args.instances_filename,
                 results_dir_path=args.results_dir,
-                batch_size=args.batch_size)
+                batch_size=args.batch_size,
+                max_batch_size=args.max_batch_size,
+                interleave=args.interleave,
+                order=args.order,
+                resume=args.resume,
+                retry_errors=args.retry_errors,
+                tolerance=args.tolerance,
+                confidence=args.confidence,
+                min_episodes=args.min_episodes,
+                seed=args.seed,
+                load_models=load_models)
         finally:
             logger.info("clem run took: %s", datetime.now() - start)
 
+    if args.command_name == "enqueue":
+        enqueue(args.game,
+                model_strings=args.models,
+                queue_path=args.queue,
+                gen_args=read_gen_args(args),
+                experiment_name=args.experiment_name,
+                instances_filename=args.instances_filename)
+    if args.command_name == "worker":
+        worker(args.queue,
+               results_dir_path=args.results_dir,
+               worker_id=args.worker_id,
+               lease_seconds=args.lease_seconds,
+               max_items=args.max_items,
+               poll_seconds=args.poll_seconds)
+
     if args.command_name == "serve":
         serve(args.game,
               learner_agent=args.learner_agent,
@@ -372,8 +890,14 @@ def cli(args: argparse.Namespace):
               port=args.port,
               results_dir=args.results_dir,
               run_id=args.run_id)
+    if args.command_name == "daemon":
+        run_daemon(host=args.host, port=args.port, memory_budget=args.memory_budget)
+    if args.command_name == "submit":
+        submit(args.job, url=args.url, wait=not args.no_wait)
     if args.command_name == "score":
         score(args.game, results_dir=args.results_dir, model_selector=args.model)
+    if args.command_name == "stats":
+        stats(args.results_dir)
     if args.command_name == "transcribe":
         transcripts(args.game, results_dir=args.results_dir)
     if args.command_name == "eval":
@@ -386,7 +910,7 @@ def cli(args: argparse.Namespace):
         )
 
 
-def main():
+def create_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser()
     parser.add_argument('--version', action='version', version=f'%(prog)s {get_version()}')
     sub_parsers = parser.add_subparsers(dest="command_name")
@@ -465,12 +989,64 @@ Update Behavior:
                             help="Specify the maximum number of tokens to be generated per turn (except for cohere). "
                                  "Be careful with high values which might lead to exceed your API token limits."
                                  "Default: 300.")
-    run_parser.add_argument("-b", "--batch_size", type=int, default=1,
+    run_parser.add_argument("-b", "--batch_size", type=batch_size_type, default=1,
                             help="The batch size for response generation, that is, "
                                  "the number of simultaneously played game instances. "
                                  "Applies to all models that support batchwise generation, "
-                                 "otherwise the game instances will be played sequentially."
+                                 "otherwise the game instances will be played sequentially. "
+                                 "Use 'auto' to calibrate the batch size with the highest throughput for each game "
+                                 "and to adapt it to the memory usage during the run (recorded in the run.json; "
+                                 "the largest batch size is used with --plan; not supported with --matrix). "
                                  "Default: 1 (sequential processing).")
+    run_parser.add_argument("--max_batch_size", type=int, default=64,
+                            help="The largest batch size to try with '-b auto'. Default: 64.")
+    run_parser.add_argument("--interleave", action="store_true",
+                            help="Play the game instances of all selected games in a single batched run, "
+                                 "so that the batches stay full across games. "
+                                 "Requires a batch size > 1 and that all models support batching.")
+    run_parser.add_argument("--resume", action="store_true",
+                            help="Skip the game instances that have already been completed in the results directory "
+                                 "(those with a completed.json), e.g., to continue an interrupted run.")
+    run_parser.add_argument("--retry_errors", action="store_true",
+                            help="Play only the game instances whose episodes ended with an error "
+                                 "(those with an error.json) in the results directory.")
+    run_parser.add_argument("--matrix", action="store_true",
+                            help="Play all selected games with each model given with -m in a single process "
+                                 "(instead of a single model pairing). Join two models with '+' to form a pairing, "
+                                 "e.g. -m llama3-8b gpt-4o llama3-8b+gpt-4o. Each model is loaded only once: "
+                                 "local models one after another, while remote models play concurrently. "
+                                 "Does not support --resume, --retry_errors, --tolerance, --order, --interleave "
+                                 "and '-b auto'.")
+    run_parser.add_argument("--memory_budget", type=float, default=None,
+                            help="The memory (in GB) for local models in a --matrix run. A loaded local model is "
+                                 "released when the next one would exceed the budget (estimated from the number of "
+                                 "parameters in the model registry). Default: None (keep all models loaded).")
+    run_parser.add_argument("--max_remote_pairings", type=int, default=4,
+                            help="The maximum number of pairings of remote models to play at the same time "
+                                 "in a --matrix run. Default: 4.")
+    run_parser.add_argument("--plan", action="store_true",
+                            help="Do not run, but estimate the number of calls, prompt and completion tokens, time "
+                                 "and cost of the run and report the instances that would exceed a model's "
+                                 "context_size. Uses the statistics of previous runs in the results directory "
+                                 "(see 'clem stats') and the 'pricing' (USD per 1M 'input' and 'output' tokens) "
+                                 "of the model specs.")
+    run_parser.add_argument("--tolerance", type=float, default=None,
+                            help="Stop playing an experiment's game instances (in randomized order) once the "
+                                 "confidence intervals of its main score and %% played are within ± tolerance "
+                                 "(in score points, e.g., 5). The achieved precision is stored as "
+                                 "early_stopping.json. Default: None (play all instances).")
+    run_parser.add_argument("--confidence", type=float, default=.95,
+                            help="The confidence level of the intervals for --tolerance. Default: 0.95.")
+    run_parser.add_argument("--min_episodes", type=int, default=5,
+                            help="The minimum number of episodes per experiment before stopping it "
+                                 "with --tolerance. Default: 5.")
+    run_parser.add_argument("--seed", type=int, default=None,
+                            help="The seed for the randomized order of the instances with --tolerance.")
+    run_parser.add_argument("--order", type=str, choices=["instances", "longest-first"], default="instances",
+                            help="The order in which the game instances are started. "
+                                 "'longest-first' starts the instances with the most requests in previous runs "
+                                 "first (see 'clem stats'), which shortens the tail of batched runs. "
+                                 "Default: instances (the order of the instances file).")
     run_parser.add_argument("-i", "--instances_filename", type=str, default=None,
                             help="The instances file name (.json suffix will be added automatically.")
     run_parser.add_argument("-r", "--results_dir", type=Path, default="results",
@@ -478,6 +1054,45 @@ Update Behavior:
                                  "For example '-r results/v1.5/de' or '-r /absolute/path/for/results'. "
                                  "When not specified, then the results will be located in 'results'")
 
+    enqueue_parser = sub_parsers.add_parser("enqueue", formatter_class=argparse.RawTextHelpFormatter,
+                                            description="Add work items to a work queue for 'clem worker' processes.")
+    enqueue_parser.add_argument("-q", "--queue", type=Path, required=True,
+                                help="Path to the SQLite work queue file, e.g., on shared storage. "
+                                     "Created when not existing.")
+    enqueue_parser.add_argument("-g", "--game", type=str, nargs="+", required=True,
+                                help="One or more game selectors (see 'clem run -h').")
+    enqueue_parser.add_argument("-m", "--models", type=str, nargs="*", required=True,
+                                help="The model pairing to play the games with (see 'clem run -h'). "
+                                     "Enqueue multiple times to add further pairings.")
+    enqueue_parser.add_argument("-e", "--experiment_name", type=str,
+                                help="Optional argument to only enqueue a specific experiment")
+    enqueue_parser.add_argument("-i", "--instances_filename", type=str, default=None,
+                                help="The instances file name (.json suffix will be added automatically.")
+    enqueue_parser.add_argument("-t", "--temperature", type=float, default=0.0,
+                                help="Argument to specify sampling temperature for the models. Default: 0.0.")
+    enqueue_parser.add_argument("-l", "--max_tokens", type=int, default=300,
+                                help="Specify the maximum number of tokens to be generated per turn. Default: 300.")
+
+    worker_parser = sub_parsers.add_parser("worker",
+                                           description="Lease and play work items from a work queue.")
+    worker_parser.add_argument("-q", "--queue", type=Path, required=True,
+                               help="Path to the SQLite work queue file (as created by 'clem enqueue').")
+    worker_parser.add_argument("-r", "--results_dir", type=Path, default="results",
+                               help="A relative or absolute path to the results root directory. "
+                                    "When not specified, then the results will be located in 'results'")
+    worker_parser.add_argument("--worker_id", type=str, default=None,
+                               help="Identifier of this worker, e.g. for its run file run.<worker_id>.json in the "
+                                    "run directories. Default: <hostname>-<pid>.")
+    worker_parser.add_argument("--lease_seconds", type=float, default=600.,
+                               help="Seconds after which a lease expires, when not renewed by the worker's "
+                                    "heartbeat. Default: 600.")
+    worker_parser.add_argument("--max_items", type=int, default=None,
+                               help="Stop after playing this number of items. Default: until the queue is drained.")
+    worker_parser.add_argument("--poll_seconds", type=float, default=None,
+                               help="Keep polling in this interval while other workers hold leases, "
+                                    "so that the leases of crashed workers are taken over. "
+                                    "Default: stop when no item is pending.")
+
     score_parser = sub_parsers.add_parser("score")
     score_parser.add_argument("-g", "--game", type=str,
                               help='A specific game name, a GameSpec-like JSON string object or "all" (default).',
@@ -490,6 +1105,14 @@ Update Behavior:
                                    "When not specified, then the results will be located in 'results'. "
                                    "Tip: Point to a specific game or model subdirectory to speed up file scanning.")
 
+    stats_parser = sub_parsers.add_parser("stats",
+                                          description="Collect turn-count and length statistics of previous runs "
+                                                      "to be used by 'clem run --order longest-first'.")
+    stats_parser.add_argument("-r", "--results_dir", type=str, default="results",
+                              help="A relative or absolute path to the results root directory. "
+                                   "The stats are stored as episode_stats.json in this directory. "
+                                   "Default: results")
+
     transcribe_parser = sub_parsers.add_parser("transcribe")
     transcribe_parser.add_argument("-g", "--game", type=str,
                                    help='A specific game name, a GameSpec-like JSON string object or "all" (default).',
@@ -562,8 +1185,60 @@ Update Behavior:
                               help="Identifier for this run, used as subdirectory name in results-dir. "
                                    "If not provided, derived from env-agent model names (e.g., 'gpt-4o-llama3'), "
                                    "otherwise defaults to 'run'.")
+
+    daemon_parser = sub_parsers.add_parser("daemon",
+                                           description="Serve a daemon that executes the run, score and eval jobs "
+                                                       "submitted with 'clem submit' and keeps the models loaded "
+                                                       "between jobs.")
+    daemon_parser.add_argument("--host", type=str, default=daemon.DEFAULT_HOST,
+                               help=f"The host to bind the daemon to. Default: {daemon.DEFAULT_HOST}")
+    daemon_parser.add_argument("--port", type=int, default=daemon.DEFAULT_PORT,
+                               help=f"The port to bind the daemon to. Default: {daemon.DEFAULT_PORT}")
+    daemon_parser.add_argument("--memory_budget", type=float, default=None,
+                               help="The memory (in GB) for local models. The least recently used local model is "
+                                    "released when the next one would exceed the budget (estimated from the number "
+                                    "of parameters in the model registry). Default: None (keep all models loaded).")
+
+    submit_parser = sub_parsers.add_parser("submit", formatter_class=argparse.RawTextHelpFormatter,
+                                           description="Submit a run, score or eval job to a 'clem daemon'. "
+                                                       "The job is executed in the current working directory.")
+    submit_parser.add_argument("--url", type=str, default=f"http://{daemon.DEFAULT_HOST}:{daemon.DEFAULT_PORT}",
+                               help=f"The URL of the daemon. Default: http://{daemon.DEFAULT_HOST}:"
+                                    f"{daemon.DEFAULT_PORT}")
+    submit_parser.add_argument("--no_wait", action="store_true",
+                               help="Return once the job is queued (instead of waiting until it is finished).")
+    submit_parser.add_argument("job", nargs=argparse.REMAINDER,
+                               help="""The clem command line of the job, e.g.:
+      $> clem submit run -g taboo -m llama3-8b
+      $> clem submit score -g taboo""")
+    return parser
+
+
+def check_args(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    """Reject the combinations of options that the selected command would ignore (exits via parser.error)."""
+    if args.command_name == "run" and args.matrix and not args.plan:
+        unsupported = [option for option, given in [
+            ("--resume", args.resume),
+            ("--retry_errors", args.retry_errors),
+            ("--tolerance", args.tolerance is not None),
+            ("--confidence", args.confidence != .95),
+            ("--min_episodes", args.min_episodes != 5),
+            ("--seed", args.seed is not None),
+            ("--order", args.order != "instances"),
+            ("--interleave", args.interleave),
+            ("-b auto", args.batch_size == batch_tuning.AUTO_BATCH_SIZE)
+        ] if given]
+        if unsupported:
+            parser.error(f"--matrix does not support {', '.join(unsupported)}: "
+                         f"run the model pairings one by one instead")
+
+
+def main():
+    parser = create_parser()
     try:  # catch all unexpected exceptions to ensure proper logging
-        cli(parser.parse_args())
+        args = parser.parse_args()
+        check_args(parser, args)
+        cli(args)
     except Exception as e:
         logger.exception(e)
         raise
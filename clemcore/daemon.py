@@ -0,0 +1,289 @@
+"""
+Long-lived run service that keeps the models loaded between jobs (clem daemon).
+
+Every 'clem run' pays the process startup again: the imports, the registry discovery, the backend import and,
+for local models, the loading of the weights and the tokenizer, which can take minutes for large models.
+The daemon loads each requested model once and keeps it resident. When a local model would exceed the memory
+budget, the least recently used local models are released (see runners.matrix.ModelCache). The game benchmarks are
+cached per process anyway (see GameBenchmark.load_from_spec), so that only modified game files are loaded again.
+
+Jobs are clem command lines (run, score or eval) that are submitted over a local HTTP API. They are queued and
+executed one after another in the working directory of the client, so that the results are written in the
+standard results layout (relative to the client) and the games and models of the client's directory are found.
+
+API (JSON):
+    POST /jobs {"argv": ["run", "-g", "taboo", "-m", "llama3-8b"], "cwd": "/path"} -> 202 the queued job
+    GET /jobs -> all jobs
+    GET /jobs/<job_id> -> the job with its status: queued, running, completed or failed
+    GET /models -> the names of the loaded models
+
+Example:
+    clem daemon --memory_budget 40 &
+    clem submit run -g taboo -m llama3-8b  # loads the model
+    clem submit run -g taboo -m llama3-8b  # the model is already loaded
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, asdict, field
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List, Dict, Callable, Optional
+
+from clemcore import backends
+from clemcore.backends import Model, ModelSpec, ModelRegistry
+from clemcore.clemgame.runners.matrix import ModelCache
+
+module_logger = logging.getLogger(__name__)
+stdout_logger = logging.getLogger("clemcore.run")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5080
+JOB_COMMANDS = ["run", "score", "eval"]
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+LoadModels = Callable[[List[ModelSpec], Dict], List[Model]]
+"""Loads the player models for the given model selectors and generation arguments (see backends.load_models)."""
+
+
+@dataclass
+class Job:
+    """A clem command line to be executed by the daemon."""
+    job_id: int
+    argv: List[str]
+    cwd: str
+    status: str = QUEUED
+    message: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    ended: Optional[float] = None
+
+    def to_json(self) -> Dict:
+        return asdict(self)
+
+
+class RunDaemon:
+    """
+    Executes the submitted jobs one after another in a worker thread with models that stay loaded between jobs.
+    """
+
+    def __init__(self,
+                 parse_args: Callable[[List[str]], argparse.Namespace],
+                 execute: Callable[[argparse.Namespace, LoadModels], None],
+                 *,
+                 memory_budget: float = None,
+                 load_model: Callable[[ModelSpec], Model] = None):
+        """
+        Args:
+            parse_args: Parses the command line of a job (as the clem CLI does).
+            execute: Executes the parsed command line of a job with the given function to load the player models.
+            memory_budget: The memory (in GB) available for local models. Default: None (keep all models loaded).
+            load_model: A function that loads a model given its (unified) model spec. Default: backends.load_model.
+        """
+        self.parse_args = parse_args
+        self.execute = execute
+        self.model_cache = ModelCache(load_model or (lambda model_spec: backends.load_model(model_spec, {})),
+                                      memory_budget)
+        self.jobs: Dict[int, Job] = {}
+        self._job_ids = itertools.count(1)
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def submit(self, argv: List[str], cwd: str) -> Job:
+        """
+        Queue a clem command line to be executed in the given working directory.
+
+        Raises:
+            ValueError: If the command line is invalid or its command is not supported by the daemon.
+        """
+        if not argv or argv[0] not in JOB_COMMANDS:
+            raise ValueError(f"The daemon executes only the commands {JOB_COMMANDS}, but got: {argv}")
+        try:
+            args = self.parse_args(argv)
+        except SystemExit:  # argparse exits on invalid arguments
+            raise ValueError(f"Invalid arguments: {argv}")
+        if getattr(args, "matrix", False):
+            raise ValueError("The daemon does not execute --matrix runs: Submit the model pairings one by one.")
+        if not os.path.isdir(cwd):
+            raise ValueError(f"The working directory {cwd} does not exist")
+        with self._lock:
+            job = Job(next(self._job_ids), list(argv), cwd)
+            self.jobs[job.job_id] = job
+        self._queue.put((job, args))
+        stdout_logger.info("Queued job %s: clem %s", job.job_id, " ".join(argv))
+        return job
+
+    def load_models(self, model_selectors: List[ModelSpec], gen_args: Dict) -> List[Model]:
+        """Return the resident models for the model selectors (loading the missing ones) with the given gen_args."""
+        model_registry = ModelRegistry.from_packaged_and_cwd_files()
+        model_specs = [model_registry.get_first_model_spec_that_unify_with(model_selector)
+                       for model_selector in model_selectors]
+        player_models = self.model_cache.acquire(model_specs)
+        for player_model in player_models:
+            player_model.set_gen_args(**gen_args)
+        return player_models
+
+    def loaded_models(self) -> List[str]:
+        return list(self.model_cache.models)
+
+    def start(self):
+        """Start the worker thread that executes the queued jobs."""
+        self._worker = threading.Thread(target=self._work, name="daemon-worker", daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout: float = None):
+        """Stop the worker thread after the current job and release all models."""
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join(timeout)
+            self._worker = None
+        self.model_cache.release_all()
+
+    def join(self):
+        """Wait until all queued jobs have been executed."""
+        self._queue.join()
+
+    def _work(self):
+        while True:
+            entry = self._queue.get()
+            try:
+                if entry is None:
+                    return
+                self._execute(*entry)
+            finally:
+                self._queue.task_done()
+
+    def _execute(self, job: Job, args: argparse.Namespace):
+        stdout_logger.info("Start job %s: clem %s (in %s)", job.job_id, " ".join(job.argv), job.cwd)
+        job.status, job.started = RUNNING, time.time()
+        # jobs are executed one after another, hence, changing the working directory for a job is safe
+        previous_cwd = os.getcwd()
+        try:
+            os.chdir(job.cwd)
+            self.execute(args, self.load_models)
+            job.status = COMPLETED
+        except SystemExit as e:  # the clem commands exit with a non-zero code on errors
+            job.status = COMPLETED if not e.code else FAILED
+            job.message = None if not e.code else f"Exited with code {e.code} (see the daemon's log)"
+        except Exception as e:
+            module_logger.exception("Job %s failed", job.job_id)
+            job.status, job.message = FAILED, str(e)
+        finally:
+            os.chdir(previous_cwd)
+            job.ended = time.time()
+        stdout_logger.info("Finished job %s (%s) after %.1fs", job.job_id, job.status, job.ended - job.started)
+
+    def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """Start the worker and serve the HTTP API until shutdown() is called (or the process is interrupted)."""
+        self.start()
+        self._server = ThreadingHTTPServer((host, port), _RequestHandler)
+        self._server.run_daemon = self
+        stdout_logger.info("Daemon listening on http://%s:%s", *self._server.server_address[:2])
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self.stop()
+
+    def shutdown(self):
+        """Stop serving the HTTP API (called from another thread)."""
+        if self._server is not None:
+            self._server.shutdown()
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+
+    @property
+    def run_daemon(self) -> RunDaemon:
+        return self.server.run_daemon
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path == "/jobs":
+            self._send(HTTPStatus.OK, [job.to_json() for job in self.run_daemon.jobs.values()])
+        elif path.startswith("/jobs/"):
+            job = self.run_daemon.jobs.get(int(path[len("/jobs/"):])) if path[len("/jobs/"):].isdigit() else None
+            if job is None:
+                self._send(HTTPStatus.NOT_FOUND, dict(error=f"No job at {self.path}"))
+            else:
+                self._send(HTTPStatus.OK, job.to_json())
+        elif path == "/models":
+            self._send(HTTPStatus.OK, self.run_daemon.loaded_models())
+        else:
+            self._send(HTTPStatus.NOT_FOUND, dict(error=f"Unknown path {self.path}"))
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._send(HTTPStatus.NOT_FOUND, dict(error=f"Unknown path {self.path}"))
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            job = self.run_daemon.submit(body.get("argv", []), body.get("cwd", os.getcwd()))
+        except (ValueError, AttributeError) as e:  # also invalid JSON
+            self._send(HTTPStatus.BAD_REQUEST, dict(error=str(e)))
+            return
+        self._send(HTTPStatus.ACCEPTED, job.to_json())
+
+    def _send(self, status: HTTPStatus, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        module_logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class DaemonClient:
+    """Submits jobs to a running daemon and queries their status (see RunDaemon)."""
+
+    def __init__(self, url: str = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout: float = 10.):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path: str, payload: Dict = None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise ValueError(json.loads(e.read()).get("error", str(e))) from None
+        except urllib.error.URLError as e:
+            raise ConnectionError(f"No daemon reachable at {self.url}. Start one with 'clem daemon'. ({e.reason})")
+
+    def submit(self, argv: List[str], cwd: str = None) -> Dict:
+        """Queue a clem command line (e.g. ["run", "-g", "taboo", "-m", "mock"]) to be executed in cwd."""
+        return self._request("/jobs", dict(argv=list(argv), cwd=os.path.abspath(cwd or os.getcwd())))
+
+    def get_job(self, job_id: int) -> Dict:
+        return self._request(f"/jobs/{job_id}")
+
+    def get_jobs(self) -> List[Dict]:
+        return self._request("/jobs")
+
+    def get_models(self) -> List[str]:
+        return self._request("/models")
+
+    def wait(self, job_id: int, poll_seconds: float = 1.) -> Dict:
+        """Poll the job until it is completed or failed and return it."""
+        while True:
+            job = self.get_job(job_id)
+            if job["status"] in (COMPLETED, FAILED):
+                return job
+            time.sleep(poll_seconds)
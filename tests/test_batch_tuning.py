@@ -0,0 +1,168 @@
+import unittest
+from typing import List, Dict
+
+from clemcore.clemgame import GameBenchmarkCallbackList, BatchResponseError
+from clemcore.clemgame.runners import batchwise, batch_tuning
+from clemcore.clemgame.runners.batch_tuning import BatchSizeTuner, is_out_of_memory
+from tests.test_batchwise_runner import RecordingBatchModel, RecordingCallback, make_benchmark, make_instances
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+
+class ThroughputModel(RecordingBatchModel):
+    """A batch model whose batches take the given seconds by batch size and run out of memory above a limit."""
+
+    def __init__(self, clock: FakeClock, seconds_by_batch_size: Dict[int, float], max_batch_size: int = None):
+        super().__init__()
+        self.clock = clock
+        self.seconds_by_batch_size = seconds_by_batch_size
+        self.max_batch_size = max_batch_size
+
+    def generate_batch_response(self, batch_messages: List[List[Dict]]):
+        if self.max_batch_size is not None and len(batch_messages) > self.max_batch_size:
+            raise RuntimeError("CUDA out of memory. Tried to allocate 2.00 GiB")
+        self.clock.now += self.seconds_by_batch_size.get(len(batch_messages), 1.)
+        return super().generate_batch_response(batch_messages)
+
+
+class ColdStartModel(ThroughputModel):
+    """A model whose first batch takes additionally 5 seconds (e.g. to compile kernels)."""
+
+    def generate_batch_response(self, batch_messages: List[List[Dict]]):
+        if not self.batch_sizes:
+            self.clock.now += 5.
+        return super().generate_batch_response(batch_messages)
+
+
+class MemoryReadings:
+
+    def __init__(self, readings: List[float] = None, default: float = None):
+        self.readings = list(readings or [])
+        self.default = default
+
+    def __call__(self):
+        return self.readings.pop(0) if self.readings else self.default
+
+
+PROMPTS = [[{"role": "user", "content": "start"}]]
+
+
+class BatchSizeCalibrationTestCase(unittest.TestCase):
+
+    def test_stops_when_the_throughput_does_not_increase(self):
+        clock = FakeClock()
+        model = ThroughputModel(clock, {1: 1., 2: 1., 4: 1.5, 8: 3.5})
+        tuner = BatchSizeTuner(max_batch_size=64, memory_usage=MemoryReadings(), clock=clock)
+        self.assertEqual(tuner.calibrate(model, PROMPTS), 4)
+        self.assertEqual(model.batch_sizes, [1, 1, 2, 4, 8])  # after a warm-up
+        self.assertEqual([point["batch_size"] for point in tuner.curve], [1, 2, 4, 8])
+
+    def test_warm_up_is_not_measured(self):
+        clock = FakeClock()
+        model = ColdStartModel(clock, {1: 1., 2: 2.5, 4: 5.})
+        tuner = BatchSizeTuner(max_batch_size=64, memory_usage=MemoryReadings(), clock=clock)
+        self.assertEqual(tuner.calibrate(model, PROMPTS), 1)  # batch size 2 would win against a cold start
+
+    def test_stops_when_out_of_memory(self):
+        clock = FakeClock()
+        model = ThroughputModel(clock, {}, max_batch_size=4)
+        tuner = BatchSizeTuner(max_batch_size=64, memory_usage=MemoryReadings(), clock=clock)
+        self.assertEqual(tuner.calibrate(model, PROMPTS), 4)
+        self.assertEqual(tuner.curve[-1]["error"], "out of memory")
+
+    def test_stops_when_the_memory_limit_is_exceeded(self):
+        clock = FakeClock()
+        model = ThroughputModel(clock, {})
+        memory = MemoryReadings([0., .5, .7, .95])  # the first reading resets the peak stats
+        tuner = BatchSizeTuner(max_batch_size=64, memory_limit=.9, memory_usage=memory, clock=clock)
+        self.assertEqual(tuner.calibrate(model, PROMPTS), 2)
+
+    def test_respects_the_max_batch_size(self):
+        clock = FakeClock()
+        model = ThroughputModel(clock, {})  # one second per batch, hence, larger batches are always better
+        tuner = BatchSizeTuner(max_batch_size=6, memory_usage=MemoryReadings(), clock=clock)
+        self.assertEqual(tuner.calibrate(model, PROMPTS), 4)
+
+    def test_without_prompts_uses_the_max_batch_size(self):
+        tuner = BatchSizeTuner(max_batch_size=16, memory_usage=MemoryReadings())
+        self.assertEqual(tuner.calibrate(None, []), 16)
+
+    def test_calibrate_renders_the_first_turn_prompts(self):
+        clock = FakeClock()
+        model = ThroughputModel(clock, {})
+        tuner = BatchSizeTuner(max_batch_size=4, memory_usage=MemoryReadings(), clock=clock)
+        batch_tuning.calibrate(make_benchmark(), make_instances([2, 3]), [model], tuner)
+        self.assertEqual(model.batch_sizes, [1, 1, 2, 4])
+        self.assertEqual(tuner.batch_size, 4)
+
+
+class BatchSizeAdaptionTestCase(unittest.TestCase):
+
+    def _calibrated_tuner(self, memory: MemoryReadings, batch_size=8, patience=2) -> BatchSizeTuner:
+        tuner = BatchSizeTuner(max_batch_size=batch_size, patience=patience, memory_usage=memory)
+        tuner.calibrate(None, [])
+        return tuner
+
+    def test_shrinks_on_high_memory_and_grows_back(self):
+        tuner = self._calibrated_tuner(MemoryReadings([.95, .95, .1, .1, .1, .1]))
+        tuner.observe(8)
+        self.assertEqual(tuner.batch_size, 6)
+        tuner.observe(6)
+        self.assertEqual(tuner.batch_size, 4)
+        tuner.observe(4)
+        self.assertEqual(tuner.batch_size, 4)  # not yet patient enough
+        tuner.observe(4)
+        self.assertEqual(tuner.batch_size, 5)
+        tuner.observe(5)
+        tuner.observe(5)
+        self.assertEqual(tuner.batch_size, 6)
+        self.assertEqual(len(tuner.to_report()["changes"]), 5)
+
+    def test_halves_when_out_of_memory(self):
+        tuner = self._calibrated_tuner(MemoryReadings())
+        tuner.observe(8, RuntimeError("CUDA out of memory"))
+        self.assertEqual(tuner.batch_size, 4)
+        tuner.observe(4, RuntimeError("something else"))
+        self.assertEqual(tuner.batch_size, 4)
+
+    def test_out_of_memory_rows_of_a_batch(self):
+        error = BatchResponseError({}, {0: RuntimeError("CUDA out of memory")})
+        self.assertTrue(is_out_of_memory(error))
+        self.assertFalse(is_out_of_memory(BatchResponseError({}, {0: RuntimeError("failed")})))
+
+    def test_batchwise_run_follows_the_tuner(self):
+        tuner = self._calibrated_tuner(MemoryReadings([.95]), batch_size=4, patience=100)
+        model = RecordingBatchModel()
+        recorder = RecordingCallback()
+        turns = [3] * 8
+        batchwise.run(make_benchmark(), make_instances(turns), [model],
+                      callbacks=GameBenchmarkCallbackList([recorder]), batch_size=4, pipelined=False,
+                      batch_size_tuner=tuner)
+        self.assertEqual(model.batch_sizes[0], 4)
+        self.assertTrue(all(size <= 3 for size in model.batch_sizes[1:]))
+        self.assertEqual(tuner.num_batches, len(model.batch_sizes))
+        self.assertEqual(sorted(recorder.ended), list(range(len(turns))))
+
+    def test_pipelined_run_follows_the_tuner_from_the_second_batch_after(self):
+        tuner = self._calibrated_tuner(MemoryReadings([.95]), batch_size=4, patience=100)
+        model = RecordingBatchModel()
+        recorder = RecordingCallback()
+        turns = [3] * 8
+        batchwise.run(make_benchmark(), make_instances(turns), [model],
+                      callbacks=GameBenchmarkCallbackList([recorder]), batch_size=4, pipelined=True,
+                      batch_size_tuner=tuner)
+        self.assertEqual(model.batch_sizes[:2], [4, 4])  # the second batch is collected while the first generates
+        self.assertTrue(all(size <= 3 for size in model.batch_sizes[2:]))
+        self.assertEqual(tuner.num_batches, len(model.batch_sizes))
+        self.assertEqual(sorted(recorder.ended), list(range(len(turns))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,418 @@
+import itertools
+import sys
+import threading
+import time
+import unittest
+from types import ModuleType
+from typing import List, Dict
+from unittest.mock import patch, MagicMock
+
+from clemcore.backends import ModelSpec, BatchGenerativeModel, Model, CustomResponseModel
+from clemcore.clemgame import GameBenchmark, GameBenchmarkCallback, GameBenchmarkCallbackList, GameInstances, \
+    GameSpec, DialogueGameMaster, Player
+from clemcore.clemgame.runners import batchwise, hybrid, dispatch
+
+
+class EchoPlayer(Player):
+
+    def _custom_response(self, context: Dict) -> str:
+        return "echo"
+
+
+class CountdownGameMaster(DialogueGameMaster):
+    """Players take turns until the number of responses given by the instance's 'turns' is reached."""
+
+    def _on_setup(self, **game_instance):
+        self.turns = game_instance["turns"]
+        self.num_responses = 0
+        for model in self.player_models:
+            self.add_player(EchoPlayer(model))
+        self.set_context_for(self.get_players()[0], "start")
+
+    def _parse_response(self, player: Player, response: str) -> str:
+        return response
+
+    def _advance_game(self, player: Player, parsed_response: str):
+        self.num_responses += 1
+        if self.num_responses >= self.turns:
+            self.state.succeed()
+            return
+        other_player = self.get_players()[self.num_responses % len(self.get_players())]
+        self.set_context_for(other_player, parsed_response)
+
+
+class CountdownBenchmark(GameBenchmark):
+
+    def create_game_master(self, experiment: dict, player_models: list) -> CountdownGameMaster:
+        return CountdownGameMaster(self.game_spec, experiment, player_models)
+
+
+class LazyImportGameMaster(CountdownGameMaster):
+    """Imports the game's additional module only when advancing the game (as games may do)."""
+
+    def _advance_game(self, player: Player, parsed_response: str):
+        import countdown_helpers
+        countdown_helpers.IMPORTED_BY.append(self.game_spec.game_name)
+        super()._advance_game(player, parsed_response)
+
+
+class LazyImportBenchmark(GameBenchmark):
+
+    def create_game_master(self, experiment: dict, player_models: list) -> LazyImportGameMaster:
+        return LazyImportGameMaster(self.game_spec, experiment, player_models)
+
+
+class RecordingBatchModel(BatchGenerativeModel):
+    """A batch model that responds with its name and records the size of each batch."""
+
+    def __init__(self, model_name="fake"):
+        super().__init__(ModelSpec(model_name=model_name))
+        self.set_gen_args(temperature=0.0, max_tokens=10)
+        self.batch_sizes: List[int] = []
+
+    def generate_response(self, messages: List[Dict]):
+        return self.generate_batch_response([messages])[0]
+
+    def generate_batch_response(self, batch_messages: List[List[Dict]]):
+        self.batch_sizes.append(len(batch_messages))
+        return [(messages, {}, self.name) for messages in batch_messages]
+
+
+class FailingBatchModel(RecordingBatchModel):
+    """A batch model whose batches fail when they contain a prompt that satisfies `fail_on`."""
+
+    def __init__(self, fail_on, model_name="fake"):
+        super().__init__(model_name)
+        self.fail_on = fail_on
+
+    def generate_batch_response(self, batch_messages: List[List[Dict]]):
+        if any(self.fail_on(messages) for messages in batch_messages):
+            raise RuntimeError("generation failed")
+        return super().generate_batch_response(batch_messages)
+
+
+class RecordingModel(Model):
+    """A non-batching model that responds with its name and records how many of its calls overlap."""
+
+    def __init__(self, model_name="judge", *, concurrent=False, delay=0.0, fail_on=None):
+        super().__init__(ModelSpec(model_name=model_name))
+        self.set_gen_args(temperature=0.0, max_tokens=10)
+        self.concurrent = concurrent
+        self.delay = delay
+        self.fail_on = fail_on
+        self.num_calls = 0
+        self.max_overlap = 0
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def supports_concurrency(self) -> bool:
+        return self.concurrent
+
+    def generate_response(self, messages: List[Dict]):
+        with self._lock:
+            self.num_calls += 1
+            self._running += 1
+            self.max_overlap = max(self.max_overlap, self._running)
+        try:
+            time.sleep(self.delay)
+            if self.fail_on is not None and self.fail_on(messages):
+                raise RuntimeError("generation failed")
+            return messages, {}, self.name
+        finally:
+            with self._lock:
+                self._running -= 1
+
+
+class RecordingCallback(GameBenchmarkCallback):
+
+    def __init__(self):
+        self.started, self.ended, self.errors = [], [], []
+        self.benchmarks_started, self.benchmarks_ended = [], []
+        self.steps = []
+
+    def on_benchmark_start(self, game_benchmark):
+        self.benchmarks_started.append(game_benchmark.game_name)
+
+    def on_benchmark_end(self, game_benchmark):
+        self.benchmarks_ended.append((game_benchmark.game_name, len(self.ended)))
+
+    def on_game_step(self, game_master, game_instance, game_step):
+        self.steps.append(game_instance["game_id"])
+
+    def on_game_start(self, game_master, game_instance):
+        self.started.append(game_instance["game_id"])
+
+    def on_game_end(self, game_master, game_instance, exception=None, rewards=None):
+        (self.ended if exception is None else self.errors).append(game_instance["game_id"])
+
+
+def make_benchmark(players=1, game_name="countdown"):
+    return CountdownBenchmark(GameSpec(game_name=game_name, game_path="/tmp", players=players))
+
+
+def make_instances(turns: List[int], game_name="countdown"):
+    rows = [{"game_name": game_name, "experiment": {"name": "exp"},
+             "game_instance": {"game_id": game_id, "turns": num_turns}}
+            for game_id, num_turns in enumerate(turns)]
+    return GameInstances(game_name, rows)
+
+
+def make_experiment_instances(game_name="taboo", experiments=("high", "low"), num_instances=3):
+    """Instances without game parameters, e.g. for selecting and ordering the rows of several experiments."""
+    rows = [{"game_name": game_name, "experiment": {"name": experiment}, "game_instance": {"game_id": game_id}}
+            for experiment in experiments for game_id in range(num_instances)]
+    return GameInstances(game_name, rows)
+
+
+class BatchwiseRunTestCase(unittest.TestCase):
+
+    def _run(self, turns, *, batch_size, **kwargs):
+        model = RecordingBatchModel()
+        recorder = RecordingCallback()
+        batchwise.run(make_benchmark(), make_instances(turns), [model],
+                      callbacks=GameBenchmarkCallbackList([recorder]), batch_size=batch_size, **kwargs)
+        return model, recorder
+
+    def test_all_instances_are_played(self):
+        turns = [1, 3, 2, 5, 1, 4]
+        model, recorder = self._run(turns, batch_size=2)
+        self.assertEqual(sorted(recorder.ended), list(range(len(turns))))
+        self.assertEqual(sum(model.batch_sizes), sum(turns))
+        self.assertTrue(all(size <= 2 for size in model.batch_sizes))
+
+    def test_batches_stay_full_until_the_tail(self):
+        """Finished sessions are replaced immediately, so only the final batches are partial."""
+        model, recorder = self._run([1, 5, 2, 6, 1, 3, 4, 2, 1, 1], batch_size=3)
+        first_partial = next(i for i, size in enumerate(model.batch_sizes) if size < 3)
+        self.assertTrue(all(size < 3 for size in model.batch_sizes[first_partial:]), model.batch_sizes)
+
+    def test_sessions_are_stepped_while_the_next_batch_generates(self):
+        for pipelined in [True, False]:
+            with self.subTest(pipelined=pipelined):
+                model = RecordingBatchModel()
+                generating = []
+                stepped_while_generating = []
+                generate = model.generate_batch_response
+
+                def generate_batch_response(batch_messages):
+                    generating.append(True)
+                    time.sleep(0.02)
+                    try:
+                        return generate(batch_messages)
+                    finally:
+                        generating.pop()
+
+                class StepRecorder(RecordingCallback):
+                    def on_game_step(self, game_master, game_instance, game_step):
+                        stepped_while_generating.append(bool(generating))
+
+                model.generate_batch_response = generate_batch_response
+                recorder = StepRecorder()
+                turns = [3, 2, 4, 3, 2, 3, 1, 2]
+                batchwise.run(make_benchmark(), make_instances(turns), [model],
+                              callbacks=GameBenchmarkCallbackList([recorder]), batch_size=2, pipelined=pipelined)
+                self.assertEqual(sorted(recorder.ended), list(range(len(turns))))
+                self.assertEqual(len(stepped_while_generating), sum(turns))
+                self.assertEqual(any(stepped_while_generating), pipelined)
+
+    def test_sessions_are_set_up_lazily(self):
+        """Sessions are only set up when there is room in the window, i.e., not all before the first batch."""
+        model = RecordingBatchModel()
+        recorder = RecordingCallback()
+        started_before_first_batch = []
+        generate = model.generate_batch_response
+
+        def generate_batch_response(batch_messages):
+            if not started_before_first_batch:
+                started_before_first_batch.append(len(recorder.started))
+            return generate(batch_messages)
+
+        model.generate_batch_response = generate_batch_response
+        batchwise.run(make_benchmark(), make_instances([2] * 10), [model],
+                      callbacks=GameBenchmarkCallbackList([recorder]), batch_size=2, max_sessions=3)
+        self.assertEqual(started_before_first_batch, [3])
+        self.assertEqual(sorted(recorder.ended), list(range(10)))
+
+    def test_two_models_generate_full_batches(self):
+        """The observations are batched per model, so that Player.batch_response does not split them."""
+        model_a, model_b = RecordingBatchModel("model-a"), RecordingBatchModel("model-b")
+        recorder = RecordingCallback()
+        turns = [2, 5, 3, 6, 4, 7, 3, 5]  # the sessions get out of step, so that both models are waited for
+        batchwise.run(make_benchmark(players=2), make_instances(turns), [model_a, model_b],
+                      callbacks=GameBenchmarkCallbackList([recorder]), batch_size=3, pipelined=False)
+        self.assertEqual(sorted(recorder.ended), list(range(len(turns))))
+        self.assertEqual(sum(model_a.batch_sizes) + sum(model_b.batch_sizes), sum(turns))
+        self.assertEqual(model_a.batch_sizes, [3, 3, 3, 3, 3, 3, 2])
+        self.assertEqual(len(model_b.batch_sizes), 6)  # mixed batches would be split into 22 calls in total
+
+    def test_programmatic_turns_are_resolved_inline(self):
+        for pipelined in [False, True]:
+            with self.subTest(pipelined=pipelined):
+                model = RecordingBatchModel()
+                recorder = RecordingCallback()
+                turns = [4, 6, 4, 5, 3, 4]
+                with patch.object(batchwise.GameSession, "collate_fn",
+                                  MagicMock(wraps=batchwise.GameSession.collate_fn)) as collate_fn:
+                    batchwise.run(make_benchmark(players=2), make_instances(turns), [model, CustomResponseModel()],
+                                  callbacks=GameBenchmarkCallbackList([recorder]), batch_size=3, pipelined=pipelined)
+                self.assertEqual(sorted(recorder.ended), list(range(len(turns))))
+                self.assertEqual(sum(model.batch_sizes), sum((t + 1) // 2 for t in turns))
+                self.assertEqual(len(recorder.steps), sum(turns))
+                # only the turns of the generative model are batched
+                self.assertEqual(collate_fn.call_count, len(model.batch_sizes))
+
+    def test_background_setup(self):
+        turns = [3, 1, 2, 2, 4, 1, 1, 2]
+        model, recorder = self._run(turns, batch_size=3, setup_workers=2)
+        self.assertEqual(sorted(recorder.ended), list(range(len(turns))))
+        self.assertEqual(sum(model.batch_sizes), sum(turns))
+
+    def test_failing_setup_is_skipped(self):
+        instances = make_instances([1, 1, 1])
+        list(instances)[1]["game_instance"].pop("turns")  # provoke a KeyError during setup
+        model = RecordingBatchModel()
+        recorder = RecordingCallback()
+        batchwise.run(make_benchmark(), instances, [model],
+                      callbacks=GameBenchmarkCallbackList([recorder]), batch_size=2)
+        self.assertEqual(sorted(recorder.ended), [0, 2])
+
+    def test_failing_rows_abort_only_their_sessions(self):
+        for pipelined in [False, True]:
+            with self.subTest(pipelined=pipelined):
+                model = FailingBatchModel(fail_on=lambda messages: len(messages) > 3)  # fails on the third turn
+                recorder = RecordingCallback()
+                batchwise.run(make_benchmark(), make_instances([2, 4, 1, 3, 2, 5]), [model],
+                              callbacks=GameBenchmarkCallbackList([recorder]), batch_size=3, pipelined=pipelined)
+                self.assertEqual(sorted(recorder.ended), [0, 2, 4])
+                self.assertEqual(sorted(recorder.errors), [1, 3, 5])
+
+    def test_raises_if_no_session_can_be_set_up(self):
+        instances = make_instances([1])
+        list(instances)[0]["game_instance"].pop("turns")
+        with self.assertRaises(RuntimeError):
+            batchwise.run(make_benchmark(), instances, [RecordingBatchModel()],
+                          callbacks=GameBenchmarkCallbackList(), batch_size=2)
+
+
+class InterleavedRunTestCase(unittest.TestCase):
+
+    def test_sessions_of_all_games_share_the_batches(self):
+        model = RecordingBatchModel()
+        recorder = RecordingCallback()
+        turns_by_game = {"short": [1, 1, 2], "long": [4, 3, 5, 2, 4], "empty": []}
+        batchwise.run_interleaved([make_benchmark(game_name=game_name) for game_name in turns_by_game],
+                                  [make_instances(turns, game_name) for game_name, turns in turns_by_game.items()],
+                                  [model], callbacks=GameBenchmarkCallbackList([recorder]), batch_size=3,
+                                  pipelined=False)
+        self.assertEqual(len(recorder.ended), 8)
+        self.assertEqual(sum(model.batch_sizes), sum(sum(turns) for turns in turns_by_game.values()))
+        self.assertEqual(recorder.benchmarks_started, ["short", "long", "empty"])
+        # each game ends once, as soon as its own sessions are done, e.g. the short game before the long one
+        self.assertEqual([game_name for game_name, _ in recorder.benchmarks_ended], ["empty", "short", "long"])
+        self.assertLess(dict(recorder.benchmarks_ended)["short"], 8)
+        # the batches do not drain at the end of the short game
+        first_partial = next(i for i, size in enumerate(model.batch_sizes) if size < 3)
+        self.assertTrue(all(size < 3 for size in model.batch_sizes[first_partial:]), model.batch_sizes)
+
+    def test_games_that_stop_early_end_as_well(self):
+        class StoppedInstances:
+            """Reports all instances, but provides only the first rows (as after an interrupt)."""
+
+            def __init__(self, game_instances, num_rows):
+                self.game_instances, self.num_rows = game_instances, num_rows
+
+            def __len__(self):
+                return len(self.game_instances)
+
+            def __iter__(self):
+                return itertools.islice(iter(self.game_instances), self.num_rows)
+
+        recorder = RecordingCallback()
+        batchwise.run_interleaved([make_benchmark(game_name="first"), make_benchmark(game_name="second")],
+                                  [StoppedInstances(make_instances([2, 3, 1, 4], "first"), 2),
+                                   StoppedInstances(make_instances([1, 1], "second"), 0)],
+                                  [RecordingBatchModel()], callbacks=GameBenchmarkCallbackList([recorder]),
+                                  batch_size=2, pipelined=False)
+        self.assertEqual(len(recorder.ended), 2)
+        self.assertEqual(sorted(game_name for game_name, _ in recorder.benchmarks_ended), ["first", "second"])
+
+    def test_games_use_their_own_additional_modules(self):
+        game_benchmarks, helpers = [], []
+        for game_name in ["first", "second"]:
+            game_benchmark = LazyImportBenchmark(GameSpec(game_name=game_name, game_path="/tmp", players=1))
+            module = ModuleType("countdown_helpers")
+            module.IMPORTED_BY = []
+            game_benchmark.set_extra_modules({"countdown_helpers": module})
+            game_benchmark.close()  # as the cli does, so that the modules of the games do not shadow each other
+            game_benchmarks.append(game_benchmark)
+            helpers.append(module)
+        recorder = RecordingCallback()
+        game_instances = [make_instances([2, 1, 3], "first"), make_instances([1, 2], "second")]
+        batchwise.run_interleaved(game_benchmarks, game_instances, [RecordingBatchModel()],
+                                  callbacks=GameBenchmarkCallbackList([recorder]), batch_size=2, pipelined=False)
+        self.assertEqual(recorder.errors, [])
+        self.assertEqual(helpers[0].IMPORTED_BY, ["first"] * 6)
+        self.assertEqual(helpers[1].IMPORTED_BY, ["second"] * 3)
+        self.assertNotIn("countdown_helpers", sys.modules)
+
+
+class HybridRunTestCase(unittest.TestCase):
+
+    def _run(self, turns, judge, *, batch_size=3, **kwargs):
+        model = RecordingBatchModel()
+        recorder = RecordingCallback()
+        hybrid.run(make_benchmark(players=2), make_instances(turns), [model, judge],
+                   callbacks=GameBenchmarkCallbackList([recorder]), batch_size=batch_size, **kwargs)
+        return model, recorder
+
+    def test_mixed_pairing_batches_the_batching_model(self):
+        turns = [4, 2, 5, 3, 6, 2, 3]
+        judge = RecordingModel()
+        model, recorder = self._run(turns, judge)
+        self.assertEqual(sorted(recorder.ended), list(range(len(turns))))
+        self.assertEqual(sum(model.batch_sizes), sum((t + 1) // 2 for t in turns))  # the first player starts
+        self.assertEqual(judge.num_calls, sum(t // 2 for t in turns))
+        self.assertGreater(max(model.batch_sizes), 1)
+        self.assertTrue(all(size <= 3 for size in model.batch_sizes))
+        self.assertEqual(judge.max_overlap, 1, "Models without concurrency support are called one at a time")
+
+    def test_concurrent_model_is_called_concurrently(self):
+        judge = RecordingModel(concurrent=True, delay=0.05)
+        _, recorder = self._run([2] * 6, judge, max_concurrency=3)
+        self.assertEqual(sorted(recorder.ended), list(range(6)))
+        self.assertGreater(judge.max_overlap, 1)
+        self.assertLessEqual(judge.max_overlap, 3)
+
+    def test_failing_call_aborts_only_its_session(self):
+        judge = RecordingModel(fail_on=lambda messages: len(messages) > 2)  # fails on its second turn
+        _, recorder = self._run([2, 4, 3, 2], judge)
+        self.assertEqual(sorted(recorder.ended), [0, 2, 3])
+        self.assertEqual(recorder.errors, [1])
+
+    def test_failing_rows_of_a_batch_abort_only_their_sessions(self):
+        model = FailingBatchModel(fail_on=lambda messages: len(messages) > 2)  # fails on its second turn
+        recorder = RecordingCallback()
+        hybrid.run(make_benchmark(players=2), make_instances([2, 4, 3, 2]), [model, RecordingModel()],
+                   callbacks=GameBenchmarkCallbackList([recorder]), batch_size=3)
+        self.assertEqual(sorted(recorder.ended), [0, 3])
+        self.assertEqual(sorted(recorder.errors), [1, 2])
+
+    def test_dispatch_selects_hybrid_for_mixed_pairings(self):
+        with patch.object(hybrid, "run") as hybrid_run, patch.object(batchwise, "run") as batchwise_run:
+            dispatch.run(make_benchmark(players=2), make_instances([1]), [RecordingBatchModel(), RecordingModel()],
+                         batch_size=2)
+            hybrid_run.assert_called_once()
+            batchwise_run.assert_not_called()
+
+    def test_dispatch_keeps_sequential_for_human_players(self):
+        human = RecordingModel("human")
+        with patch.object(hybrid, "run") as hybrid_run, \
+                patch("clemcore.clemgame.runners.sequential.run") as sequential_run:
+            dispatch.run(make_benchmark(players=2), make_instances([1]), [RecordingBatchModel(), human],
+                         batch_size=2)
+            hybrid_run.assert_not_called()
+            sequential_run.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
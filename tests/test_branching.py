@@ -1,4 +1,6 @@
+from copy import deepcopy
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 
@@ -6,7 +8,10 @@ from clemcore import backends
 from clemcore.backends import Model
 from clemcore.clemgame import GameBenchmark, GameRegistry, GameInstances, GameBenchmarkCallbackList, EpochResultsFolder, \
     EpochResultsFolderCallback, InstanceFileSaver, ExperimentFileSaver, InteractionsFileSaver, SignalFileSaver
+from clemcore.clemgame.envs.pettingzoo.master import GameMasterEnv
 from clemcore.clemgame.runners import branching
+from tests.test_batchwise_runner import RecordingCallback, RecordingBatchModel, RecordingModel, make_benchmark, \
+    make_instances
 
 TEST_GAME = "taboo"
 TEST_MODEL = "mock"
@@ -87,3 +92,258 @@ class TestBranchingRunner:
                 branching.is_round(0)
             )
         )
+
+
+class SharedRecordingCallback(RecordingCallback):
+    """Records the events of all branches (the callback is not copied with the branches)."""
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class TestCopyOnWriteBranching:
+
+    def _run(self, turns, branching_factor, recorder, **kwargs):
+        branching.run(make_benchmark(players=2), make_instances(turns), [RecordingBatchModel()],
+                      callbacks=GameBenchmarkCallbackList([recorder]), branching_factor=branching_factor, **kwargs)
+
+    def test_no_copies_without_branching(self):
+        recorder = SharedRecordingCallback()
+        with patch.object(branching, "deepcopy", wraps=deepcopy) as copy_mock:
+            self._run([4, 2], 1, recorder)
+        copy_mock.assert_not_called()
+        assert sorted(recorder.ended) == [0, 1]
+        assert len(recorder.steps) == 6
+
+    def test_copies_only_on_branching_points(self):
+        recorder = SharedRecordingCallback()
+        with patch.object(branching, "deepcopy", wraps=deepcopy) as copy_mock:
+            self._run([3], 2, recorder)
+        assert recorder.ended == [0] * 8  # 2^3 leaves
+        assert copy_mock.call_count == 1 + 2 + 4  # the parent continues as one of the branches
+        assert len(recorder.steps) == 2 + 4 + 8
+
+    def test_copies_share_the_configuration_but_not_the_histories(self):
+        model = RecordingBatchModel()
+        env = GameMasterEnv(make_benchmark(players=2))
+        row = next(iter(make_instances([4])))
+        env.reset(options=dict(player_models=[model], experiment=row["experiment"], game_instance=row["game_instance"]))
+        player = env.player_by_agent_id[env.agent_selection]
+        env.step(player(env.observe(env.agent_selection)))
+        branch = deepcopy(env)
+        branch_player = branch.player_by_agent_id["player_0"]
+        assert branch.game_benchmark is env.game_benchmark
+        assert branch.game_master.experiment is env.game_master.experiment
+        assert branch_player.model is model
+        assert branch_player.get_perspective() is not player.get_perspective()
+        assert branch_player.get_perspective() == player.get_perspective()
+        branch_player.get_perspective()[-1]["content"] = "edited only in the branch"
+        assert player.get_perspective()[-1]["content"] != "edited only in the branch"
+        branch_player.get_perspective().append(dict(role="user", content="only in the branch"))
+        assert len(branch_player.get_perspective()) == len(player.get_perspective()) + 1
+
+
+class TestBatchedBranching:
+
+    def _run(self, turns, model, branching_factor=2, **kwargs):
+        recorder = SharedRecordingCallback()
+        branching.run(make_benchmark(), make_instances(turns), [model],
+                      callbacks=GameBenchmarkCallbackList([recorder]), branching_factor=branching_factor, **kwargs)
+        return recorder
+
+    def test_branches_are_generated_in_batches(self):
+        model = RecordingBatchModel()
+        recorder = self._run([3], model)
+        assert model.batch_sizes == [2, 4, 8]
+        assert len(recorder.ended) == 8
+
+    def test_branches_of_several_instances_share_the_batches(self):
+        model = RecordingBatchModel()
+        recorder = self._run([3, 3, 2], model, max_instances=2)
+        assert model.batch_sizes == [4, 8, 16, 2, 4]
+        assert sorted(set(recorder.ended)) == [0, 1, 2]
+        assert len(recorder.ended) == 8 + 8 + 4
+
+    def test_batch_size_limits_the_batches(self):
+        model = RecordingBatchModel()
+        self._run([3], model, batch_size=3)
+        assert model.batch_sizes == [2, 3, 1, 3, 3, 2]
+
+    def test_concurrent_model_is_called_concurrently(self):
+        model = RecordingModel(concurrent=True, delay=.05)
+        recorder = self._run([2], model, branching_factor=4)
+        assert model.num_calls == 4 + 16
+        assert model.max_overlap > 1
+        assert len(recorder.ended) == 16
+
+    def test_failing_branch_aborts_only_itself(self):
+        num_calls = [0]
+
+        def fail_on_second_call(messages):
+            num_calls[0] += 1
+            return num_calls[0] == 2
+
+        recorder = self._run([2], RecordingModel(fail_on=fail_on_second_call))
+        assert recorder.errors == [0]
+        assert recorder.ended == [0, 0]
+
+
+
+class SamplingModel(RecordingBatchModel):
+    """A batch model that samples several responses to the same messages with a single call."""
+
+    def __init__(self, model_name="fake", fail=False):
+        super().__init__(model_name)
+        self.fail = fail
+        self.sample_sizes = []
+
+    def supports_sampling(self) -> bool:
+        return True
+
+    def generate_samples(self, messages, n):
+        if self.fail:
+            raise RuntimeError("sampling failed")
+        self.sample_sizes.append(n)
+        return [(messages, {}, f"{self.name}-{idx}") for idx in range(n)]
+
+
+class TestSampledBranching:
+
+    def _run(self, turns, model, branching_factor=2, **kwargs):
+        recorder = SharedRecordingCallback()
+        branching.run(make_benchmark(), make_instances(turns), [model],
+                      callbacks=GameBenchmarkCallbackList([recorder]), branching_factor=branching_factor, **kwargs)
+        return recorder
+
+    def test_branch_responses_are_sampled_with_one_call(self):
+        model = SamplingModel()
+        recorder = self._run([3], model, branching_factor=3)
+        assert model.sample_sizes == [3] * (1 + 3 + 9)
+        assert model.batch_sizes == []
+        assert len(recorder.ended) == 27
+
+    def test_continued_branches_are_batched(self):
+        model = SamplingModel()
+        recorder = self._run([3], model, branching_factor=3, branching_condition=branching.is_round(1))
+        assert model.sample_sizes == [3]
+        assert model.batch_sizes == [1, 3]  # before and after the branching point
+        assert len(recorder.ended) == 3
+
+    def test_model_without_sampling_is_batched(self):
+        model = RecordingBatchModel()
+        self._run([2], model, branching_factor=3)
+        assert model.batch_sizes == [3, 9]
+
+    def test_failed_sampling_aborts_the_siblings(self):
+        recorder = self._run([2], SamplingModel(fail=True))
+        assert recorder.errors == [0, 0]
+
+
+class TestMemoizedBranching:
+
+    def _run(self, turns, model, branching_factor=2, **kwargs):
+        recorder = SharedRecordingCallback()
+        branching.run(make_benchmark(), make_instances(turns), [model],
+                      callbacks=GameBenchmarkCallbackList([recorder]), branching_factor=branching_factor,
+                      memoize=True, **kwargs)
+        return recorder
+
+    def test_identical_contexts_are_generated_once(self):
+        model = RecordingBatchModel()
+        recorder = self._run([3], model)
+        assert model.batch_sizes == [1, 1, 1]
+        assert len(recorder.ended) == 8
+        assert len(recorder.steps) == 2 + 4 + 8
+
+    def test_memo_is_not_shared_among_instances(self):
+        model = RecordingBatchModel()
+        recorder = self._run([3, 3], model, max_instances=2)
+        assert model.batch_sizes == [2, 2, 2]
+        assert sorted(recorder.ended) == [0] * 8 + [1] * 8
+
+    def test_sampling_models_are_not_memoized(self):
+        model = RecordingBatchModel()
+        model.set_gen_args(temperature=0.7, max_tokens=10)
+        self._run([3], model)
+        assert model.batch_sizes == [2, 4, 8]
+
+    def test_memo_hits_are_counted(self):
+        model = RecordingBatchModel()
+        recorder = SharedRecordingCallback()
+        env = GameMasterEnv(make_benchmark(), callbacks=GameBenchmarkCallbackList([recorder]))
+        row = next(iter(make_instances([2])))
+        env.reset(options=dict(player_models=[model], experiment=row["experiment"], game_instance=row["game_instance"]))
+        runner = branching.BranchingRunner(env, branching_factor=3, branching_condition=branching.is_round(0),
+                                           memoize=True)
+        runner.run()
+        assert model.batch_sizes == [1, 1]
+        assert (runner.memo_hits, runner.memo_misses) == (4, 2)
+        assert len(recorder.ended) == 3
+
+
+class EventOrderCallback(SharedRecordingCallback):
+    """Records the order of the steps and the ends of all branches."""
+
+    def __init__(self):
+        super().__init__()
+        self.events = []
+
+    def on_game_step(self, game_master, game_instance, game_step):
+        super().on_game_step(game_master, game_instance, game_step)
+        self.events.append("step")
+
+    def on_game_end(self, game_master, game_instance, exception=None, rewards=None):
+        super().on_game_end(game_master, game_instance, exception, rewards)
+        self.events.append("end")
+
+
+class TestBranchTraversal:
+
+    def _run(self, turns, model, branching_factor=2, **kwargs):
+        recorder = EventOrderCallback()
+        branching.run(make_benchmark(), make_instances(turns), [model],
+                      callbacks=GameBenchmarkCallbackList([recorder]), branching_factor=branching_factor, **kwargs)
+        return recorder
+
+    def test_bounded_frontier_limits_the_live_branches(self):
+        model = RecordingBatchModel()
+        recorder = self._run([3], model, max_branches=4)
+        assert max(model.batch_sizes) == 4
+        assert sum(model.batch_sizes) == 2 + 4 + 8  # all branches are played nevertheless
+        assert len(recorder.ended) == 8
+
+    def test_depth_first_finishes_trajectories_steadily(self):
+        model = RecordingBatchModel()
+        recorder = self._run([3], model, traversal=branching.DEPTH_FIRST)
+        assert set(model.batch_sizes) == {1}
+        assert len(model.batch_sizes) == 2 + 4 + 8
+        assert len(recorder.ended) == 8
+        assert recorder.events.index("end") == 3  # the first trajectory ends after its three steps
+
+    def test_depth_first_copies_only_started_branches(self):
+        with patch.object(branching, "deepcopy", wraps=deepcopy) as copy_mock:
+            self._run([3], RecordingBatchModel(), traversal=branching.DEPTH_FIRST, max_branches=2)
+        assert copy_mock.call_count == 1 + 2 + 4  # as for breadth-first: the parent is the last branch
+
+    def test_depth_first_with_several_instances(self):
+        recorder = self._run([2, 3], RecordingBatchModel(), traversal=branching.DEPTH_FIRST, max_instances=2)
+        assert sorted(recorder.ended) == [0] * 4 + [1] * 8
+
+    def test_beam_keeps_the_best_branches(self):
+        scores = {}
+
+        def score_func(env):  # prefer the most recently created branches
+            return scores.setdefault(id(env), len(scores))
+
+        model = RecordingBatchModel()
+        runner_recorder = self._run([3], model, traversal=branching.BEAM, max_branches=2, score_func=score_func)
+        assert model.batch_sizes == [2, 4, 4]
+        assert len(runner_recorder.ended) == 4  # the branches of the last step are not pruned (they are done)
+
+    def test_invalid_traversals(self):
+        with pytest.raises(ValueError):
+            branching.validate_traversal("random", None, None)
+        with pytest.raises(ValueError):
+            branching.validate_traversal(branching.BREADTH_FIRST, 0, None)
+        with pytest.raises(ValueError):
+            branching.validate_traversal(branching.BEAM, 2, None)
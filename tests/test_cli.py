@@ -1,9 +1,65 @@
+import argparse
+import io
+import tempfile
 import unittest
-from contextlib import ExitStack
+from contextlib import ExitStack, redirect_stdout, redirect_stderr
+from pathlib import Path
 from unittest.mock import patch, MagicMock
 
-from clemcore.cli import main, score, run
+from clemcore.cli import main, score, run, worker, create_parser, check_args, _resolve_game_specs
+from clemcore.clemgame import RunFileSaver
 from clemcore.clemgame.registry import GameSpec
+from clemcore.clemgame.runners.distributed import WorkQueue
+from tests.test_batchwise_runner import RecordingBatchModel
+
+
+class CLIHelpTestCase(unittest.TestCase):
+
+    def test_help_of_every_command_renders(self):
+        parser = create_parser()
+        sub_parsers = next(action for action in parser._actions if isinstance(action, argparse._SubParsersAction))
+        self.assertTrue(sub_parsers.choices)
+        for command_name, sub_parser in [("clem", parser)] + list(sub_parsers.choices.items()):
+            with self.subTest(command=command_name):
+                with redirect_stdout(io.StringIO()), self.assertRaises(SystemExit) as exit_info:
+                    parser.parse_args(["-h"] if sub_parser is parser else [command_name, "-h"])
+                self.assertEqual(exit_info.exception.code, 0)
+
+
+class CLIArgsTestCase(unittest.TestCase):
+
+    def _check(self, argv):
+        parser = create_parser()
+        check_args(parser, parser.parse_args(argv))
+
+    def test_matrix_rejects_the_options_it_would_ignore(self):
+        run_args = ["run", "-g", "taboo", "-m", "model-a", "model-b", "--matrix"]
+        for options in [["--resume"], ["--retry_errors"], ["--tolerance", "5"], ["--seed", "1"],
+                        ["--order", "longest-first"], ["--interleave"], ["-b", "auto"]]:
+            with self.subTest(options=options):
+                with redirect_stderr(io.StringIO()) as stderr, self.assertRaises(SystemExit) as exit_info:
+                    self._check(run_args + options)
+                self.assertEqual(exit_info.exception.code, 2)
+                self.assertIn(options[0], stderr.getvalue())
+
+    def test_matrix_accepts_the_options_it_supports(self):
+        self._check(["run", "-g", "taboo", "-m", "model-a", "model-b", "--matrix", "-b", "8", "--memory_budget", "40"])
+        self._check(["run", "-g", "taboo", "-m", "model-a", "model-b", "--matrix", "--plan", "-b", "auto"])
+        self._check(["run", "-g", "taboo", "-m", "model-a", "--resume", "--tolerance", "5", "-b", "auto"])
+
+
+class CLIWorkerTestCase(unittest.TestCase):
+
+    def test_each_worker_writes_its_own_run_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            queue_path = Path(tmp_dir) / "queue.sqlite"
+            WorkQueue(queue_path)
+            with patch("clemcore.cli.distributed.run") as mock_run:
+                worker(queue_path, results_dir_path=Path(tmp_dir) / "results", worker_id="node-1")
+            callbacks = mock_run.call_args.kwargs["create_callbacks"]([RecordingBatchModel()])
+            run_file_saver = next(c for c in callbacks.callbacks if isinstance(c, RunFileSaver))
+            self.assertEqual(run_file_saver.file_name, "run.node-1.json")
+            self.assertTrue((run_file_saver.results_folder.to_run_dir_path() / "run.node-1.json").is_file())
 
 
 class CLIExceptionLoggingTestCase(unittest.TestCase):
@@ -43,13 +99,13 @@ class RunGameDeduplicationTestCase(unittest.TestCase):
         "clemcore.cli.GameInstances",
     ]
 
-    def _run(self, game_selectors):
+    def _run(self, game_selectors, **kwargs):
         """Call cli.run() with all I/O side effects suppressed."""
         with ExitStack() as stack:
             for target in self._IO_PATCHES:
                 kw = {"return_value": [MagicMock()]} if "load_models" in target else {}
                 stack.enter_context(patch(target, **kw))
-            run(game_selectors, model_selectors=[], gen_args={})
+            run(game_selectors, model_selectors=[], gen_args={}, **kwargs)
 
     def test_duplicate_game_selectors_run_once(self):
         mock_benchmark = MagicMock()
@@ -86,6 +142,36 @@ class RunGameDeduplicationTestCase(unittest.TestCase):
 
         self.assertEqual(mock_benchmark_cls.load_from_spec.call_count, 2)
 
+    def test_game_specs_are_resolved_once_in_the_order_of_the_selectors(self):
+        taboo = self._make_spec("taboo")
+        wordle = self._make_spec("wordle")
+        with patch("clemcore.cli.GameRegistry") as mock_registry_cls:
+            mock_registry = mock_registry_cls.from_directories_and_cwd_files.return_value
+            mock_registry.get_game_specs_that_unify_with.side_effect = \
+                lambda selector: [taboo, wordle] if selector == "all" else [wordle]
+            self.assertEqual(_resolve_game_specs(["wordle", "all"]), [wordle, taboo])
+            self.assertEqual(_resolve_game_specs("wordle"), [wordle])
+
+    def test_interleave_plays_all_games_in_one_run(self):
+        taboo = self._make_spec("taboo")
+        wordle = self._make_spec("wordle")
+
+        with patch("clemcore.cli.GameRegistry") as mock_registry_cls:
+            mock_registry = mock_registry_cls.from_directories_and_cwd_files.return_value
+            mock_registry.get_game_specs_that_unify_with.side_effect = \
+                lambda selector: [taboo] if selector == "taboo" else [wordle]
+            with patch("clemcore.cli.GameBenchmark") as mock_benchmark_cls, \
+                    patch("clemcore.cli.batchwise.run_interleaved") as mock_run_interleaved, \
+                    patch("clemcore.cli.dispatch.run") as mock_dispatch_run:
+                mock_benchmark_cls.load_from_spec.return_value.__enter__.return_value = MagicMock()
+                self._run(["taboo", "wordle"], batch_size=4, interleave=True)
+
+        mock_run_interleaved.assert_called_once()
+        mock_dispatch_run.assert_not_called()
+        game_benchmarks, game_instances = mock_run_interleaved.call_args.args[:2]
+        self.assertEqual(len(game_benchmarks), 2)
+        self.assertEqual(len(game_instances), 2)
+
 
 if __name__ == "__main__":
     unittest.main()
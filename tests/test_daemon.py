@@ -0,0 +1,104 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from clemcore import daemon
+from clemcore.backends import ModelSpec, CustomResponseModel
+from clemcore.cli import create_parser
+from clemcore.daemon import RunDaemon, DaemonClient, COMPLETED, FAILED
+
+
+class RunDaemonTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.loaded = []
+        self.executed = []
+        self.daemon = RunDaemon(parse_args=create_parser().parse_args, execute=self._execute,
+                                load_model=self._load_model)
+        self.daemon.start()
+
+    def tearDown(self):
+        self.daemon.stop(timeout=5)
+        self.tmp_dir.cleanup()
+
+    def _load_model(self, model_spec):
+        self.loaded.append(model_spec.model_name)
+        return CustomResponseModel(model_spec)
+
+    def _execute(self, args, load_models):
+        if args.command_name == "run":
+            player_models = load_models(ModelSpec.from_strings(args.models), dict(temperature=0., max_tokens=7))
+            self.executed.append((os.getcwd(), [player_model.max_tokens for player_model in player_models]))
+            if args.game == ["fail"]:
+                raise RuntimeError("game failed")
+            if args.game == ["exit"]:
+                raise SystemExit(1)
+
+    def test_models_stay_loaded_between_jobs(self):
+        first = self.daemon.submit(["run", "-g", "taboo", "-m", "mock"], self.tmp_dir.name)
+        second = self.daemon.submit(["run", "-g", "wordle", "-m", "mock"], self.tmp_dir.name)
+        self.daemon.join()
+        self.assertEqual(self.loaded, ["mock"])
+        self.assertEqual((first.status, second.status), (COMPLETED, COMPLETED))
+        self.assertEqual(self.daemon.loaded_models(), ["mock"])
+
+    def test_jobs_are_executed_in_the_client_directory_with_their_gen_args(self):
+        cwd = os.getcwd()
+        self.daemon.submit(["run", "-g", "taboo", "-m", "mock"], self.tmp_dir.name)
+        self.daemon.join()
+        self.assertEqual(self.executed, [(os.path.realpath(self.tmp_dir.name), [7])])
+        self.assertEqual(os.getcwd(), cwd)
+
+    def test_failing_jobs_do_not_stop_the_daemon(self):
+        failed = self.daemon.submit(["run", "-g", "fail", "-m", "mock"], self.tmp_dir.name)
+        exited = self.daemon.submit(["run", "-g", "exit", "-m", "mock"], self.tmp_dir.name)
+        completed = self.daemon.submit(["score", "-g", "taboo"], self.tmp_dir.name)
+        self.daemon.join()
+        self.assertEqual((failed.status, failed.message), (FAILED, "game failed"))
+        self.assertEqual(exited.status, FAILED)
+        self.assertEqual(completed.status, COMPLETED)
+
+    def test_invalid_jobs_are_rejected(self):
+        for argv in [[], ["list", "games"], ["run", "-m", "mock"], ["run", "-g", "taboo", "-m", "mock", "--matrix"]]:
+            with self.subTest(argv=argv), self.assertRaises(ValueError):
+                self.daemon.submit(argv, self.tmp_dir.name)
+        self.assertEqual(self.daemon.jobs, {})
+
+
+class DaemonClientTestCase(unittest.TestCase):
+
+    def test_submit_and_wait_over_http(self):
+        executed = []
+        service = RunDaemon(parse_args=create_parser().parse_args,
+                            execute=lambda args, load_models: executed.append(args.command_name))
+        server_thread = threading.Thread(target=service.serve, kwargs=dict(port=0), daemon=True)
+        server_thread.start()
+        while service._server is None:
+            time.sleep(.01)
+        host, port = service._server.server_address[:2]
+        try:
+            client = DaemonClient(f"http://{host}:{port}")
+            job = client.submit(["eval", "-r", "results"])
+            job = client.wait(job["job_id"], poll_seconds=.01)
+            self.assertEqual(job["status"], COMPLETED)
+            self.assertEqual(executed, ["eval"])
+            self.assertEqual([j["job_id"] for j in client.get_jobs()], [job["job_id"]])
+            self.assertEqual(client.get_models(), [])
+            with self.assertRaises(ValueError):
+                client.submit(["list", "games"])
+            with self.assertRaises(ValueError):
+                client.get_job(42)
+        finally:
+            service.shutdown()
+            server_thread.join(5)
+
+    def test_unreachable_daemon(self):
+        with self.assertRaises(ConnectionError):
+            DaemonClient(f"http://{daemon.DEFAULT_HOST}:1", timeout=1.).get_jobs()
+
+
+if __name__ == '__main__':
+    unittest.main()
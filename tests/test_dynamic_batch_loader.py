@@ -4,26 +4,40 @@ from clemcore.clemgame.runners.batchwise import (
     DynamicBatchDataLoader,
     SinglePassGameSessionPoller,
     GameSession,
+    GameSessionPool,
+    SlidingWindowGameSessionPoller,
+    RefillBatchDataLoader,
 )
 
 
+class MockModel:
+    """Mock model for testing."""
+
+    def __init__(self, name):
+        self.name = name
+
+
 class MockPlayer:
     """Mock player for testing."""
 
-    def __init__(self, name):
+    def __init__(self, name, model_name="mock"):
         self.name = name
+        self.model = MockModel(model_name)
 
 
 class MockGameMasterEnv:
     """Mock GameMasterEnv with controllable done state."""
 
-    def __init__(self, session_id, *, done_after=3):
+    def __init__(self, session_id, *, done_after=3, model_names=("mock",)):
         self._session_id = session_id
         self._done_after = done_after
         self._observe_count = 0
         self.agent_selection = "player_0"
         self.terminations = {"player_0": False}
-        self.player_by_agent_id = {"player_0": MockPlayer(f"player_{session_id}")}
+        self.truncations = {"player_0": False}
+        # the players take turns, each with its own model
+        self.player_by_agent_id = {f"player_{idx}": MockPlayer(f"player_{session_id}", model_name)
+                                   for idx, model_name in enumerate(model_names)}
 
     def last(self, observe=False):
         """Return observation in PettingZoo style.
@@ -40,6 +54,7 @@ class MockGameMasterEnv:
         info = {}
         if termination:
             self.terminations["player_0"] = True
+        self.agent_selection = f"player_{self._observe_count % len(self.player_by_agent_id)}"
         return context, reward, termination, truncation, info
 
     def step(self, response):
@@ -264,5 +279,166 @@ class DynamicBatchDataLoaderTestCase(unittest.TestCase):
             self.assertTrue(session.is_done)
 
 
+class GameSessionPoolTestCase(unittest.TestCase):
+
+    def _make_rows(self, num_rows):
+        return [{"game_name": "test", "experiment": {"name": "exp"}, "game_instance": {"game_id": i}}
+                for i in range(num_rows)]
+
+    def _make_pool(self, num_rows, *, max_sessions, setup_workers=0, done_after=2, fail_ids=()):
+        created = []
+
+        def create_session(session_id, row):
+            if row["game_instance"]["game_id"] in fail_ids:
+                raise RuntimeError("setup failed")
+            created.append(session_id)
+            return GameSession(session_id, MockGameMasterEnv(session_id, done_after=done_after), row)
+
+        pool = GameSessionPool(create_session, self._make_rows(num_rows),
+                               max_sessions=max_sessions, setup_workers=setup_workers)
+        return pool, created
+
+    def test_sessions_are_created_lazily(self):
+        """Test that no session is set up before the first pass."""
+        pool, created = self._make_pool(10, max_sessions=3)
+        self.assertEqual(len(created), 0)
+        pool.refill()
+        self.assertEqual(len(created), 3)
+        self.assertEqual(len(pool), 3)
+
+    def test_window_bounds_alive_sessions(self):
+        """Test that never more than max_sessions are alive, but all instances are played."""
+        pool, created = self._make_pool(10, max_sessions=3)
+        loader = DynamicBatchDataLoader(SlidingWindowGameSessionPoller(pool),
+                                        collate_fn=GameSession.collate_fn, batch_size=2)
+        max_alive = 0
+        seen = set()
+        for session_ids, _, _ in loader:
+            max_alive = max(max_alive, len(pool))
+            seen.update(session_ids)
+        self.assertLessEqual(max_alive, 3)
+        self.assertEqual(seen, set(range(10)))
+        self.assertTrue(pool.is_exhausted)
+
+    def test_background_setup(self):
+        """Test that sessions set up by background threads are all played."""
+        pool, created = self._make_pool(8, max_sessions=2, setup_workers=2)
+        loader = DynamicBatchDataLoader(SlidingWindowGameSessionPoller(pool),
+                                        collate_fn=GameSession.collate_fn, batch_size=2)
+        observations = [sid for session_ids, _, _ in loader for sid in session_ids]
+        pool.close()
+        self.assertEqual(sorted(set(observations)), list(range(8)))
+        self.assertEqual(len(observations), 8 * 2)  # each session yields done_after observations
+
+    def test_failed_setups_are_skipped(self):
+        """Test that a failing setup is counted and the pool continues with the next rows."""
+        pool, created = self._make_pool(5, max_sessions=2, fail_ids=(0, 3))
+        loader = DynamicBatchDataLoader(SlidingWindowGameSessionPoller(pool),
+                                        collate_fn=GameSession.collate_fn, batch_size=2)
+        seen = {sid for session_ids, _, _ in loader for sid in session_ids}
+        self.assertEqual(seen, {1, 2, 4})
+        self.assertEqual(pool.error_count, 2)
+        self.assertEqual(pool.num_created, 3)
+
+    def test_from_sessions(self):
+        sessions = [GameSession(i, MockGameMasterEnv(i, done_after=1), {}) for i in range(3)]
+        pool = GameSessionPool.from_sessions(sessions)
+        pool.refill()
+        self.assertEqual([session.session_id for session in pool], [0, 1, 2])
+
+
+class RefillBatchDataLoaderTestCase(unittest.TestCase):
+
+    def _make_pool(self, done_afters, max_sessions=None):
+        sessions = [GameSession(i, MockGameMasterEnv(i, done_after=done_after), {})
+                    for i, done_after in enumerate(done_afters)]
+        pool = GameSessionPool(lambda _, session: session, sessions,
+                               max_sessions=max_sessions or len(sessions))
+        return pool, sessions
+
+    def test_batches_are_full_while_enough_sessions_are_alive(self):
+        """Test that batches only shrink when fewer sessions than batch_size are alive."""
+        pool, sessions = self._make_pool([1, 5, 2, 6, 1, 3, 4, 2], max_sessions=3)
+        loader = RefillBatchDataLoader(pool, collate_fn=GameSession.collate_fn, batch_size=3)
+        batch_sizes = [len(session_ids) for session_ids, _, _ in loader]
+        self.assertEqual(sum(batch_sizes), 1 + 5 + 2 + 6 + 1 + 3 + 4 + 2)
+        first_partial = next(i for i, size in enumerate(batch_sizes) if size < 3)
+        self.assertTrue(all(size < 3 for size in batch_sizes[first_partial:]),
+                        f"Full batch after a partial one: {batch_sizes}")
+        self.assertTrue(all(session.is_done for session in sessions))
+
+    def test_no_partial_batches_at_pass_boundaries(self):
+        """Test that 5 long-running sessions with batch_size=2 always yield full batches (except the last one)."""
+        pool, _ = self._make_pool([4] * 5)
+        loader = RefillBatchDataLoader(pool, collate_fn=GameSession.collate_fn, batch_size=2)
+        batch_sizes = [len(session_ids) for session_ids, _, _ in loader]
+        self.assertEqual(batch_sizes, [2] * 10)
+
+    def test_fairness(self):
+        """Test that a ready session is served within ceil(num_sessions / batch_size) batches."""
+        pool, _ = self._make_pool([10] * 5)
+        loader = RefillBatchDataLoader(pool, collate_fn=GameSession.collate_fn, batch_size=2)
+        last_served = {}
+        for batch_idx, (session_ids, _, _) in enumerate(loader):
+            for session_id in session_ids:
+                if session_id in last_served:
+                    self.assertLessEqual(batch_idx - last_served[session_id], 3)
+                last_served[session_id] = batch_idx
+        self.assertEqual(set(last_served), set(range(5)))
+
+    def test_sessions_stay_in_flight_until_released(self):
+        """Test that without auto_release the next batch is filled with other sessions (double-buffering)."""
+        pool, _ = self._make_pool([2] * 4)
+        loader = RefillBatchDataLoader(pool, collate_fn=GameSession.collate_fn, batch_size=2, auto_release=False)
+        batches = iter(loader)
+        self.assertEqual(next(batches)[0], [0, 1])
+        self.assertEqual(next(batches)[0], [2, 3])
+        self.assertIsNone(next(batches), "All sessions are in flight")
+        loader.release([0, 1])
+        self.assertEqual(next(batches)[0], [0, 1])
+        loader.release([2, 3])
+        self.assertEqual(next(batches)[0], [2, 3])
+
+    def test_batches_are_formed_per_model(self):
+        """Test that the players of two models taking turns are batched by model (at full width)."""
+        sessions = [GameSession(i, MockGameMasterEnv(i, done_after=4, model_names=("a", "b")), {})
+                    for i in range(4)]
+        pool = GameSessionPool(lambda _, session: session, sessions, max_sessions=4)
+        loader = RefillBatchDataLoader(pool, collate_fn=GameSession.collate_fn, batch_size=2, max_wait=4)
+        batch_models = [{player.model.name for player in players} for _, players, _ in loader]
+        self.assertEqual([len(models) for models in batch_models], [1] * 8, batch_models)
+        self.assertEqual(batch_models[:2], [{"a"}, {"a"}])
+
+    def test_observations_of_another_model_do_not_starve(self):
+        """Test that a single observation of another model is served after max_wait batches."""
+        sessions = [GameSession(i, MockGameMasterEnv(i, done_after=10), {}) for i in range(4)]
+        sessions.append(GameSession(4, MockGameMasterEnv(4, done_after=10, model_names=("other",)), {}))
+        pool = GameSessionPool(lambda _, session: session, sessions, max_sessions=5)
+        loader = RefillBatchDataLoader(pool, collate_fn=GameSession.collate_fn, batch_size=2, max_wait=2)
+        other_batches = [batch_idx for batch_idx, (session_ids, _, _) in enumerate(loader) if 4 in session_ids]
+        self.assertEqual(len(other_batches), 10)
+        self.assertEqual(other_batches[0], 2)
+        self.assertTrue(all(later - earlier <= 3 for earlier, later in zip(other_batches, other_batches[1:])))
+
+    def test_observations_are_stepped_inline(self):
+        """Test that the observations resolved by step_inline are not batched, but observed again right away."""
+        sessions = [GameSession(i, MockGameMasterEnv(i, done_after=4, model_names=("llm", "script")), {})
+                    for i in range(2)]
+        pool = GameSessionPool(lambda _, session: session, sessions, max_sessions=2)
+        stepped_inline = []
+
+        def step_inline(observation):
+            session_id, player, _ = observation
+            if player.model.name != "script":
+                return False
+            stepped_inline.append(session_id)
+            return True
+
+        loader = RefillBatchDataLoader(pool, collate_fn=GameSession.collate_fn, batch_size=2, step_inline=step_inline)
+        batch_models = [{player.model.name for player in players} for _, players, _ in loader]
+        self.assertEqual(batch_models, [{"llm"}] * 2)
+        self.assertEqual(sorted(stepped_inline), [0, 0, 1, 1])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,137 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from clemcore.clemgame import GameBenchmarkCallbackList, GameInstances, GameScorer
+from clemcore.clemgame.metrics import BENCH_SCORE, METRIC_ABORTED, METRIC_LOSE, METRIC_SUCCESS
+from clemcore.clemgame.runners import early_stopping
+from clemcore.clemgame.runners.batch_tuning import BatchSizeTuner
+from clemcore.clemgame.runners.early_stopping import RunningScores, EarlyStoppingInstances, confidence_interval
+from tests.test_batchwise_runner import CountdownBenchmark, CountdownGameMaster, RecordingBatchModel, \
+    RecordingCallback, make_benchmark
+
+
+class InstanceScorer(GameScorer):
+    """Scores each episode with the instance's 'score'."""
+
+    def compute_episode_scores(self, interactions):
+        self.log_episode_score(BENCH_SCORE, self.game_instance["score"])
+
+
+class ScoredCountdownGameMaster(CountdownGameMaster):
+
+    def _on_after_game(self):
+        self.log_key(METRIC_ABORTED, False)
+        self.log_key(METRIC_LOSE, False)
+        self.log_key(METRIC_SUCCESS, True)
+
+
+class ScoredCountdownBenchmark(CountdownBenchmark):
+
+    def create_game_master(self, experiment, player_models):
+        return ScoredCountdownGameMaster(self.game_spec, experiment, player_models)
+
+    def create_game_scorer(self, experiment, game_instance):
+        return InstanceScorer(self.game_name, experiment, game_instance)
+
+
+def make_instances(scores_by_experiment):
+    rows = [{"game_name": "countdown", "experiment": {"name": experiment},
+             "game_instance": {"game_id": game_id, "turns": 1, "score": score}}
+            for experiment, scores in scores_by_experiment.items() for game_id, score in enumerate(scores)]
+    return GameInstances("countdown", rows)
+
+
+class ConfidenceIntervalTestCase(unittest.TestCase):
+
+    def test_half_width(self):
+        self.assertIsNone(confidence_interval([50.], .95))
+        self.assertEqual(confidence_interval([50., 50., 50.], .95), 0.)
+        self.assertAlmostEqual(confidence_interval([0., 100.], .95), 1.96 * 70.7107 / 2 ** .5, places=2)
+
+
+class EarlyStoppingInstancesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.running_scores = RunningScores(make_benchmark())
+        self.game_instances = make_instances({"a": [0] * 10, "b": [0] * 10})
+
+    def _experiment_names(self, rows):
+        return [row["experiment"]["name"] for row in rows]
+
+    def test_experiments_are_visited_in_turns(self):
+        sampled = EarlyStoppingInstances(self.game_instances, self.running_scores, tolerance=5, seed=1)
+        rows = list(sampled)
+        self.assertEqual(self._experiment_names(rows), ["a", "b"] * 10)
+        self.assertEqual(len(sampled), 20)
+
+    def test_order_is_randomized_per_experiment(self):
+        rows = list(EarlyStoppingInstances(self.game_instances, self.running_scores, tolerance=5, seed=1))
+        game_ids = [row["game_instance"]["game_id"] for row in rows if row["experiment"]["name"] == "a"]
+        self.assertEqual(sorted(game_ids), list(range(10)))
+        self.assertNotEqual(game_ids, list(range(10)))
+        rows_again = list(EarlyStoppingInstances(self.game_instances, self.running_scores, tolerance=5, seed=1))
+        self.assertEqual(rows, rows_again)
+
+    def test_converged_experiment_is_stopped(self):
+        sampled = EarlyStoppingInstances(self.game_instances, self.running_scores, tolerance=5, min_episodes=3)
+        rows = []
+        for row in sampled:
+            rows.append(row)
+            experiment_name = row["experiment"]["name"]
+            self.running_scores.played[experiment_name].append(100.)
+            main_score = 50. if experiment_name == "a" else 10. * len(rows)
+            self.running_scores.main_scores[experiment_name].append(main_score)
+        self.assertEqual(self._experiment_names(rows).count("a"), 3)
+        self.assertEqual(self._experiment_names(rows).count("b"), 10)
+        report = sampled.to_report()["experiments"]
+        self.assertTrue(report["a"]["converged"])
+        self.assertEqual(report["a"]["main_score_ci"], 0.)
+        self.assertFalse(report["b"]["converged"])
+
+    def test_unsteady_played_prevents_stopping(self):
+        sampled = EarlyStoppingInstances(self.game_instances, self.running_scores, tolerance=5, min_episodes=3)
+        for row in sampled:
+            experiment_name = row["experiment"]["name"]
+            self.running_scores.played[experiment_name].append(100. * (sampled.num_started[experiment_name] % 2))
+            self.running_scores.main_scores[experiment_name].append(50.)
+        self.assertEqual(sum(sampled.num_started.values()), 20)
+
+
+class EarlyStoppingRunTestCase(unittest.TestCase):
+
+    def test_run_stops_converged_experiments_and_stores_report(self):
+        game_benchmark = ScoredCountdownBenchmark(make_benchmark().game_spec)
+        game_instances = make_instances({"steady": [50] * 20, "noisy": [0, 100] * 10})
+        recorder = RecordingCallback()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report = early_stopping.run(game_benchmark, game_instances, [RecordingBatchModel()],
+                                        callbacks=GameBenchmarkCallbackList([recorder]),
+                                        tolerance=5, min_episodes=4, seed=0, report_dir_path=Path(tmp_dir))
+            with open(Path(tmp_dir) / early_stopping.EARLY_STOPPING_FILE_NAME) as f:
+                self.assertEqual(json.load(f), report)
+        experiments = report["experiments"]
+        self.assertEqual(experiments["steady"]["episodes"], 4)
+        self.assertEqual(experiments["steady"]["main_score"], 50)
+        self.assertEqual(experiments["steady"]["played"], 100)
+        self.assertTrue(experiments["steady"]["converged"])
+        self.assertEqual(experiments["noisy"]["episodes"], 20)
+        self.assertFalse(experiments["noisy"]["converged"])
+        self.assertEqual(len(recorder.ended), 24)
+        self.assertEqual(recorder.benchmarks_ended, [("countdown", 24)])
+
+    def test_run_follows_the_batch_size_tuner(self):
+        game_benchmark = ScoredCountdownBenchmark(make_benchmark().game_spec)
+        game_instances = make_instances({"steady": [50] * 8})
+        tuner = BatchSizeTuner(max_batch_size=4, memory_usage=lambda: None)
+        tuner.batch_size = 2  # e.g. reduced after running out of memory
+        model = RecordingBatchModel()
+        early_stopping.run(game_benchmark, game_instances, [model], batch_size=4, batch_size_tuner=tuner,
+                           tolerance=5, min_episodes=4, seed=0)
+        self.assertGreater(tuner.num_batches, 0)
+        self.assertLessEqual(max(model.batch_sizes), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from clemcore.clemgame.resources import store_json
+from clemcore.clemgame.stats import EpisodeStats
+from tests.test_batchwise_runner import make_experiment_instances
+
+EXPERIMENTS = ("high", "low", "new")  # "new" has no stored episodes
+
+
+def _store_interactions(results_dir: Path, model_pair: str, experiment: str, game_id: int, num_requests: int):
+    turns = [[{"from": "GM", "to": "Player 1", "action": {"type": "send message", "content": "prompt"}},
+              {"from": "Player 1", "to": "GM", "action": {"type": "get message", "content": "answer"}}]
+             for _ in range(num_requests)]
+    interactions = {
+        "meta": {"game_name": "taboo", "experiment_name": experiment, "game_id": game_id},
+        "turns": turns,
+        "Request Count": [1] * num_requests
+    }
+    instance_dir = results_dir / model_pair / "taboo" / experiment / f"instance_{game_id:05d}"
+    store_json(interactions, "interactions.json", instance_dir)
+
+
+class EpisodeStatsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.results_dir = Path(self.tmp_dir.name)
+        for model_pair, offset in [("model-a", 0), ("model-b", 2)]:
+            _store_interactions(self.results_dir, model_pair, "high", 0, 8 + offset)
+            _store_interactions(self.results_dir, model_pair, "high", 1, 4 + offset)
+            _store_interactions(self.results_dir, model_pair, "low", 0, 1 + offset)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_from_results_dir(self):
+        episode_stats = EpisodeStats.from_results_dir(self.results_dir)
+        high = episode_stats.stats["taboo"]["high"]
+        self.assertEqual(high["episodes"], 4)
+        self.assertEqual(high["mean_requests"], (8 + 10 + 4 + 6) / 4)
+        self.assertEqual(high["instances"], {"0": 9.0, "1": 5.0})
+        self.assertEqual(high["mean_chars"], (8 + 10 + 4 + 6) / 4 * len("promptanswer"))
+        self.assertEqual(high["mean_response_chars"], len("answer"))
+        self.assertIsNone(high["mean_response_seconds"])  # no timestamps
+        self.assertEqual(len(episode_stats), 2)
+
+    def test_response_seconds_from_timestamps(self):
+        turn = [{"from": "GM", "to": "Player 1", "timestamp": "2024-01-01T10:00:00",
+                 "action": {"type": "send message", "content": "prompt"}},
+                {"from": "Player 1", "to": "GM", "timestamp": "2024-01-01T10:00:02.500000",
+                 "action": {"type": "get message", "content": "answer"}}]
+        self.assertEqual(EpisodeStats.collect_responses({"turns": [turn]}), [(6, 2.5)])
+
+    def test_store_and_load(self):
+        episode_stats = EpisodeStats.from_results_dir(self.results_dir)
+        stats_file = episode_stats.store(self.results_dir / "episode_stats.json")
+        self.assertEqual(EpisodeStats.from_file(stats_file).stats, episode_stats.stats)
+        self.assertEqual(len(EpisodeStats.from_file(self.results_dir / "missing.json")), 0)
+
+    def test_expected_requests_falls_back_to_experiment_mean(self):
+        episode_stats = EpisodeStats.from_results_dir(self.results_dir)
+        rows = {(row["experiment"]["name"], row["game_instance"]["game_id"]): row
+                for row in make_experiment_instances(experiments=EXPERIMENTS)}
+        self.assertEqual(episode_stats.expected_requests(rows[("high", 0)]), 9.0)
+        self.assertEqual(episode_stats.expected_requests(rows[("high", 2)]), 7.0)
+        self.assertIsNone(episode_stats.expected_requests(rows[("new", 0)]))
+
+    def test_longest_first(self):
+        episode_stats = EpisodeStats.from_results_dir(self.results_dir)
+        ordered = episode_stats.longest_first(make_experiment_instances(experiments=EXPERIMENTS))
+        order = [(row["experiment"]["name"], row["game_instance"]["game_id"]) for row in ordered]
+        self.assertEqual(order, [("new", 0), ("new", 1), ("new", 2),  # unknown length first (stable)
+                                 ("high", 0), ("high", 2), ("high", 1),
+                                 ("low", 0), ("low", 1), ("low", 2)])
+        self.assertEqual(len(ordered), len(make_experiment_instances(experiments=EXPERIMENTS)))
+
+
+if __name__ == '__main__':
+    unittest.main()
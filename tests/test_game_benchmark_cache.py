@@ -0,0 +1,100 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from clemcore.clemgame import GameBenchmark, GameSpec
+
+MASTER_PY = """
+import helpers
+from clemcore.clemgame import GameBenchmark
+
+helpers.EXECUTIONS.append("master")
+
+
+class {class_name}(GameBenchmark):
+
+    def helper_value(self):
+        return helpers.VALUE
+"""
+
+
+def _write_game(games_dir: Path, game_name: str, value: str) -> GameSpec:
+    game_path = games_dir / game_name
+    game_path.mkdir()
+    class_name = game_name.capitalize() + "Benchmark"
+    (game_path / "master.py").write_text(MASTER_PY.format(class_name=class_name))
+    (game_path / "helpers.py").write_text(f"VALUE = {value!r}\nEXECUTIONS = []\n")
+    return GameSpec(game_name=game_name, game_path=str(game_path), players=1)
+
+
+class GameBenchmarkCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        games_dir = Path(self.tmp_dir.name)
+        self.alpha = _write_game(games_dir, "alpha", "a")
+        self.beta = _write_game(games_dir, "beta", "b")
+        GameBenchmark.clear_cache()
+
+    def tearDown(self):
+        GameBenchmark.clear_cache()
+        sys.modules.pop("helpers", None)
+        self.tmp_dir.cleanup()
+
+    def test_repeated_loads_reuse_the_benchmark(self):
+        game_benchmark = GameBenchmark.load_from_spec(self.alpha)
+        game_benchmark.close()
+        self.assertIs(GameBenchmark.load_from_spec(self.alpha), game_benchmark)
+        self.assertEqual(sys.modules["helpers"].EXECUTIONS, ["master"])
+
+    def test_modified_game_files_are_loaded_again(self):
+        game_benchmark = GameBenchmark.load_from_spec(self.alpha)
+        game_benchmark.close()
+        helpers_file = Path(self.alpha.game_path) / "helpers.py"
+        helpers_file.write_text("VALUE = 'changed'\nEXECUTIONS = []\n")
+        stat = helpers_file.stat()
+        os.utime(helpers_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        reloaded = GameBenchmark.load_from_spec(self.alpha)
+        self.assertIsNot(reloaded, game_benchmark)
+        self.assertEqual(reloaded.helper_value(), "changed")
+
+    def test_files_that_are_not_imported_are_ignored(self):
+        game_benchmark = GameBenchmark.load_from_spec(self.alpha)
+        game_benchmark.close()
+        resources_path = Path(self.alpha.game_path) / "resources"
+        resources_path.mkdir()
+        (resources_path / "instances.json").write_text("{}")
+        (Path(self.alpha.game_path) / "unused.py").write_text("VALUE = 'unused'\n")
+        self.assertIs(GameBenchmark.load_from_spec(self.alpha), game_benchmark)
+
+    def test_modified_master_is_loaded_again(self):
+        game_benchmark = GameBenchmark.load_from_spec(self.alpha)
+        game_benchmark.close()
+        master_file = Path(self.alpha.game_path) / "master.py"
+        stat = master_file.stat()
+        os.utime(master_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertIsNot(GameBenchmark.load_from_spec(self.alpha), game_benchmark)
+
+    def test_games_with_same_module_names_are_isolated(self):
+        alpha = GameBenchmark.load_from_spec(self.alpha)  # not closed, so that its helpers are still registered
+        beta = GameBenchmark.load_from_spec(self.beta)
+        self.assertEqual(alpha.helper_value(), "a")
+        self.assertEqual(beta.helper_value(), "b")
+        self.assertEqual(sys.modules["helpers"].VALUE, "b")
+        self.assertIs(GameBenchmark.load_from_spec(self.alpha), alpha)
+        self.assertEqual(sys.modules["helpers"].VALUE, "a")
+        beta.close()  # does not unregister the helpers of alpha
+        self.assertEqual(sys.modules["helpers"].VALUE, "a")
+        alpha.close()
+        self.assertNotIn("helpers", sys.modules)
+
+    def test_without_cache(self):
+        game_benchmark = GameBenchmark.load_from_spec(self.alpha, use_cache=False)
+        game_benchmark.close()
+        self.assertIsNot(GameBenchmark.load_from_spec(self.alpha, use_cache=False), game_benchmark)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+import unittest
+from types import SimpleNamespace
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+# Skip all tests if huggingface dependencies aren't available
+huggingface_local_api = pytest.importorskip("clemcore.backends.huggingface_local_api")
+
+from clemcore import backends
+from clemcore.backends.huggingface_local_api import HuggingfaceLocalModel, _crop_layer_states
+from clemcore.backends.prompt_cache import PromptCache
+
+PAD = 0
+MAX_NEW_TOKENS = 3
+
+
+def make_tiny_model():
+    """A randomly initialized, tiny Llama model that never stops before max_new_tokens."""
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(vocab_size=64, hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+                                      num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=128,
+                                      pad_token_id=PAD, bos_token_id=2, eos_token_id=1)
+    model = transformers.LlamaForCausalLM(config).eval()
+    model.generation_config.eos_token_id = None
+    model.generation_config.pad_token_id = PAD
+    return model
+
+
+def make_hf_model(prompt_cache: PromptCache) -> HuggingfaceLocalModel:
+    """A HuggingfaceLocalModel around the tiny model (without loading a tokenizer or weights from the hub)."""
+    hf_model = HuggingfaceLocalModel.__new__(HuggingfaceLocalModel)
+    backends.Model.__init__(hf_model, backends.ModelSpec(model_name="tiny"))
+    hf_model.model = make_tiny_model()
+    hf_model.prompt_cache = prompt_cache
+    return hf_model
+
+
+def left_pad(batch_token_ids):
+    """The input ids and the attention mask of the token ids padded on the left (as the tokenizer does)."""
+    length = max(len(token_ids) for token_ids in batch_token_ids)
+    input_ids = torch.tensor([[PAD] * (length - len(token_ids)) + list(token_ids) for token_ids in batch_token_ids])
+    attention_mask = torch.tensor([[0] * (length - len(token_ids)) + [1] * len(token_ids)
+                                   for token_ids in batch_token_ids])
+    return input_ids, attention_mask
+
+
+def generate(hf_model, input_ids, attention_mask, past_key_values=None):
+    kwargs = dict(past_key_values=past_key_values) if past_key_values is not None else {}
+    with torch.no_grad():
+        return hf_model.model.generate(input_ids, attention_mask=attention_mask, max_new_tokens=MAX_NEW_TOKENS,
+                                       do_sample=False, return_dict_in_generate=True, output_logits=True, **kwargs)
+
+
+def unpadded(generation_output, attention_mask):
+    """The token ids of each row's prompt and response (without the padding)."""
+    num_pads = (attention_mask == 0).sum(dim=1).tolist()
+    return [generation_output.sequences[row, num_pad:].tolist() for row, num_pad in enumerate(num_pads)]
+
+
+class KVCacheTestMixin:
+    hf_model: HuggingfaceLocalModel
+
+    def assert_same_generation(self, cached_output, cold_output):
+        self.assertEqual(cached_output.sequences.tolist(), cold_output.sequences.tolist())
+        for cached_logits, cold_logits in zip(cached_output.logits, cold_output.logits):
+            torch.testing.assert_close(cached_logits, cold_logits, atol=1e-4, rtol=1e-4)
+
+    def play_turn(self, batch_token_ids, reuse=True):
+        """Generate the responses to the prompts (with the cache) and store their KV states."""
+        input_ids, attention_mask = left_pad(batch_token_ids)
+        past_key_values = self.hf_model._reuse_kv_states(input_ids, attention_mask) if reuse else None
+        output = generate(self.hf_model, input_ids, attention_mask, past_key_values)
+        self.hf_model._store_kv_states(output, attention_mask)
+        return output, attention_mask, past_key_values
+
+
+class KVCacheReuseTestCase(KVCacheTestMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.hf_model = make_hf_model(PromptCache(memory_budget=1))
+
+    def test_multi_turn_batch_generates_as_without_cache(self):
+        # the prompts of two dialogues with different lengths, i.e., the second one is padded
+        first_turn, first_mask, past_key_values = self.play_turn([[2, 5, 6, 7, 8], [2, 9, 10]])
+        self.assertIsNone(past_key_values)  # nothing cached yet
+        self.assertEqual(len(self.hf_model.prompt_cache), 2)
+        # each dialogue continues with its previous prompt and response
+        second_prompts = [token_ids + [11, 12] for token_ids in unpadded(first_turn, first_mask)]
+        input_ids, attention_mask = left_pad(second_prompts)
+        past_key_values = self.hf_model._reuse_kv_states(input_ids, attention_mask)
+        # the last generated token has not been fed to the model: 7 of 8 tokens and 2 pads + 5 of 6 tokens
+        self.assertEqual(past_key_values.get_seq_length(), 7)
+        cached_output = generate(self.hf_model, input_ids, attention_mask, past_key_values)
+        cold_output = generate(self.hf_model, input_ids, attention_mask)
+        self.assert_same_generation(cached_output, cold_output)
+
+    def test_third_turn_reuses_the_stored_second_turn(self):
+        first_turn, first_mask, _ = self.play_turn([[2, 5, 6, 7, 8], [2, 9, 10]])
+        second_turn, second_mask, _ = self.play_turn(
+            [token_ids + [11, 12] for token_ids in unpadded(first_turn, first_mask)])
+        third_prompts = [token_ids + [13] for token_ids in unpadded(second_turn, second_mask)]
+        input_ids, attention_mask = left_pad(third_prompts)
+        past_key_values = self.hf_model._reuse_kv_states(input_ids, attention_mask)
+        self.assertEqual(past_key_values.get_seq_length(), input_ids.shape[1] - 2)  # but the new context
+        self.assert_same_generation(generate(self.hf_model, input_ids, attention_mask, past_key_values),
+                                    generate(self.hf_model, input_ids, attention_mask))
+
+    def test_edited_history_reuses_only_the_unchanged_prefix(self):
+        first_turn, first_mask, _ = self.play_turn([[2, 5, 6, 7, 8]])
+        edited = unpadded(first_turn, first_mask)[0]
+        edited[3] = 30  # e.g. a game master rewrites a message of the history
+        input_ids, attention_mask = left_pad([edited + [11, 12]])
+        past_key_values = self.hf_model._reuse_kv_states(input_ids, attention_mask)
+        self.assertEqual(past_key_values.get_seq_length(), 3)
+        self.assert_same_generation(generate(self.hf_model, input_ids, attention_mask, past_key_values),
+                                    generate(self.hf_model, input_ids, attention_mask))
+
+    def test_batch_with_an_uncached_prompt_is_prefilled_completely(self):
+        self.play_turn([[2, 5, 6, 7, 8]])
+        input_ids, attention_mask = left_pad([[2, 5, 6, 7, 8, 11], [3, 4, 4, 4, 4, 4, 4]])
+        self.assertIsNone(self.hf_model._reuse_kv_states(input_ids, attention_mask))
+
+    def test_stored_states_exclude_the_padding(self):
+        output, attention_mask, _ = self.play_turn([[2, 5, 6, 7, 8], [2, 9, 10]])
+        entries = list(self.hf_model.prompt_cache.entries.values())
+        self.assertEqual([len(entry.token_ids) for entry in entries], [7, 5])
+        self.assertEqual([entry.num_prompt_tokens for entry in entries], [5, 3])
+        for entry in entries:
+            keys, values = entry.kv_state[0]
+            self.assertEqual(keys.shape[0], 1)
+            self.assertEqual(keys.shape[2], len(entry.token_ids))
+            self.assertEqual(values.shape[2], len(entry.token_ids))
+
+    def test_incomplete_caches_disable_the_reuse(self):
+        keys = torch.zeros(1, 2, 3, 8)  # e.g. a sliding window cache that covers only 3 of 4 positions
+        generation_output = SimpleNamespace(sequences=torch.ones(1, 5, dtype=torch.long),
+                                            past_key_values=((keys, keys),))
+        with self.assertLogs(huggingface_local_api.logger, level="WARNING"):
+            self.hf_model._store_kv_states(generation_output, torch.ones(1, 4, dtype=torch.long))
+        self.assertIsNone(self.hf_model.prompt_cache)
+
+
+class SharedPrefixTestCase(KVCacheTestMixin, unittest.TestCase):
+    SYSTEM_PROMPT = [2, 40, 41, 42, 43, 44, 45, 46]  # e.g. the rules of the game
+
+    def setUp(self):
+        self.hf_model = make_hf_model(PromptCache(memory_budget=1, crop=_crop_layer_states, min_shared_length=4))
+
+    def test_instances_reuse_the_shared_prefix_as_a_cold_prefill(self):
+        self.play_turn([self.SYSTEM_PROMPT + [20, 21]])  # the first instance
+        input_ids, attention_mask = left_pad([self.SYSTEM_PROMPT + [22, 23], self.SYSTEM_PROMPT + [24]])
+        past_key_values = self.hf_model._reuse_kv_states(input_ids, attention_mask)
+        self.assertEqual(self.hf_model.prompt_cache.shared_prefixes, 1)  # cropped once for both rows
+        shared = self.hf_model.prompt_cache.entries[tuple(self.SYSTEM_PROMPT)]
+        self.assertTrue(shared.shared)
+        self.assertEqual(shared.kv_state[0][0].shape[2], len(self.SYSTEM_PROMPT))
+        self.assertEqual(past_key_values.get_seq_length(), len(self.SYSTEM_PROMPT))  # the first row is not padded
+        self.assert_same_generation(generate(self.hf_model, input_ids, attention_mask, past_key_values),
+                                    generate(self.hf_model, input_ids, attention_mask))
+
+    def test_shared_prefix_is_not_released_by_the_sessions_that_use_it(self):
+        self.play_turn([self.SYSTEM_PROMPT + [20, 21]])
+        session_bytes = next(iter(self.hf_model.prompt_cache.entries.values())).num_bytes
+        # room for the shared prefix and one session
+        self.hf_model.prompt_cache.memory_budget = 2 * session_bytes / (1024 ** 3)
+        self.play_turn([self.SYSTEM_PROMPT + [22, 23], self.SYSTEM_PROMPT + [24, 25]])
+        self.assertIn(tuple(self.SYSTEM_PROMPT), self.hf_model.prompt_cache.entries)
+        input_ids, attention_mask = left_pad([self.SYSTEM_PROMPT + [26, 27]])  # the next instance
+        past_key_values = self.hf_model._reuse_kv_states(input_ids, attention_mask)
+        self.assertEqual(past_key_values.get_seq_length(), len(self.SYSTEM_PROMPT))
+        self.assert_same_generation(generate(self.hf_model, input_ids, attention_mask, past_key_values),
+                                    generate(self.hf_model, input_ids, attention_mask))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -121,5 +121,26 @@ class GameMasterEnvStepRewardsTestCase(unittest.TestCase):
         self.assertAlmostEqual(env._cumulative_rewards["player_0"], 0.6)
 
 
+class GameMasterEnvAbortTestCase(unittest.TestCase):
+    """Tests for GameMasterEnv.abort() on errors outside the env, e.g. during response generation."""
+
+    def test_abort_truncates_agents_and_notifies_callbacks(self):
+        callbacks = MagicMock()
+        mock_game_master = MagicMock()
+        env = GameMasterEnv(MagicMock(), callbacks=callbacks)
+        env.game_master = mock_game_master
+        env.game_instance = {"game_id": 0}
+        env.agents = ["player_0", "player_1"]
+        env.terminations = {"player_0": False, "player_1": False}
+        env.truncations = {"player_0": False, "player_1": False}
+        error = RuntimeError("generation failed")
+
+        env.abort(error)
+
+        callbacks.on_game_end.assert_called_once_with(mock_game_master, {"game_id": 0}, error)
+        self.assertEqual(env.truncations, {"player_0": True, "player_1": True})
+        self.assertEqual(env.terminations, {"player_0": False, "player_1": False})
+
+
 if __name__ == '__main__':
     unittest.main()
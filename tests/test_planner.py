@@ -0,0 +1,96 @@
+import unittest
+
+from clemcore.backends import ModelSpec
+from clemcore.clemgame import planner
+from clemcore.clemgame.planner import TokenCounter, parse_context_size, create_planning_model, plan_game, summarize
+from clemcore.clemgame.stats import EpisodeStats
+from tests.test_batchwise_runner import make_benchmark, make_instances
+
+
+def remote_spec(model_name="gpt", context_size="1k", **kwargs):
+    return ModelSpec(model_name=model_name, backend="openai", context_size=context_size, **kwargs)
+
+
+def make_stats(**experiment_stats):
+    return EpisodeStats({"countdown": {"exp": {"episodes": 2, "instances": {}, **experiment_stats}}})
+
+
+class PlannerUtilsTestCase(unittest.TestCase):
+
+    def test_parse_context_size(self):
+        self.assertEqual(parse_context_size("128k"), 128_000)
+        self.assertEqual(parse_context_size("1M"), 1_000_000)
+        self.assertEqual(parse_context_size(4096), 4096)
+        self.assertIsNone(parse_context_size(None))
+        self.assertIsNone(parse_context_size("unknown"))
+
+    def test_estimated_token_count(self):
+        messages = [{"role": "user", "content": "x" * 40}, {"role": "assistant", "content": "y" * 8}]
+        self.assertEqual(TokenCounter().count(messages), 10 + 2 + 2 * planner.TOKENS_PER_MESSAGE)
+
+    def test_planning_model_is_never_called(self):
+        model = create_planning_model(remote_spec(), dict(temperature=0., max_tokens=100))
+        self.assertEqual(model.max_tokens, 100)
+        with self.assertRaises(RuntimeError):
+            model.generate_response([{"role": "user", "content": "hi"}])
+
+
+class PlanGameTestCase(unittest.TestCase):
+
+    def _plan(self, turns, model_spec, episode_stats=None, players=1, max_tokens=100):
+        player_models = [create_planning_model(model_spec, dict(temperature=0., max_tokens=max_tokens))]
+        if players == 2:
+            player_models.append(create_planning_model(ModelSpec(model_name="mock"), {}))
+        return plan_game(make_benchmark(players=players), make_instances(turns), player_models,
+                         episode_stats=episode_stats)
+
+    def test_without_history_one_call_per_player(self):
+        game_plan = self._plan([3, 5], remote_spec())
+        gpt = game_plan["models"]["gpt"]
+        self.assertEqual(gpt["calls"], 2)
+        self.assertEqual(gpt["completion_tokens"], 200)  # max_tokens, when the response lengths are unknown
+        first_prompt_tokens = TokenCounter().count([{"role": "user", "content": "start"}])
+        self.assertEqual(gpt["prompt_tokens"], 2 * first_prompt_tokens)
+        self.assertIsNone(gpt["seconds"])
+        self.assertIsNone(gpt["cost"])
+        self.assertEqual(game_plan["instances_with_history"], 0)
+
+    def test_history_predicts_calls_tokens_time_and_cost(self):
+        stats = make_stats(mean_requests=4., mean_chars=4 * 40., mean_response_chars=20., mean_response_seconds=2.)
+        spec = remote_spec(pricing={"input": 1., "output": 2.})
+        game_plan = self._plan([4, 4], spec, stats)
+        gpt = game_plan["models"]["gpt"]
+        self.assertEqual(gpt["calls"], 8)
+        self.assertEqual(gpt["completion_tokens"], 8 * 5)
+        first_prompt_tokens = TokenCounter().count([{"role": "user", "content": "start"}])
+        # each request adds 10 tokens: 0 + 10 + 20 + 30 per episode
+        self.assertEqual(gpt["prompt_tokens"], 2 * (4 * first_prompt_tokens + 60))
+        self.assertEqual(gpt["seconds"], 16.)
+        self.assertAlmostEqual(gpt["cost"], (gpt["prompt_tokens"] + 2 * gpt["completion_tokens"]) / 1e6)
+        self.assertEqual(game_plan["instances_with_history"], 2)
+
+    def test_calls_are_shared_among_players(self):
+        game_plan = self._plan([5], remote_spec(), make_stats(mean_requests=5., mean_chars=50.), players=2)
+        self.assertEqual(game_plan["models"]["gpt"]["calls"], 3)  # the first player starts
+        self.assertNotIn("mock", game_plan["models"])
+
+    def test_context_overflow_is_reported_with_its_turn(self):
+        stats = make_stats(mean_requests=10., mean_chars=10 * 400.)  # each request adds 100 tokens
+        game_plan = self._plan([10], remote_spec(context_size="1k"), stats, max_tokens=300)
+        overflow, = game_plan["context_overflows"]
+        self.assertEqual(overflow["turn"], 8)  # 5 + 7 * 100 + 300 tokens
+        self.assertEqual(overflow["context_size"], 1000)
+        self.assertEqual(overflow["game_id"], 0)
+
+    def test_summarize_divides_time_by_batch_size(self):
+        stats = make_stats(mean_requests=4., mean_chars=40., mean_response_seconds=1.)
+        game_plans = [self._plan([4] * 4, remote_spec(pricing={"input": 1.}), stats)]
+        summary = summarize(game_plans, batch_size=4)
+        self.assertEqual(summary["calls"], 16)
+        self.assertEqual(summary["seconds"], 4.)
+        self.assertGreater(summary["cost"], 0)
+        self.assertEqual(summary["context_overflows"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,10 @@ import unittest
 from typing import Dict
 from unittest.mock import MagicMock
 
+from clemcore.clemgame.errors import BatchResponseError
 from clemcore.clemgame.player import Player
 from clemcore.backends import CustomResponseModel, ModelSpec
+from clemcore.backends.utils import ContextExceededError
 
 
 class MockPlayer(Player):
@@ -258,5 +260,85 @@ class BatchResponseTestCase(unittest.TestCase):
         self.assertIn("generate_batch_response", str(cm.exception))
 
 
+class BatchResponseIsolationTestCase(unittest.TestCase):
+    """Tests for isolating the failing rows of a batch in Player.batch_response."""
+
+    def _make_players(self, generate_batch_response, num_players):
+        model = MagicMock()
+        model.name = "model"
+        model.generate_batch_response.side_effect = generate_batch_response
+        contexts = [{"role": "user", "content": f"ctx{i}"} for i in range(num_players)]
+        return [MockPlayer(model) for _ in range(num_players)], contexts, model
+
+    def test_failing_row_is_isolated_by_bisection(self):
+        def generate_batch_response(batch_messages):
+            if any(messages[-1]["content"] == "ctx2" for messages in batch_messages):
+                raise RuntimeError("generation failed")
+            return [(messages, {}, messages[-1]["content"].replace("ctx", "resp")) for messages in batch_messages]
+
+        players, contexts, model = self._make_players(generate_batch_response, 4)
+        with self.assertRaises(BatchResponseError) as cm:
+            Player.batch_response(players, contexts, row_ids=[10, 11, 12, 13])
+        self.assertEqual(list(cm.exception.exception_by_row_id), [12])
+        context_response_by_row_id = cm.exception.context_response_by_row_id
+        self.assertEqual({row_id: response for row_id, (_, response) in context_response_by_row_id.items()},
+                         {10: "resp0", 11: "resp1", 13: "resp3"})
+        # all rows, then the halves, then the quarters of the failing half
+        self.assertEqual([len(call.args[0]) for call in model.generate_batch_response.call_args_list], [4, 2, 2, 1, 1])
+        self.assertEqual(players[0].get_perspective()[-1]["content"], "resp0")
+        self.assertEqual(players[2].get_perspective()[-1]["role"], "user")  # the failed row has no response
+
+    def test_rows_exceeding_the_context_are_removed_without_bisection(self):
+        def generate_batch_response(batch_messages):
+            exceeded = [i for i, messages in enumerate(batch_messages) if messages[-1]["content"] in ("ctx0", "ctx3")]
+            if exceeded:
+                raise ContextExceededError("Context token limit exceeded", batch_indices=exceeded)
+            return [(messages, {}, "resp") for messages in batch_messages]
+
+        players, contexts, model = self._make_players(generate_batch_response, 4)
+        with self.assertRaises(BatchResponseError) as cm:
+            Player.batch_response(players, contexts, row_ids=[0, 1, 2, 3])
+        self.assertEqual(sorted(cm.exception.exception_by_row_id), [0, 3])
+        self.assertEqual(sorted(cm.exception.context_response_by_row_id), [1, 2])
+        self.assertEqual(model.generate_batch_response.call_count, 2)
+
+    def test_no_error_without_failures(self):
+        players, contexts, _ = self._make_players(
+            lambda batch_messages: [(messages, {}, "resp") for messages in batch_messages], 3)
+        result = Player.batch_response(players, contexts, row_ids=[0, 1, 2])
+        self.assertEqual(sorted(result), [0, 1, 2])
+
+
+class SampleResponseTestCase(unittest.TestCase):
+    """Tests for Player.sample_response static method."""
+
+    def test_samples_are_generated_with_one_call(self):
+        model = MagicMock()
+        model.name = "model"
+        model.generate_samples.return_value = [({"prompt": "p"}, {}, "resp0"), ({"prompt": "p"}, {}, "resp1")]
+        players = [MockPlayer(model), MockPlayer(model)]
+
+        result = Player.sample_response(players, {"role": "user", "content": "ctx"})
+
+        self.assertEqual(result, ["resp0", "resp1"])
+        model.generate_samples.assert_called_once_with([{"role": "user", "content": "ctx"}], 2)
+        self.assertEqual(players[0].get_perspective()[-1]["content"], "resp0")
+        self.assertEqual(players[1].get_perspective()[-1]["content"], "resp1")
+
+    def test_default_samples_are_generated_as_batch(self):
+        model = CustomResponseModel()
+        model.generate_batch_response = MagicMock(return_value=[({}, {}, "a"), ({}, {}, "b"), ({}, {}, "c")])
+        results = model.generate_samples([{"role": "user", "content": "ctx"}], 3)
+        self.assertEqual([response_text for _, _, response_text in results], ["a", "b", "c"])
+        self.assertEqual(len(model.generate_batch_response.call_args.args[0]), 3)
+        self.assertFalse(model.supports_sampling())
+
+    def test_players_must_share_the_model(self):
+        model_a, model_b = MagicMock(), MagicMock()
+        model_a.name, model_b.name = "a", "b"
+        with self.assertRaises(AssertionError):
+            Player.sample_response([MockPlayer(model_a), MockPlayer(model_b)], {"role": "user", "content": "ctx"})
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,146 @@
+import unittest
+
+from clemcore.backends.prompt_cache import PromptCache, TokenTrie, common_prefix_length, GB
+
+
+def crop(kv_state, length):
+    return f"{kv_state}[:{length}]", length
+
+
+class PromptCacheTestCase(unittest.TestCase):
+
+    def test_common_prefix_length(self):
+        self.assertEqual(common_prefix_length([1, 2, 3], [1, 2, 4]), 2)
+        self.assertEqual(common_prefix_length([1, 2], [1, 2, 3]), 2)
+        self.assertEqual(common_prefix_length([5], [1]), 0)
+
+    def test_next_turn_reuses_the_previous_turn(self):
+        cache = PromptCache(memory_budget=1)
+        cache.store([1, 2, 3, 4], "turn-1", num_bytes=10)  # prompt and response
+        length, entry = cache.lookup([1, 2, 3, 4, 5, 6])
+        self.assertEqual(length, 4)
+        self.assertEqual(entry.kv_state, "turn-1")
+        self.assertEqual((cache.hits, cache.misses, cache.reused_tokens), (1, 0, 4))
+
+    def test_longest_prefix_wins(self):
+        cache = PromptCache(memory_budget=1)
+        cache.store([1, 2], "short", num_bytes=10)
+        cache.store([1, 2, 3, 4], "long", num_bytes=10)
+        cache.store([7, 8, 9], "other session", num_bytes=10)
+        self.assertEqual(cache.lookup([1, 2, 3, 4, 5])[1].kv_state, "long")
+        self.assertEqual(cache.lookup([7, 8, 0]), (2, cache.entries[(7, 8, 9)]))
+
+    def test_edited_history_reuses_only_the_unchanged_prefix(self):
+        cache = PromptCache(memory_budget=1)
+        cache.store([1, 2, 3, 4], "turn-1", num_bytes=10)
+        length, entry = cache.lookup([1, 2, 9, 4, 5])
+        self.assertEqual(length, 2)  # the state must be cropped to the tokens before the edit
+        self.assertEqual(cache.lookup([9, 9]), (0, None))
+        self.assertEqual(cache.misses, 1)
+
+    def test_at_least_one_token_is_prefilled(self):
+        cache = PromptCache(memory_budget=1)
+        cache.store([1, 2, 3], "turn-1", num_bytes=10)
+        self.assertEqual(cache.lookup([1, 2, 3])[0], 2)
+        self.assertEqual(cache.lookup([1], max_length=0), (0, None))
+
+    def test_least_recently_used_entries_are_released(self):
+        cache = PromptCache(memory_budget=25 / GB)
+        cache.store([1], "a", num_bytes=10)
+        cache.store([2], "b", num_bytes=10)
+        cache.lookup([1, 0])  # a is used again
+        cache.store([3], "c", num_bytes=10)
+        self.assertEqual(list(cache.entries), [(1,), (3,)])
+        self.assertEqual(cache.num_bytes, 20)
+        cache.store([4], "too large", num_bytes=30)
+        self.assertNotIn((4,), cache.entries)
+
+    def test_storing_the_same_tokens_replaces_the_entry(self):
+        cache = PromptCache(memory_budget=1)
+        cache.store([1, 2], "old", num_bytes=10)
+        cache.store([1, 2], "new", num_bytes=20)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.num_bytes, 20)
+        cache.clear()
+        self.assertEqual((len(cache), cache.num_bytes), (0, 0))
+
+
+class TokenTrieTestCase(unittest.TestCase):
+
+    def test_longest_prefix(self):
+        trie = TokenTrie()
+        trie.insert((1, 2, 3, 4))
+        trie.insert((1, 2, 5))
+        trie.insert((1, 2))
+        self.assertEqual(trie.longest_prefix([1, 2, 3, 9]), (3, (1, 2, 3, 4)))
+        self.assertEqual(trie.longest_prefix([1, 2, 7]), (2, (1, 2)))  # prefer the sequence that ends there
+        self.assertEqual(trie.longest_prefix([1, 2, 5, 6]), (3, (1, 2, 5)))
+        self.assertEqual(trie.longest_prefix([9]), (0, None))
+
+    def test_removed_sequences_are_not_found(self):
+        trie = TokenTrie()
+        trie.insert((1, 2, 3))
+        trie.insert((1, 2, 4))
+        trie.remove((1, 2, 3))
+        self.assertEqual(trie.longest_prefix([1, 2, 3]), (2, (1, 2, 4)))
+        trie.remove((1, 2, 4))
+        self.assertEqual(trie.longest_prefix([1, 2, 3]), (0, None))
+        self.assertEqual(trie.root.children, {})
+
+
+class SharedPrefixTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = PromptCache(memory_budget=1, crop=crop, min_shared_length=3)
+        self.rules = [1, 2, 3, 4]
+        # the first instance: the prompt (rules and slot) and the response
+        self.cache.store(self.rules + [10, 11, 20, 21], "instance-1", num_bytes=8, num_prompt_tokens=6)
+
+    def test_prompt_prefix_is_shared_once(self):
+        length, entry = self.cache.lookup(self.rules + [12, 13])  # the next instance
+        self.assertEqual(length, 4)
+        self.assertTrue(entry.shared)
+        self.assertEqual(entry.kv_state, "instance-1[:4]")
+        self.assertEqual(self.cache.lookup(self.rules + [14, 15]), (4, entry))  # reused as is
+        self.assertEqual(self.cache.shared_prefixes, 1)
+        self.assertEqual(self.cache.num_bytes, 8 + 4)
+
+    def test_next_turn_is_not_shared(self):
+        length, entry = self.cache.lookup(self.rules + [10, 11, 20, 22, 30])  # the response was re-tokenized
+        self.assertEqual(length, 7)
+        self.assertFalse(entry.shared)
+        self.assertEqual(self.cache.shared_prefixes, 0)
+
+    def test_short_prefixes_are_not_shared(self):
+        length, entry = self.cache.lookup([1, 2, 9])
+        self.assertEqual(length, 2)
+        self.assertFalse(entry.shared)
+
+    def test_shared_prefixes_outlive_the_sessions(self):
+        shared = self.cache.lookup(self.rules + [12, 13])[1]
+        self.cache.store(self.rules + [12, 13, 22], "instance-2", num_bytes=7, num_prompt_tokens=6)
+        self.cache.memory_budget = 11 / GB  # the sessions are released first
+        self.assertEqual(self.cache.lookup(self.rules + [14, 15]), (4, shared))  # the next instance
+        self.cache.store(self.rules + [14, 15, 23], "instance-3", num_bytes=7, num_prompt_tokens=6)
+        self.assertEqual([entry.kv_state for entry in self.cache.entries.values()], ["instance-1[:4]", "instance-3"])
+        self.assertEqual(self.cache.lookup(self.rules + [16, 17]), (4, shared))
+
+    def test_shared_entry_in_use_is_released_last(self):
+        # the rows of a batch use the shared prefix and store their sessions after the generation
+        self.cache.memory_budget = 13 / GB  # for the shared entry and one session
+        length, shared = self.cache.lookup(self.rules + [12, 13])
+        self.assertEqual(self.cache.lookup(self.rules + [14, 15]), (length, shared))
+        self.cache.store(self.rules + [12, 13, 22], "instance-2", num_bytes=7, num_prompt_tokens=6)
+        self.cache.store(self.rules + [14, 15, 23], "instance-3", num_bytes=7, num_prompt_tokens=6)
+        self.assertEqual([entry.kv_state for entry in self.cache.entries.values()], ["instance-1[:4]", "instance-3"])
+        self.assertEqual(self.cache.lookup(self.rules + [16, 17]), (4, shared))
+
+    def test_stored_entry_is_not_released_for_itself(self):
+        self.cache.lookup(self.rules + [12, 13])
+        self.cache.memory_budget = 10 / GB
+        self.cache.store(self.rules + [12, 13, 22], "instance-2", num_bytes=7, num_prompt_tokens=6)
+        self.assertEqual([entry.kv_state for entry in self.cache.entries.values()], ["instance-2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import copy
 import unittest
 
 from clemcore.clemgame.recorder import GameInteractionsRecorder, EventCallRecorder
@@ -43,6 +44,18 @@ class TestGameInteractionsRecorder(unittest.TestCase):
         self.assertTrue(meta["completed"])
         self.assertEqual(meta["round_count"], 3)
 
+    def test_deepcopy_shares_logged_events(self):
+        """Copies (e.g. of branches) share the logged events, but log new events independently."""
+        self.recorder.log_event("GM", "Player 1", {"type": "send message", "content": "hi"})
+        branch = copy.deepcopy(self.recorder)
+        self.assertIs(branch.interactions["turns"][0][0], self.recorder.interactions["turns"][0][0])
+        branch.log_event("Player 1", "GM", {"type": "get message", "content": "hello"})
+        branch.log_next_round()
+        self.assertEqual(len(branch.interactions["turns"][0]), 2)
+        self.assertEqual(len(self.recorder.interactions["turns"]), 1)
+        self.assertEqual(len(self.recorder.interactions["turns"][0]), 1)
+        self.assertIsNone(self.recorder.interactions["meta"]["round_count"])
+
 
 class TestEventCallRecorder(unittest.TestCase):
 
@@ -0,0 +1,74 @@
+import os
+import signal
+import tempfile
+import unittest
+from pathlib import Path
+
+from clemcore.cli import GracefulInterrupt
+from clemcore.clemgame import ResultsFolder, SignalFileIndex
+from clemcore.clemgame.resources import store_json
+from tests.test_batchwise_runner import make_experiment_instances
+
+
+def _ids(game_instances):
+    return [(row["experiment"]["name"], row["game_instance"]["game_id"]) for row in game_instances]
+
+
+class SignalFileIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.results_folder = ResultsFolder(Path(self.tmp_dir.name), run_dir="model-a--model-b")
+        run_dir = self.results_folder.to_run_dir_path()
+        store_json({}, "completed.json", run_dir / "taboo" / "high" / "instance_00000")
+        store_json({}, "completed.json", run_dir / "taboo" / "low" / "instance_00002")
+        store_json({}, "error.json", run_dir / "taboo" / "high" / "instance_00001")
+        store_json({}, "instance.json", run_dir / "taboo" / "low" / "instance_00000")  # started, but no signal
+        # other model pairings do not count
+        store_json({}, "completed.json", Path(self.tmp_dir.name) / "other" / "taboo" / "high" / "instance_00002")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_resume_skips_completed_instances(self):
+        index = SignalFileIndex.from_results_folder(self.results_folder)
+        remaining = make_experiment_instances().filter(index.to_instances_filter())
+        self.assertEqual(_ids(remaining), [("high", 1), ("high", 2), ("low", 0), ("low", 1)])
+
+    def test_retry_errors_only(self):
+        index = SignalFileIndex.from_results_folder(self.results_folder)
+        remaining = make_experiment_instances().filter(index.to_instances_filter(errors_only=True))
+        self.assertEqual(_ids(remaining), [("high", 1)])
+
+    def test_empty_run_dir(self):
+        index = SignalFileIndex.from_results_folder(ResultsFolder(Path(self.tmp_dir.name), run_dir="missing"))
+        self.assertEqual(len(make_experiment_instances().filter(index.to_instances_filter())), 6)
+
+
+class GracefulInterruptTestCase(unittest.TestCase):
+
+    def test_first_sigint_stops_providing_rows(self):
+        with GracefulInterrupt() as interrupt:
+            played = []
+            for row in interrupt.wrap(make_experiment_instances()):
+                played.append(row)
+                if len(played) == 2:
+                    os.kill(os.getpid(), signal.SIGINT)
+            self.assertTrue(interrupt.requested)
+            self.assertEqual(len(played), 2)
+
+    def test_second_sigint_interrupts_immediately(self):
+        with GracefulInterrupt():
+            os.kill(os.getpid(), signal.SIGINT)
+            with self.assertRaises(KeyboardInterrupt):
+                os.kill(os.getpid(), signal.SIGINT)
+
+    def test_previous_handler_is_restored(self):
+        previous = signal.getsignal(signal.SIGINT)
+        with GracefulInterrupt():
+            self.assertIsNot(signal.getsignal(signal.SIGINT), previous)
+        self.assertIs(signal.getsignal(signal.SIGINT), previous)
+
+
+if __name__ == '__main__':
+    unittest.main()
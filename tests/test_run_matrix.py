@@ -0,0 +1,138 @@
+import threading
+import time
+import unittest
+from typing import List, Dict
+from unittest.mock import patch
+
+from clemcore.backends import Model, ModelSpec
+from clemcore.clemgame import GameBenchmarkCallbackList
+from clemcore.clemgame.runners import matrix
+from clemcore.clemgame.runners.matrix import ModelCache, estimate_memory, plan
+from tests.test_batchwise_runner import RecordingCallback, make_benchmark, make_instances
+
+
+def local_spec(model_name, parameters="8B", **model_config):
+    return ModelSpec(model_name=model_name, backend="huggingface_local", parameters=parameters,
+                     model_config=model_config)
+
+
+def remote_spec(model_name):
+    return ModelSpec(model_name=model_name, backend="openai", parameters="")
+
+
+class FakeModel(Model):
+    """Responds with its name; remote models are slow and record which threads call them."""
+
+    def __init__(self, model_spec: ModelSpec):
+        super().__init__(model_spec)
+        self.set_gen_args(temperature=0.0, max_tokens=10)
+        self.unloaded = False
+        self.threads = set()
+
+    def supports_concurrency(self) -> bool:
+        return not matrix.is_local(self.model_spec)
+
+    def generate_response(self, messages: List[Dict]):
+        assert not self.unloaded, "model has been unloaded"
+        self.threads.add(threading.current_thread().name)
+        if self.supports_concurrency():
+            time.sleep(.01)
+        return messages, {}, self.name
+
+    def unload(self):
+        self.unloaded = True
+
+
+class EstimateMemoryTestCase(unittest.TestCase):
+
+    def test_estimate_from_parameters(self):
+        self.assertEqual(estimate_memory(local_spec("a", "8B")), 16.)
+        self.assertEqual(estimate_memory(local_spec("a", "8B", load_in_4bit=True)), 4.)
+        self.assertEqual(estimate_memory(local_spec("a", "500M", load_in_8bit=True)), .5)
+        self.assertIsNone(estimate_memory(local_spec("a", "")))
+        self.assertIsNone(estimate_memory(ModelSpec(model_name="mock")))
+
+
+class PlanTestCase(unittest.TestCase):
+
+    def test_local_pairings_are_grouped_by_shared_models(self):
+        a, b, c, gpt = local_spec("a"), local_spec("b"), local_spec("c"), remote_spec("gpt")
+        local_pairings, remote_pairings = plan([[a], [b], [a, gpt], [c, b], [gpt], [b, a]])
+        names = [[spec.model_name for spec in pairing] for pairing in local_pairings]
+        self.assertEqual(names, [["a"], ["a", "gpt"], ["b", "a"], ["b"], ["c", "b"]])
+        self.assertEqual(remote_pairings, [[gpt]])
+
+
+class ModelCacheTestCase(unittest.TestCase):
+
+    def test_models_are_loaded_once_and_released_within_budget(self):
+        loaded = []
+
+        def load_model(model_spec):
+            loaded.append(model_spec.model_name)
+            return FakeModel(model_spec)
+
+        cache = ModelCache(load_model, memory_budget=40)
+        a, b, c, gpt = local_spec("a"), local_spec("b"), local_spec("c"), remote_spec("gpt")
+        model_a, _ = cache.acquire([a, gpt])
+        cache.acquire([b])
+        self.assertEqual(cache.memory_in_use(), 32.)
+        cache.acquire([a, gpt])  # already loaded
+        self.assertEqual(loaded, ["a", "gpt", "b"])
+        cache.acquire([c])  # releases the least recently used local model (b)
+        self.assertEqual(sorted(cache.models), ["a", "c", "gpt"])
+        cache.acquire([local_spec("d", "30B")])  # needs 60 GB: releases a and c, but is loaded anyway
+        self.assertEqual(sorted(cache.models), ["d", "gpt"])
+        self.assertTrue(model_a.unloaded)
+        cache.release_all()
+        self.assertEqual(len(cache.models), 0)
+
+    def test_without_budget_models_stay_loaded(self):
+        cache = ModelCache(FakeModel)
+        for name in ["a", "b", "c"]:
+            cache.acquire([local_spec(name, "70B")])
+        self.assertEqual(len(cache.models), 3)
+
+
+class MatrixRunTestCase(unittest.TestCase):
+
+    def test_all_games_are_played_with_all_pairings(self):
+        models = {}
+
+        def load_model(model_spec):
+            models[model_spec.model_name] = FakeModel(model_spec)
+            return models[model_spec.model_name]
+
+        recorders = {}
+
+        def create_callbacks(player_models):
+            recorder = RecordingCallback()
+            recorders[Model.to_identifier(player_models)] = recorder
+            return GameBenchmarkCallbackList([recorder])
+
+        game_benchmarks = [make_benchmark(game_name="countdown"), make_benchmark(game_name="other")]
+        game_instances = [make_instances([1, 2, 3], game_name="countdown"), make_instances([2], game_name="other")]
+        pairings = [[local_spec("a")], [remote_spec("gpt")], [remote_spec("claude")], [local_spec("b")]]
+        errors = matrix.run(game_benchmarks, game_instances, pairings,
+                            load_model=load_model, create_callbacks=create_callbacks, memory_budget=20)
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(recorders), ["a", "b", "claude", "gpt"])
+        for recorder in recorders.values():
+            self.assertEqual(recorder.benchmarks_started, ["countdown", "other"])
+            self.assertEqual(sorted(recorder.ended), [0, 0, 1, 2])
+        self.assertTrue(all(model.unloaded for model in models.values()))
+        self.assertTrue(all(name.startswith("remote-pairing") for name in models["gpt"].threads))
+        self.assertEqual(models["a"].threads, {threading.main_thread().name})
+
+    def test_errors_of_a_game_do_not_stop_the_matrix(self):
+        game_benchmarks = [make_benchmark(game_name="countdown"), make_benchmark(game_name="other")]
+        game_instances = [make_instances([1], game_name="countdown"), make_instances([1], game_name="other")]
+        with patch.object(matrix.dispatch, "run", side_effect=[RuntimeError("boom"), None]) as run:
+            errors = matrix.run(game_benchmarks, game_instances, [[local_spec("a")]], load_model=FakeModel,
+                                create_callbacks=lambda player_models: GameBenchmarkCallbackList())
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(run.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from types import ModuleType
+
+from clemcore.backends import ModelSpec
+from clemcore.clemgame import GameBenchmark, GameBenchmarkCallbackList, GameSpec
+from clemcore.clemgame.envs.pettingzoo.master import GameMasterEnv
+from clemcore.clemgame.snapshots import dump_snapshot, load_snapshot, read_snapshot_header, SNAPSHOT_VERSION
+from tests.test_batchwise_runner import make_benchmark, make_instances, RecordingBatchModel, RecordingCallback
+
+MASTER_PY = """
+from clemcore.clemgame import GameBenchmark, DialogueGameMaster, Player
+
+
+class ShoutPlayer(Player):
+
+    def _custom_response(self, context):
+        return "shout"
+
+
+class ShoutMaster(DialogueGameMaster):
+
+    def _on_setup(self, **game_instance):
+        self.add_player(ShoutPlayer(self.player_models[0]))
+        self.set_context_for(self.get_players()[0], "start")
+
+    def _parse_response(self, player, response):
+        return response
+
+    def _advance_game(self, player, parsed_response):
+        if self.current_round >= 1:
+            self.state.succeed()
+        self.set_context_for(player, parsed_response)
+
+
+class ShoutBenchmark(GameBenchmark):
+
+    def create_game_master(self, experiment, player_models):
+        return ShoutMaster(self.game_spec, experiment, player_models)
+"""
+
+
+def make_env(game_benchmark, player_models, turns=4, callbacks=None):
+    row = next(iter(make_instances([turns], game_name=game_benchmark.game_name)))
+    game_env = GameMasterEnv(game_benchmark, callbacks=callbacks)
+    game_env.reset(options=dict(player_models=player_models, experiment=row["experiment"],
+                                game_instance=row["game_instance"]))
+    return game_env
+
+
+def play(game_env, num_steps=None):
+    while game_env.agent_selection is not None and num_steps != 0:
+        context, _, termination, truncation, _ = game_env.last()
+        if termination or truncation:
+            game_env.step(None)
+            continue
+        player = game_env.player_by_agent_id[game_env.agent_selection]
+        game_env.step(player(context))
+        num_steps = None if num_steps is None else num_steps - 1
+
+
+class SnapshotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.game_benchmark = make_benchmark(players=2)
+        self.model = RecordingBatchModel()
+
+    def test_restored_env_continues_the_episode(self):
+        game_env = make_env(self.game_benchmark, [self.model])
+        play(game_env, num_steps=1)
+        restored = GameMasterEnv.from_snapshot(game_env.to_snapshot(), self.game_benchmark,
+                                               player_models=[self.model])
+        self.assertIsNot(restored, game_env)
+        self.assertIs(restored.game_benchmark, self.game_benchmark)
+        self.assertIs(restored.game_master.game_spec, self.game_benchmark.game_spec)
+        restored_player = restored.player_by_agent_id["player_0"]
+        self.assertIs(restored_player.model, self.model)
+        self.assertEqual(restored_player.get_perspective(), game_env.player_by_agent_id["player_0"].get_perspective())
+        play(restored)
+        self.assertEqual(restored.game_master.num_responses, 4)
+        self.assertEqual(game_env.game_master.num_responses, 1)  # the original is not affected
+
+    def test_callbacks_are_restored_with_the_env(self):
+        recorder = RecordingCallback()
+        game_env = make_env(self.game_benchmark, [self.model], callbacks=GameBenchmarkCallbackList([recorder]))
+        play(game_env, num_steps=2)
+        restored = GameMasterEnv.from_snapshot(game_env.to_snapshot(), self.game_benchmark,
+                                               player_models=[self.model])
+        play(restored)
+        restored_recorder = restored.callbacks.callbacks[0]
+        self.assertIsNot(restored_recorder, recorder)
+        self.assertEqual(restored_recorder.steps, [0] * 4)
+        self.assertEqual(restored_recorder.ended, [0])
+        self.assertEqual(recorder.ended, [])
+
+    def test_shared_objects_are_referenced(self):
+        recorder = RecordingCallback()
+        game_env = make_env(self.game_benchmark, [self.model], callbacks=GameBenchmarkCallbackList([recorder]))
+        data = game_env.to_snapshot(shared=dict(recorder=recorder))
+        restored = GameMasterEnv.from_snapshot(data, self.game_benchmark, player_models=[self.model],
+                                               shared=dict(recorder=recorder))
+        self.assertIs(restored.callbacks.callbacks[0], recorder)
+        with self.assertRaises(ValueError):
+            GameMasterEnv.from_snapshot(data, self.game_benchmark, player_models=[self.model])
+
+    def test_missing_models_are_loaded_by_spec(self):
+        self.model.set_gen_args(temperature=0.5, max_tokens=20)
+        game_env = make_env(self.game_benchmark, [self.model])
+        data = game_env.to_snapshot()
+        self.assertEqual(read_snapshot_header(data)["models"], [{"model_name": "fake"}])
+        loaded_specs = []
+
+        def load_model(model_spec: ModelSpec):
+            loaded_specs.append(model_spec.model_name)
+            return RecordingBatchModel(model_spec.model_name)
+
+        restored = GameMasterEnv.from_snapshot(data, self.game_benchmark, load_model=load_model)
+        self.assertEqual(loaded_specs, ["fake"])  # once for both players
+        restored_model = restored.player_by_agent_id["player_1"].model
+        self.assertIs(restored_model, restored.player_by_agent_id["player_0"].model)
+        self.assertEqual(restored_model.gen_args, dict(temperature=0.5, max_tokens=20))
+
+    def test_given_models_keep_their_gen_args(self):
+        self.model.set_gen_args(temperature=0.5)
+        data = make_env(self.game_benchmark, [self.model]).to_snapshot()
+        self.model.set_gen_args(temperature=0.0)  # e.g. the model is used by another experiment
+        with self.assertLogs("clemcore.clemgame.snapshots", level="WARNING") as logs:
+            restored = GameMasterEnv.from_snapshot(data, self.game_benchmark, player_models=[self.model])
+        self.assertEqual(len(logs.output), 1)  # once for both players
+        self.assertIs(restored.player_by_agent_id["player_0"].model, self.model)
+        self.assertEqual(self.model.gen_args, dict(temperature=0.0))
+
+    def test_extra_modules_are_registered_only_while_restoring(self):
+        data = make_env(self.game_benchmark, [self.model]).to_snapshot()
+        other_helpers = sys.modules["shout_helpers"] = ModuleType("shout_helpers")  # of another game
+        self.addCleanup(sys.modules.pop, "shout_helpers", None)
+        self.game_benchmark.set_extra_modules(dict(shout_helpers=ModuleType("shout_helpers")))
+        load_snapshot(data, self.game_benchmark, player_models=[self.model])
+        self.assertIs(sys.modules["shout_helpers"], other_helpers)
+        del sys.modules["shout_helpers"]
+        load_snapshot(data, self.game_benchmark, player_models=[self.model])
+        self.assertNotIn("shout_helpers", sys.modules)
+
+    def test_players_and_game_states_can_be_snapshot(self):
+        game_env = make_env(self.game_benchmark, [self.model])
+        play(game_env, num_steps=1)
+        player = game_env.player_by_agent_id["player_0"]
+        restored_player = load_snapshot(dump_snapshot(player, self.game_benchmark), self.game_benchmark,
+                                        player_models=[self.model])
+        self.assertEqual(restored_player.get_perspective(), player.get_perspective())
+        state = load_snapshot(dump_snapshot(game_env.game_master.state, self.game_benchmark), self.game_benchmark)
+        self.assertEqual(state.outcome, game_env.game_master.state.outcome)
+
+    def test_invalid_snapshots_are_rejected(self):
+        data = make_env(self.game_benchmark, [self.model]).to_snapshot()
+        header, _, payload = data.partition(b"\n")
+        newer = json.dumps({**json.loads(header), "version": SNAPSHOT_VERSION + 1}).encode("utf-8")
+        with self.assertRaises(ValueError):
+            load_snapshot(newer + b"\n" + payload, self.game_benchmark)
+        with self.assertRaises(ValueError):
+            load_snapshot(data, make_benchmark(game_name="other"))
+        with self.assertRaises(ValueError):
+            load_snapshot(b"not a snapshot", self.game_benchmark)
+
+
+class GameModuleSnapshotTestCase(unittest.TestCase):
+    """The classes of a game's master.py are not importable by their module name."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        game_path = Path(self.tmp_dir.name) / "shout"
+        game_path.mkdir()
+        (game_path / "master.py").write_text(MASTER_PY)
+        self.game_spec = GameSpec(game_name="shout", game_path=str(game_path), players=1)
+        GameBenchmark.clear_cache()
+
+    def tearDown(self):
+        GameBenchmark.clear_cache()
+        self.tmp_dir.cleanup()
+
+    def test_game_classes_are_restored_from_the_game_module(self):
+        game_benchmark = GameBenchmark.load_from_spec(self.game_spec, use_cache=False)
+        model = RecordingBatchModel()
+        game_env = make_env(game_benchmark, [model])
+        data = game_env.to_snapshot()
+        reloaded = GameBenchmark.load_from_spec(self.game_spec, use_cache=False)  # e.g. in another process
+        restored = GameMasterEnv.from_snapshot(data, reloaded, player_models=[model])
+        self.assertIs(type(restored.game_master), reloaded.game_module.ShoutMaster)
+        self.assertIsNot(type(restored.game_master), type(game_env.game_master))
+        play(restored)
+        self.assertEqual(restored.game_master.state.outcome, "success")
+
+
+if __name__ == '__main__':
+    unittest.main()
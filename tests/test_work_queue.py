@@ -0,0 +1,237 @@
+import multiprocessing
+import sqlite3
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from clemcore.cli import create_results_callbacks
+from clemcore.clemgame import EpisodeCancelledError
+from clemcore.clemgame.envs.pettingzoo.master import GameMasterEnv
+from clemcore.clemgame.runners import distributed
+from clemcore.clemgame.runners.distributed import WorkQueue, PENDING, LEASED, COMPLETED, FAILED
+from tests.test_batchwise_runner import RecordingBatchModel, make_benchmark, make_experiment_instances, make_instances
+
+
+def _lease_all(db_path, worker_id, results):
+    """Worker process: lease and complete items until the queue is drained."""
+    work_queue = WorkQueue(db_path)
+    leased = []
+    while True:
+        item = work_queue.lease(worker_id)
+        if item is None:
+            break
+        leased.append(item.item_id)
+        work_queue.complete(item, worker_id)
+    results.put(leased)
+
+
+class WorkQueueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp_dir.name) / "queue.sqlite"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_enqueue_ignores_known_items(self):
+        """Enqueuing the same sweep twice does not add items again."""
+        work_queue = WorkQueue(self.db_path)
+        self.assertEqual(work_queue.enqueue(make_experiment_instances(), ["mock"], gen_args={}), 6)
+        self.assertEqual(work_queue.enqueue(make_experiment_instances(), ["mock"], gen_args={}), 0)
+        self.assertEqual(work_queue.enqueue(make_experiment_instances(), ["mock", "mock"], gen_args={}), 6)
+        self.assertEqual(work_queue.counts()[PENDING], 12)
+
+    def test_lease_complete_and_fail(self):
+        """Leased items are not leased again; completion and failure are recorded."""
+        work_queue = WorkQueue(self.db_path)
+        work_queue.enqueue(make_experiment_instances(num_instances=1), ["mock"], gen_args={"temperature": 0.})
+        first = work_queue.lease("w1")
+        second = work_queue.lease("w2")
+        self.assertNotEqual(first.item_id, second.item_id)
+        self.assertEqual(first.models, ("mock",))
+        self.assertEqual(first.gen_args, {"temperature": 0.})
+        self.assertEqual(first.attempts, 1)
+        self.assertIsNone(work_queue.lease("w3"))
+        self.assertTrue(work_queue.complete(first, "w1"))
+        self.assertFalse(work_queue.complete(second, "w1"), "Only the lease holder can complete an item")
+        self.assertTrue(work_queue.fail(second, "w2", "boom"))
+        self.assertEqual(work_queue.counts(), {PENDING: 0, LEASED: 0, COMPLETED: 1, FAILED: 1})
+        self.assertEqual(work_queue.reset_failed(), 1)
+        self.assertEqual(work_queue.counts()[PENDING], 1)
+
+    def test_expired_lease_is_re_leased(self):
+        """A crashed worker's item is handed out again once its lease expired."""
+        work_queue = WorkQueue(self.db_path, lease_seconds=0.05)
+        work_queue.enqueue(make_experiment_instances(experiments=("high",), num_instances=1), ["mock"], gen_args={})
+        item = work_queue.lease("crashed")
+        self.assertIsNone(work_queue.lease("w2"))
+        time.sleep(0.1)
+        re_leased = work_queue.lease("w2")
+        self.assertEqual(re_leased.item_id, item.item_id)
+        self.assertEqual(re_leased.attempts, 2)
+        self.assertFalse(work_queue.heartbeat(item, "crashed"), "The crashed worker lost its lease")
+        self.assertTrue(work_queue.heartbeat(re_leased, "w2"))
+
+    def test_expired_lease_fails_after_max_attempts(self):
+        work_queue = WorkQueue(self.db_path, lease_seconds=0.01, max_attempts=1)
+        work_queue.enqueue(make_experiment_instances(experiments=("high",), num_instances=1), ["mock"], gen_args={})
+        work_queue.lease("crashed")
+        time.sleep(0.05)
+        self.assertIsNone(work_queue.lease("w2"))
+        self.assertEqual(work_queue.counts()[FAILED], 1)
+
+    def test_lease_prefers_models_and_game(self):
+        work_queue = WorkQueue(self.db_path)
+        work_queue.enqueue(make_experiment_instances("taboo", num_instances=1), ["a"], gen_args={})
+        work_queue.enqueue(make_experiment_instances("wordle", num_instances=1), ["b"], gen_args={})
+        work_queue.enqueue(make_experiment_instances("taboo", num_instances=1), ["b"], gen_args={})
+        item = work_queue.lease("w1", prefer_models=("b",), prefer_game="taboo")
+        self.assertEqual((item.game_name, item.models), ("taboo", ("b",)))
+
+    def test_multiple_worker_processes_lease_each_item_once(self):
+        work_queue = WorkQueue(self.db_path)
+        work_queue.enqueue(make_experiment_instances(num_instances=20), ["mock"], gen_args={})
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=_lease_all, args=(str(self.db_path), f"w{i}", results))
+                   for i in range(4)]
+        for worker in workers:
+            worker.start()
+        leased = [item_id for _ in workers for item_id in results.get(timeout=60)]
+        for worker in workers:
+            worker.join()
+        self.assertEqual(len(leased), 40)
+        self.assertEqual(len(set(leased)), 40)
+        self.assertEqual(work_queue.counts()[COMPLETED], 40)
+
+
+class WorkerRunTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.work_queue = WorkQueue(Path(self.tmp_dir.name) / "queue.sqlite")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _run(self, run_episode, load_models=None, game_env_class=None):
+        game_benchmark = MagicMock()
+        game_benchmark.__enter__ = lambda s: s
+        game_benchmark.__exit__ = MagicMock(return_value=False)
+        callbacks = MagicMock()
+        load_models = load_models or MagicMock(return_value=[MagicMock()])
+        with patch.object(distributed, "GameRegistry"), \
+                patch.object(distributed, "GameMasterEnv", game_env_class or MagicMock()), \
+                patch.object(distributed.GameBenchmark, "load_from_spec", return_value=game_benchmark), \
+                patch.object(distributed.GameInstances, "from_game_spec", return_value=make_experiment_instances()), \
+                patch.object(distributed.sequential, "run_episode", side_effect=run_episode):
+            num_completed = distributed.run(self.work_queue, create_callbacks=lambda models: callbacks,
+                                            worker_id="w1", load_models=load_models)
+        return num_completed, callbacks, load_models
+
+    def test_worker_drains_queue(self):
+        """The worker plays all items, loads the models once and notifies benchmark callbacks once per game."""
+        self.work_queue.enqueue(make_experiment_instances(), ["mock"], gen_args={})
+        played = []
+        num_completed, callbacks, load_models = self._run(
+            lambda env, row, models, **kwargs: played.append((row["experiment"]["name"],
+                                                              row["game_instance"]["game_id"])))
+        self.assertEqual(num_completed, 6)
+        self.assertEqual(len(set(played)), 6)
+        self.assertEqual(load_models.call_count, 1)
+        self.assertEqual(callbacks.on_benchmark_start.call_count, 1)
+        self.assertEqual(callbacks.on_benchmark_end.call_count, 1)
+        self.assertEqual(self.work_queue.counts()[COMPLETED], 6)
+
+    def test_worker_records_failures_and_continues(self):
+        self.work_queue.enqueue(make_experiment_instances(), ["mock"], gen_args={})
+
+        def run_episode(env, row, models, **kwargs):
+            if row["game_instance"]["game_id"] == 0:
+                raise RuntimeError("boom")
+
+        game_env_class = MagicMock()
+        num_completed, _, _ = self._run(run_episode, game_env_class=game_env_class)
+        self.assertEqual(num_completed, 4)
+        self.assertEqual(self.work_queue.counts()[FAILED], 2)
+        self.assertEqual(game_env_class.return_value.close.call_count, 6)  # also the envs of failed episodes
+
+    def test_worker_continues_when_failures_cannot_be_recorded(self):
+        self.work_queue.enqueue(make_experiment_instances(), ["mock"], gen_args={})
+
+        def run_episode(env, row, models, **kwargs):
+            if row["game_instance"]["game_id"] == 0:
+                raise RuntimeError("boom")
+
+        with patch.object(self.work_queue, "fail", side_effect=sqlite3.OperationalError("database is locked")):
+            num_completed, _, _ = self._run(run_episode)
+        self.assertEqual(num_completed, 4)
+        self.assertEqual(self.work_queue.counts()[LEASED], 2)  # re-leased when the leases expire
+
+    def test_previous_models_are_unloaded_on_pairing_change(self):
+        self.work_queue.enqueue(make_experiment_instances(num_instances=1), ["mock"], gen_args={})
+        self.work_queue.enqueue(make_experiment_instances(num_instances=1), ["other"], gen_args={})
+        loaded = []
+
+        def load_models(model_specs, gen_args):
+            loaded.append(MagicMock())
+            return [loaded[-1]]
+
+        num_completed, _, _ = self._run(lambda env, row, models, **kwargs: None, load_models=load_models)
+        self.assertEqual(num_completed, 4)
+        self.assertEqual(len(loaded), 2)
+        loaded[0].unload.assert_called_once()
+        loaded[1].unload.assert_not_called()
+
+    def test_episode_is_aborted_when_the_lease_is_lost(self):
+        self.work_queue.enqueue(make_experiment_instances(num_instances=1), ["mock"], gen_args={})
+        aborted = []
+
+        class LostHeartbeat(distributed.LeaseHeartbeat):
+            def __enter__(self):
+                if self.item.experiment_name == "high":  # e.g. another worker has re-leased the expired item
+                    self.lease_lost.set()
+                return super().__enter__()
+
+        def run_episode(env, row, models, is_aborted=None):
+            aborted.append(is_aborted())
+            return not aborted[-1]
+
+        game_env_class = MagicMock()
+        with patch.object(distributed, "LeaseHeartbeat", LostHeartbeat):
+            num_completed, _, _ = self._run(run_episode, game_env_class=game_env_class)
+        self.assertEqual(sorted(aborted), [False, True])
+        game_env_class.return_value.abort.assert_called_once()  # to release the callbacks' state of the episode
+        self.assertIsInstance(game_env_class.return_value.abort.call_args.args[0], EpisodeCancelledError)
+        self.assertEqual(num_completed, 1)
+        self.assertEqual(self.work_queue.counts()[LEASED], 1)  # not completed by this worker
+
+
+class CancelledEpisodeTestCase(unittest.TestCase):
+    """The result file savers release the state of a cancelled episode, but do not write its results."""
+
+    def test_cancelled_episode_leaves_no_results(self):
+        model = RecordingBatchModel()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            callbacks = create_results_callbacks(Path(tmp_dir), [model])
+            game_benchmark = make_benchmark()
+            callbacks.on_benchmark_start(game_benchmark)
+            row = next(iter(make_instances([3])))
+            game_env = GameMasterEnv(game_benchmark, callbacks=callbacks)
+            game_env.reset(options=dict(player_models=[model], experiment=row["experiment"],
+                                        game_instance=row["game_instance"]))
+            game_env.abort(EpisodeCancelledError("The lease was lost"))
+            callbacks.on_benchmark_end(game_benchmark)
+            savers = {type(callback).__name__: callback for callback in callbacks.callbacks}
+            self.assertEqual(savers["InteractionsFileSaver"]._recorders, {})
+            self.assertEqual(savers["PlayerFileSaver"]._recorders, {})
+            run_dir_path = savers["RunFileSaver"].results_folder.to_run_dir_path()
+            self.assertEqual(savers["RunFileSaver"].data["games"]["countdown"]["num_instances"], 0)
+            self.assertEqual(list(run_dir_path.rglob("error.json")) + list(run_dir_path.rglob("interactions.json")),
+                             [])
+
+
+if __name__ == '__main__':
+    unittest.main()